@@ -0,0 +1,225 @@
+"""
+aec.py - Cancelación de eco acústico (AEC) para el modo full-duplex
+
+Cuando emisor y receptor funcionan en la misma máquina, lo que suena por el
+altavoz vuelve a entrar por el micrófono. EchoCanceller resta ese eco usando
+como referencia la señal que el receptor acaba de reproducir.
+
+Algoritmo: NLMS en el dominio de la frecuencia con filtro particionado
+(PBFDAF). La respuesta del eco se divide en P particiones de un bloque
+(10 ms); cada bloque se procesa con FFTs de 2 bloques vectorizadas sobre
+todas las particiones y canales del micrófono a la vez, con normalización
+por potencia de cada bin y restricción de gradiente (solapamiento-guarda).
+
+Uso (benchmark de tiempo por bloque de 10 ms):
+    python aec.py --bench
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from resampler import StreamResampler
+
+
+class EchoCanceller:
+    """Cancelador de eco NLMS particionado en frecuencia, en streaming."""
+
+    name = "Cancelación de eco"
+
+    def __init__(self, rate, channels=1, frame_ms=10, tail_ms=250, step=0.5,
+                 power_smoothing=0.9, max_reference_ms=500):
+        """
+        Args:
+            rate: frecuencia del micrófono (Hz)
+            channels: canales del micrófono
+            frame_ms: tamaño de bloque de procesado
+            tail_ms: longitud de eco cubierta (latencia de dispositivos + sala)
+            step: paso de adaptación NLMS (0 < step <= 1)
+            power_smoothing: suavizado de la potencia de referencia por bin
+            max_reference_ms: referencia máxima acumulada (se descarta lo más antiguo)
+        """
+        self.rate = rate
+        self.channels = channels
+        self.block = max(16, int(rate * frame_ms / 1000))
+        self.partitions = max(1, int(np.ceil(tail_ms / frame_ms)))
+        self.step = step
+        self.power_smoothing = power_smoothing
+        self.max_reference = int(rate * max_reference_ms / 1000)
+        self.enabled = True
+
+        self._lock = threading.Lock()
+        self._reference_chunks = []
+        self._reference_len = 0
+        self._reference_resampler = None
+        self.reset()
+
+    def reset(self):
+        B, P, bins = self.block, self.partitions, self.block + 1
+        self._weights = np.zeros((self.channels, P, bins), dtype=np.complex64)
+        self._far_spectra = np.zeros((P, bins), dtype=np.complex64)  # historial de referencia
+        self._far_power = np.full(bins, 1e-6, dtype=np.float32)
+        self._far_prev = np.zeros(B, dtype=np.float32)
+        self.erle_db = 0.0
+        self.prepare(getattr(self, "capacity", B))
+
+    def prepare(self, max_frames):
+        """Reserva las FIFO y buffers de trabajo para bloques de hasta `max_frames` frames (vacía el estado)."""
+        B, c = self.block, self.channels
+        self.capacity = max_frames
+        # Micrófono pendiente de completar un bloque (< B) seguido del bloque nuevo
+        self._mic = np.zeros((B + max_frames, c), dtype=np.float32)
+        self._mic_len = 0
+        # FIFO de salida precargada con un bloque: latencia fija de frame_ms
+        self._out = np.zeros((B + max_frames, c), dtype=np.float32)
+        self._out_len = B
+        # Error con media trama de ceros delante para la FFT del gradiente
+        self._padded_error = np.zeros((2 * B, c), dtype=np.float32)
+
+    def push_reference(self, frames, rate=None):
+        """
+        Añade audio reproducido por el altavoz (float32 (frames, canales)).
+
+        Se puede llamar desde el hilo del receptor; si `rate` difiere de la
+        frecuencia del micrófono la referencia se convierte.
+        """
+        mono = frames.mean(axis=1) if frames.ndim > 1 and frames.shape[1] > 1 else frames.reshape(-1)
+        mono = mono.astype(np.float32, copy=False)
+        if rate and rate != self.rate:
+            if self._reference_resampler is None or self._reference_resampler.in_rate != rate:
+                self._reference_resampler = StreamResampler(rate, self.rate, 1)
+            mono = self._reference_resampler.process(mono[:, None])[:, 0]
+        with self._lock:
+            self._reference_chunks.append(mono)
+            self._reference_len += len(mono)
+            # Si el micrófono no consume (p. ej. emisor detenido), no acumular sin límite
+            while self._reference_len > self.max_reference and len(self._reference_chunks) > 1:
+                self._reference_len -= len(self._reference_chunks.pop(0))
+
+    def _take_reference(self, n):
+        """Extrae n muestras de referencia (ceros si el altavoz no ha sonado)."""
+        with self._lock:
+            if self._reference_len == 0:
+                return np.zeros(n, dtype=np.float32)
+            joined = np.concatenate(self._reference_chunks)
+            taken, rest = joined[:n], joined[n:]
+            self._reference_chunks = [rest] if len(rest) else []
+            self._reference_len = len(rest)
+        if len(taken) < n:
+            taken = np.concatenate((taken, np.zeros(n - len(taken), dtype=np.float32)))
+        return taken
+
+    def _process_block(self, far, mic, error):
+        """Cancela un bloque: far (B,), mic (B, canales). Escribe el error (B, canales) en `error`."""
+        B = self.block
+        far_spec = np.fft.rfft(np.concatenate((self._far_prev, far)))
+        self._far_prev[:] = far
+        self._far_spectra = np.roll(self._far_spectra, 1, axis=0)
+        self._far_spectra[0] = far_spec
+
+        # Estimación del eco: suma sobre particiones (canales x particiones x bins)
+        echo_spec = np.einsum("cpk,pk->ck", self._weights, self._far_spectra)
+        echo = np.fft.irfft(echo_spec, n=2 * B, axis=1)[:, B:].T
+        np.subtract(mic, echo, out=error, casting="same_kind")
+
+        # Actualización NLMS normalizada por la potencia de cada bin
+        self._far_power = (self.power_smoothing * self._far_power
+                           + (1 - self.power_smoothing) * (far_spec.real ** 2 + far_spec.imag ** 2))
+        self._padded_error[B:] = error
+        error_spec = np.fft.rfft(self._padded_error, axis=0).T
+        gradient = (np.conj(self._far_spectra)[None] * error_spec[:, None, :]
+                    / (self.partitions * self._far_power + 1e-6))
+        # Restricción de gradiente: anular la mitad causal no válida
+        g_time = np.fft.irfft(gradient, n=2 * B, axis=2)
+        g_time[:, :, B:] = 0.0
+        self._weights += (self.step * np.fft.rfft(g_time, axis=2)).astype(np.complex64)
+
+        mic_energy = float(np.mean(mic ** 2))
+        if mic_energy > 1e-8:
+            erle = 10 * np.log10(mic_energy / max(float(np.mean(error ** 2)), 1e-12))
+            self.erle_db += 0.05 * (erle - self.erle_db)
+
+    def process(self, frames):
+        """Cancela el eco de un bloque del micrófono float32 (frames, canales) de cualquier tamaño."""
+        if not self.enabled:
+            return frames
+        out = np.array(frames, dtype=np.float32)
+        self.process_into(out)
+        return out
+
+    def process_into(self, frames):
+        """Como process(), pero escribe el resultado in situ sobre `frames` usando las FIFO reservadas."""
+        if not self.enabled:
+            return frames
+        B = self.block
+        n = len(frames)
+        if n > self.capacity:
+            self._grow(n)
+        mic = self._mic[:self._mic_len + n]
+        mic[self._mic_len:] = frames
+        n_blocks = len(mic) // B
+        if n_blocks:
+            far = self._take_reference(n_blocks * B)
+            for b in range(n_blocks):
+                start = self._out_len + b * B
+                self._process_block(far[b * B:(b + 1) * B], mic[b * B:(b + 1) * B],
+                                    self._out[start:start + B])
+            self._out_len += n_blocks * B
+        rest = len(mic) - n_blocks * B
+        self._mic[:rest] = mic[n_blocks * B:]
+        self._mic_len = rest
+
+        # La FIFO siempre tiene al menos n frames: B precargados menos el micrófono pendiente
+        frames[:] = self._out[:n]
+        self._out[:self._out_len - n] = self._out[n:self._out_len]
+        self._out_len -= n
+        return frames
+
+    def _grow(self, max_frames):
+        """Amplía las reservas conservando el micrófono y la salida pendientes."""
+        mic = self._mic[:self._mic_len].copy()
+        out = self._out[:self._out_len].copy()
+        self.prepare(max_frames)
+        self._mic[:len(mic)] = mic
+        self._mic_len = len(mic)
+        self._out[:len(out)] = out
+        self._out_len = len(out)
+
+
+def benchmark(rate=44100, channels=1, seconds=3.0, tail_ms=250):
+    """Mide el coste medio de un bloque de 10 ms con eco sintético."""
+    aec = EchoCanceller(rate, channels, tail_ms=tail_ms)
+    rng = np.random.default_rng(0)
+    echo_path = rng.standard_normal(int(rate * 0.05)).astype(np.float32) * np.exp(-np.arange(int(rate * 0.05)) / 300)
+    echo_path *= 0.3 / np.abs(echo_path).sum()
+
+    far = rng.standard_normal(int(rate * seconds)).astype(np.float32) * 0.1
+    mic = np.convolve(far, echo_path)[:len(far)]
+    mic = np.repeat(mic[:, None], channels, axis=1)
+
+    chunk = aec.block
+    start = time.perf_counter()
+    for i in range(0, len(far) - chunk, chunk):
+        aec.push_reference(far[i:i + chunk, None])
+        aec.process(mic[i:i + chunk])
+    elapsed = time.perf_counter() - start
+    blocks = len(far) // chunk
+    return elapsed / blocks * 1e6, 1000.0 * chunk / rate, aec.erle_db
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cancelador de eco NLMS particionado.")
+    parser.add_argument("--bench", action="store_true", help="ejecutar benchmark")
+    parser.add_argument("--rate", type=int, default=44100)
+    parser.add_argument("--tail-ms", type=int, default=250)
+    args = parser.parse_args()
+
+    if args.bench:
+        for channels in (1, 2):
+            cost_us, block_ms, erle = benchmark(args.rate, channels, tail_ms=args.tail_ms)
+            print(f"canales={channels}  {cost_us:7.0f} µs por bloque de {block_ms:.0f} ms "
+                  f"({100 * cost_us / (block_ms * 1000):.1f} % de un núcleo), ERLE {erle:.1f} dB")
+    else:
+        parser.print_help()
@@ -0,0 +1,189 @@
+"""
+analysis.py - Espectro, espectrograma y medidores de nivel fuera del hilo de audio
+
+El hilo de audio solo deja una copia del último bloque en un buzón de una
+plaza (SingleSlot) y sigue; nunca espera ni calcula nada. Un hilo de
+análisis aparte recoge el bloque más reciente, lo diezma, calcula la FFT
+real enventanada sobre buffers reutilizados y publica el resultado en otro
+buzón que la interfaz lee en su refresco.
+
+Si el análisis tarda más de su presupuesto o el hilo despierta tarde (CPU
+saturada), el periodo de refresco se alarga automáticamente; cuando hay
+holgura vuelve poco a poco al periodo mínimo.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+DB_FLOOR = -120.0
+
+
+class SingleSlot:
+    """
+    Buzón de una plaza sin bloqueo: el escritor sustituye el valor y el
+    lector toma el último. Se apoya en que asignar una referencia es atómico
+    en CPython; los valores intermedios que nadie llegó a leer se pierden.
+    """
+
+    def __init__(self):
+        self._value = None
+        self.version = 0
+
+    def put(self, value):
+        self._value = value
+        self.version += 1
+
+    def peek(self):
+        return self._value
+
+
+class AudioAnalyzer:
+    """Hilo de análisis: espectro, espectrograma y RMS/pico por bloque."""
+
+    def __init__(self, target_rate=11025, fft_size=1024, history=100,
+                 min_interval=0.05, max_interval=1.0, budget=0.25):
+        """
+        Args:
+            target_rate: frecuencia aproximada tras diezmar (Hz)
+            fft_size: tamaño de la FFT sobre la señal diezmada
+            history: filas del espectrograma
+            min_interval, max_interval: límites del periodo de refresco (s)
+            budget: fracción máxima del periodo que puede ocupar el cálculo
+        """
+        self.target_rate = target_rate
+        self.fft_size = fft_size
+        self.history = history
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget = budget
+        self.interval = min_interval
+
+        self.input = SingleSlot()
+        self.output = SingleSlot()
+        self._stop = threading.Event()
+        self._thread = None
+        self._rate = None
+
+        # Buffers reutilizados en cada iteración
+        self._window = np.hanning(fft_size).astype(np.float32)
+        self._ring = np.zeros(fft_size, dtype=np.float32)
+        self._windowed = np.empty(fft_size, dtype=np.float32)
+        self._spectrum = np.empty(fft_size // 2 + 1, dtype=np.complex64)
+        self._magnitude = np.empty(fft_size // 2 + 1, dtype=np.float32)
+        self._spectrogram = np.full((history, fft_size // 2 + 1), DB_FLOOR, dtype=np.float32)
+        self._row = 0
+        self._norm = 2.0 / self._window.sum()
+
+    # ---------- lado del hilo de audio ----------
+
+    def submit(self, frames, rate):
+        """Entrega un bloque float32 (frames, canales). Coste: una copia, sin esperas."""
+        self.input.put((frames.copy(), rate))
+
+    # ---------- ciclo de vida ----------
+
+    def start(self):
+        # Un hilo anterior recién detenido termina en como mucho un periodo
+        if self._thread and self._thread.is_alive():
+            self._stop.set()
+            self._thread.join(timeout=self.max_interval)
+        self._stop.clear()
+        self._rate = None
+        self.interval = self.min_interval
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self):
+        """Último resultado publicado (dict) o None."""
+        return self.output.peek()
+
+    # ---------- hilo de análisis ----------
+
+    def _configure(self, rate):
+        self._rate = rate
+        self.decimation = max(1, int(rate // self.target_rate))
+        self.analysis_rate = rate / self.decimation
+        self.freqs = np.fft.rfftfreq(self.fft_size, 1.0 / self.analysis_rate).astype(np.float32)
+        self._ring[:] = 0.0
+        self._spectrogram[:] = DB_FLOOR
+        self._row = 0
+
+    def _analyze(self, frames, rate):
+        """Resultado del bloque, o None si no llega a una muestra diezmada (nada que publicar)."""
+        if rate != self._rate:
+            self._configure(rate)
+
+        # Medidores sobre la señal completa (todos los canales)
+        peak = float(np.max(np.abs(frames))) if frames.size else 0.0
+        rms = float(np.sqrt(np.mean(np.square(frames)))) if frames.size else 0.0
+
+        # Diezmado por promedio (filtro de caja) a mono
+        d = self.decimation
+        usable = (len(frames) // d) * d
+        mono = frames[:usable].reshape(-1, d, frames.shape[1]).mean(axis=(1, 2))
+
+        # Ventana deslizante de fft_size muestras diezmadas
+        n = min(len(mono), self.fft_size)
+        if n == 0:
+            return None     # con n = 0, _ring[:-n] sería vacío y no el buffer entero
+        self._ring[:-n] = self._ring[n:]
+        self._ring[-n:] = mono[-n:]
+
+        np.multiply(self._ring, self._window, out=self._windowed)
+        np.fft.rfft(self._windowed, out=self._spectrum)
+        np.abs(self._spectrum, out=self._magnitude)
+        self._magnitude *= self._norm
+        np.maximum(self._magnitude, 1e-6, out=self._magnitude)
+        spectrum_db = self._spectrogram[self._row]
+        np.log10(self._magnitude, out=spectrum_db)
+        spectrum_db *= 20.0
+        self._row = (self._row + 1) % self.history
+
+        return {
+            "freqs": self.freqs,
+            "spectrum_db": spectrum_db.copy(),
+            # Filas de la más antigua a la más reciente
+            "spectrogram_db": np.roll(self._spectrogram, -self._row, axis=0),
+            "rms_db": 20 * np.log10(max(rms, 1e-6)),
+            "peak_db": 20 * np.log10(max(peak, 1e-6)),
+            "interval": self.interval,
+        }
+
+    def _run(self):
+        seen = 0
+        next_wakeup = time.monotonic()
+        while not self._stop.is_set():
+            next_wakeup += self.interval
+            delay = next_wakeup - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            lateness = time.monotonic() - next_wakeup
+
+            if self.input.version != seen:
+                seen = self.input.version
+                item = self.input.peek()
+                start = time.monotonic()
+                try:
+                    result = self._analyze(*item)
+                    if result is not None:
+                        self.output.put(result)
+                except Exception as e:
+                    print(f"Error en análisis de audio: {e}")
+                cost = time.monotonic() - start
+                self._adapt(cost, lateness)
+
+            # No acumular retraso tras una pausa larga
+            if lateness > self.interval:
+                next_wakeup = time.monotonic()
+
+    def _adapt(self, cost, lateness):
+        """Alarga el periodo bajo presión de CPU y lo recorta cuando hay holgura."""
+        if cost > self.budget * self.interval or lateness > 0.5 * self.interval:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        elif cost < 0.5 * self.budget * self.interval and lateness < 0.1 * self.interval:
+            self.interval = max(self.min_interval, self.interval * 0.95)
@@ -0,0 +1,287 @@
+"""
+audio_engine.py - PyAudio y streams abiertos reutilizables entre sesiones
+
+Inicializar PortAudio (pyaudio.PyAudio()) enumera todas las APIs de audio
+del sistema y tarda segundos en algunos equipos; abrir un stream cuesta
+decenas o cientos de milisegundos más. AudioEngine crea la instancia una
+sola vez y conserva los streams abiertos: detener una sesión solo para el
+stream (stop_stream) y la siguiente con el mismo formato lo reanuda
+(start_stream), de modo que reiniciar emisión o recepción cuesta
+milisegundos.
+
+Arranque por disponibilidad: en vez de esperar un tiempo fijo a que otro
+programa suelte el micrófono, wait_until_ready() intenta abrirlo y leer
+un bloque corto, y reintenta con espera exponencial hasta que responde.
+
+Uso:
+    engine = AudioEngine()
+    stream, device_rate = engine.open_when_ready(fmt, channels, rate, chunk, input=True)
+    ...
+    engine.release(stream)   # al detener: queda parado y listo para reutilizar
+    engine.close()           # al cerrar la aplicación
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import pyaudio
+
+MAX_IDLE_STREAMS = 4    # streams parados que se conservan (cada uno retiene el dispositivo)
+READY_FIRST_WAIT_S = 0.02
+READY_MAX_WAIT_S = 0.5
+PROBE_FRAMES = 64       # lectura de prueba: el dispositivo abre pero puede no entregar audio
+
+
+def open_stream_with_fallback(p, fmt, channels, rate, chunk, input=False, output=False, device=None):
+    """
+    Abre un stream PyAudio a `rate`; si el dispositivo no lo soporta, lo abre
+    a su frecuencia nativa por defecto.
+
+    Args:
+        chunk: frames del búfer del dispositivo (frames_per_buffer); no tiene
+            por qué coincidir con los frames que se leen o escriben por llamada
+        device: índice PyAudio del dispositivo (None = predeterminado del sistema)
+    Retorna:
+        tuple: (stream, device_rate). Si device_rate != rate hace falta un
+        resampler (resampler.StreamResampler) entre el dispositivo y la red.
+    """
+    selection = {}
+    if device is not None:
+        selection["input_device_index" if input else "output_device_index"] = device
+    try:
+        return p.open(format=fmt, channels=channels, rate=rate,
+                      input=input, output=output, frames_per_buffer=chunk, **selection), rate
+    except (OSError, ValueError):
+        if device is not None:
+            info = p.get_device_info_by_index(device)
+        else:
+            info = p.get_default_input_device_info() if input else p.get_default_output_device_info()
+        device_rate = int(info["defaultSampleRate"])
+        if device_rate == rate:
+            raise
+        stream = p.open(format=fmt, channels=channels, rate=device_rate,
+                        input=input, output=output, frames_per_buffer=chunk, **selection)
+        return stream, device_rate
+
+
+def stream_latency_ms(stream, input=True):
+    """
+    Latencia real del dispositivo según PortAudio (búfer del host incluido),
+    que puede diferir de la pedida; 0.0 si la API no la informa.
+    """
+    try:
+        latency = stream.get_input_latency() if input else stream.get_output_latency()
+    except (OSError, AttributeError):
+        return 0.0
+    return latency * 1000.0
+
+
+def wait_until_ready(open_stream, input=True, timeout=5.0, cancel=None, on_retry=None, discard=None):
+    """
+    Abre un dispositivo reintentando con espera exponencial mientras esté ocupado.
+
+    Args:
+        open_stream: callable() -> (stream, device_rate); lanza OSError si no se puede abrir
+        input: hacer una lectura de prueba (un micrófono ocupado a veces abre pero no lee)
+        timeout: segundos como máximo; después se relanza el último error
+        cancel: threading.Event que aborta la espera (retorna None)
+        on_retry: callable(intento, error, espera) para informar al usuario
+        discard: callable(stream) para cerrar un stream que no supera la prueba
+    Retorna:
+        tuple | None: (stream, device_rate), o None si se canceló.
+    """
+    deadline = time.monotonic() + timeout
+    wait = READY_FIRST_WAIT_S
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            stream, device_rate = open_stream()
+            if input:
+                try:
+                    stream.read(PROBE_FRAMES, exception_on_overflow=False)
+                except (OSError, ValueError):
+                    (discard or (lambda s: s.close()))(stream)
+                    raise
+            return stream, device_rate
+        except (OSError, ValueError) as e:
+            if time.monotonic() + wait > deadline:
+                raise
+            if on_retry:
+                on_retry(attempt, e, wait)
+            if cancel is not None:
+                if cancel.wait(wait):
+                    return None
+            else:
+                time.sleep(wait)
+            wait = min(READY_MAX_WAIT_S, wait * 2)
+
+
+class AudioEngine:
+    """Instancia PyAudio perezosa y caché de streams parados por formato."""
+
+    def __init__(self, pyaudio_instance=None, log=print):
+        """
+        Args:
+            pyaudio_instance: instancia compartida (modo full-duplex); la
+                termina su propietario, no close()
+        """
+        self.shared_p = pyaudio_instance
+        self.log = log
+        self._p = pyaudio_instance
+        self._idle = OrderedDict()   # clave de formato -> (stream, device_rate)
+        self._keys = {}              # stream en uso -> (clave, device_rate)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def p(self):
+        """
+        Instancia PyAudio (se crea en el primer uso y se conserva). Se crea con
+        el cerrojo tomado: el calentamiento, los streams en reserva y la
+        conmutación de dispositivos llegan aquí desde hilos distintos.
+        """
+        with self._lock:
+            if self._p is None:
+                self._p = pyaudio.PyAudio()
+            return self._p
+
+    def warm_up(self):
+        """Inicializa PortAudio por adelantado (p. ej. en un hilo al abrir la ventana)."""
+        try:
+            self.p
+        except Exception as e:
+            self.log(f"No se pudo inicializar el audio: {e}")
+
+    def prepare(self, fmt, channels, rate, chunk, input=False, output=False, device=None):
+        """Abre el stream por adelantado y lo deja parado en reserva (arranque inmediato)."""
+        try:
+            self.release(self.open(fmt, channels, rate, chunk, input=input, output=output, device=device)[0])
+        except Exception as e:
+            self.log(f"No se pudo preparar el dispositivo: {e}")
+
+    def open_when_ready(self, fmt, channels, rate, chunk, input=False, output=False, device=None, **kwargs):
+        """open() con reintentos hasta que el dispositivo esté libre (ver wait_until_ready)."""
+        return wait_until_ready(
+            lambda: self.open(fmt, channels, rate, chunk, input=input, output=output, device=device),
+            input=input, discard=self.discard, **kwargs)
+
+    def open(self, fmt, channels, rate, chunk, input=False, output=False, device=None):
+        """
+        Retorna un stream en marcha con ese formato, reutilizando uno parado si lo hay.
+
+        Args:
+            device: índice PyAudio (None = predeterminado del sistema)
+        Retorna:
+            tuple: (stream, device_rate) como open_stream_with_fallback().
+        """
+        key = (input, output, fmt, channels, rate, chunk, device)
+        with self._lock:
+            entry = self._idle.pop(key, None)
+        if entry:
+            stream, device_rate = entry
+            try:
+                if stream.is_stopped():
+                    stream.start_stream()
+                with self._lock:
+                    self._keys[stream] = (key, device_rate)
+                return stream, device_rate
+            except (OSError, ValueError) as e:
+                # Dispositivo desconectado mientras estaba parado: abrir uno nuevo
+                self.log(f"Stream en reserva inservible ({e}), se abre de nuevo")
+                self._close_stream(stream)
+
+        stream, device_rate = open_stream_with_fallback(self.p, fmt, channels, rate, chunk,
+                                                        input=input, output=output, device=device)
+        with self._lock:
+            self._keys[stream] = (key, device_rate)
+        return stream, device_rate
+
+    def release(self, stream):
+        """Para el stream y lo guarda para la siguiente sesión con el mismo formato."""
+        with self._lock:
+            entry = self._keys.pop(stream, None)
+        if entry is None:
+            return
+        try:
+            if not stream.is_stopped():
+                stream.stop_stream()
+        except (OSError, ValueError):
+            self._close_stream(stream)
+            return
+
+        key, device_rate = entry
+        evicted = []
+        with self._lock:
+            if self._closed:
+                evicted.append(stream)
+            else:
+                self._idle[key] = (stream, device_rate)
+                while len(self._idle) > MAX_IDLE_STREAMS:
+                    evicted.append(self._idle.popitem(last=False)[1][0])
+        for old in evicted:
+            self._close_stream(old)
+
+    def discard(self, stream):
+        """Cierra un stream que ha fallado, sin guardarlo."""
+        with self._lock:
+            self._keys.pop(stream, None)
+        self._close_stream(stream)
+
+    def can_reset(self, closing=()):
+        """True si reset() podría reinicializar tras cerrar los streams `closing`."""
+        with self._lock:
+            return (self._p is not None and self._p is not self.shared_p
+                    and all(stream in closing for stream in self._keys))
+
+    def reset(self):
+        """
+        Reinicializa PortAudio para que enumere los dispositivos conectados
+        desde el arranque (PortAudio solo los lista en Pa_Initialize). Cierra
+        los streams en reserva; no hace nada con streams en uso o con una
+        instancia compartida, que pertenece a otro.
+
+        Retorna:
+            bool: True si se reinicializó.
+        """
+        with self._lock:
+            if self._keys or self._p is None or self._p is self.shared_p:
+                return False
+            streams = [stream for stream, _ in self._idle.values()]
+            self._idle.clear()
+            for stream in streams:
+                self._close_stream(stream)
+            # Terminar antes de soltar el cerrojo: una instancia nueva creada
+            # mientras tanto mantendría PortAudio inicializado sin reenumerar
+            try:
+                self._p.terminate()
+            except Exception as e:
+                self.log(f"Error terminando PyAudio: {e}")
+            self._p = None
+        return True
+
+    def close(self):
+        """Cierra todos los streams y termina PyAudio si la instancia es propia."""
+        with self._lock:
+            self._closed = True
+            streams = [stream for stream, _ in self._idle.values()] + list(self._keys)
+            self._idle.clear()
+            self._keys.clear()
+        for stream in streams:
+            self._close_stream(stream)
+        with self._lock:
+            p, self._p = self._p, None
+        if p is not None and p is not self.shared_p:
+            try:
+                p.terminate()
+            except Exception as e:
+                self.log(f"Error terminando PyAudio: {e}")
+
+    def _close_stream(self, stream):
+        try:
+            if not stream.is_stopped():
+                stream.stop_stream()
+            stream.close()
+        except Exception as e:
+            self.log(f"Error cerrando stream: {e}")
@@ -6,53 +6,117 @@ y envía paquetes UDP al receptor. Diseñado para uso local o en LAN.
 No modifica la lógica principal — solo documentación y mensajes.
 """
 
+import argparse
+import os
 import pyaudio
-import socket
 import time
 from utils import obtener_ip_local, IP_enlazadas
+from protocol import build_packet, new_stream_id, frame_bytes
+from secure import cipher_from_passphrase
+from net_tuning import tune_socket, describe, DSCP_EF
+from net_addr import open_sender, format_addr
+from pacing import PacedSender
+from audio_engine import AudioEngine, wait_until_ready, stream_latency_ms
+from devices import DeviceInventory, describe as describe_device
+
+parser = argparse.ArgumentParser(description="Emisor de audio UDP de línea de comandos.")
+parser.add_argument("--listar", action="store_true", help="lista los micrófonos y sus capacidades y sale")
+parser.add_argument("--dispositivo", default="", help="micrófono por nombre o índice (vacío = predeterminado)")
+parser.add_argument("--baja-latencia", action="store_true",
+                    help="búfer de dispositivo de 128 frames y tramas de red de 256 (~6 ms)")
+parser.add_argument("--api", default="", help="API de audio preferida: ALSA, JACK, PulseAudio, WASAPI...")
+args = parser.parse_args()
 
 # Configuración de audio
-CHUNK = 1024  # Tamaño del buffer (ajusta según latencia/calidad)
+CHUNK = 256 if args.baja_latencia else 1024  # Frames por paquete (ajusta según latencia/calidad)
+BUFFER_DISPOSITIVO = 128 if args.baja_latencia else CHUNK  # frames_per_buffer del micrófono
 FORMAT = pyaudio.paInt16  # Formato de audio
-CHANNELS = 1  # Mono
-RATE = 44100  # Frecuencia de muestreo (Hz)
+CHANNELS = 1  # Mono (2 = estéreo)
+RATE = 44100  # Frecuencia de muestreo (Hz): 44100, 48000, 96000
 
 # Configuración de red
-HOST_RECEPTOR = "169.254.23.244"
+HOST_RECEPTOR = "169.254.23.244"  # IPv4, IPv6 ("fe80::1%eth0") o grupo multicast
 PORT = 5000
 
-print(f"Preparando transmisión a {HOST_RECEPTOR}:{PORT}...")
-print("(Info) Espera 5 segundos para liberar el micrófono si hace falta...")
+# Cuenta atrás opcional antes de abrir el micrófono (0 = arrancar en cuanto esté libre)
+RETARDO_INICIO = 0
+ESPERA_MAXIMA_MICRO = 5.0  # segundos reintentando si otro programa tiene el micrófono
 
-# Espera 5 segundos antes de iniciar
-for i in range(5, 0, -1):
-    print(f"Iniciando en {i} segundos...", end="\r")
-    time.sleep(1)
-print("\n¡Transmisión iniciada!                          ")
+# Frase compartida para cifrar los paquetes (vacía = sin cifrado, ver secure.py)
+CLAVE = os.environ.get("MICRO_REMOTO_CLAVE", "")
+cipher = cipher_from_passphrase(CLAVE)
 
 # Inicializa PyAudio
 p = pyaudio.PyAudio()
+inventario = DeviceInventory(AudioEngine(p), host_api=args.api)
+
+if args.listar:
+    for d in inventario.inputs():
+        print(f"[{d.index}] {describe_device(d, input=True)}")
+    p.terminate()
+    raise SystemExit(0)
+
+if args.dispositivo and inventario.find(args.dispositivo, input=True) is None:
+    print(f"Micrófono '{args.dispositivo}' no encontrado, se usa el predeterminado")
+indice_micro = inventario.resolve(args.dispositivo, input=True)
 
-# Abre el micrófono
-stream = p.open(
-    format=FORMAT,
-    channels=CHANNELS,
-    rate=RATE,
-    input=True,
-    frames_per_buffer=CHUNK
+print(f"Preparando transmisión a {format_addr((HOST_RECEPTOR, PORT))}...")
+
+# Espera opcional antes de iniciar
+for i in range(RETARDO_INICIO, 0, -1):
+    print(f"Iniciando en {i} segundos...", end="\r")
+    time.sleep(1)
+
+# Abre el micrófono en cuanto esté libre: reintenta con espera exponencial
+# en lugar de esperar siempre un tiempo fijo
+inicio = time.perf_counter()
+stream, _ = wait_until_ready(
+    lambda: (p.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=BUFFER_DISPOSITIVO,
+                    input_device_index=indice_micro), RATE),
+    timeout=ESPERA_MAXIMA_MICRO,
+    on_retry=lambda intento, error, espera: print(f"Micrófono ocupado ({error}), reintento {intento}...")
 )
+print(f"¡Transmisión iniciada! (micrófono listo en {(time.perf_counter() - inicio) * 1000:.0f} ms)")
+print(f"Latencia de captura: trama {CHUNK / RATE * 1000:.1f} ms + dispositivo {stream_latency_ms(stream):.1f} ms")
+
+# Configura el socket UDP de la familia del receptor (IPv4 o IPv6)
+s, DESTINO = open_sender(HOST_RECEPTOR, PORT)
+# Marcado DSCP EF (voz) para QoS y buffer de envío holgado
+print(f"Socket: {describe(tune_socket(s, sndbuf=1024 * 1024, dscp=DSCP_EF))}")
+
+# Cabecera: el receptor negocia canales, frecuencia y formato a partir de ella
+stream_id = new_stream_id()
+seq = 0
+timestamp = 0
 
-# Configura el socket UDP
-s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+# Envío a ritmo de reloj con cola acotada (ver pacing.py); el micrófono entrega a ráfagas
+pacer = PacedSender(s, DESTINO, CHUNK / RATE, max_queue=8, policy="oldest")
+pacer.start()
+desbordes_micro = 0
 
 try:
-    print(f"Enviando audio a {HOST_RECEPTOR}:{PORT}...")
+    print(f"Enviando audio a {format_addr(DESTINO)}...")
     while True:
-        data = stream.read(CHUNK)  # Lee el audio del micrófono
-        s.sendto(data, (HOST_RECEPTOR, PORT))  # Envía el audio por UDP
+        try:
+            data = stream.read(CHUNK)  # Lee el audio del micrófono
+        except IOError as e:
+            if getattr(e, "errno", None) != pyaudio.paInputOverflowed:
+                raise
+            # Bloque perdido en el dispositivo: se cuenta y se deja el hueco en el timestamp
+            desbordes_micro += 1
+            timestamp += CHUNK
+            continue
+        packet = build_packet(data, seq, timestamp, stream_id, CHANNELS, FORMAT, RATE)
+        if cipher:
+            packet = cipher.seal(packet)
+        pacer.submit(packet, timestamp / RATE)  # Envía el audio por UDP a su hora
+        seq += 1
+        timestamp += len(data) // frame_bytes(CHANNELS, FORMAT)
 except KeyboardInterrupt:
     print("\nDeteniendo el servidor...")
 finally:
+    pacer.stop()
+    print(f"Envío a ritmo: {pacer.summary()}, desbordes del micrófono {desbordes_micro}")
     stream.stop_stream()
     stream.close()
     p.terminate()
@@ -0,0 +1,53 @@
+"""Intercomunicador bidireccional de línea de comandos.
+
+Un extremo por proceso (ver intercom.py): captura y reproduce con un solo
+socket. En modo "ptt" cada Enter alterna entre hablar y escuchar.
+
+Ejemplo (dos equipos, mismo puerto):
+    python cmd_intercom.py 192.168.1.20 --modo half
+"""
+
+import argparse
+import os
+import time
+
+from intercom import IntercomEndpoint, MODES
+from secure import cipher_from_passphrase
+
+parser = argparse.ArgumentParser(description="Intercomunicador UDP bidireccional.")
+parser.add_argument("peer", help="IP (v4 o v6) o nombre del otro extremo")
+parser.add_argument("--puerto", type=int, default=5000, help="puerto remoto")
+parser.add_argument("--puerto-local", type=int, default=5000, help="puerto local")
+parser.add_argument("--modo", choices=MODES, default="full")
+parser.add_argument("--rate", type=int, default=48000)
+parser.add_argument("--chunk", type=int, default=960)
+parser.add_argument("--ducking-db", type=float, default=-15.0)
+parser.add_argument("--sin-aec", action="store_true", help="desactivar la cancelación de eco")
+parser.add_argument("--clave", default=os.environ.get("MICRO_REMOTO_CLAVE", ""),
+                    help="frase compartida para cifrar (por defecto $MICRO_REMOTO_CLAVE)")
+args = parser.parse_args()
+
+endpoint = IntercomEndpoint(
+    args.peer, peer_port=args.puerto, local_port=args.puerto_local, mode=args.modo,
+    rate=args.rate, chunk=args.chunk, duck_db=args.ducking_db, echo_cancel=not args.sin_aec,
+    cipher=cipher_from_passphrase(args.clave)
+)
+endpoint.start()
+
+try:
+    if args.modo == "ptt":
+        print("Enter: hablar / escuchar. Ctrl+C para salir.")
+        while True:
+            input()
+            endpoint.talking = not endpoint.talking
+            print("Hablando..." if endpoint.talking else "Escuchando...")
+    else:
+        print("Presiona Ctrl+C para salir.")
+        while endpoint.running:
+            time.sleep(1.0)
+except (KeyboardInterrupt, EOFError):
+    print("\nDeteniendo el intercomunicador...")
+finally:
+    endpoint.stop()
+    status = endpoint.status()
+    print(f"Paquetes enviados: {status['sent']}, recibidos: {status['received']}")
@@ -1,22 +1,62 @@
+import argparse
+import os
 import pyaudio
-import socket
-import numpy as np  # Para manipular los datos de audio
+from protocol import PT_AUDIO, FLAG_ENCRYPTED, MAX_DATAGRAM, parse_packet
+from dsp import decode_frames, encode_frames, apply_gain
+from secure import cipher_from_passphrase, replay_state_path
+from source_filter import DropLog, SourceFilter
+from net_tuning import BatchReceiver, tune_socket, describe
+from net_addr import bind_receiver, format_addr
+from audio_engine import AudioEngine, stream_latency_ms
+from devices import DeviceInventory, describe as describe_device
+
+# Opciones de red para hosts que reciben muchos streams (ver net_tuning.py)
+parser = argparse.ArgumentParser(description="Receptor de audio UDP de línea de comandos.")
+parser.add_argument("--rcvbuf", type=int, default=4 * 1024 * 1024, help="tamaño de SO_RCVBUF (bytes)")
+parser.add_argument("--busy-poll", type=int, default=0, help="SO_BUSY_POLL en µs (solo Linux)")
+parser.add_argument("--lote", type=int, default=0, help="recepción por lotes de N datagramas (0 = desactivada)")
+parser.add_argument("--listar", action="store_true", help="lista las salidas de audio y sus capacidades y sale")
+parser.add_argument("--salida", default="", help="dispositivo de salida por nombre o índice (vacío = predeterminado)")
+parser.add_argument("--baja-latencia", action="store_true", help="búfer del dispositivo de salida de 128 frames")
+parser.add_argument("--grupo", default="", help="grupo multicast IPv4 o IPv6 al que unirse (p. ej. ff12::5000)")
+parser.add_argument("--api", default="", help="API de audio preferida: ALSA, JACK, PulseAudio, WASAPI...")
+args = parser.parse_args()
 
 # Configuración de audio
 CHUNK = 1024
+BUFFER_DISPOSITIVO = 128 if args.baja_latencia else CHUNK  # frames_per_buffer de la salida
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 44100
 
 # Configuración de red
-HOST = '0.0.0.0'  # Escucha en todas las interfaces de red
+HOST = ''  # Escucha en todas las interfaces de red, IPv4 e IPv6 (doble pila)
 PORT = 5000
 
+# Frase compartida: si se define, solo se aceptan paquetes autenticados con ella
+CLAVE = os.environ.get("MICRO_REMOTO_CLAVE", "")
+cipher = cipher_from_passphrase(CLAVE)
+
+# Emisores aceptados (vacío = cualquiera) y tasa máxima por origen (bytes/s)
+EMISORES_PERMITIDOS = set()
+source_filter = SourceFilter(EMISORES_PERMITIDOS, rate_bytes=3_000_000, burst_bytes=1024 * 1024)
+
 # Factor de amplificación (1.0 = sin cambio, 2.0 = doble volumen, etc.)
 AMPLIFICATION_FACTOR = 2.0
 
 # Inicializa PyAudio
 p = pyaudio.PyAudio()
+inventario = DeviceInventory(AudioEngine(p), host_api=args.api)
+
+if args.listar:
+    for d in inventario.outputs():
+        print(f"[{d.index}] {describe_device(d, input=False)}")
+    p.terminate()
+    raise SystemExit(0)
+
+if args.salida and inventario.find(args.salida, input=False) is None:
+    print(f"Salida '{args.salida}' no encontrada, se usa la predeterminada")
+INDICE_SALIDA = inventario.resolve(args.salida, input=False)
 
 # Abre el stream de salida
 stream = p.open(
@@ -24,31 +64,66 @@ stream = p.open(
     channels=CHANNELS,
     rate=RATE,
     output=True,
-    frames_per_buffer=CHUNK
+    frames_per_buffer=BUFFER_DISPOSITIVO,
+    output_device_index=INDICE_SALIDA
 )
+print(f"Latencia del dispositivo de salida: {stream_latency_ms(stream, input=False):.1f} ms")
 
-# Configura el socket UDP
-s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-s.bind((HOST, PORT))
+# Configura el socket UDP (doble pila, o la familia del grupo multicast)
+s = bind_receiver(PORT, HOST, args.grupo)
+print(f"Socket: {describe(tune_socket(s, rcvbuf=args.rcvbuf, busy_poll_us=args.busy_poll))}")
+receiver = BatchReceiver(s, args.lote) if args.lote > 0 else None
+if cipher:
+    cipher.persist_replay(replay_state_path(PORT))   # repeticiones rechazadas también tras reiniciar
 
-print(f"Escuchando audio en {HOST}:{PORT}...")
+print(f"Escuchando audio en {format_addr(s.getsockname())}" + (f", grupo {args.grupo}" if args.grupo else "") + "...")
 print("Presiona Ctrl+C para detener el script...")
 
+negociado = False   # ya llegó audio con cabecera: se descarta el PCM heredado
+descartes = DropLog(print)   # paquetes inválidos: un resumen cada pocos segundos, no uno por paquete
+
 try:
     while True:
-        data, _ = s.recvfrom(4096)  # Recibe datos UDP
+        # Un datagrama por llamada, o un lote sobre buffers preasignados (--lote)
+        packets = receiver.receive() if receiver else [s.recvfrom(MAX_DATAGRAM)]
+        for data, addr in packets:
+            if not source_filter.allow(addr, data):
+                continue
+            if cipher:
+                data = cipher.open(data)  # None si no se autentica o es repetido
+                if data is None:
+                    continue
+            # Un datagrama que no se puede procesar se descarta sin detener el receptor
+            try:
+                header, payload = parse_packet(data, RATE)
+                if header.ptype != PT_AUDIO or (header.flags & FLAG_ENCRYPTED and not cipher):
+                    continue
+                if header.stream_id is None and negociado:
+                    continue
+                negociado = negociado or header.stream_id is not None
 
-        # Convierte los datos a un array de numpy (formato int16)
-        audio_data = np.frombuffer(data, dtype=np.int16)
+                # Reabre la salida si el emisor usa otro formato (canales, rate, muestra)
+                # (si el dispositivo no admite el formato, se sigue con la salida anterior)
+                if (header.channels, header.rate, header.sample_format) != (CHANNELS, RATE, FORMAT):
+                    print(f"Formato recibido: {header.channels} canal(es), {header.rate} Hz")
+                    nuevo = p.open(format=header.sample_format, channels=header.channels, rate=header.rate,
+                                   output=True, frames_per_buffer=BUFFER_DISPOSITIVO,
+                                   output_device_index=INDICE_SALIDA)
+                    stream.stop_stream()
+                    stream.close()
+                    stream = nuevo
+                    CHANNELS, RATE, FORMAT = header.channels, header.rate, header.sample_format
 
-        # Amplifica el audio (multiplica por el factor)
-        amplified_audio = np.clip(audio_data * AMPLIFICATION_FACTOR, -32768, 40000).astype(np.int16)
+                # Convierte los datos a float32 (frames, canales)
+                audio_data = decode_frames(payload, FORMAT, CHANNELS)
 
-        # Convierte de vuelta a bytes
-        amplified_data = amplified_audio.tobytes()
+                # Amplifica el audio (multiplica por el factor)
+                apply_gain(audio_data, AMPLIFICATION_FACTOR)
 
-        # Reproduce el audio amplificado
-        stream.write(amplified_data)
+                # Convierte de vuelta a bytes (saturando) y reproduce
+                stream.write(encode_frames(audio_data, FORMAT))
+            except (ValueError, OSError) as e:
+                descartes.add(e)
 except KeyboardInterrupt:
     print("\nDeteniendo el cliente...")
 except Exception as e:
@@ -61,4 +136,8 @@ finally:
     p.terminate()
     # Cierra el socket
     s.close()
+    if cipher:
+        cipher.close_replay()
+    print(f"Filtro de origen: {source_filter.summary()}")
+    print(f"Paquetes descartados: {descartes.summary()}")
     print("Recursos liberados correctamente.")
@@ -2,9 +2,9 @@
 common.py - Módulo compartido para interfaces de audio UDP (emisor y receptor)
 
 Proporciona:
-- Configuración de audio (CHUNK, FORMAT, CHANNELS, RATE)
+- Configuración (reexportada de config.py, que no depende de Tk)
 - Funciones para setup de estilos ttk
-- Funciones para crear gráficos matplotlib
+- Funciones para crear gráficos matplotlib (señal, espectro y espectrograma)
 - Utilidades UI (centrar ventana, combobox oscuro, etc.)
 """
 
@@ -13,15 +13,15 @@ import matplotlib.pyplot as plt
 from tkinter import ttk
 import tkinter as tk
 import numpy as np
-import pyaudio
-
-# ==================== CONFIGURACIÓN DE AUDIO ====================
-AUDIO_CONFIG = {
-    "CHUNK": 2048,
-    "FORMAT": pyaudio.paInt16,
-    "CHANNELS": 1,
-    "RATE": 44100,
-}
+import os
+
+from audio_engine import open_stream_with_fallback  # reexportado para los módulos existentes
+from config import (  # reexportado: la configuración vive en config.py (sin Tk)
+    AUDIO_CONFIG, AUDIO_PRESETS, CAPTURE_DSP_CONFIG, VAD_CONFIG, INTERCOM_CONFIG, RECORDER_CONFIG,
+    SECURITY_CONFIG, SOURCE_FILTER_CONFIG, NET_CONFIG, PACING_CONFIG, STARTUP_CONFIG, FEEDBACK_CONFIG,
+    DEVICE_CONFIG, LATENCY_CONFIG, WORKER_CONFIG, SHM_CONFIG, DSP_GRAPH_CONFIG,
+)
+from state import STATUS_OK, STATUS_WAIT, STATUS_STOPPED
 
 # ==================== COLORES Y ESTILOS ====================
 COLORS = {
@@ -43,6 +43,13 @@ COLORS = {
     "status_yellow": "#ffaa00",
 }
 
+# Nivel de estado de las canalizaciones -> color de la etiqueta de estado
+STATUS_LEVEL_COLORS = {
+    STATUS_OK: COLORS["status_green"],
+    STATUS_WAIT: COLORS["status_yellow"],
+    STATUS_STOPPED: COLORS["status_red"],
+}
+
 
 def setup_style():
     """
@@ -75,6 +82,16 @@ def setup_style():
               fieldbackground=[("readonly", COLORS["bg_secondary"])],
               foreground=[("readonly", COLORS["fg_white"])])
 
+    # Checkbutton oscuro
+    style.configure("Dark.TCheckbutton",
+                    background=COLORS["bg_main"],
+                    foreground=COLORS["fg_white"],
+                    indicatorbackground=COLORS["bg_secondary"],
+                    indicatorforeground=COLORS["fg_white"])
+    style.map("Dark.TCheckbutton",
+              background=[("active", COLORS["bg_main"])],
+              indicatorbackground=[("selected", COLORS["button_active"])])
+
     # Entry oscuro
     style.configure("Dark.TEntry",
                     fieldbackground=COLORS["bg_secondary"],
@@ -126,6 +143,7 @@ def setup_style():
 def create_plot(root, chunk_size=1024):
     """
     Crea un gráfico matplotlib configurado para visualizar audio en tiempo real.
+    La señal se representa normalizada a [-1, 1] (ver dsp.decode_frames).
 
     Args:
         root: ventana tk.Tk o frame contenedor
@@ -144,7 +162,7 @@ def create_plot(root, chunk_size=1024):
     ax.set_facecolor(COLORS["bg_dark"])
     
     line, = ax.plot(buffer, color=COLORS["fg_white"], lw=1)
-    ax.set_ylim(-32768, 32767)
+    ax.set_ylim(-1.0, 1.0)
     ax.set_xlim(0, chunk_size)
     ax.tick_params(axis='x', colors=COLORS["fg_white"])
     ax.tick_params(axis='y', colors=COLORS["fg_white"])
@@ -164,6 +182,172 @@ def create_plot(root, chunk_size=1024):
     return fig, ax, canvas, line, buffer
 
 
+# Vistas del panel de señal (el análisis lo calcula analysis.AudioAnalyzer)
+VIEW_MODES = ("Señal", "Espectro", "Espectrograma")
+
+
+def create_analysis_plots(root, n_bins=513, history=100):
+    """
+    Crea las figuras de espectro y espectrograma (ocultas hasta elegir su vista).
+
+    Retorna:
+        tuple: ((fig_spec, ax_spec, canvas_spec, spectrum_line),
+                (fig_gram, ax_gram, canvas_gram, spectrogram_image))
+    """
+    def styled_axes(title):
+        fig, ax = plt.subplots(figsize=(6, 2), facecolor=COLORS["bg_dark"])
+        ax.set_facecolor(COLORS["bg_dark"])
+        ax.tick_params(axis='x', colors=COLORS["fg_white"])
+        ax.tick_params(axis='y', colors=COLORS["fg_white"])
+        for spine in ax.spines.values():
+            spine.set_color(COLORS["bg_secondary"])
+        ax.set_title(title, color=COLORS["fg_white"], fontsize=10)
+        canvas = FigureCanvasTkAgg(fig, master=root)
+        canvas.get_tk_widget().configure(
+            bg=COLORS["bg_dark"],
+            highlightthickness=1,
+            highlightbackground=COLORS["bg_secondary"]
+        )
+        return fig, ax, canvas
+
+    fig_spec, ax_spec, canvas_spec = styled_axes("Espectro (dBFS)")
+    spectrum_line, = ax_spec.plot(np.zeros(n_bins), color=COLORS["fg_white"], lw=1)
+    ax_spec.set_ylim(-100, 0)
+    ax_spec.set_xlim(0, 1)
+
+    fig_gram, ax_gram, canvas_gram = styled_axes("Espectrograma")
+    image = ax_gram.imshow(
+        np.full((n_bins, history), -100.0), origin="lower", aspect="auto",
+        cmap="magma", vmin=-100, vmax=0, extent=(0, history, 0, 1)
+    )
+    ax_gram.set_xticks([])
+
+    return (fig_spec, ax_spec, canvas_spec, spectrum_line), (fig_gram, ax_gram, canvas_gram, image)
+
+
+class AnalysisView:
+    """
+    Selector de vista (señal / espectro / espectrograma) y medidores RMS/pico
+    sobre el panel de señal. Solo se usa desde el hilo de Tk: lee el último
+    resultado publicado por el analizador y redibuja únicamente si es nuevo.
+    """
+
+    def __init__(self, graph_frame, signal_canvas, history=100):
+        self.signal_canvas = signal_canvas
+        self.mode = tk.StringVar(value=VIEW_MODES[0])
+        self._last_result = None
+
+        toolbar = ttk.Frame(graph_frame, style="TFrame")
+        toolbar.pack(fill="x", padx=5, pady=(5, 0), before=signal_canvas.get_tk_widget())
+        ttk.Label(toolbar, text="Vista:").pack(side="left")
+        combo = ttk.Combobox(toolbar, textvariable=self.mode, values=VIEW_MODES,
+                             state="readonly", width=14, style="Dark.TCombobox")
+        combo.pack(side="left", padx=(5, 10))
+        combo.bind("<<ComboboxSelected>>", lambda _: self.show_mode())
+        self.meter_label = ttk.Label(toolbar, text="RMS -- dBFS · Pico -- dBFS",
+                                     font=("Consolas", 9))
+        self.meter_label.pack(side="right")
+
+        spec, gram = create_analysis_plots(graph_frame, history=history)
+        _, self.ax_spec, self.canvas_spec, self.spectrum_line = spec
+        _, self.ax_gram, self.canvas_gram, self.spectrogram_image = gram
+        self._canvases = {
+            VIEW_MODES[0]: signal_canvas,
+            VIEW_MODES[1]: self.canvas_spec,
+            VIEW_MODES[2]: self.canvas_gram,
+        }
+
+    def show_mode(self):
+        """Empaqueta solo el lienzo de la vista elegida."""
+        for mode, canvas in self._canvases.items():
+            widget = canvas.get_tk_widget()
+            if mode == self.mode.get():
+                widget.pack(fill="both", expand=True, padx=5, pady=5)
+            else:
+                widget.pack_forget()
+        self._last_result = None
+
+    def shows_signal(self):
+        return self.mode.get() == VIEW_MODES[0]
+
+    def refresh(self, result):
+        """Actualiza medidores y, si la vista es de análisis, su gráfico."""
+        if result is None or result is self._last_result:
+            return
+        self._last_result = result
+
+        peak_color = "#ff0000" if result["peak_db"] > -1.0 else COLORS["fg_white"]
+        self.meter_label.config(
+            text=f"RMS {result['rms_db']:6.1f} dBFS · Pico {result['peak_db']:6.1f} dBFS",
+            foreground=peak_color
+        )
+
+        mode = self.mode.get()
+        freqs = result["freqs"]
+        if mode == VIEW_MODES[1]:
+            self.spectrum_line.set_data(freqs, result["spectrum_db"])
+            self.ax_spec.set_xlim(0, freqs[-1])
+            self.canvas_spec.draw_idle()
+        elif mode == VIEW_MODES[2]:
+            self.spectrogram_image.set_data(result["spectrogram_db"].T)
+            self.spectrogram_image.set_extent((0, result["spectrogram_db"].shape[0], 0, freqs[-1]))
+            self.ax_gram.set_ylim(0, freqs[-1])
+            self.canvas_gram.draw_idle()
+
+
+def create_key_entry(parent, variable):
+    """
+    Campo de la clave compartida (oculta) para el cifrado de paquetes.
+
+    Args:
+        parent: frame contenedor
+        variable: tk.StringVar con la frase
+    Retorna:
+        ttk.Entry creado (para deshabilitarlo durante la sesión)
+    """
+    ttk.Label(parent, text="Clave compartida (cifrado)", style="TLabel").pack(anchor="w", padx=5, pady=(5, 2))
+    entry = ttk.Entry(parent, textvariable=variable, show="•", style="Dark.TEntry")
+    entry.pack(fill="x", padx=5, pady=(0, 5))
+    return entry
+
+
+def create_device_selector(parent, variable, label):
+    """
+    Desplegable de dispositivo de audio (se rellena tras escanear en segundo plano).
+
+    Args:
+        parent: frame contenedor
+        variable: tk.StringVar con el nombre del dispositivo
+        label: texto de la etiqueta ("Micrófono", "Salida")
+    Retorna:
+        ttk.Combobox creado (para rellenarlo y deshabilitarlo durante la sesión)
+    """
+    ttk.Label(parent, text=label, style="TLabel").pack(anchor="w", padx=5, pady=(5, 2))
+    combo = ttk.Combobox(parent, textvariable=variable, values=[variable.get()],
+                         state="readonly", style="Dark.TCombobox")
+    combo.pack(fill="x", padx=5, pady=(0, 5))
+    return combo
+
+
+def bind_control(variable, control, name):
+    """
+    Publica en `control` (state.ControlState) cada cambio de la variable Tk,
+    para que los hilos de audio lean el valor sin tocar Tk.
+
+    Args:
+        variable: tk.Variable (DoubleVar, BooleanVar...)
+        control: state.ControlState
+        name: parámetro de `control` que refleja la variable
+    """
+    def publish(*_):
+        try:
+            control.update(**{name: variable.get()})
+        except tk.TclError:
+            pass   # valor a medio escribir en un Entry: se publica al completarlo
+    variable.trace_add("write", publish)
+    publish()
+
+
 def center_window(root, width=700, height=600):
     """
     Centra una ventana tk en la pantalla.
@@ -0,0 +1,196 @@
+"""
+config.py - Configuración compartida por las interfaces, los scripts de consola y el demonio
+
+Sin dependencias de Tk ni Matplotlib: lo importan también el demonio
+(daemon.py) y las canalizaciones de audio (pipeline.py), que deben poder
+ejecutarse en equipos sin pantalla. common.py lo reexporta para la
+interfaz gráfica.
+
+apply_overrides() aplica sobre estos diccionarios los valores de un
+archivo de configuración (sección "config" del demonio).
+"""
+
+import os
+
+import pyaudio
+
+# ==================== CONFIGURACIÓN DE AUDIO ====================
+# FORMAT usa las constantes de PyAudio, que coinciden con los códigos de
+# formato de muestra de la cabecera de protocol.py.
+AUDIO_CONFIG = {
+    "CHUNK": 2048,
+    "FORMAT": pyaudio.paInt16,
+    "CHANNELS": 1,
+    "RATE": 44100,
+    "RESAMPLE_QUALITY": "media",   # calidad del resampler si el dispositivo usa otra frecuencia
+}
+
+# Formatos seleccionables en el emisor: nombre -> (canales, rate, formato)
+AUDIO_PRESETS = {
+    "Mono 16 bits 44.1 kHz": (1, 44100, pyaudio.paInt16),
+    "Mono 16 bits 48 kHz": (1, 48000, pyaudio.paInt16),
+    "Estéreo 16 bits 44.1 kHz": (2, 44100, pyaudio.paInt16),
+    "Estéreo 16 bits 48 kHz": (2, 48000, pyaudio.paInt16),
+    "Estéreo 24 bits 48 kHz": (2, 48000, pyaudio.paInt24),
+    "Estéreo 24 bits 96 kHz": (2, 96000, pyaudio.paInt24),
+    "Estéreo float32 48 kHz": (2, 48000, pyaudio.paFloat32),
+    "Estéreo float32 96 kHz": (2, 96000, pyaudio.paFloat32),
+}
+
+# ==================== LIMPIEZA DE LA CAPTURA (EMISOR) ====================
+CAPTURE_DSP_CONFIG = {
+    "HIGHPASS": True,            # paso alto contra retumbe/climatización
+    "HIGHPASS_HZ": 100.0,
+    "NOISE_SUPPRESSION": False,  # resta espectral contra siseo de fondo
+}
+
+# ==================== GRAFO DSP (dsp_graph.py) ====================
+DSP_GRAPH_CONFIG = {
+    # Orden de los nodos; claves registradas con dsp_graph.register_node()
+    "CAPTURE": ["eco", "paso_alto", "ruido", "vad", "ganancia"],
+    "PLAYBACK": ["ganancia"],
+    "PLAYBACK_BLOCK": 1024,  # frames máximos por bloque en el receptor (el emisor usa su trama)
+}
+
+# ==================== SUPRESIÓN DE SILENCIOS (VAD) ====================
+VAD_CONFIG = {
+    "ENABLED": True,        # valor inicial de la casilla del emisor
+    "HANGOVER_MS": 300,     # actividad mantenida tras la última voz detectada
+    "KEEPALIVE_MS": 500,    # periodo de los paquetes de ruido de confort en silencio
+    "CN_TIMEOUT_MS": 1500,  # el receptor deja de generar ruido si no llega nada en este tiempo
+}
+
+# ==================== INTERCOMUNICADOR (intercom.py) ====================
+INTERCOM_CONFIG = {
+    "PORT": 5000,           # mismo puerto local y remoto por defecto (un socket por extremo)
+    "MODE": "full",         # "full", "half" o "ptt"
+    "RATE": 48000,
+    "CHUNK": 960,           # 20 ms a 48 kHz: marca el ritmo del bucle de E/S
+    "DUCK_DB": -15.0,       # atenuación de lo entrante mientras se habla (full-duplex)
+    "FLOOR_HOLD_MS": 400,   # sin audio remoto durante este tiempo, el turno queda libre
+}
+
+# ==================== GRABACIÓN CIRCULAR (RECEPTOR) ====================
+RECORDER_CONFIG = {
+    "MINUTES": 5,                         # duración del buffer "últimos N minutos"
+    "PATH": "grabacion_receptor.ring",    # archivo mapeado en memoria
+    "EXPORT_SECONDS": 60,                 # segundos exportados por "Guardar repetición"
+}
+
+# ==================== CIFRADO (secure.py) ====================
+SECURITY_CONFIG = {
+    # Frase compartida por emisor y receptor; vacía = sin cifrado
+    "PASSPHRASE": os.environ.get("MICRO_REMOTO_CLAVE", ""),
+}
+
+# ==================== FILTRO DE ORIGEN (RECEPTOR) ====================
+SOURCE_FILTER_CONFIG = {
+    "ALLOWED_HOSTS": "",    # IPs separadas por comas; vacío = cualquier emisor
+    # Límite por origen en bytes/s (cada paquete cuenta su tamaño + PACKET_COST). El preset
+    # más exigente (estéreo float32 96 kHz, trama de baja latencia y FEC) ronda 2 MB/s
+    "RATE_BYTES": 3_000_000,
+    "BURST_BYTES": 1024 * 1024,  # ráfaga admitida tras un atasco de la red
+    "PACKET_COST": 512,          # frena también las avalanchas de paquetes pequeños (~5.000/s)
+}
+
+# ==================== SOCKETS (net_tuning.py, net_addr.py, net_interfaces.py) ====================
+NET_CONFIG = {
+    "RCVBUF": 4 * 1024 * 1024,  # buffer de recepción: absorbe ráfagas sin perder datagramas
+    "SNDBUF": 1024 * 1024,
+    "DSCP": 46,                 # EF (voz); 0 = sin marcar
+    "BUSY_POLL_US": 0,          # SO_BUSY_POLL en Linux (0 = desactivado)
+    "HIGH_THROUGHPUT": False,   # recepción por lotes con buffers preasignados
+    "BATCH": 32,                # datagramas máximos por lote
+    "BIND_HOST": "",            # dirección local de recepción ("" = todas, IPv4 e IPv6)
+    "MULTICAST_HOPS": 1,        # TTL / hop limit hacia grupos multicast (1 = solo el enlace)
+    "MULTICAST_INTERFACE": "",  # interfaz multicast: nombre o índice (IPv6) o IP local (IPv4); "" = la del sistema
+    "MTU_AWARE": True,          # repartir los bloques para no superar la MTU de la ruta (net_interfaces.py)
+}
+
+# ==================== ENVÍO A RITMO CONSTANTE (pacing.py) ====================
+PACING_CONFIG = {
+    "ENABLED": True,        # False = enviar cada bloque en cuanto se captura
+    "MAX_QUEUE": 8,         # paquetes en espera antes de descartar
+    "DROP_POLICY": "oldest",  # "oldest" (prima latencia) o "newest" (prima continuidad)
+    "DELAY_FRAMES": 1,      # bloques de retardo para absorber ráfagas del micrófono
+}
+
+# ==================== ARRANQUE DEL EMISOR ====================
+STARTUP_CONFIG = {
+    "DELAY_S": 0,               # cuenta atrás opcional antes de abrir el micrófono (0 = sin espera)
+    "READY_TIMEOUT_S": 5.0,     # tiempo máximo esperando a que el micrófono quede libre
+    "PREOPEN_INPUT": True,      # abrir el micrófono al iniciar la ventana (arranque en ms)
+}
+
+# ==================== CANAL DE RETORNO (feedback.py) ====================
+FEEDBACK_CONFIG = {
+    "ENABLED": True,        # el receptor informa de pérdida, jitter y buffer al emisor
+    "INTERVAL_MS": 500,     # periodo de los informes
+    "ADAPTIVE": True,       # el emisor ajusta tasa de bits, FEC y tamaño de trama según los informes
+}
+
+# ==================== DISPOSITIVOS DE AUDIO (devices.py) ====================
+DEVICE_CONFIG = {
+    "INPUT": "",                # micrófono preferido por nombre ("" = predeterminado del sistema)
+    "OUTPUT": "",               # salida preferida por nombre
+    "BACKUP_INPUT": "",         # respaldo si el preferido se desconecta ("" = predeterminado)
+    "BACKUP_OUTPUT": "",
+    "RETRY_PREFERRED_S": 5.0,   # periodo de los intentos de volver al preferido
+    "RESCAN_S": 30.0,           # reenumerar en busca de un preferido conectado tras el arranque
+}
+
+# ==================== PERFIL DE BAJA LATENCIA ====================
+# El búfer del dispositivo (frames_per_buffer) es independiente de la trama
+# de red: con el perfil normal ambos son AUDIO_CONFIG["CHUNK"] (2048 frames,
+# ~46 ms a 44.1 kHz en cada extremo); el de baja latencia pide búferes
+# pequeños al dispositivo y tramas cortas a la red.
+LATENCY_CONFIG = {
+    "LOW_LATENCY": False,       # valor inicial de la casilla "Baja latencia"
+    "DEVICE_FRAMES": 128,       # búfer del dispositivo en baja latencia (~3 ms a 44.1 kHz)
+    "NETWORK_FRAMES": 256,      # trama de red del emisor en baja latencia (~6 ms)
+    "HOST_API": "",             # API de audio preferida: "ALSA", "JACK", "PulseAudio", "WASAPI"... ("" = la del sistema)
+}
+
+# ==================== VARIOS PROCESOS (workers.py) ====================
+# Para hosts que reciben decenas de streams: cada emisor se asigna a un
+# proceso que lo decodifica y resamplea, y un proceso mezclador reúne el PCM
+# a través de buffers circulares en memoria compartida.
+WORKER_CONFIG = {
+    "PROCESSES": 0,             # procesos de decodificación (0 = uno por núcleo)
+    "MODE": "auto",             # "reuseport" (reparte el kernel), "dispatcher" (un hilo reparte) o "auto"
+    "MIX_RATE": 48000,          # formato común de la mezcla
+    "MIX_CHANNELS": 2,
+    "MIX_FRAMES": 960,          # 20 ms a 48 kHz: ritmo del mezclador
+    "RING_SLOTS": 256,          # bloques en vuelo por proceso antes de descartar
+    "MAX_BUFFER_MS": 200,       # cola máxima por stream en el mezclador (lo que exceda se descarta)
+}
+
+# ==================== TRANSPORTE LOCAL (shm_transport.py) ====================
+# Emisor y receptor en la misma máquina: los datagramas pasan por memoria
+# compartida en lugar de UDP por loopback (host del emisor "shm:<canal>").
+SHM_CONFIG = {
+    "SLOTS": 64,                # datagramas en vuelo por sentido antes de sobrescribir
+    "SLOT_BYTES": 65536,        # datagrama máximo (cabe cualquier datagrama UDP)
+    "SPIN_US": 200,             # espera activa antes de dormir: latencia de µs tras cada paquete
+    "MAX_SLEEP_US": 250,        # sueño máximo entre comprobaciones en reposo
+}
+
+
+def apply_overrides(overrides):
+    """
+    Sustituye valores de los diccionarios de configuración.
+
+    Args:
+        overrides: {"NET_CONFIG": {"RCVBUF": 8388608}, ...}
+    Lanza:
+        KeyError: sección o clave desconocida (evita erratas silenciosas)
+    """
+    sections = {name: value for name, value in globals().items()
+                if name.endswith("_CONFIG") and isinstance(value, dict)}
+    for section, values in overrides.items():
+        if section not in sections:
+            raise KeyError(f"Sección de configuración desconocida: {section}")
+        for key, value in values.items():
+            if key not in sections[section]:
+                raise KeyError(f"Clave desconocida en {section}: {key}")
+            sections[section][key] = value
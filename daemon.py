@@ -0,0 +1,393 @@
+"""
+daemon.py - Servicio sin interfaz gráfica con API de control local
+
+Ejecuta emisores y receptores con el mismo código que las interfaces
+(pipeline.py), sin importar Tk ni Matplotlib y sin gráficos ni análisis
+espectral: pensado para equipos sin pantalla o que arrancan al inicio.
+
+Uso:
+    python daemon.py --config microremoto.json
+    python daemon.py --listar
+
+Archivo de configuración (JSON):
+    {
+      "control": {"host": "127.0.0.1", "port": 8750, "token": ""},
+      "config": {"NET_CONFIG": {"HIGH_THROUGHPUT": true}},
+      "streams": [
+        {"name": "sala", "type": "receptor", "port": 5000, "device": "",
+         "low_latency": false, "record": false, "allowed_hosts": "", "passphrase": "",
+         "autostart": true, "volume": 1.0},
+        {"name": "micro", "type": "emisor", "host": "192.168.1.20", "port": 5001,
+         "preset": "Mono 44.1 kHz 16 bits", "device": "", "amplification": 1.5}
+      ]
+    }
+
+"config" sustituye valores de config.py (ver config.apply_overrides). En
+cada stream, las claves de su ControlState (amplification, volume, vad,
+highpass, noise_suppression) son sus valores iniciales y el resto sus
+parámetros de arranque. Con emisor y receptor en este mismo equipo, el
+receptor con "local_channel": "sala" y el emisor con "host": "shm:sala"
+intercambian los datagramas por memoria compartida (shm_transport.py).
+"host" admite IPv4, IPv6 y grupos multicast; un receptor con
+"multicast_group": "ff12::5000" recibe lo que se envía a ese grupo.
+
+API de control (JSON por HTTP, solo en la interfaz local):
+    GET  /streams                    estado y medidas de todos los streams
+    GET  /streams/<nombre>           estado y medidas de uno
+    POST /streams/<nombre>/start     arranca
+    POST /streams/<nombre>/stop      detiene
+    POST /streams/<nombre>/params    {"volume": 0.8, ...}: los controles se aplican
+                                     en caliente; dispositivo, puerto, destino...
+                                     reinician el stream si estaba en marcha
+    GET  /devices                    micrófonos y salidas disponibles
+Con "token", cada petición debe llevar la cabecera X-Token con ese valor.
+
+Señales: SIGTERM y SIGINT detienen los streams y terminan; SIGHUP vuelve
+a leer el archivo de configuración.
+"""
+
+import argparse
+import hmac
+import json
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+from config import SECURITY_CONFIG, SOURCE_FILTER_CONFIG, DEVICE_CONFIG, LATENCY_CONFIG
+from secure import cipher_from_passphrase
+from audio_engine import AudioEngine
+from devices import DeviceInventory, describe as describe_device
+from pipeline import TransmitterPipeline, ReceiverPipeline, transmit_control, receive_control
+
+DEFAULT_CONTROL = {"host": "127.0.0.1", "port": 8750, "token": ""}
+STOP_TIMEOUT_S = 2.0
+
+# Parámetros de arranque por tipo de stream y su valor por omisión
+RECEIVER_SETTINGS = {
+    "port": 5000, "passphrase": None, "allowed_hosts": None, "device": None,
+    "low_latency": None, "record": False, "local_channel": "",
+    "multicast_group": "",
+}
+TRANSMITTER_SETTINGS = {
+    "host": "", "port": 5000, "passphrase": None, "preset": None, "device": None, "low_latency": None,
+}
+
+
+def log(message):
+    print(message, flush=True)
+
+
+class ManagedStream:
+    """Un emisor o receptor con nombre, sus parámetros y su canalización."""
+
+    def __init__(self, spec, engine):
+        """
+        Args:
+            spec: entrada de "streams" del archivo de configuración
+            engine: AudioEngine propio del stream (PyAudio compartido)
+        Lanza:
+            ValueError: tipo o parámetro desconocido
+        """
+        self.name = spec["name"]
+        self.kind = spec.get("type", "receptor")
+        if self.kind not in ("receptor", "emisor"):
+            raise ValueError(f"Tipo de stream desconocido: {self.kind}")
+        self.autostart = spec.get("autostart", True)
+        self.settings = dict(RECEIVER_SETTINGS if self.kind == "receptor" else TRANSMITTER_SETTINGS)
+
+        prefix = f"[{self.name}] "
+        stream_log = lambda message: log(prefix + message)
+        if self.kind == "receptor":
+            self.pipeline = ReceiverPipeline(engine, control=receive_control(), log=stream_log)
+        else:
+            self.pipeline = TransmitterPipeline(engine, control=transmit_control(), log=stream_log)
+
+        values = {key: value for key, value in spec.items() if key not in ("name", "type", "autostart")}
+        self.configure(values)
+
+    @property
+    def control_keys(self):
+        return self.pipeline.control.snapshot()._fields
+
+    def configure(self, values):
+        """
+        Aplica parámetros: los controles en caliente y el resto para el próximo arranque.
+
+        Retorna:
+            bool: True si cambió algún parámetro de arranque.
+        Lanza:
+            ValueError: parámetro desconocido (no se aplica ninguno)
+        """
+        unknown = [key for key in values if key not in self.control_keys and key not in self.settings]
+        if unknown:
+            raise ValueError(f"Parámetros desconocidos para {self.kind}: {', '.join(unknown)}")
+        controls = {key: value for key, value in values.items() if key in self.control_keys}
+        if controls:
+            self.pipeline.control.update(**controls)
+        changed = False
+        for key, value in values.items():
+            if key in self.settings and self.settings[key] != value:
+                self.settings[key] = value
+                changed = True
+        return changed
+
+    def start(self):
+        """
+        Lanza:
+            RuntimeError: ya en marcha o clave no utilizable
+            ValueError: emisor sin destino
+        """
+        settings = self.settings
+
+        def setting(key, default):
+            return default if settings[key] is None else settings[key]
+
+        cipher = cipher_from_passphrase(setting("passphrase", SECURITY_CONFIG["PASSPHRASE"]))
+        low_latency = setting("low_latency", LATENCY_CONFIG["LOW_LATENCY"])
+        if self.kind == "receptor":
+            self.pipeline.start(
+                port=settings["port"], cipher=cipher,
+                allowed_hosts=setting("allowed_hosts", SOURCE_FILTER_CONFIG["ALLOWED_HOSTS"]),
+                device_name=setting("device", DEVICE_CONFIG["OUTPUT"]),
+                low_latency=low_latency, record=settings["record"],
+                local_channel=settings["local_channel"], multicast_group=settings["multicast_group"]
+            )
+        else:
+            if not settings["host"]:
+                raise ValueError("El emisor necesita 'host'")
+            self.pipeline.start(
+                settings["host"], port=settings["port"], preset=settings["preset"], cipher=cipher,
+                device_name=setting("device", DEVICE_CONFIG["INPUT"]), low_latency=low_latency
+            )
+
+    def stop(self):
+        self.pipeline.stop(timeout=STOP_TIMEOUT_S)
+
+    def stats(self):
+        stats = self.pipeline.stats()
+        stats["nombre"] = self.name
+        return stats
+
+
+class Daemon:
+    """Streams configurados, su PyAudio compartido y la recarga de configuración."""
+
+    def __init__(self, path):
+        self.path = path
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.engine = AudioEngine(log=log)   # propietario del PyAudio; los streams lo comparten
+        self.inventory = DeviceInventory(self.engine, host_api=LATENCY_CONFIG["HOST_API"])
+        self.control = dict(DEFAULT_CONTROL)
+        self.stopping = threading.Event()
+        self.reload_requested = threading.Event()
+
+    def read_config(self):
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self):
+        """Lee el archivo, aplica "config" y crea (o actualiza) los streams."""
+        data = self.read_config()
+        config.apply_overrides(data.get("config", {}))
+        self.control.update(data.get("control", {}))
+
+        specs = {spec["name"]: spec for spec in data.get("streams", [])}
+        with self.lock:
+            # Streams retirados del archivo
+            for name in list(self.streams):
+                if name not in specs:
+                    log(f"[{name}] retirado de la configuración")
+                    self.streams.pop(name).stop()
+            for name, spec in specs.items():
+                stream = self.streams.get(name)
+                if stream is not None and stream.kind != spec.get("type", "receptor"):
+                    stream.stop()
+                    stream = None
+                if stream is None:
+                    stream = ManagedStream(spec, AudioEngine(self.engine.p, log=log))
+                    self.streams[name] = stream
+                    if stream.autostart:
+                        try:
+                            self.start(name)
+                        except (RuntimeError, ValueError):
+                            pass  # ya registrado; se puede arrancar luego por la API
+                else:
+                    values = {key: value for key, value in spec.items() if key not in ("name", "type", "autostart")}
+                    self.set_params(name, values)
+
+    def start(self, name):
+        stream = self.streams[name]
+        if stream.pipeline.running:
+            return
+        try:
+            stream.start()
+        except (RuntimeError, ValueError) as e:
+            log(f"[{name}] no se pudo iniciar: {e}")
+            raise
+
+    def stop(self, name):
+        self.streams[name].stop()
+
+    def set_params(self, name, values):
+        """Controles en caliente; un parámetro de arranque reinicia el stream si estaba en marcha."""
+        stream = self.streams[name]
+        if stream.configure(values) and stream.pipeline.running:
+            log(f"[{name}] parámetros de arranque cambiados, reiniciando")
+            stream.stop()
+            stream.start()
+
+    def stats(self, name=None):
+        if name is not None:
+            return self.streams[name].stats()
+        return [stream.stats() for stream in self.streams.values()]
+
+    def devices(self):
+        devices = self.inventory.devices()
+        return {
+            "entradas": [{"indice": d.index, "descripcion": describe_device(d, input=True)}
+                         for d in self.inventory.inputs()],
+            "salidas": [{"indice": d.index, "descripcion": describe_device(d, input=False)}
+                        for d in self.inventory.outputs()],
+            "total": len(devices),
+        }
+
+    def shutdown(self):
+        with self.lock:
+            for stream in self.streams.values():
+                stream.stop()
+        # Los streams en reserva de cada uno se cierran antes de terminar el PyAudio común
+        for stream in self.streams.values():
+            stream.pipeline.engine.close()
+        self.engine.close()
+
+    def run(self):
+        """Arranca la API y espera señales hasta que se pida terminar."""
+        self.load()
+        server = ThreadingHTTPServer((self.control["host"], self.control["port"]), ControlHandler)
+        server.daemon_threads = True
+        server.app = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        log(f"API de control en http://{self.control['host']}:{self.control['port']}/")
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stopping.set())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload_requested.set())
+
+        # El hilo principal solo atiende las señales (los manejadores no bloquean)
+        while not self.stopping.wait(0.5):
+            if self.reload_requested.is_set():
+                self.reload_requested.clear()
+                log(f"Recargando {self.path}")
+                try:
+                    self.load()
+                except (OSError, ValueError, KeyError) as e:
+                    log(f"Configuración no aplicada: {e}")
+
+        log("Deteniendo...")
+        server.shutdown()
+        server.server_close()
+        self.shutdown()
+        log("Servicio detenido.")
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    """Peticiones de la API de control (ver docstring del módulo)."""
+
+    server_version = "MicroRemoto"
+
+    def log_message(self, format, *args):
+        pass  # las acciones relevantes ya se registran en el log del servicio
+
+    def reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def authorized(self):
+        token = self.server.app.control.get("token")
+        if not token:
+            return True
+        offered = self.headers.get("X-Token", "")
+        if hmac.compare_digest(offered.encode("utf-8"), token.encode("utf-8")):
+            return True
+        self.reply(401, {"error": "token no válido"})
+        return False
+
+    def route(self):
+        """Segmentos de la ruta: /streams/sala/stop -> ['streams', 'sala', 'stop']."""
+        return [part for part in self.path.split("?")[0].split("/") if part]
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        app = self.server.app
+        parts = self.route()
+        if parts == ["streams"]:
+            self.reply(200, app.stats())
+        elif len(parts) == 2 and parts[0] == "streams" and parts[1] in app.streams:
+            self.reply(200, app.stats(parts[1]))
+        elif parts == ["devices"]:
+            try:
+                self.reply(200, app.devices())
+            except Exception as e:
+                self.reply(500, {"error": str(e)})
+        else:
+            self.reply(404, {"error": "ruta desconocida"})
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        app = self.server.app
+        parts = self.route()
+        if len(parts) != 3 or parts[0] != "streams" or parts[1] not in app.streams:
+            self.reply(404, {"error": "ruta desconocida"})
+            return
+        name, action = parts[1], parts[2]
+        try:
+            with app.lock:
+                if action == "start":
+                    app.start(name)
+                elif action == "stop":
+                    app.stop(name)
+                elif action == "params":
+                    length = int(self.headers.get("Content-Length", 0))
+                    values = json.loads(self.rfile.read(length) or b"{}")
+                    if not isinstance(values, dict):
+                        raise ValueError("Se esperaba un objeto JSON")
+                    app.set_params(name, values)
+                else:
+                    self.reply(404, {"error": "acción desconocida"})
+                    return
+        except (RuntimeError, ValueError) as e:
+            self.reply(400, {"error": str(e)})
+            return
+        self.reply(200, app.stats(name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de audio UDP sin interfaz con API de control local.")
+    parser.add_argument("--config", default="microremoto.json", help="archivo de configuración JSON")
+    parser.add_argument("--listar", action="store_true", help="lista los dispositivos de audio y sale")
+    args = parser.parse_args()
+
+    if args.listar:
+        engine = AudioEngine(log=log)
+        inventory = DeviceInventory(engine, host_api=LATENCY_CONFIG["HOST_API"])
+        for d in inventory.inputs():
+            print(f"[{d.index}] entrada: {describe_device(d, input=True)}")
+        for d in inventory.outputs():
+            print(f"[{d.index}] salida: {describe_device(d, input=False)}")
+        engine.close()
+        return
+
+    Daemon(args.config).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+devices.py - Inventario de dispositivos de audio, selección y conmutación ante fallos
+
+- DeviceInventory: lista los dispositivos con sus capacidades (canales,
+  frecuencias aceptadas, latencias baja/alta por defecto). Consultar las
+  frecuencias con is_format_supported() es lento en algunas APIs (WASAPI,
+  ASIO), así que el resultado se guarda tras el primer escaneo y solo se
+  repite al pedir refresh=True.
+- DeviceFailover: dispositivo preferido + respaldo. Si el stream falla
+  (micrófono USB desconectado), elige el siguiente candidato (respaldo,
+  predeterminado del sistema, cualquier otro compatible) para reabrir sin
+  cortar la sesión de red, y cada `retry_s` intenta volver al preferido.
+  Si el preferido no figuraba en el inventario, cada `rescan_s` cierra el
+  stream un momento y vuelve a enumerar para encontrarlo.
+
+Con una API de audio preferida (LATENCY_CONFIG["HOST_API"]: ALSA, JACK,
+PulseAudio, WASAPI...) solo se ofrecen sus dispositivos y el
+"predeterminado" es el de esa API: las de acceso directo admiten búferes
+mucho menores que las capas de mezcla del sistema.
+
+Los dispositivos se eligen por nombre: el índice de PortAudio cambia al
+conectar o desconectar hardware. PortAudio solo enumera al inicializarse,
+de modo que un dispositivo conectado después no aparece hasta refrescar
+el inventario con el audio detenido.
+
+Uso (lista los dispositivos de este equipo):
+    python devices.py
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+import pyaudio
+
+CANDIDATE_RATES = (8000, 16000, 22050, 32000, 44100, 48000, 88200, 96000)
+DEFAULT_DEVICE = "Predeterminado"   # etiqueta de la interfaz para "el del sistema"
+
+DeviceInfo = namedtuple("DeviceInfo", [
+    "index", "name", "host_api", "max_input_channels", "max_output_channels", "default_rate",
+    "input_rates", "output_rates", "input_latency_ms", "output_latency_ms"
+])
+
+
+def probe_device(p, info):
+    """DeviceInfo a partir del dict de PyAudio, comprobando las frecuencias candidatas."""
+    index = info["index"]
+    in_channels = int(info["maxInputChannels"])
+    out_channels = int(info["maxOutputChannels"])
+    input_rates, output_rates = [], []
+    for rate in CANDIDATE_RATES:
+        if in_channels:
+            try:
+                p.is_format_supported(rate, input_device=index, input_channels=min(in_channels, 2),
+                                      input_format=pyaudio.paInt16)
+                input_rates.append(rate)
+            except ValueError:
+                pass
+        if out_channels:
+            try:
+                p.is_format_supported(rate, output_device=index, output_channels=min(out_channels, 2),
+                                      output_format=pyaudio.paInt16)
+                output_rates.append(rate)
+            except ValueError:
+                pass
+    try:
+        host_api = p.get_host_api_info_by_index(info["hostApi"])["name"]
+    except (OSError, KeyError):
+        host_api = "?"
+    return DeviceInfo(
+        index, info["name"], host_api, in_channels, out_channels, int(info["defaultSampleRate"]),
+        tuple(input_rates), tuple(output_rates),
+        (info["defaultLowInputLatency"] * 1000.0, info["defaultHighInputLatency"] * 1000.0),
+        (info["defaultLowOutputLatency"] * 1000.0, info["defaultHighOutputLatency"] * 1000.0),
+    )
+
+
+def describe(device, input=True):
+    """Texto de una línea con las capacidades de un dispositivo."""
+    channels = device.max_input_channels if input else device.max_output_channels
+    rates = device.input_rates if input else device.output_rates
+    low, high = device.input_latency_ms if input else device.output_latency_ms
+    rates_text = "/".join(f"{r / 1000:g}k" for r in rates) or f"{device.default_rate / 1000:g}k"
+    return f"{device.name} ({device.host_api}): {channels} canal(es), {rates_text} Hz, {low:.0f}-{high:.0f} ms"
+
+
+class DeviceInventory:
+    """Dispositivos de la instancia PyAudio de un AudioEngine, escaneados una vez."""
+
+    def __init__(self, engine, host_api=""):
+        """
+        Args:
+            engine: audio_engine.AudioEngine
+            host_api: API preferida (subcadena del nombre, p. ej. "JACK"; "" = todas)
+        """
+        self.engine = engine
+        self.host_api = host_api
+        self._devices = None
+        self._lock = threading.Lock()
+
+    def devices(self, refresh=False):
+        """
+        Lista de DeviceInfo (se escanea en la primera llamada).
+
+        Args:
+            refresh: reinicializar PortAudio para ver dispositivos nuevos
+                (solo con el audio detenido; ver AudioEngine.reset)
+        """
+        if refresh:
+            self.refresh()
+        with self._lock:
+            if self._devices is None:
+                p = self.engine.p
+                found = []
+                for i in range(p.get_device_count()):
+                    try:
+                        found.append(probe_device(p, p.get_device_info_by_index(i)))
+                    except (OSError, ValueError, KeyError):
+                        continue
+                self._devices = found
+            return list(self._devices)
+
+    def refresh(self):
+        """
+        Vuelve a enumerar los dispositivos si el motor puede reinicializar
+        PortAudio (ningún stream en uso). Los índices pueden cambiar.
+
+        Retorna:
+            bool: True si se reinicializó; si no, el inventario sigue igual.
+        """
+        with self._lock:
+            if not self.engine.reset():
+                return False
+            self._devices = None
+            return True
+
+    def inputs(self):
+        return [d for d in self.devices() if d.max_input_channels > 0 and self._on_api(d.host_api)]
+
+    def outputs(self):
+        return [d for d in self.devices() if d.max_output_channels > 0 and self._on_api(d.host_api)]
+
+    def _on_api(self, name):
+        return not self.host_api or self.host_api.lower() in name.lower()
+
+    def find(self, name, input=True):
+        """
+        Dispositivo con ese nombre (o índice, p. ej. "3" desde la línea de
+        comandos) y dirección, o None (None/"" = predeterminado).
+        """
+        if not name or name == DEFAULT_DEVICE:
+            return None
+        candidates = self.inputs() if input else self.outputs()
+        for device in candidates:
+            if device.name == name:
+                return device
+        if str(name).isdigit():
+            for device in candidates:
+                if device.index == int(name):
+                    return device
+        return None
+
+    def default_index(self, input=True):
+        """Índice del dispositivo predeterminado (de la API preferida si la hay), o None."""
+        p = self.engine.p
+        if self.host_api:
+            for i in range(p.get_host_api_count()):
+                api = p.get_host_api_info_by_index(i)
+                if self._on_api(api["name"]):
+                    index = api["defaultInputDevice" if input else "defaultOutputDevice"]
+                    if index >= 0:
+                        return index
+        try:
+            info = p.get_default_input_device_info() if input else p.get_default_output_device_info()
+            return info["index"]
+        except (OSError, IOError):
+            return None
+
+    def resolve(self, name, input=True):
+        """
+        Índice para abrir el dispositivo `name`: el suyo, el predeterminado de
+        la API preferida, o None (predeterminado del sistema).
+        """
+        device = self.find(name, input)
+        if device:
+            return device.index
+        return self.default_index(input) if self.host_api else None
+
+    def names(self, input=True):
+        """Nombres para un desplegable, empezando por DEFAULT_DEVICE."""
+        return [DEFAULT_DEVICE] + [d.name for d in (self.inputs() if input else self.outputs())]
+
+
+class DeviceFailover:
+    """Dispositivo preferido, respaldo y vuelta al preferido cuando reaparece."""
+
+    def __init__(self, inventory, preferred="", backup="", input=True, channels=1, retry_s=5.0,
+                 rescan_s=30.0, log=print):
+        """
+        Args:
+            inventory: DeviceInventory
+            preferred, backup: nombres ("" o DEFAULT_DEVICE = predeterminado del sistema)
+            channels: canales que necesita el stream
+            retry_s: periodo de los intentos de volver al preferido
+            rescan_s: periodo de las reenumeraciones en busca de un preferido
+                conectado después del arranque (ver try_restore)
+        """
+        self.inventory = inventory
+        self.preferred = preferred if preferred != DEFAULT_DEVICE else ""
+        self.backup = backup if backup != DEFAULT_DEVICE else ""
+        self.input = input
+        self.channels = channels
+        self.retry_s = retry_s
+        self.rescan_s = rescan_s
+        self.log = log
+        if self.preferred and inventory.find(self.preferred, input) is None:
+            self.log(f"Dispositivo '{self.preferred}' no encontrado, se usa el predeterminado")
+        self.preferred_index = inventory.resolve(self.preferred, input)   # None = predeterminado del sistema
+        self.current = self.preferred_index
+        self._next_retry = 0.0
+        self._next_rescan = time.monotonic() + rescan_s   # recién enumerados
+
+    @property
+    def on_backup(self):
+        """En otro dispositivo, o en el predeterminado porque el preferido no estaba."""
+        return self.current != self.preferred_index or self._missing_preferred()
+
+    def candidates(self, failed):
+        """Índices a probar tras el fallo de `failed`, en orden de preferencia."""
+        order = []
+        backup = self.inventory.find(self.backup, self.input)
+        if backup:
+            order.append(backup.index)
+        order.append(self.inventory.default_index(self.input))
+        order.append(self.preferred_index)
+        for device in (self.inventory.inputs() if self.input else self.inventory.outputs()):
+            available = device.max_input_channels if self.input else device.max_output_channels
+            if available >= self.channels:
+                order.append(device.index)
+        seen, result = {failed}, []
+        for index in order:
+            if index is not None and index not in seen:
+                seen.add(index)
+                result.append(index)
+        return result
+
+    def fail_over(self, open_device, error):
+        """
+        Reabre el stream en el siguiente dispositivo disponible.
+
+        Args:
+            open_device: callable(índice) -> (stream, device_rate); lanza OSError si falla
+            error: excepción que provocó el cambio (para el registro)
+        Retorna:
+            tuple | None: (stream, device_rate) o None si no queda ninguno.
+        """
+        failed = self.current if self.current is not None else self.inventory.default_index(self.input)
+        self.log(f"Fallo del dispositivo de {'entrada' if self.input else 'salida'} ({error})")
+        for index in self.candidates(failed):
+            try:
+                opened = open_device(index)
+            except (OSError, ValueError):
+                continue
+            self.current = index
+            self._next_retry = time.monotonic() + self.retry_s
+            self.log(f"Conmutado a: {self._name(index)}")
+            return opened
+        return None
+
+    def try_restore(self, open_device, now=None, stream=None):
+        """
+        Si se está en un respaldo, intenta volver al preferido cada `retry_s`.
+
+        Un preferido que no figura en el inventario (conectado después del
+        arranque) solo aparece al reinicializar PortAudio, y eso exige cerrar
+        el stream actual: cada `rescan_s`, si se da `stream` y no hay otros
+        en uso, se cierra (hueco breve), se refresca el inventario y se abre
+        el preferido o, si sigue sin estar, de nuevo el respaldo.
+
+        Args:
+            stream: stream abierto ahora (None = no volver a enumerar)
+        Retorna:
+            tuple | None: (stream, device_rate) del nuevo stream, o None si
+            se sigue con el actual.
+        Lanza:
+            OSError: si tras cerrar `stream` no se puede abrir ningún dispositivo.
+        """
+        if not self.on_backup:
+            return None
+        now = time.monotonic() if now is None else now
+        if now < self._next_retry:
+            return None
+        self._next_retry = now + self.retry_s
+        if not self._missing_preferred():
+            return self._open_preferred(open_device)
+        if stream is None or now < self._next_rescan:
+            return None
+        self._next_rescan = now + self.rescan_s
+        if not self.inventory.engine.can_reset((stream,)):
+            return None
+        return self._rescan(open_device, stream)
+
+    def _missing_preferred(self):
+        return bool(self.preferred) and self.inventory.find(self.preferred, self.input) is None
+
+    def _open_preferred(self, open_device):
+        preferred = self.preferred_index
+        if preferred is None:
+            preferred = self.inventory.default_index(self.input)
+        try:
+            opened = open_device(preferred)
+        except (OSError, ValueError):
+            return None
+        self.current = self.preferred_index
+        self.log(f"Dispositivo preferido disponible de nuevo: {self._name(preferred)}")
+        return opened
+
+    def _rescan(self, open_device, stream):
+        """Cierra `stream`, vuelve a enumerar y reabre el preferido o el respaldo."""
+        backup = self._name(self.current) if self.current is not None else ""
+        self.inventory.engine.discard(stream)
+        if not self.inventory.refresh():
+            self.log("No se pudieron volver a enumerar los dispositivos")
+        # Los índices cambian al reinicializar PortAudio: se resuelven de nuevo por nombre
+        self.preferred_index = self.inventory.resolve(self.preferred, self.input)
+        if not self._missing_preferred():
+            opened = self._open_preferred(open_device)
+            if opened:
+                return opened
+        self.current = self.inventory.resolve(backup, self.input)
+        try:
+            return open_device(self.current)
+        except (OSError, ValueError):
+            pass
+        opened = self.fail_over(open_device, "preferido ausente tras volver a enumerar")
+        if opened is None:
+            raise OSError("Ningún dispositivo disponible tras volver a enumerar")
+        return opened
+
+    def _name(self, index):
+        for device in self.inventory.devices():
+            if device.index == index:
+                return device.name
+        return f"#{index}"
+
+
+if __name__ == "__main__":
+    from audio_engine import AudioEngine
+
+    engine = AudioEngine()
+    inventory = DeviceInventory(engine)
+    started = time.perf_counter()
+    inventory.devices()
+    print(f"Escaneo: {(time.perf_counter() - started) * 1000:.0f} ms")
+    print("Entradas:")
+    for device in inventory.inputs():
+        print(f"  [{device.index}] {describe(device, input=True)}")
+    print("Salidas:")
+    for device in inventory.outputs():
+        print(f"  [{device.index}] {describe(device, input=False)}")
+    engine.close()
@@ -0,0 +1,132 @@
+"""
+drift.py - Compensación de deriva de reloj entre tarjetas de sonido
+
+Dos tarjetas "a 44100 Hz" nunca coinciden exactamente: si el emisor va más
+rápido, el audio se acumula en el receptor y la latencia crece sin límite;
+si va más lento, el buffer se vacía y aparecen cortes.
+
+DriftCompensator observa el nivel de audio pendiente en el receptor (cola
+propia + buffer del dispositivo), lo suaviza y, con un control PI, ajusta
+una relación de remuestreo muy cercana a 1 (± unos cientos de ppm) que se
+aplica con interpolación lineal fraccionaria, inaudible a esa escala. Si el
+nivel se dispara (p. ej. tras una ráfaga), descarta frames de golpe.
+"""
+
+import numpy as np
+
+
+class DriftCompensator:
+    """Control de latencia por micro-remuestreo para el camino de reproducción."""
+
+    def __init__(self, rate, channels=1, target_frames=None, max_ppm=2000,
+                 smoothing_s=1.0, kp=0.1, ki=0.0025, warmup_s=2.0):
+        """
+        Args:
+            rate: frecuencia de muestreo (Hz)
+            channels: número de canales
+            target_frames: nivel objetivo; None = el medido tras el arranque
+            max_ppm: corrección máxima aplicada (partes por millón)
+            smoothing_s: constante de tiempo del promedio del nivel (s)
+            kp, ki: ganancias proporcional (1/s) e integral (1/s²) sobre el
+                error de nivel en segundos; ki = kp²/4 da amortiguamiento crítico
+            warmup_s: segundos de medida antes de fijar el objetivo automático
+        """
+        self.rate = rate
+        self.channels = channels
+        self.target_frames = target_frames
+        self.max_correction = max_ppm * 1e-6
+        self.smoothing_s = smoothing_s
+        self.kp = kp
+        self.ki = ki
+        self.warmup_s = warmup_s
+        self.reset()
+
+    def reset(self):
+        """Reinicia la estimación (nuevo stream o cambio de formato)."""
+        self.level = None
+        self.integral = 0.0
+        self.ratio = 1.0
+        self.dropped_frames = 0
+        self._target = self.target_frames
+        self._warmup_levels = []
+        self._warmup_elapsed = 0.0
+        self._pos = 1.0  # posición de la próxima salida en buf (1.0 = primer frame del bloque)
+        self._last = np.zeros((1, self.channels), dtype=np.float32)
+
+    @property
+    def drift_ppm(self):
+        """Deriva estimada: corrección integral en régimen permanente (ppm)."""
+        return self.integral * 1e6
+
+    @property
+    def latency_ms(self):
+        """Latencia suavizada en el receptor (ms)."""
+        return 0.0 if self.level is None else 1000.0 * self.level / self.rate
+
+    def update(self, level_frames, elapsed_frames):
+        """
+        Registra el nivel actual de frames pendientes y recalcula la relación.
+
+        Args:
+            level_frames: frames pendientes de reproducir (cola + dispositivo)
+            elapsed_frames: frames transcurridos desde la última llamada
+
+        Retorna:
+            int: frames a descartar ya (0 salvo que el nivel supere con
+            creces el objetivo).
+        """
+        dt = elapsed_frames / self.rate
+        if self.level is None:
+            self.level = float(level_frames)
+        else:
+            self.level += min(1.0, dt / self.smoothing_s) * (level_frames - self.level)
+
+        if self._target is None:
+            self._warmup_levels.append(level_frames)
+            self._warmup_elapsed += dt
+            if self._warmup_elapsed < self.warmup_s:
+                return 0
+            self._target = float(np.median(self._warmup_levels))
+            self._warmup_levels = []
+
+        # Demasiado audio pendiente: descartar el exceso de una vez
+        if level_frames > 4 * max(self._target, 1.0) + self.rate * 0.1:
+            excess = int(level_frames - self._target)
+            self.level = self._target
+            self.dropped_frames += excess
+            return excess
+
+        error = (self.level - self._target) / self.rate  # segundos de más
+        self.integral = float(np.clip(self.integral + self.ki * error * dt,
+                                      -self.max_correction, self.max_correction))
+        correction = float(np.clip(self.kp * error + self.integral,
+                                   -self.max_correction, self.max_correction))
+        # ratio = frames de salida por frame de entrada (<1 consume la cola más rápido)
+        self.ratio = 1.0 - correction
+        return 0
+
+    def process(self, frames):
+        """
+        Remuestrea un bloque float32 (frames, canales) por la relación actual
+        con interpolación lineal, conservando la fase entre bloques.
+        """
+        n = len(frames)
+        if n == 0:
+            return frames
+        if self.ratio == 1.0 and self._pos == 1.0:
+            self._last = frames[-1:].copy()
+            return frames
+
+        # buf[0] es la última muestra del bloque anterior; se duplica la última
+        # muestra al final para poder interpolar justo en la posición n
+        buf = np.concatenate((self._last, frames, frames[-1:]))
+        step = 1.0 / self.ratio
+        count = int((n - self._pos) // step) + 1 if self._pos <= n else 0
+        positions = self._pos + np.arange(count) * step
+        index = positions.astype(np.int64)
+        frac = (positions - index).astype(np.float32)[:, None]
+        out = buf[index] * (1.0 - frac) + buf[index + 1] * frac
+
+        self._pos += count * step - n
+        self._last = frames[-1:].copy()
+        return out.astype(np.float32, copy=False)
@@ -0,0 +1,94 @@
+"""
+dsp.py - Procesado de audio vectorizado sobre frames entrelazados
+
+Todas las funciones trabajan con arrays NumPy de forma (frames, canales) en
+float32 normalizado a [-1, 1], obtenidos directamente del PCM entrelazado
+sin bucles por canal.
+
+Formatos soportados (ver protocol.py): int16, int24 empaquetado y float32.
+"""
+
+import numpy as np
+
+from protocol import FMT_FLOAT32, FMT_INT16, FMT_INT24
+
+INT16_SCALE = 32768.0
+INT24_SCALE = 8388608.0
+
+
+def decode_frames(payload, sample_format, channels):
+    """
+    Convierte PCM entrelazado (bytes/memoryview) a float32 (frames, canales).
+
+    Los bytes sobrantes que no completan un frame se descartan.
+    """
+    if sample_format == FMT_INT16:
+        samples = np.frombuffer(payload, dtype="<i2", count=len(payload) // 2)
+        out = samples.astype(np.float32)
+        out *= 1.0 / INT16_SCALE
+    elif sample_format == FMT_FLOAT32:
+        out = np.frombuffer(payload, dtype="<f4", count=len(payload) // 4).astype(np.float32)
+    elif sample_format == FMT_INT24:
+        raw = np.frombuffer(payload, dtype=np.uint8, count=(len(payload) // 3) * 3).reshape(-1, 3)
+        # Ensamblar 24 bits little-endian en int32 y extender el signo
+        samples = (raw[:, 0].astype(np.int32)
+                   | (raw[:, 1].astype(np.int32) << 8)
+                   | (raw[:, 2].astype(np.int32) << 16))
+        samples = (samples << 8) >> 8
+        out = samples.astype(np.float32)
+        out *= 1.0 / INT24_SCALE
+    else:
+        raise ValueError(f"Formato de muestra no soportado: {sample_format}")
+
+    usable = (out.size // channels) * channels
+    return out[:usable].reshape(-1, channels)
+
+
+def encode_frames(frames, sample_format):
+    """Convierte float32 (frames, canales) a PCM entrelazado en bytes, saturando a [-1, 1]."""
+    clipped = np.clip(frames, -1.0, 1.0)
+    if sample_format == FMT_INT16:
+        return (clipped * (INT16_SCALE - 1)).astype("<i2").tobytes()
+    if sample_format == FMT_FLOAT32:
+        return clipped.astype("<f4").tobytes()
+    if sample_format == FMT_INT24:
+        samples = (clipped * (INT24_SCALE - 1)).astype("<i4").reshape(-1)
+        # Quedarse con los 3 bytes bajos de cada int32 little-endian
+        return samples.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    raise ValueError(f"Formato de muestra no soportado: {sample_format}")
+
+
+def apply_gain(frames, gain):
+    """Aplica una ganancia in situ a todos los canales a la vez."""
+    if gain != 1.0:
+        frames *= np.float32(gain)
+    return frames
+
+
+def mixdown(frames):
+    """Mezcla a mono (media de canales) para visualización. Siempre retorna una copia."""
+    if frames.shape[1] == 1:
+        return frames[:, 0].copy()
+    return frames.mean(axis=1)
+
+
+def fit_length(signal, length):
+    """Recorta o rellena con ceros una señal 1D a `length` muestras."""
+    if len(signal) >= length:
+        return signal[:length]
+    return np.pad(signal, (0, length - len(signal)))
+
+
+def roll_in(window, signal):
+    """Ventana deslizante: descarta lo más antiguo de `window` y añade `signal` al final."""
+    if len(signal) >= len(window):
+        return signal[-len(window):]
+    return np.concatenate((window[len(signal):], signal))
+
+
+def remix(frames, channels):
+    """Adapta (frames, canales) a otro número de canales: mezcla a mono y reparte por igual."""
+    if frames.shape[1] == channels:
+        return frames
+    mono = mixdown(frames).astype(np.float32, copy=False)
+    return np.repeat(mono[:, None], channels, axis=1)
@@ -0,0 +1,244 @@
+"""
+dsp_graph.py - Grafo de procesado de audio con coste medido por nodo
+
+Emisor y receptor pasan cada bloque por una cadena de nodos en el orden que
+indica DSP_GRAPH_CONFIG. Contrato de los nodos:
+- reciben vistas float32 (frames, canales) sobre el buffer del llamador y
+  las modifican in situ, sin cambiar su tamaño; lo que cambia la longitud
+  (resampleo, deriva de reloj) queda fuera del grafo;
+- el grafo parte cada llamada en sub-bloques de exactamente `block` frames
+  y, si la longitud no es múltiplo de `block`, una cola final más corta
+  (1 .. block-1 frames). La cola se procesa tal cual: rellenarla con ceros
+  contaminaría el estado de filtros y VAD, y retenerla hasta completar un
+  bloque añadiría hasta un bloque de latencia. Con el emisor a su CHUNK
+  nativo todas las llamadas son bloques enteros;
+- setup(rate, channels, block) reserva de antemano sus buffers para
+  `block` frames; la cola usa la parte inicial de esas mismas reservas;
+- begin() se llama una vez por llamada al grafo, antes del primer sub-bloque;
+- update(params) lee los parámetros en caliente (ControlState.snapshot())
+  antes de cada bloque.
+
+DspGraph mide cada nodo activo (media móvil de µs, normalizada a un bloque
+de `block` frames para que las colas no la falseen) para la vista de
+estadísticas. Para añadir una etapa basta con registrar su fábrica y
+poner su clave en el orden; los bucles de red no cambian:
+
+    register_node("limitador", lambda rate, channels, **resources: Limiter())
+    DSP_GRAPH_CONFIG["CAPTURE"] = ["eco", "paso_alto", "ruido", "vad", "ganancia", "limitador"]
+"""
+
+import time
+
+import numpy as np
+
+from filters import HighPassFilter, SpectralNoiseSuppressor
+from vad import VoiceActivityDetector
+
+
+class DspNode:
+    """Nodo base: procesa in situ; `param` es el campo del snapshot que lo activa."""
+
+    name = "Nodo"
+    param = None
+
+    def __init__(self):
+        self.enabled = True
+
+    def setup(self, rate, channels, block):
+        self.rate, self.channels, self.block = rate, channels, block
+
+    def reset(self):
+        pass
+
+    def begin(self):
+        pass
+
+    def update(self, params):
+        if self.param:
+            self.enabled = bool(getattr(params, self.param, True))
+
+    def process(self, frames):
+        raise NotImplementedError
+
+
+class StageNode(DspNode):
+    """Adapta una etapa de filters.py o aec.py: process_into() in situ sobre buffers reservados con prepare()."""
+
+    def __init__(self, stage, param=None):
+        super().__init__()
+        self.stage = stage
+        self.name = stage.name
+        self.param = param
+
+    def setup(self, rate, channels, block):
+        super().setup(rate, channels, block)
+        self.stage.prepare(block)
+
+    def reset(self):
+        if hasattr(self.stage, "reset"):
+            self.stage.reset()
+
+    def update(self, params):
+        super().update(params)
+        # Etapas con su propio interruptor (p. ej. el cancelador de eco)
+        self.enabled = self.enabled and getattr(self.stage, "enabled", True)
+
+    def process(self, frames):
+        self.stage.process_into(frames)
+
+
+class GainNode(DspNode):
+    """Ganancia y saturación a [-1, 1] in situ; la ganancia es el producto de los parámetros `factors`."""
+
+    name = "Ganancia"
+
+    def __init__(self, factors=("amplification",)):
+        super().__init__()
+        self.factors = factors
+        self.gain = 1.0
+
+    def update(self, params):
+        gain = 1.0
+        for factor in self.factors:
+            gain *= getattr(params, factor, 1.0)
+        self.gain = np.float32(gain)
+        # Con ganancia unidad no hay nada que saturar que no haga ya encode_frames
+        self.enabled = gain != 1.0
+
+    def process(self, frames):
+        np.multiply(frames, self.gain, out=frames)
+        np.clip(frames, -1.0, 1.0, out=frames)
+
+
+class VadNode(DspNode):
+    """Detector de voz: no modifica el bloque; `active` es el OR de los sub-bloques de la llamada."""
+
+    name = "VAD"
+    param = "vad"
+
+    def __init__(self, vad):
+        super().__init__()
+        self.vad = vad
+        self.active = True
+
+    def update(self, params):
+        super().update(params)
+        if not self.enabled:
+            self.active = True
+
+    def begin(self):
+        self.active = False
+
+    def process(self, frames):
+        # Basta un sub-bloque con voz para enviar la llamada entera como voz
+        if self.vad.process(frames):
+            self.active = True
+
+
+class DspGraph:
+    """Cadena de nodos sobre sub-bloques de `block` frames (más la cola), con coste medio por nodo (µs por bloque)."""
+
+    def __init__(self, nodes, rate, channels, block):
+        self.nodes = [node for node in nodes if node is not None]
+        self.rate, self.channels, self.block = rate, channels, block
+        for node in self.nodes:
+            node.setup(rate, channels, block)
+        self.cost_us = {node.name: 0.0 for node in self.nodes}
+        self._elapsed = [0.0] * len(self.nodes)
+
+    def find(self, cls):
+        """Primer nodo de la clase `cls`, o None."""
+        return next((node for node in self.nodes if isinstance(node, cls)), None)
+
+    def reset(self):
+        for node in self.nodes:
+            node.reset()
+
+    def update(self, params):
+        for node in self.nodes:
+            node.update(params)
+
+    def process(self, frames):
+        """Procesa `frames` in situ (float32 (frames, canales), escribible) y lo retorna."""
+        n = len(frames)
+        if n == 0:
+            return frames
+        block, elapsed = self.block, self._elapsed
+        active = [(i, node) for i, node in enumerate(self.nodes) if node.enabled]
+        for i, node in active:
+            elapsed[i] = 0.0
+            node.begin()
+        # Sub-bloques de tamaño fijo; el último es la cola si n no es múltiplo de block
+        for start in range(0, n, block):
+            view = frames[start:start + block]
+            for i, node in active:
+                begin = time.perf_counter()
+                node.process(view)
+                elapsed[i] += time.perf_counter() - begin
+        for i, node in enumerate(self.nodes):
+            if not node.enabled:
+                self.cost_us[node.name] = 0.0
+                continue
+            cost = elapsed[i] * 1e6 * block / n
+            self.cost_us[node.name] += 0.1 * (cost - self.cost_us[node.name])
+        return frames
+
+    def costs(self):
+        """{nodo: µs por bloque} de los nodos activos (para stats())."""
+        return {node.name: round(self.cost_us[node.name], 1) for node in self.nodes if node.enabled}
+
+    def cost_summary(self):
+        """Texto breve con el coste por nodo activo, p. ej. 'Paso alto 40 µs'."""
+        parts = [f"{name} {cost:.0f} µs" for name, cost in self.costs().items()]
+        return " · ".join(parts) if parts else "Sin procesado"
+
+
+# ==================== REGISTRO DE NODOS ====================
+
+NODE_FACTORIES = {}
+
+
+def register_node(key, factory):
+    """Registra `factory(rate, channels, **resources)` -> DspNode o None (nodo no disponible)."""
+    NODE_FACTORIES[key] = factory
+
+
+def build_graph(order, rate, channels, block, **resources):
+    """
+    Construye un DspGraph con los nodos de `order` (claves registradas).
+
+    Args:
+        resources: objetos que algunas fábricas necesitan (p. ej. echo_canceller,
+            highpass_hz, hangover_ms, gain_factors)
+    """
+    unknown = [key for key in order if key not in NODE_FACTORIES]
+    if unknown:
+        raise ValueError(f"Nodos DSP desconocidos: {', '.join(unknown)}")
+    return DspGraph([NODE_FACTORIES[key](rate, channels, **resources) for key in order], rate, channels, block)
+
+
+def _echo_node(rate, channels, echo_canceller=None, **resources):
+    return StageNode(echo_canceller) if echo_canceller else None
+
+
+def _highpass_node(rate, channels, highpass_hz=100.0, **resources):
+    return StageNode(HighPassFilter(rate, channels, highpass_hz), "highpass")
+
+
+def _noise_node(rate, channels, **resources):
+    return StageNode(SpectralNoiseSuppressor(rate, channels), "noise_suppression")
+
+
+def _vad_node(rate, channels, hangover_ms=300, **resources):
+    return VadNode(VoiceActivityDetector(rate, hangover_ms=hangover_ms))
+
+
+def _gain_node(rate, channels, gain_factors=("amplification",), **resources):
+    return GainNode(gain_factors)
+
+
+register_node("eco", _echo_node)
+register_node("paso_alto", _highpass_node)
+register_node("ruido", _noise_node)
+register_node("vad", _vad_node)
+register_node("ganancia", _gain_node)
@@ -0,0 +1,378 @@
+"""
+feedback.py - Informes del receptor y adaptación del emisor al estado de la red
+
+Canal de retorno al estilo RTCP sobre el mismo socket UDP:
+
+- Receptor: ReceptionStats mide por stream la pérdida (huecos de seq), el
+  jitter entre llegadas (estimador de RFC 3550 sobre los timestamps) y
+  cuenta los bloques recuperados por redundancia. Cada medio segundo se
+  envía un PT_FEEDBACK a la dirección de origen del emisor con esas
+  medidas y el nivel de su buffer de reproducción.
+- Emisor: AdaptiveController recibe los informes y ajusta tres ejes con
+  un esquema de control de congestión (bajada multiplicativa, subida de un
+  escalón tras un periodo de prueba que se duplica si la subida fracasa):
+    1. Tasa de bits: escalera de (formato de muestra, rate) desde el formato
+       elegido hasta int16 a media frecuencia. Se baja con pérdida alta o
+       con pérdida acompañada de jitter creciente (congestión).
+    2. Redundancia (FEC): con pérdida sin señal de congestión (pérdida
+       aleatoria), cada paquete lleva además el bloque anterior (PT_AUDIO_RED).
+    3. Tamaño de trama: con jitter alto o buffer vacío se agrupan 2 o 4
+       bloques por paquete (menos paquetes y menos sensibles al jitter);
+       vuelve a 1 cuando la red se calma.
+- AdaptivePacketizer aplica el perfil vigente al empaquetar.
+
+Los paquetes con formato o rate rebajados llevan FLAG_ADAPTED: el receptor
+no reabre su salida, decodifica el formato recibido y resamplea al rate
+del stream. Solo lo hace si ya conoce el formato nominal de ese stream
+(un paquete sin FLAG_ADAPTED: audio o ruido de confort); hasta entonces los
+descarta, y el emisor vuelve al escalón alto cuando una sesión se
+(re)establece. Sin informes (receptor antiguo) el emisor no cambia nada.
+"""
+
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from protocol import (
+    PT_AUDIO, PT_AUDIO_RED, PT_FEEDBACK, FLAG_ADAPTED, RED_HEADER, FEEDBACK_PAYLOAD,
+    FMT_FLOAT32, FMT_INT24, FMT_INT16, SAMPLE_WIDTHS, HEADER_SIZE, MAX_DATAGRAM, build_control_packet,
+    build_packet
+)
+from dsp import encode_frames
+from secure import TAG_SIZE
+from resampler import StreamResampler
+
+# Umbrales del control (fracción de paquetes perdidos)
+LOSS_HIGH = 0.10        # congestión segura: bajar tasa de bits
+LOSS_LOW = 0.02         # por encima: FEC, o bajar si además crece el jitter
+LOSS_CLEAN = 0.005      # por debajo durante FEC_OFF_REPORTS informes: quitar FEC
+FEC_OFF_REPORTS = 10
+PROBE_MIN_S = 5.0       # espera mínima sin pérdidas antes de subir un escalón
+PROBE_MAX_S = 60.0
+DECREASE_HOLD_S = 1.0   # tras bajar, esperar a que el cambio se note antes de volver a bajar
+MAX_FRAMES_MULTIPLE = 4
+PAYLOAD_LIMIT = MAX_DATAGRAM - HEADER_SIZE - TAG_SIZE   # datagrama UDP menos cabecera y etiqueta AEAD
+MIN_REDUCED_RATE = 16000
+LOSS_SMOOTHING = 0.3    # peso de cada informe en la pérdida media (ventanas de 0.5 s son ruidosas)
+
+FeedbackReport = namedtuple(
+    "FeedbackReport", ["stream_id", "highest_seq", "loss", "jitter_ms", "buffer_ms", "recovered"]
+)
+Profile = namedtuple("Profile", ["sample_format", "rate", "frames_multiple", "fec"])
+
+
+def build_report(report_stream_id, seq, report):
+    """Datagrama PT_FEEDBACK con un FeedbackReport (sin cifrar)."""
+    payload = FEEDBACK_PAYLOAD.pack(report.stream_id, report.highest_seq & 0xFFFFFFFF, report.loss,
+                                    report.jitter_ms, report.buffer_ms, report.recovered)
+    return build_control_packet(payload, seq, report_stream_id, PT_FEEDBACK)
+
+
+def parse_report(payload):
+    """FeedbackReport de un payload PT_FEEDBACK, o None si está mal formado."""
+    if len(payload) < FEEDBACK_PAYLOAD.size:
+        return None
+    return FeedbackReport(*FEEDBACK_PAYLOAD.unpack_from(payload))
+
+
+class ReceptionStats:
+    """Pérdida y jitter de un stream, con contadores por intervalo de informe."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, stream_id=None):
+        self.stream_id = stream_id
+        self.highest = None
+        self.jitter = 0.0          # segundos
+        self.recovered = 0
+        self._transit = None
+        self._expected = 0
+        self._received = 0
+
+    def on_packet(self, stream_id, seq, timestamp, rate, arrival):
+        """
+        Registra la llegada de un paquete.
+
+        Args:
+            rate: frecuencia en la que está expresado `timestamp` (la del stream)
+            arrival: instante de llegada (time.monotonic())
+        Retorna:
+            int: paquetes perdidos justo antes de este (0 si llega en orden).
+        """
+        if stream_id != self.stream_id:
+            self.reset(stream_id)
+
+        gap = 0
+        if self.highest is None:
+            self.highest = seq
+            self._expected += 1
+        else:
+            delta = (seq - self.highest) & 0xFFFFFFFF
+            if 0 < delta < 0x80000000:
+                gap = delta - 1
+                self.highest = seq
+                self._expected += delta
+            elif delta:
+                # Llega tarde: ya se contó como perdido en este intervalo
+                self._expected += 1
+        self._received += 1
+
+        # Jitter entre llegadas (RFC 3550, A.8) en segundos
+        transit = arrival - timestamp / rate
+        if self._transit is not None:
+            self.jitter += (abs(transit - self._transit) - self.jitter) / 16.0
+        self._transit = transit
+        return gap
+
+    def current(self, buffer_ms):
+        """FeedbackReport del intervalo en curso, sin reiniciar los contadores."""
+        loss = max(0.0, 1.0 - self._received / self._expected) if self._expected else 0.0
+        return FeedbackReport(self.stream_id or 0, self.highest or 0, loss,
+                              self.jitter * 1000.0, buffer_ms, self.recovered)
+
+    def report(self, buffer_ms):
+        """FeedbackReport del intervalo transcurrido; reinicia los contadores."""
+        report = self.current(buffer_ms)
+        self._expected = self._received = 0
+        return report
+
+
+class AdaptiveController:
+    """Elige el perfil de envío (tasa de bits, FEC, tamaño de trama) según los informes."""
+
+    def __init__(self, rate, sample_format, chunk, log=print):
+        """
+        Args:
+            rate, sample_format: formato elegido por el usuario (escalón más alto)
+            chunk: frames por bloque de captura
+        """
+        self.rate = rate
+        self.chunk = chunk
+        self.log = log
+
+        # Escalera de tasa de bits: formatos cada vez más estrechos y, al final, media frecuencia
+        widths = [fmt for fmt in (FMT_FLOAT32, FMT_INT24, FMT_INT16)
+                  if SAMPLE_WIDTHS[fmt] <= SAMPLE_WIDTHS[sample_format]]
+        self.ladder = [(sample_format, rate)] + [(fmt, rate) for fmt in widths if fmt != sample_format]
+        if rate // 2 >= MIN_REDUCED_RATE:
+            self.ladder.append((FMT_INT16, rate // 2))
+
+        self.restart()
+
+    def restart(self):
+        """Vuelve al perfil nominal (escalón alto, sin FEC, un bloque por paquete) y olvida la historia."""
+        self.level = 0
+        self.fec = False
+        self.frames_multiple = 1
+        self._probe_s = PROBE_MIN_S
+        self._last_change = float("-inf")
+        self._last_increase = None
+        self._clean_reports = 0
+        self._calm_reports = 0
+        self._jitter_floor = None
+        self.loss = 0.0
+
+    @property
+    def profile(self):
+        fmt, rate = self.ladder[self.level]
+        return Profile(fmt, rate, self.frames_multiple, self.fec)
+
+    def describe(self):
+        p = self.profile
+        return (f"{SAMPLE_WIDTHS[p.sample_format] * 8} bits {p.rate} Hz, "
+                f"{p.frames_multiple} bloque(s)/paquete, FEC {'sí' if p.fec else 'no'}")
+
+    def on_report(self, report, now=None):
+        """
+        Actualiza el perfil con un informe del receptor.
+
+        Retorna:
+            bool: True si el perfil ha cambiado.
+        """
+        now = time.monotonic() if now is None else now
+        before = self.profile
+        block_ms = 1000.0 * self.chunk / self.rate
+        packet_ms = block_ms * self.frames_multiple
+        self.loss += LOSS_SMOOTHING * (report.loss - self.loss)
+        loss = max(self.loss, report.loss if report.loss >= 2 * LOSS_HIGH else 0.0)
+
+        # Suelo de jitter: mínimo reciente, que se relaja despacio hacia arriba
+        if self._jitter_floor is None or report.jitter_ms < self._jitter_floor:
+            self._jitter_floor = report.jitter_ms
+        else:
+            self._jitter_floor += 0.02 * (report.jitter_ms - self._jitter_floor)
+        jitter_rising = report.jitter_ms > 2.0 * self._jitter_floor + 2.0
+
+        congested = loss >= LOSS_HIGH or (loss >= LOSS_LOW and jitter_rising)
+        if congested:
+            if self.level < len(self.ladder) - 1 and now - self._last_change >= DECREASE_HOLD_S:
+                self.level += 1
+                # Si la última subida fracasó enseguida, esperar el doble antes de volver a probar
+                if self._last_increase and now - self._last_increase < 2 * self._probe_s:
+                    self._probe_s = min(PROBE_MAX_S, self._probe_s * 2)
+                self._last_change = now
+            self._clean_reports = 0
+        elif loss >= LOSS_LOW:
+            # Pérdida sin congestión: redundancia en vez de menos tasa
+            self.fec = True
+            self._clean_reports = 0
+        else:
+            self._clean_reports = self._clean_reports + 1 if loss < LOSS_CLEAN else 0
+            if self.fec and self._clean_reports >= FEC_OFF_REPORTS:
+                self.fec = False
+            if self.level > 0 and now - self._last_change >= self._probe_s:
+                self.level -= 1
+                self._last_change = self._last_increase = now
+            elif self._last_increase and now - self._last_increase >= 4 * self._probe_s:
+                self._probe_s = PROBE_MIN_S
+
+        # Tamaño de trama: más frames por paquete con jitter alto o buffer casi vacío
+        starving = 0 < report.buffer_ms < 0.5 * block_ms
+        if (report.jitter_ms > 0.5 * packet_ms or starving) and self.frames_multiple < MAX_FRAMES_MULTIPLE:
+            self.frames_multiple *= 2
+            self._calm_reports = 0
+        elif report.jitter_ms < 0.15 * packet_ms and not starving:
+            self._calm_reports += 1
+            if self.frames_multiple > 1 and self._calm_reports >= FEC_OFF_REPORTS:
+                self.frames_multiple //= 2
+                self._calm_reports = 0
+        else:
+            self._calm_reports = 0
+
+        if self.profile != before:
+            self.log(f"Red: pérdida {loss * 100:.1f} %, jitter {report.jitter_ms:.1f} ms, "
+                     f"buffer {report.buffer_ms:.0f} ms -> {self.describe()}")
+            return True
+        return False
+
+
+class AdaptivePacketizer:
+    """Empaqueta los bloques capturados con el perfil vigente del controlador."""
+
+    def __init__(self, stream_id, channels, sample_format, rate, chunk, controller=None,
+                 resample_quality="media", max_payload=None, payload_limit=None):
+        """
+        Args:
+            stream_id, channels, sample_format, rate: formato nominal del stream
+            chunk: frames por bloque de captura
+            controller: AdaptiveController; None = formato fijo, un bloque por paquete
+            max_payload: bytes de payload máximos por datagrama (MTU de la ruta);
+                None = sin límite. Un bloque mayor se reparte en varios paquetes.
+            payload_limit: payload máximo que admite el transporte (datagrama UDP
+                o ranura de memoria compartida, menos cabecera y etiqueta AEAD);
+                None = PAYLOAD_LIMIT. Limita los bloques por paquete del perfil
+                y por encima de él siempre se reparte.
+        """
+        self.stream_id = stream_id
+        self.channels = channels
+        self.sample_format = sample_format
+        self.rate = rate
+        self.chunk = chunk
+        self.controller = controller
+        self.resample_quality = resample_quality
+        self.max_payload = max_payload
+        self.payload_limit = payload_limit or PAYLOAD_LIMIT
+        self.seq = 0
+        self._pending = []
+        self._pending_timestamp = None
+        self._reducer = None
+        self._previous = None   # (seq, formato, rate, payload) del último bloque de audio
+
+    @property
+    def profile(self):
+        if self.controller:
+            return self.controller.profile
+        return Profile(self.sample_format, self.rate, 1, False)
+
+    def build(self, payload, timestamp, ptype, sample_format=None, rate=None, flags=0):
+        """Construye un datagrama con el siguiente número de secuencia."""
+        packet = build_packet(payload, self.seq, timestamp, self.stream_id, self.channels,
+                              sample_format or self.sample_format, rate or self.rate,
+                              ptype=ptype, flags=flags)
+        self.seq += 1
+        if ptype not in (PT_AUDIO, PT_AUDIO_RED):
+            self._previous = None
+        return packet
+
+    def discard(self):
+        """Descarta lo acumulado sin enviarlo (envío en pausa); la redundancia no cruza el hueco."""
+        self._pending = []
+        self._pending_timestamp = None
+        self._previous = None
+
+    def add(self, frames, timestamp):
+        """
+        Añade un bloque de audio (ya con ganancia).
+
+        Retorna:
+            list: [(datagrama, timestamp), ...] listos para enviar.
+        """
+        if self._pending_timestamp is None:
+            self._pending_timestamp = timestamp
+        self._pending.append(frames)
+        if sum(len(f) for f in self._pending) < self.chunk * self.frames_multiple(self.profile):
+            return []
+        return self.flush()
+
+    def frames_multiple(self, profile):
+        """Bloques por paquete del perfil, rebajados para que el payload (con FEC, dos copias) quepa en `payload_limit`."""
+        block_bytes = self.chunk * self.channels * SAMPLE_WIDTHS.get(profile.sample_format, 4) * profile.rate / self.rate
+        limit = (self.payload_limit - RED_HEADER.size) // 2 if profile.fec else self.payload_limit
+        return max(1, min(profile.frames_multiple, int(limit // max(block_bytes, 1))))
+
+    def flush(self):
+        """Empaqueta lo acumulado (p. ej. al entrar en silencio)."""
+        if not self._pending:
+            return []
+        frames = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+        timestamp = self._pending_timestamp
+        self._pending = []
+        self._pending_timestamp = None
+
+        profile = self.profile
+        if profile.rate != self.rate:
+            if self._reducer is None or self._reducer.out_rate != profile.rate:
+                self._reducer = StreamResampler(self.rate, profile.rate, self.channels, self.resample_quality)
+            frames = self._reducer.process(frames)
+        else:
+            self._reducer = None
+        payload = encode_frames(frames, profile.sample_format)
+        flags = FLAG_ADAPTED if (profile.sample_format, profile.rate) != (self.sample_format, self.rate) else 0
+
+        # Bloques que no caben en la MTU o en el transporte: varios paquetes, cada uno con su timestamp
+        limit = min(self.max_payload or self.payload_limit, self.payload_limit)
+        frame_bytes = len(payload) // len(frames) if len(frames) else len(payload)
+        part_bytes = len(payload) or 1
+        if len(payload) > limit and frame_bytes:
+            part_bytes = max(1, limit // frame_bytes) * frame_bytes
+
+        outgoing = []
+        for start in range(0, max(len(payload), 1), part_bytes):
+            part = payload[start:start + part_bytes]
+            # Offset en frames del stream nominal (el perfil puede ir a otra frecuencia)
+            part_timestamp = timestamp + (start // frame_bytes * self.rate // profile.rate if frame_bytes else 0)
+
+            # FEC: repetir el bloque anterior si es contiguo, del mismo formato y cabe
+            ptype, body = PT_AUDIO, part
+            previous = self._previous
+            if (profile.fec and previous and previous[0] == self.seq - 1
+                    and previous[1:3] == (profile.sample_format, profile.rate)
+                    and RED_HEADER.size + len(part) + len(previous[3]) <= limit):
+                ptype = PT_AUDIO_RED
+                body = RED_HEADER.pack(len(part)) + part + previous[3]
+            self._previous = (self.seq, profile.sample_format, profile.rate, part)
+
+            packet = self.build(body, part_timestamp, ptype, profile.sample_format, profile.rate, flags)
+            outgoing.append((packet, part_timestamp))
+        return outgoing
+
+
+def split_red_payload(payload):
+    """Separa un payload PT_AUDIO_RED en (primario, redundante); redundante puede estar vacío."""
+    if len(payload) < RED_HEADER.size:
+        return payload[:0], payload[:0]
+    primary_len = RED_HEADER.unpack_from(payload)[0]
+    start = RED_HEADER.size
+    return payload[start:start + primary_len], payload[start + primary_len:]
@@ -0,0 +1,261 @@
+"""
+filters.py - Cadena de limpieza de la captura: paso alto y reducción de ruido
+
+Etapas (cada una activable por separado; dsp_graph.py las encadena y mide su coste):
+- HighPassFilter: biquad Butterworth con estado (como lfilter con zi) que
+  elimina el retumbe de climatización y golpes graves. Se evalúa por
+  sub-bloques en forma de espacio de estados: la respuesta de cada sub-bloque
+  es un producto de matrices y solo el estado (2 valores por canal) se
+  propaga secuencialmente, sin bucles Python por muestra ni por canal.
+- SpectralNoiseSuppressor: resta espectral con STFT y solapamiento-suma
+  (50 %, ventana raíz de Hann) sobre un perfil de ruido aprendido en los
+  tramos de menor energía.
+
+Todas las etapas reciben y devuelven bloques float32 (frames, canales) del
+mismo tamaño. process_into() escribe el resultado in situ sobre el bloque
+recibido usando buffers reservados con prepare(); es la vía del grafo DSP.
+"""
+
+import numpy as np
+
+
+class HighPassFilter:
+    """Paso alto Butterworth de 2º orden con estado entre bloques."""
+
+    name = "Paso alto"
+
+    def __init__(self, rate, channels=1, cutoff_hz=100.0, block=128):
+        self.rate = rate
+        self.channels = channels
+        self.cutoff_hz = cutoff_hz
+        self.block = block
+        self.enabled = True
+        self._design()
+        self.reset()
+
+    def _design(self):
+        """Coeficientes RBJ (Q = 1/√2) y matrices de espacio de estados por sub-bloque."""
+        w0 = 2 * np.pi * self.cutoff_hz / self.rate
+        alpha = np.sin(w0) / (2 * np.sqrt(0.5))
+        cos_w0 = np.cos(w0)
+        a0 = 1 + alpha
+        b0, b1, b2 = (1 + cos_w0) / 2 / a0, -(1 + cos_w0) / a0, (1 + cos_w0) / 2 / a0
+        a1, a2 = -2 * cos_w0 / a0, (1 - alpha) / a0
+
+        # Forma directa II transpuesta: s' = A s + B x, y = C s + D x
+        A = np.array([[-a1, 1.0], [-a2, 0.0]])
+        B = np.array([b1 - a1 * b0, b2 - a2 * b0])
+        C = np.array([1.0, 0.0])
+        L = self.block
+
+        powers = [np.eye(2)]
+        for _ in range(L):
+            powers.append(A @ powers[-1])
+
+        impulse = np.empty(L)
+        impulse[0] = b0
+        for n in range(1, L):
+            impulse[n] = C @ powers[n - 1] @ B
+        idx = np.arange(L)
+        lag = idx[:, None] - idx[None, :]
+        self._toeplitz = np.where(lag >= 0, impulse[np.clip(lag, 0, None)], 0.0)  # (L, L)
+        self._state_to_out = np.stack([C @ powers[i] for i in range(L)])          # (L, 2)
+        self._in_to_state = np.stack([powers[L - 1 - j] @ B for j in range(L)], 1)  # (2, L)
+        self._powers = powers                                                     # A^0 .. A^L
+
+    def reset(self):
+        self._state = np.zeros((2, self.channels))
+
+    def prepare(self, max_frames):
+        """Reserva los buffers de trabajo para bloques de hasta `max_frames` frames."""
+        L, c = self.block, self.channels
+        n_blocks = max(1, max_frames // L)
+        self.capacity = max_frames
+        self._x = np.empty((max_frames, c))
+        self._zero_state = np.empty((n_blocks, L, c))
+        self._from_state = np.empty((n_blocks, L, c))
+        self._drive = np.empty((n_blocks, 2, c))
+        self._states = np.empty((n_blocks, 2, c))
+        self._next = np.empty((2, c))
+
+    def process(self, frames):
+        out = np.array(frames, dtype=np.float32)
+        self.process_into(out)
+        return out
+
+    def process_into(self, frames):
+        """Filtra in situ un bloque float32 (frames, canales) usando solo los buffers reservados."""
+        L = self.block
+        n = len(frames)
+        if n > getattr(self, "capacity", 0):
+            self.prepare(n)
+        x = self._x[:n]
+        np.copyto(x, frames)
+        n_blocks = n // L
+        state = self._state
+
+        if n_blocks:
+            # (n_blocks, L, canales): respuestas a estado cero de todos los sub-bloques a la vez
+            blocks = x[:n_blocks * L].reshape(n_blocks, L, self.channels)
+            zero_state = np.matmul(self._toeplitz, blocks, out=self._zero_state[:n_blocks])
+            drive = np.matmul(self._in_to_state, blocks, out=self._drive[:n_blocks])
+
+            # Propagar solo el estado (2 x canales) de sub-bloque en sub-bloque
+            states = self._states[:n_blocks]
+            a_block = self._powers[L]
+            for b in range(n_blocks):
+                states[b] = state
+                np.matmul(a_block, states[b], out=state)
+                state += drive[b]
+            zero_state += np.matmul(self._state_to_out, states, out=self._from_state[:n_blocks])
+            np.copyto(frames[:n_blocks * L], zero_state.reshape(-1, self.channels), casting="same_kind")
+
+        # Cola que no completa un sub-bloque: mismas matrices, recortadas
+        t = n - n_blocks * L
+        if t:
+            tail = x[n_blocks * L:]
+            out = np.matmul(self._toeplitz[:t, :t], tail, out=self._zero_state[0, :t])
+            out += np.matmul(self._state_to_out[:t], state, out=self._from_state[0, :t])
+            np.matmul(self._powers[t], state, out=self._next)
+            self._next += np.matmul(self._in_to_state[:, L - t:], tail, out=self._drive[0])
+            state[:] = self._next
+            np.copyto(frames[n_blocks * L:], out, casting="same_kind")
+        return frames
+
+
+class SpectralNoiseSuppressor:
+    """Reducción de ruido por resta espectral (STFT + solapamiento-suma)."""
+
+    name = "Reducción de ruido"
+
+    def __init__(self, rate, channels=1, fft_size=512, over_subtraction=2.0,
+                 gain_floor=0.1, learn_seconds=0.5, noise_adapt=0.05):
+        """
+        Args:
+            rate: frecuencia de muestreo (Hz)
+            channels: número de canales
+            fft_size: tamaño de trama (salto = fft_size / 2)
+            over_subtraction: factor de sobre-resta del ruido
+            gain_floor: ganancia mínima por banda (limita el "ruido musical")
+            learn_seconds: aprendizaje inicial del perfil de ruido
+            noise_adapt: velocidad de adaptación del perfil en tramos de ruido
+        """
+        self.rate = rate
+        self.channels = channels
+        self.fft_size = fft_size
+        self.hop = fft_size // 2
+        self.over_subtraction = over_subtraction
+        self.gain_floor = gain_floor
+        self.learn_frames = int(learn_seconds * rate / self.hop)
+        self.noise_adapt = noise_adapt
+        self.enabled = True
+
+        # Ventana raíz de Hann periódica: análisis x síntesis suma 1 con 50 % de solape
+        self._window = np.sqrt(np.hanning(fft_size + 1)[:-1]).astype(np.float32)[None, :, None]
+        self.reset()
+
+    def reset(self):
+        self.noise_psd = None
+        self._frames_seen = 0
+        self._min_energy = None
+        self.prepare(getattr(self, "capacity", self.fft_size))
+
+    def prepare(self, max_frames):
+        """Reserva las FIFO y buffers de trabajo para bloques de hasta `max_frames` frames (vacía el estado)."""
+        N, H, c = self.fft_size, self.hop, self.channels
+        n_frames = max_frames // H + 1
+        self.capacity = max_frames
+        # Entrada pendiente (siempre N - H <= pendiente < N) seguida del bloque nuevo
+        self._input = np.zeros((N + max_frames, c), dtype=np.float32)
+        self._input_len = N - H
+        self._windowed = np.empty((n_frames, N, c), dtype=np.float32)
+        self._ola = np.empty((n_frames + 1, H, c), dtype=np.float32)
+        self._overlap = np.zeros((H, c), dtype=np.float32)
+        # FIFO de salida precargada con un salto: latencia total = fft_size muestras
+        self._output = np.zeros((N + max_frames, c), dtype=np.float32)
+        self._output_len = H
+
+    def _update_noise(self, power):
+        """Aprende el perfil de ruido con las tramas de menor energía."""
+        energy = power.sum(axis=(1, 2))
+        if self.noise_psd is None:
+            self.noise_psd = power.mean(axis=0)
+            self._min_energy = float(energy.min())
+
+        learning = self._frames_seen < self.learn_frames
+        self._min_energy = min(self._min_energy * 1.002 ** len(energy), float(energy.min()))
+        quiet = energy <= self._min_energy * 2.0
+        if learning:
+            quiet[:] = True
+        if quiet.any():
+            rate = 0.5 if learning else self.noise_adapt
+            self.noise_psd += rate * (power[quiet].mean(axis=0) - self.noise_psd)
+        self._frames_seen += len(energy)
+
+    def process(self, frames):
+        out = np.array(frames, dtype=np.float32)
+        self.process_into(out)
+        return out
+
+    def process_into(self, frames):
+        """Limpia in situ un bloque float32 (frames, canales); solo las FFT reservan memoria."""
+        n = len(frames)
+        N, H = self.fft_size, self.hop
+        if n > self.capacity:
+            self._grow(n)
+        pending = self._input_len
+        buf = self._input[:pending + n]
+        buf[pending:] = frames
+        n_frames = (len(buf) - N) // H + 1
+
+        if n_frames > 0:
+            # Tramas solapadas como vista (sin copia): (n_frames, N, canales)
+            strides = (buf.strides[0] * H, buf.strides[0], buf.strides[1])
+            segments = np.lib.stride_tricks.as_strided(buf, (n_frames, N, self.channels), strides)
+            windowed = np.multiply(segments, self._window, out=self._windowed[:n_frames])
+            spectrum = np.fft.rfft(windowed, axis=1)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+
+            self._update_noise(power)
+            gain = 1.0 - self.over_subtraction * self.noise_psd[None] / np.maximum(power, 1e-12)
+            gain = np.sqrt(np.maximum(gain, self.gain_floor ** 2))
+            spectrum *= gain
+            cleaned = np.fft.irfft(spectrum, n=N, axis=1)
+            windowed[:] = cleaned
+            windowed *= self._window
+
+            # Solapamiento-suma: la 1ª mitad de cada trama se suma a la 2ª de la anterior
+            ola = self._ola[:n_frames + 1]
+            ola.fill(0.0)
+            ola[:-1] += windowed[:, :H]
+            ola[1:] += windowed[:, H:]
+            ola[0] += self._overlap
+            self._overlap[:] = ola[-1]
+            produced = n_frames * H
+            self._output[self._output_len:self._output_len + produced] = ola[:-1].reshape(-1, self.channels)
+            self._output_len += produced
+            # Conservar la entrada no consumida al principio del buffer
+            rest = len(buf) - produced
+            self._input[:rest] = buf[produced:]
+            self._input_len = rest
+        else:
+            self._input_len = len(buf)
+
+        ready = min(n, self._output_len)
+        frames[:ready] = self._output[:ready]
+        frames[ready:] = 0.0
+        self._output[:self._output_len - ready] = self._output[ready:self._output_len]
+        self._output_len -= ready
+        return frames
+
+    def _grow(self, max_frames):
+        """Amplía las reservas conservando la entrada y la salida pendientes."""
+        pending_in = self._input[:self._input_len].copy()
+        pending_out = self._output[:self._output_len].copy()
+        overlap = self._overlap.copy()
+        self.prepare(max_frames)
+        self._input[:len(pending_in)] = pending_in
+        self._input_len = len(pending_in)
+        self._output[:len(pending_out)] = pending_out
+        self._output_len = len(pending_out)
+        self._overlap[:] = overlap
@@ -0,0 +1,405 @@
+"""
+intercom.py - Sesión de intercomunicador bidireccional sobre un único socket
+
+Cada extremo captura y reproduce a la vez con un solo socket UDP (ligado al
+puerto local y enviando al del otro extremo) y un solo hilo de E/S: el ritmo
+lo marca la lectura del micrófono y, tras enviar cada bloque, se vacía el
+socket sin bloquear y se reproduce lo recibido. Frente a ejecutar emisor y
+receptor por separado se ahorran un proceso, un socket y los hilos de cada
+aplicación.
+
+Modos:
+- "full": full-duplex; el audio entrante se atenúa (ducking) mientras el
+  VAD detecta voz local y el eco se cancela con aec.EchoCanceller.
+- "half": half-duplex por voz; habla quien tiene el turno (floor). El turno
+  se toma al detectar voz si el otro extremo no está enviando audio y se
+  suelta al terminar el hangover del VAD. Si ambos lo toman a la vez, lo
+  conserva el stream_id mayor.
+- "ptt": pulsar para hablar (atributo `talking`), con el mismo arbitraje de
+  turno que "half".
+
+Solo se aceptan datagramas de la IP del otro extremo, con tasa limitada
+(source_filter.SourceFilter), antes de descifrar o decodificar nada.
+
+Los paquetes son los de protocol.py (PT_AUDIO / PT_CN), así que un extremo
+también puede hablar con un receptor o emisor clásico. Con `cipher`
+(secure.PacketCipher) se cifra lo enviado y se descarta lo no autenticado.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pyaudio
+
+from audio_engine import open_stream_with_fallback
+from protocol import (
+    PT_AUDIO, PT_CN, CN_PAYLOAD, FMT_INT16, FLAG_ENCRYPTED, MAX_DATAGRAM, SAMPLE_FORMAT_NAMES,
+    build_packet, new_stream_id, parse_packet
+)
+from dsp import decode_frames, encode_frames, apply_gain
+from resampler import StreamResampler
+from drift import DriftCompensator
+from vad import VoiceActivityDetector, ComfortNoise
+from aec import EchoCanceller
+from source_filter import DropLog, SourceFilter
+from net_tuning import tune_socket, describe, DSCP_EF
+from net_addr import bind_receiver, resolve, for_socket, host_of, format_addr
+from secure import replay_state_path
+
+MODES = ("full", "half", "ptt")
+
+FLOOR_FREE = "libre"
+FLOOR_LOCAL = "local"
+FLOOR_REMOTE = "remoto"
+
+
+class IntercomEndpoint:
+    """Un extremo del intercomunicador: captura, envío, recepción y reproducción en un hilo."""
+
+    def __init__(self, peer_host, peer_port=5000, local_port=5000, mode="full",
+                 channels=1, rate=48000, sample_format=FMT_INT16, chunk=960,
+                 duck_db=-15.0, duck_release_ms=250, floor_hold_ms=400,
+                 hangover_ms=300, keepalive_ms=500, cn_timeout_ms=1500,
+                 echo_cancel=True, resample_quality="media", pyaudio_instance=None,
+                 cipher=None, log=print):
+        """
+        Args:
+            peer_host, peer_port: dirección del otro extremo (IPv4, IPv6 o nombre)
+            local_port: puerto UDP local (envío y recepción)
+            mode: "full", "half" o "ptt"
+            channels, rate, sample_format: formato de captura y envío
+            chunk: frames por bloque (marca el ritmo del bucle)
+            duck_db: atenuación del audio entrante con voz local (modo full)
+            duck_release_ms: tiempo de recuperación de la ganancia tras la voz
+            floor_hold_ms: tiempo sin audio remoto tras el que el turno queda libre
+            hangover_ms, keepalive_ms, cn_timeout_ms: como en VAD_CONFIG
+            echo_cancel: cancelar el eco de lo reproducido (modo full)
+            pyaudio_instance: instancia PyAudio compartida; None = propia
+            cipher: secure.PacketCipher para cifrar/autenticar; None = en claro
+            log: función para mensajes
+        """
+        if mode not in MODES:
+            raise ValueError(f"Modo desconocido: {mode}")
+        self.peer = (peer_host, peer_port)
+        self.local_port = local_port
+        self.mode = mode
+        self.channels = channels
+        self.rate = rate
+        self.sample_format = sample_format
+        self.chunk = chunk
+        self.duck_gain = 10 ** (duck_db / 20)
+        self.duck_release_s = duck_release_ms / 1000.0
+        self.floor_hold_s = floor_hold_ms / 1000.0
+        self.hangover_ms = hangover_ms
+        self.keepalive_s = keepalive_ms / 1000.0
+        self.cn_timeout_s = cn_timeout_ms / 1000.0
+        self.echo_cancel = echo_cancel
+        self.resample_quality = resample_quality
+        self.shared_p = pyaudio_instance
+        self.cipher = cipher
+        self.log = log
+
+        # Controles (se escriben desde la interfaz; asignaciones simples)
+        self.talking = False       # botón de pulsar para hablar
+        self.volume = 1.0
+        self.gain = 1.0
+
+        # Estado observable
+        self.running = False
+        self.floor = FLOOR_FREE
+        self.local_speech = False
+        self.remote_active = False
+        self.playback_gain = 1.0
+        self.stats = {"sent": 0, "received": 0, "dropped_frames": 0}
+
+        self._stop = threading.Event()
+        self._thread = None
+        self.stream_id = new_stream_id()
+        self.p = None
+        self.in_stream = self.out_stream = None
+        self.sock = None
+        self.peer_addr = None
+        self.source_filter = None
+        self.drop_log = DropLog(self.log)
+        self.negotiated = False   # ya llegó audio con cabecera: se descarta el PCM heredado
+
+    # ---------- ciclo de vida ----------
+
+    def start(self):
+        """Abre audio y socket y arranca el hilo de E/S."""
+        self.p = self.shared_p or pyaudio.PyAudio()
+        self.in_stream, in_rate = open_stream_with_fallback(
+            self.p, self.sample_format, self.channels, self.rate, self.chunk, input=True
+        )
+        self.in_resampler = None
+        if in_rate != self.rate:
+            self.in_resampler = StreamResampler(in_rate, self.rate, self.channels, self.resample_quality)
+            self.log(f"Micrófono a {in_rate} Hz, resampleando a {self.rate} Hz")
+
+        # Salida: hasta recibir el primer paquete, al mismo formato que la captura
+        self.out_stream = None
+        self.out_format = None
+        self.negotiated = False
+        self.open_output(self.channels, self.rate, self.sample_format)
+
+        # Un solo socket de doble pila para enviar y recibir: el otro extremo puede ser IPv4 o IPv6
+        _, peer_addr = resolve(*self.peer)
+        self.sock = bind_receiver(self.local_port)
+        self.peer_addr = for_socket(self.sock, peer_addr)
+        self.source_filter = SourceFilter({host_of(peer_addr)})
+        self.drop_log = DropLog(self.log)
+        if self.cipher:
+            self.cipher.persist_replay(replay_state_path(self.local_port))
+        self.sock.setblocking(False)
+        self.log(f"Socket: {describe(tune_socket(self.sock, rcvbuf=1 << 20, sndbuf=1 << 20, dscp=DSCP_EF))}")
+
+        self.vad = VoiceActivityDetector(self.rate, hangover_ms=self.hangover_ms)
+        self.echo_canceller = EchoCanceller(self.rate, self.channels) if self.echo_cancel else None
+
+        self._stop.clear()
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.log(f"Intercomunicador ({self.mode}) en :{self.local_port} -> {format_addr(peer_addr)}")
+
+    def stop(self):
+        """Detiene el hilo y libera audio y socket."""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self.running = False
+        for stream in (self.in_stream, self.out_stream):
+            if stream:
+                try:
+                    stream.stop_stream()
+                    stream.close()
+                except Exception as e:
+                    self.log(f"Error cerrando stream: {e}")
+        self.in_stream = self.out_stream = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        if self.cipher:
+            self.cipher.close_replay()
+        if self.p and self.p is not self.shared_p:
+            self.p.terminate()
+        self.p = None
+
+    def status(self):
+        """Resumen del estado para la interfaz."""
+        return {
+            "mode": self.mode,
+            "floor": self.floor,
+            "local_speech": self.local_speech,
+            "remote_active": self.remote_active,
+            "ducking_db": 20 * np.log10(max(self.playback_gain, 1e-6)),
+            "erle_db": self.echo_canceller.erle_db if self.echo_canceller else 0.0,
+            "filtered": self.source_filter.dropped if self.source_filter else 0,
+            "discarded": self.drop_log.total,
+            **self.stats,
+        }
+
+    # ---------- salida ----------
+
+    def open_output(self, channels, rate, sample_format):
+        """(Re)abre la salida al formato que envía el otro extremo."""
+        if self.out_stream:
+            try:
+                self.out_stream.stop_stream()
+                self.out_stream.close()
+            except Exception as e:
+                self.log(f"Error cerrando stream: {e}")
+        self.out_stream, out_rate = open_stream_with_fallback(
+            self.p, sample_format, channels, rate, self.chunk, output=True
+        )
+        self.out_format = (channels, rate, sample_format)
+        self.out_device_rate = out_rate
+        self.out_resampler = None
+        if out_rate != rate:
+            self.out_resampler = StreamResampler(rate, out_rate, channels, self.resample_quality)
+            self.log(f"Salida a {out_rate} Hz, resampleando desde {rate} Hz")
+        self.out_capacity = 0
+        self.playback_queue = []
+        self.drift = DriftCompensator(rate, channels)
+        self.comfort_noise = ComfortNoise(channels)
+        self.comfort_noise_until = 0.0
+
+    def _output_fill_frames(self):
+        available = self.out_stream.get_write_available()
+        self.out_capacity = max(self.out_capacity, available)
+        fill = self.out_capacity - available
+        return fill / self.out_resampler.ratio if self.out_resampler else fill
+
+    def _play(self, now):
+        channels, rate, sample_format = self.out_format
+        if not self.playback_queue and now < self.comfort_noise_until:
+            self.playback_queue.append(self.comfort_noise.generate(self.chunk))
+        if not self.playback_queue:
+            return
+        frames = np.concatenate(self.playback_queue) if len(self.playback_queue) > 1 else self.playback_queue[0]
+        self.playback_queue.clear()
+
+        drop = self.drift.update(len(frames) + self._output_fill_frames(), len(frames))
+        if drop:
+            frames = frames[min(drop, len(frames)):]
+            self.stats["dropped_frames"] += drop
+
+        apply_gain(frames, self.volume)
+        self._apply_ducking(frames, rate)
+        frames = self.drift.process(frames)
+        if self.out_resampler:
+            frames = self.out_resampler.process(frames)
+        self.out_stream.write(encode_frames(frames, sample_format))
+        if self.echo_canceller:
+            self.echo_canceller.push_reference(frames, self.out_device_rate)
+
+    def _apply_ducking(self, frames, rate):
+        """
+        Atenúa lo entrante con voz local (full) o lo silencia si el turno es
+        propio (half/ptt). La ganancia baja en un bloque y se recupera en
+        duck_release_ms, con rampa lineal dentro del bloque.
+        """
+        if self.mode == "full":
+            target = self.duck_gain if self.local_speech else 1.0
+        else:
+            target = 0.0 if self.floor == FLOOR_LOCAL else 1.0
+
+        start = self.playback_gain
+        if target < start:
+            end = target
+        else:
+            end = min(target, start + len(frames) / rate / self.duck_release_s)
+        if start == end == 1.0:
+            return
+        ramp = np.linspace(start, end, len(frames), dtype=np.float32)
+        frames *= ramp[:, None]
+        self.playback_gain = end
+
+    # ---------- recepción ----------
+
+    def _receive(self, now):
+        """Vacía el socket sin bloquear y encola el audio del otro extremo."""
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                break
+            # Un datagrama que no se puede procesar se descarta sin cortar la llamada
+            try:
+                self._handle_packet(data, addr, now)
+            except Exception as e:
+                self.drop_log.add(e)
+
+    def _handle_packet(self, data, addr, now):
+        """Filtra, descifra y encola un datagrama del otro extremo."""
+        if not self.source_filter.allow(addr, data):
+            return
+        if self.cipher:
+            data = self.cipher.open(data)
+            if data is None:
+                return
+        header, payload = parse_packet(data, self.rate)
+        if header.flags & FLAG_ENCRYPTED and not self.cipher:
+            return
+        # PCM heredado sin cabecera: solo mientras no haya un stream negociado
+        if header.stream_id is None:
+            if self.negotiated:
+                return
+        else:
+            self.negotiated = True
+        if header.stream_id == self.stream_id:
+            return  # propio (p. ej. prueba en bucle local)
+        if header.ptype not in (PT_AUDIO, PT_CN):
+            return
+
+        if (header.channels, header.rate, header.sample_format) != self.out_format:
+            self.log(
+                f"Formato remoto: {header.channels} canal(es), {header.rate} Hz, "
+                f"{SAMPLE_FORMAT_NAMES.get(header.sample_format, header.sample_format)}"
+            )
+            self.open_output(header.channels, header.rate, header.sample_format)
+
+        self.stats["received"] += 1
+        if header.ptype == PT_CN:
+            if len(payload) >= CN_PAYLOAD.size:
+                self.comfort_noise.level = CN_PAYLOAD.unpack_from(payload)[0]
+            self.comfort_noise_until = now + self.cn_timeout_s
+            return
+
+        self.comfort_noise_until = 0.0
+        self.remote_stream_id = header.stream_id
+        self.remote_last_audio = now
+        self.playback_queue.append(decode_frames(payload, header.sample_format, header.channels))
+
+    # ---------- turno (half-duplex / ptt) ----------
+
+    def _arbitrate(self, want_to_talk, now):
+        """Decide si este extremo puede enviar audio en este bloque."""
+        self.remote_active = now - self.remote_last_audio < self.floor_hold_s
+        if self.mode == "full":
+            self.floor = FLOOR_LOCAL if want_to_talk else (FLOOR_REMOTE if self.remote_active else FLOOR_FREE)
+            return True
+
+        if not want_to_talk:
+            self.floor = FLOOR_REMOTE if self.remote_active else FLOOR_FREE
+        elif self.floor == FLOOR_LOCAL:
+            # Colisión: ambos tomaron el turno a la vez; lo conserva el stream_id mayor
+            if self.remote_active and self.remote_stream_id > self.stream_id:
+                self.floor = FLOOR_REMOTE
+        elif not self.remote_active:
+            self.floor = FLOOR_LOCAL
+        return self.floor == FLOOR_LOCAL
+
+    # ---------- bucle ----------
+
+    def _run(self):
+        seq = 0
+        timestamp = 0
+        last_keepalive = 0.0
+        self.remote_last_audio = -1e9
+        self.remote_stream_id = 0
+        try:
+            while not self._stop.is_set():
+                data = self.in_stream.read(self.chunk, exception_on_overflow=False)
+                frames = decode_frames(data, self.sample_format, self.channels)
+                if self.in_resampler:
+                    frames = self.in_resampler.process(frames)
+                if self.echo_canceller and self.mode == "full":
+                    frames = self.echo_canceller.process(frames)
+
+                now = time.monotonic()
+                self.local_speech = self.vad.process(frames)
+                want_to_talk = self.talking if self.mode == "ptt" else self.local_speech
+                may_send = self._arbitrate(want_to_talk, now)
+
+                packet = None
+                if may_send and want_to_talk:
+                    apply_gain(frames, self.gain)
+                    packet = build_packet(encode_frames(frames, self.sample_format), seq, timestamp,
+                                          self.stream_id, self.channels, self.sample_format, self.rate,
+                                          ptype=PT_AUDIO)
+                    last_keepalive = 0.0
+                elif now - last_keepalive >= self.keepalive_s:
+                    packet = build_packet(CN_PAYLOAD.pack(self.vad.noise_rms * self.gain), seq, timestamp,
+                                          self.stream_id, self.channels, self.sample_format, self.rate,
+                                          ptype=PT_CN)
+                    last_keepalive = now
+                timestamp += len(frames)
+                if packet and self.cipher:
+                    packet = self.cipher.seal(packet)
+                if packet:
+                    try:
+                        self.sock.sendto(packet, self.peer_addr)
+                        seq += 1
+                        self.stats["sent"] += 1
+                    except BlockingIOError:
+                        pass  # buffer de envío lleno: se pierde este bloque
+
+                self._receive(now)
+                self._play(now)
+        except Exception as e:
+            if not self._stop.is_set():
+                self.log(f"Error en el intercomunicador: {e}")
+        finally:
+            self.running = False
@@ -0,0 +1,73 @@
+"""
+interface_duplex.py - Intercomunicador full-duplex (emisor + receptor en un proceso)
+
+Abre la ventana del receptor y la del emisor en el mismo proceso, con una
+única instancia de PyAudio compartida, y conecta ambos a un cancelador de
+eco: lo que el receptor reproduce se usa como referencia para restar su eco
+de la captura del micrófono antes de transmitirla.
+
+Requiere:
+- interface_emisor.py / interface_receptor.py: aplicaciones base
+- aec.py: cancelador de eco NLMS particionado en frecuencia
+"""
+
+import tkinter as tk
+import pyaudio
+import sys
+
+from common import AUDIO_CONFIG
+from aec import EchoCanceller
+from interface_emisor import AudioTransmitterApp
+from interface_receptor import AudioReceiverApp
+
+
+class DuplexApp:
+    def __init__(self, root):
+        self.root = root
+
+        # Recursos compartidos por ambos sentidos
+        self.p = pyaudio.PyAudio()
+
+        # Receptor en la ventana principal; su salida alimenta la referencia del AEC
+        self.receiver = AudioReceiverApp(root, pyaudio_instance=self.p, echo_reference=self.push_reference)
+
+        # Emisor en una segunda ventana, con el cancelador aplicado a la captura
+        self.transmitter_window = tk.Toplevel(root)
+        self.transmitter = AudioTransmitterApp(
+            self.transmitter_window,
+            pyaudio_instance=self.p,
+            echo_canceller=EchoCanceller(AUDIO_CONFIG["RATE"], AUDIO_CONFIG["CHANNELS"])
+        )
+
+        # Cerrar cualquiera de las dos ventanas detiene ambos sentidos
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.transmitter_window.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def push_reference(self, frames, rate):
+        """Entrega lo reproducido al cancelador vigente del emisor (hilo del receptor)."""
+        canceller = self.transmitter.pipeline.echo_canceller
+        if canceller and self.transmitter.pipeline.running:
+            canceller.push_reference(frames, rate)
+
+    def on_close(self):
+        """Detiene emisión y recepción y libera la instancia de PyAudio compartida."""
+        self.transmitter.stop_transmission()
+        self.receiver.stop_reception()
+        # Cada hilo libera su stream al salir; se espera antes de cerrar los motores
+        self.transmitter.pipeline.join(timeout=1.0)
+        self.receiver.pipeline.join(timeout=1.0)
+        # Los streams en reserva de cada sentido se cierran antes de terminar la instancia común
+        self.transmitter.engine.close()
+        self.receiver.engine.close()
+        try:
+            self.p.terminate()
+        except Exception as e:
+            print(f"Error terminando PyAudio: {e}")
+        self.root.after(100, self.root.destroy)
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = DuplexApp(root)
+    root.mainloop()
@@ -4,16 +4,15 @@ interface_emisor.py - Interfaz de transmisión de audio UDP con NetScanner mejor
 Requiere:
 - pyaudio: captura de audio del micrófono
 - common.py: estilos compartidos y utilidades UI
+- pipeline.py: captura, procesado y envío (compartido con daemon.py)
 - utils.py: mapeo de IPs (opcional)
+- audio_engine.py / session.py: audio reutilizable entre sesiones y sesión con el receptor
 """
 
-import pyaudio
 import socket
-import time
 import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-import numpy as np
 import sys
 import subprocess
 import ipaddress
@@ -22,9 +21,18 @@ from concurrent.futures import ThreadPoolExecutor
 import os
 
 from common import (
-    AUDIO_CONFIG, COLORS, setup_style, create_plot, 
-    center_window, configure_window
+    AUDIO_PRESETS, CAPTURE_DSP_CONFIG, VAD_CONFIG, SECURITY_CONFIG, STARTUP_CONFIG, DEVICE_CONFIG, LATENCY_CONFIG, COLORS,
+    STATUS_LEVEL_COLORS, setup_style, create_plot, center_window, configure_window, AnalysisView, create_key_entry,
+    create_device_selector, bind_control
 )
+from analysis import AudioAnalyzer, SingleSlot
+from secure import cipher_from_passphrase
+from audio_engine import AudioEngine
+from devices import DEFAULT_DEVICE
+from state import StatusQueue, UiPump
+from pipeline import TransmitterPipeline, transmit_control, SCOPE_FRAMES
+from net_addr import ipv6_neighbors
+from net_interfaces import shared_inventory, network_of
 
 # Simulación de IP_enlazadas si no está disponible
 try:
@@ -43,12 +51,9 @@ class NetworkScanner:
         self.own_ips = self.get_own_ips()
         
     def get_own_ips(self):
-        """Obtiene todas las IPs propias del dispositivo."""
+        """Obtiene todas las IPs propias del dispositivo (inventario de interfaces, sin DNS)."""
         try:
-            hostname = socket.gethostname()
-            hostname_ex = socket.gethostbyname_ex(hostname)
-            # El tercer elemento contiene las IPs
-            own_ips = hostname_ex[2]
+            own_ips = sorted(shared_inventory().own_ips())
             print(f"IPs propias del dispositivo: {own_ips}")
             return own_ips
         except Exception as e:
@@ -83,8 +88,9 @@ class NetworkScanner:
         
         # Método 2: Intentar conexión por socket en puertos comunes
         try:
+            family = socket.AF_INET6 if ":" in str(ip) else socket.AF_INET
             for port in [80, 443, 22, 21, 135, 139, 445]:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock = socket.socket(family, socket.SOCK_STREAM)
                 sock.settimeout(1)
                 result = sock.connect_ex((str(ip), port))
                 sock.close()
@@ -101,21 +107,23 @@ class NetworkScanner:
             print(f"IPs propias para generar subredes: {self.own_ips}")
             
             subnets = []
-            for ip in self.own_ips:
+            # IPv6: un /64 no se barre, se usa neighbor discovery (scan_network)
+            for interface, address in shared_inventory().addresses(family=socket.AF_INET):
                 try:
-                    # Crear objeto IP y obtener la subred /24
-                    ip_obj = ipaddress.IPv4Address(ip)
-                    # Usar notación wildcard como solicitaste
-                    base_parts = ip.split('.')
-                    wildcard_subnet = f"{base_parts[0]}.{base_parts[1]}.{base_parts[2]}.*"
-                    subnet_cidr = f"{base_parts[0]}.{base_parts[1]}.{base_parts[2]}.0/24"
+                    network = network_of(address).network
+                    if network.prefixlen <= 24:
+                        # Redes grandes: solo el /24 de la propia IP, en notación wildcard
+                        base_parts = address.address.split('.')
+                        subnet = f"{base_parts[0]}.{base_parts[1]}.{base_parts[2]}.*"
+                    else:
+                        subnet = str(network)
                     
-                    if wildcard_subnet not in subnets:
-                        subnets.append(wildcard_subnet)
-                        print(f"Subred encontrada: {wildcard_subnet} (desde IP: {ip})")
+                    if subnet not in subnets:
+                        subnets.append(subnet)
+                        print(f"Subred encontrada: {subnet} (desde {interface.name}: {address.address}/{address.prefix})")
                         
                 except Exception as e:
-                    print(f"Error procesando IP {ip}: {e}")
+                    print(f"Error procesando IP {address.address}: {e}")
                     continue
             
             # Si no encontramos subredes, usar algunas comunes
@@ -146,19 +154,11 @@ class NetworkScanner:
         """Escanea una subred de forma optimizada usando notación wildcard."""
         try:
             # Convertir wildcard a CIDR para el escaneo
-            cidr_subnet = self.wildcard_to_cidr(wildcard_subnet)
+            cidr_subnet = self.wildcard_to_cidr(wildcard_subnet) if '*' in wildcard_subnet else wildcard_subnet
             network = ipaddress.IPv4Network(cidr_subnet, strict=False)
             
-            # Escanear solo un rango más pequeño para mayor velocidad
-            base_ip = str(network.network_address).split('.')
-            ips_to_scan = []
-            
-            # Escanear del 1 al 254 (excluyendo .0 y .255)
-            for i in range(1, 255):
-                ip = f"{base_ip[0]}.{base_ip[1]}.{base_ip[2]}.{i}"
-                # Excluir IPs propias del dispositivo
-                if ip not in self.own_ips:
-                    ips_to_scan.append(ip)
+            # Direcciones de host (sin red ni difusión), excluyendo las IPs propias
+            ips_to_scan = [str(ip) for ip in network.hosts() if str(ip) not in self.own_ips]
             
             print(f"Escaneando {len(ips_to_scan)} IPs en {wildcard_subnet}...")
             
@@ -175,7 +175,7 @@ class NetworkScanner:
             return []
 
     def scan_network(self):
-        """Escanea todas las subredes locales."""
+        """Escanea las subredes IPv4 locales y busca los vecinos IPv6 del enlace."""
         self.scanning = True
         self.active_ips = []
         
@@ -190,11 +190,16 @@ class NetworkScanner:
                 active_ips = self.scan_subnet_optimized(subnet)
                 all_active_ips.extend(active_ips)
             
+            # IPv6: los vecinos que responden a ff02::1, sin barrer la subred
+            ipv6_active = ipv6_neighbors()
+            print(f"Vecinos IPv6 encontrados: {len(ipv6_active)}")
+            all_active_ips.extend(ipv6_active)
+
             # Filtrar IPs no deseadas
             filtered_ips = []
             for ip in all_active_ips:
-                if (ip not in ["127.0.0.1", "localhost"] and 
-                    ip not in self.own_ips):
+                if (ip not in ["127.0.0.1", "::1", "localhost"] and
+                    ip.partition("%")[0] not in self.own_ips):
                     filtered_ips.append(ip)
             
             self.active_ips = list(set(filtered_ips))  # Remover duplicados
@@ -209,41 +214,91 @@ class NetworkScanner:
 
 
 class AudioTransmitterApp:
-    def __init__(self, root):
+    def __init__(self, root, pyaudio_instance=None, echo_canceller=None):
+        """
+        Args:
+            root: ventana tk.Tk o tk.Toplevel
+            pyaudio_instance: instancia PyAudio compartida (modo full-duplex); None = propia
+            echo_canceller: aec.EchoCanceller aplicado a la captura (modo full-duplex)
+        """
         self.root = root
         
         # Configurar ventana base
         configure_window(self.root, "Transmisor de Audio UDP", icon_name="emisor.ico")
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        # Configuración de audio
-        self.CHUNK = AUDIO_CONFIG["CHUNK"]
-        self.FORMAT = AUDIO_CONFIG["FORMAT"]
-        self.CHANNELS = AUDIO_CONFIG["CHANNELS"]
-        self.RATE = AUDIO_CONFIG["RATE"]
-
         # Variables de control
         self.HOST_RECEPTOR = tk.StringVar()
         self.AMPLIFICATION_FACTOR = tk.DoubleVar(value=1.0)
+        self.AUDIO_FORMAT = tk.StringVar(value=next(iter(AUDIO_PRESETS)))
+        self.VAD_ENABLED = tk.BooleanVar(value=VAD_CONFIG["ENABLED"])
+        self.HIGHPASS_ENABLED = tk.BooleanVar(value=CAPTURE_DSP_CONFIG["HIGHPASS"])
+        self.NOISE_SUPPRESSION_ENABLED = tk.BooleanVar(value=CAPTURE_DSP_CONFIG["NOISE_SUPPRESSION"])
+        self.SHARED_KEY = tk.StringVar(value=SECURITY_CONFIG["PASSPHRASE"])
+        self.INPUT_DEVICE = tk.StringVar(value=DEVICE_CONFIG["INPUT"] or DEFAULT_DEVICE)
+        self.LOW_LATENCY = tk.BooleanVar(value=LATENCY_CONFIG["LOW_LATENCY"])
         self.transmitting = False
-        self.transmit_event = threading.Event()
-        
-        # Recursos de audio/red
-        self.p = None
-        self.stream = None
-        self.s = None
-        self.PORT = 5000
+
+        # Mensajes de los hilos hacia la interfaz (nunca tocan Tk directamente)
+        self.ui = StatusQueue()
+
+        # Último tramo de señal para el gráfico y análisis espectral (hilo propio)
+        self.scope = SingleSlot()
+        self.scope_version = 0
+        self.analyzer = AudioAnalyzer()
+
+        # Captura y envío: el mismo código que usa el demonio sin interfaz (pipeline.py);
+        # PyAudio y el stream se conservan entre sesiones
+        self.engine = AudioEngine(pyaudio_instance, log=self.log_message)
+        self.pipeline = TransmitterPipeline(
+            self.engine, control=transmit_control(), log=self.log_message,
+            status=lambda message, level: self.ui.status(message, STATUS_LEVEL_COLORS[level]),
+            scope=self.scope, analyzer=self.analyzer, echo_canceller=echo_canceller,
+            on_stopped=lambda: self.ui.call(self.finalize_stop)
+        )
+        self.control = self.pipeline.control
 
         # NetScanner
         self.scanner = NetworkScanner()
         self.scanning = False
 
-        # Buffer para gráfico
-        self.audio_buffer = np.zeros(self.CHUNK)
-
         # Setup UI con estilos compartidos
         setup_style()
         self.setup_ui()
+        bind_control(self.AMPLIFICATION_FACTOR, self.control, "amplification")
+        bind_control(self.VAD_ENABLED, self.control, "vad")
+        bind_control(self.HIGHPASS_ENABLED, self.control, "highpass")
+        bind_control(self.NOISE_SUPPRESSION_ENABLED, self.control, "noise_suppression")
+
+        # Un único temporizador aplica los mensajes de los hilos y refresca los gráficos
+        self.pump = UiPump(self.root, self.ui, self.update_status, log=self.log_message)
+        self.pump.add_tick(self.update_plot)
+        self.pump.start()
+
+        # Inicializar PortAudio (y abrir el micrófono) en segundo plano: la primera transmisión arranca sin esperar
+        threading.Thread(target=self.prepare_audio, daemon=True).start()
+
+    def prepare_audio(self):
+        """
+        Inicializa PortAudio, escanea los micrófonos y, si está configurado,
+        deja el elegido abierto en reserva.
+        """
+        self.engine.warm_up()
+        try:
+            names = self.pipeline.inventory.names(input=True)
+        except Exception as e:
+            self.log_message(f"No se pudieron listar los micrófonos: {e}")
+            return
+        self.ui.call(self.update_device_list, names)
+        if STARTUP_CONFIG["PREOPEN_INPUT"]:
+            self.pipeline.prepare(DEVICE_CONFIG["INPUT"], LATENCY_CONFIG["LOW_LATENCY"])
+
+    def update_device_list(self, names):
+        """Rellena el desplegable de micrófonos con el resultado del escaneo."""
+        self.device_combo.config(values=names)
+        if self.INPUT_DEVICE.get() not in names:
+            self.log_message(f"Micrófono '{self.INPUT_DEVICE.get()}' no encontrado, se usa el predeterminado")
+            self.INPUT_DEVICE.set(DEFAULT_DEVICE)
 
     def get_available_ips(self):
         """Obtiene lista de IPs disponibles desde utils o defaults."""
@@ -256,13 +311,11 @@ class AudioTransmitterApp:
 
     def get_local_ips(self):
         """
-        Obtiene las direcciones IP locales del dispositivo.
+        Obtiene las direcciones IP locales del dispositivo (inventario de interfaces, sin DNS).
         Retorna una lista con las IPs disponibles.
         """
         try:
-            hostname = socket.gethostname()
-            hostname_ex = socket.gethostbyname_ex(hostname)
-            ips = hostname_ex[2]
+            ips = [f"{address.address} ({interface.name})" for interface, address in shared_inventory().addresses()]
             return ips if ips else ["No disponible"]
         except Exception as e:
             return [f"Error: {str(e)}"]
@@ -346,6 +399,57 @@ class AudioTransmitterApp:
         )
         self.amplification_slider.pack(fill="x", padx=10, pady=(0, 10))
         
+        # Formato de audio (canales, frecuencia y formato de muestra)
+        ttk.Label(config_frame, text="Formato de audio", style="TLabel").pack(anchor="w", padx=10, pady=(0, 2))
+        
+        self.format_combo = ttk.Combobox(
+            config_frame,
+            textvariable=self.AUDIO_FORMAT,
+            values=list(AUDIO_PRESETS),
+            state="readonly",
+            style="Dark.TCombobox"
+        )
+        self.format_combo.pack(fill="x", padx=10, pady=(0, 10))
+
+        # Micrófono (la lista llega al terminar el escaneo en segundo plano)
+        device_frame = ttk.Frame(config_frame, style="TFrame")
+        device_frame.pack(fill="x", padx=5)
+        self.device_combo = create_device_selector(device_frame, self.INPUT_DEVICE, "Micrófono")
+        self.latency_check = ttk.Checkbutton(
+            device_frame,
+            text="Baja latencia (búfer corto)",
+            variable=self.LOW_LATENCY,
+            style="Dark.TCheckbutton"
+        )
+        self.latency_check.pack(anchor="w", padx=5, pady=(0, 5))
+        
+        # Procesado de captura: supresión de silencios, paso alto y reducción de ruido
+        ttk.Label(config_frame, text="Procesado", style="TLabel").pack(anchor="w", padx=10, pady=(0, 2))
+        
+        dsp_frame = ttk.Frame(config_frame, style="TFrame")
+        dsp_frame.pack(fill="x", padx=10)
+        
+        for text, variable in (
+            ("VAD", self.VAD_ENABLED),
+            ("Paso alto", self.HIGHPASS_ENABLED),
+            ("Anti-ruido", self.NOISE_SUPPRESSION_ENABLED),
+        ):
+            ttk.Checkbutton(
+                dsp_frame,
+                text=text,
+                variable=variable,
+                style="Dark.TCheckbutton"
+            ).pack(side="left", padx=(0, 8))
+        
+        self.dsp_cost_label = ttk.Label(
+            config_frame,
+            text="",
+            foreground=COLORS["fg_gray"],
+            style="TLabel",
+            font=("Segoe UI", 8)
+        )
+        self.dsp_cost_label.pack(anchor="w", padx=10, pady=(0, 10))
+        
         # --- IPs LOCALES (Derecha) ---
         ips_frame = ttk.LabelFrame(row1_frame, text="IPs Locales y de Red", style="Custom.TLabelframe")
         ips_frame.pack(side="right", fill="both", expand=True, padx=(5, 0))
@@ -377,6 +481,9 @@ class AudioTransmitterApp:
         self.ip_text.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Clave compartida: cifra y autentica los paquetes (vacía = sin cifrado)
+        self.key_entry = create_key_entry(ips_frame, self.SHARED_KEY)
+        
         # ========== FILA 2: CONTROLES Y ESTADO ==========
         row2_frame = ttk.Frame(main_frame, style="TFrame")
         row2_frame.pack(fill="x", pady=(0, 10))
@@ -455,8 +562,9 @@ class AudioTransmitterApp:
         graph_frame = ttk.LabelFrame(main_frame, text="Señal de Audio", style="Custom.TLabelframe")
         graph_frame.pack(fill="both", expand=True)
         
-        self.figure, self.ax, self.canvas, self.line, self.audio_buffer = create_plot(graph_frame, self.CHUNK)
+        self.figure, self.ax, self.canvas, self.line, _ = create_plot(graph_frame, SCOPE_FRAMES)
         self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+        self.analysis_view = AnalysisView(graph_frame, self.canvas)
         
         # Inicializar etiqueta de amplificación
         self.update_amp_label(self.AMPLIFICATION_FACTOR.get())
@@ -512,16 +620,16 @@ class AudioTransmitterApp:
             
             # Obtener información de subredes primero
             subnets = self.scanner.get_local_subnets()
-            self.root.after(0, self.update_status, f"Escaneando {len(subnets)} subredes...", COLORS["status_yellow"])
+            self.ui.status(f"Escaneando {len(subnets)} subredes...", COLORS["status_yellow"])
             
             # Realizar escaneo
             active_ips = self.scanner.scan_network()
             
             # Actualizar UI en el hilo principal
-            self.root.after(0, self.on_scan_complete, active_ips, subnets)
+            self.ui.call(self.on_scan_complete, active_ips, subnets)
             
         except Exception as e:
-            self.root.after(0, self.on_scan_error, str(e))
+            self.ui.call(self.on_scan_error, str(e))
 
     def on_scan_complete(self, active_ips, subnets):
         """Se ejecuta cuando el escaneo se completa."""
@@ -571,16 +679,21 @@ class AudioTransmitterApp:
         print(message)
 
     def update_status(self, message, color="white"):
-        """Actualiza etiqueta de estado de forma segura desde threads."""
+        """Actualiza la etiqueta de estado (hilo de la interfaz; los hilos usan self.ui.status)."""
         self.status_label.config(text=message, foreground=color)
         self.update_status_background(color)
 
     def update_plot(self):
-        """Actualiza el gráfico con datos de audio."""
-        self.line.set_ydata(self.audio_buffer)
-        self.canvas.draw()
-        if self.transmitting:
-            self.root.after(50, self.update_plot)
+        """Refresca gráficos y medidores (temporizador de la interfaz); solo redibuja lo nuevo."""
+        if not self.transmitting:
+            return
+        if self.analysis_view.shows_signal() and self.scope.version != self.scope_version:
+            self.scope_version = self.scope.version
+            self.line.set_ydata(self.scope.peek())
+            self.canvas.draw()
+        self.analysis_view.refresh(self.analyzer.latest())
+        if self.pipeline.capture_graph:
+            self.dsp_cost_label.config(text=f"Coste por bloque: {self.pipeline.capture_graph.cost_summary()}")
 
     def update_amp_label(self, value):
         """Actualiza la etiqueta del valor de amplificación."""
@@ -603,136 +716,55 @@ class AudioTransmitterApp:
             messagebox.showwarning("Advertencia", "Ingresa una IP de receptor válida.")
             return
 
+        # Cifrado opcional de los paquetes con la clave compartida
+        try:
+            cipher = cipher_from_passphrase(self.SHARED_KEY.get())
+        except RuntimeError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
         self.transmitting = True
-        self.transmit_event.clear()
+        self.analyzer.start()
+        self.format_combo.config(state=tk.DISABLED)
+        self.device_combo.config(state=tk.DISABLED)
+        self.latency_check.config(state=tk.DISABLED)
+        self.key_entry.config(state=tk.DISABLED)
         self.start_button.config(state=tk.DISABLED, style="Disabled.TButton")
         self.stop_button.config(state=tk.NORMAL, style="Primary.TButton")
-        self.log_message(f"Preparando transmisión a {host}:{self.PORT}...")
-
-        threading.Thread(target=self.countdown_and_transmit, args=(host,), daemon=True).start()
 
-    def countdown_and_transmit(self, host):
-        """Cuenta regresiva antes de iniciar la transmisión."""
-        self.root.after(0, self.update_status, "Iniciando en 5 segundos...", COLORS["status_yellow"])
-
-        for i in range(5, 0, -1):
-            if self.transmit_event.is_set():
-                self.root.after(0, self.update_status, "Detenido", COLORS["status_red"])
-                return
-            self.root.after(0, self.update_status, f"Iniciando en {i} segundos...", COLORS["status_yellow"])
-            time.sleep(1)
-
-        if self.transmit_event.is_set():
-            self.root.after(0, self.update_status, "Detenido", COLORS["status_red"])
-            return
-
-        self.root.after(0, self.update_status, "¡Transmisión iniciada!", COLORS["status_green"])
-        self.run_transmission(host)
-
-    def run_transmission(self, host):
-        """Ejecuta el bucle principal de transmisión."""
-        try:
-            # Crear nuevos recursos para esta sesión
-            self.p = pyaudio.PyAudio()
-            self.stream = self.p.open(
-                format=self.FORMAT,
-                channels=self.CHANNELS,
-                rate=self.RATE,
-                input=True,
-                frames_per_buffer=self.CHUNK
-            )
-            self.s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-
-            self.update_plot()
-
-            while not self.transmit_event.is_set():
-                try:
-                    data = self.stream.read(self.CHUNK, exception_on_overflow=False)
-                    audio_data = np.frombuffer(data, dtype=np.int16)
-                    processed_audio = np.clip(
-                        audio_data * self.AMPLIFICATION_FACTOR.get(),
-                        -32768, 32767
-                    ).astype(np.int16)
-                    self.audio_buffer = audio_data.copy()
-
-                    # Verificar que el socket aún es válido antes de enviar
-                    if self.s and not self.transmit_event.is_set():
-                        self.s.sendto(processed_audio.tobytes(), (host, self.PORT))
-                    
-                except socket.error as e:
-                    if not self.transmit_event.is_set():
-                        self.log_message(f"Error de socket durante transmisión: {e}")
-                    break
-                except Exception as e:
-                    if not self.transmit_event.is_set():
-                        self.log_message(f"Error durante transmisión: {e}")
-                    break
-
-        except Exception as e:
-            if not self.transmit_event.is_set():
-                self.log_message(f"Error al iniciar transmisión: {e}")
-        finally:
-            # Solo llamar stop_transmission si no fue ya llamado
-            if not self.transmit_event.is_set():
-                self.root.after(0, self.cleanup_resources)
-
-    def cleanup_resources(self):
-        """Limpia los recursos de audio y red de forma segura."""
-        # Cerrar stream de audio
-        if self.stream:
-            try:
-                if self.stream.is_active():
-                    self.stream.stop_stream()
-                self.stream.close()
-                self.stream = None
-            except Exception as e:
-                self.log_message(f"Error cerrando stream: {e}")
-
-        # Terminar PyAudio
-        if self.p:
-            try:
-                self.p.terminate()
-                self.p = None
-            except Exception as e:
-                self.log_message(f"Error terminando PyAudio: {e}")
-
-        # Cerrar socket
-        if self.s:
-            try:
-                self.s.close()
-                self.s = None
-            except Exception as e:
-                self.log_message(f"Error cerrando socket: {e}")
-
-        # Actualizar estado en la interfaz
-        self.root.after(0, self.finalize_stop)
+        self.pipeline.start(host, preset=self.AUDIO_FORMAT.get(), cipher=cipher,
+                            device_name=self.INPUT_DEVICE.get(), low_latency=self.LOW_LATENCY.get())
 
     def finalize_stop(self):
-        """Finaliza el estado de detención en la interfaz."""
+        """Finaliza el estado de detención en la interfaz (el hilo ya liberó micrófono y socket)."""
         self.transmitting = False
+        self.analyzer.stop()
+        self.format_combo.config(state="readonly")
+        self.device_combo.config(state="readonly")
+        self.latency_check.config(state=tk.NORMAL)
+        self.key_entry.config(state=tk.NORMAL)
         self.start_button.config(state=tk.NORMAL, style="Primary.TButton")
         self.stop_button.config(state=tk.DISABLED, style="Disabled.TButton")
-        self.update_status("Detenido", COLORS["status_red"])
-        self.log_message("Transmisión detenida.")
 
     def stop_transmission(self):
         """Detiene la transmisión de forma segura."""
         if not self.transmitting:
             return
-
-        self.transmit_event.set()
         self.log_message("Solicitando detención de transmisión...")
-
-        # Iniciar limpieza en un hilo separado para no bloquear la UI
-        threading.Thread(target=self.cleanup_resources, daemon=True).start()
+        # Sin bloquear la UI: el hilo de transmisión libera los recursos y avisa con finalize_stop
+        self.pipeline.stop()
 
     def on_close(self):
         """Maneja el cierre de la ventana."""
         self.stop_transmission()
+        self.pipeline.join(timeout=1.0)
+        self.pump.stop()
+        self.engine.close()
         self.root.after(100, self.root.destroy)
         sys.exit(0)
 
 
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = AudioTransmitterApp(root)
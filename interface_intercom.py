@@ -0,0 +1,226 @@
+"""
+interface_intercom.py - Interfaz del intercomunicador bidireccional
+
+Un único extremo (intercom.IntercomEndpoint) por ventana: captura y
+reproduce con un solo socket y un solo hilo de E/S. Modos full-duplex con
+ducking, half-duplex por voz y pulsar para hablar (botón o barra
+espaciadora mantenidos).
+
+Requiere:
+- intercom.py: sesión bidireccional
+- common.py: estilos compartidos y utilidades UI
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox
+import sys
+
+from common import (
+    AUDIO_CONFIG, INTERCOM_CONFIG, VAD_CONFIG, SECURITY_CONFIG, COLORS, setup_style, configure_window,
+    create_key_entry
+)
+from intercom import IntercomEndpoint, FLOOR_LOCAL, FLOOR_REMOTE
+from secure import cipher_from_passphrase
+
+# Etiqueta visible -> modo de intercom.py
+MODE_LABELS = {
+    "Full-duplex": "full",
+    "Half-duplex (voz)": "half",
+    "Pulsar para hablar": "ptt",
+}
+
+
+class IntercomApp:
+    def __init__(self, root):
+        self.root = root
+        configure_window(self.root, "Intercomunicador UDP", width=560, height=430)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Variables de control
+        self.PEER_HOST = tk.StringVar()
+        self.LOCAL_PORT = tk.IntVar(value=INTERCOM_CONFIG["PORT"])
+        self.PEER_PORT = tk.IntVar(value=INTERCOM_CONFIG["PORT"])
+        self.MODE = tk.StringVar(value=next(k for k, v in MODE_LABELS.items() if v == INTERCOM_CONFIG["MODE"]))
+        self.VOLUME_FACTOR = tk.DoubleVar(value=1.0)
+        self.SHARED_KEY = tk.StringVar(value=SECURITY_CONFIG["PASSPHRASE"])
+
+        self.endpoint = None
+        self.update_id = None
+
+        setup_style()
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Configura la interfaz: conexión, controles y estado."""
+        main_frame = ttk.Frame(self.root, style="TFrame")
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # ========== CONEXIÓN ==========
+        config_frame = ttk.LabelFrame(main_frame, text="Conexión", style="Custom.TLabelframe")
+        config_frame.pack(fill="x", pady=(0, 10))
+
+        grid = ttk.Frame(config_frame, style="TFrame")
+        grid.pack(fill="x", padx=10, pady=10)
+
+        ttk.Label(grid, text="IP del otro extremo").grid(row=0, column=0, sticky="w")
+        ttk.Entry(grid, textvariable=self.PEER_HOST, width=18, style="Dark.TEntry").grid(row=0, column=1, padx=5)
+        ttk.Label(grid, text="Puerto remoto").grid(row=0, column=2, sticky="w", padx=(10, 0))
+        ttk.Entry(grid, textvariable=self.PEER_PORT, width=7, style="Dark.TEntry").grid(row=0, column=3, padx=5)
+
+        ttk.Label(grid, text="Modo").grid(row=1, column=0, sticky="w", pady=(8, 0))
+        self.mode_combo = ttk.Combobox(grid, textvariable=self.MODE, values=list(MODE_LABELS),
+                                       state="readonly", width=18, style="Dark.TCombobox")
+        self.mode_combo.grid(row=1, column=1, padx=5, pady=(8, 0))
+        ttk.Label(grid, text="Puerto local").grid(row=1, column=2, sticky="w", padx=(10, 0), pady=(8, 0))
+        ttk.Entry(grid, textvariable=self.LOCAL_PORT, width=7, style="Dark.TEntry").grid(row=1, column=3, padx=5, pady=(8, 0))
+
+        key_frame = ttk.Frame(config_frame, style="TFrame")
+        key_frame.pack(fill="x", padx=5)
+        self.key_entry = create_key_entry(key_frame, self.SHARED_KEY)
+
+        ttk.Label(config_frame, text="Volumen").pack(anchor="w", padx=10)
+        ttk.Scale(
+            config_frame,
+            from_=0.0,
+            to=2.0,
+            variable=self.VOLUME_FACTOR,
+            orient="horizontal",
+            style="Horizontal.TScale",
+            command=self.update_volume
+        ).pack(fill="x", padx=10, pady=(0, 10))
+
+        # ========== CONTROLES ==========
+        controls_frame = ttk.LabelFrame(main_frame, text="Controles", style="Custom.TLabelframe")
+        controls_frame.pack(fill="x", pady=(0, 10))
+
+        buttons = ttk.Frame(controls_frame, style="TFrame")
+        buttons.pack(padx=10, pady=10)
+
+        self.start_button = ttk.Button(buttons, text="Conectar", command=self.start_session,
+                                       style="Primary.TButton", width=12)
+        self.start_button.pack(side="left", padx=(0, 10))
+        self.stop_button = ttk.Button(buttons, text="Desconectar", command=self.stop_session,
+                                      state=tk.DISABLED, style="Disabled.TButton", width=12)
+        self.stop_button.pack(side="left", padx=(0, 10))
+
+        # Pulsar para hablar: activo mientras se mantiene el botón o la barra espaciadora
+        self.talk_button = ttk.Button(buttons, text="Mantener para hablar", style="Primary.TButton", width=20)
+        self.talk_button.pack(side="left")
+        self.talk_button.bind("<ButtonPress-1>", lambda _: self.set_talking(True))
+        self.talk_button.bind("<ButtonRelease-1>", lambda _: self.set_talking(False))
+        self.root.bind("<KeyPress-space>", lambda _: self.set_talking(True))
+        self.root.bind("<KeyRelease-space>", lambda _: self.set_talking(False))
+
+        # ========== ESTADO ==========
+        self.status_label = tk.Label(
+            main_frame,
+            text="Desconectado",
+            bg=COLORS["bg_secondary"],
+            fg=COLORS["fg_white"],
+            font=("Segoe UI", 14, "bold"),
+            pady=10
+        )
+        self.status_label.pack(fill="x")
+        self.detail_label = ttk.Label(main_frame, text="", font=("Consolas", 9))
+        self.detail_label.pack(fill="x", pady=(5, 0))
+
+    def log_message(self, message):
+        """Registra mensajes en consola."""
+        print(message)
+
+    def update_volume(self, value):
+        if self.endpoint:
+            self.endpoint.volume = float(value)
+
+    def set_talking(self, talking):
+        if self.endpoint:
+            self.endpoint.talking = talking
+
+    def start_session(self):
+        """Abre el extremo local y empieza a hablar/escuchar con el otro."""
+        host = self.PEER_HOST.get().strip()
+        if not host:
+            messagebox.showwarning("Advertencia", "Ingresa la IP del otro extremo.")
+            return
+        try:
+            self.endpoint = IntercomEndpoint(
+                host,
+                peer_port=self.PEER_PORT.get(),
+                local_port=self.LOCAL_PORT.get(),
+                mode=MODE_LABELS[self.MODE.get()],
+                rate=INTERCOM_CONFIG["RATE"],
+                chunk=INTERCOM_CONFIG["CHUNK"],
+                duck_db=INTERCOM_CONFIG["DUCK_DB"],
+                floor_hold_ms=INTERCOM_CONFIG["FLOOR_HOLD_MS"],
+                hangover_ms=VAD_CONFIG["HANGOVER_MS"],
+                keepalive_ms=VAD_CONFIG["KEEPALIVE_MS"],
+                cn_timeout_ms=VAD_CONFIG["CN_TIMEOUT_MS"],
+                resample_quality=AUDIO_CONFIG["RESAMPLE_QUALITY"],
+                cipher=cipher_from_passphrase(self.SHARED_KEY.get()),
+                log=self.log_message,
+            )
+            self.endpoint.volume = self.VOLUME_FACTOR.get()
+            self.endpoint.start()
+        except Exception as e:
+            if self.endpoint:
+                self.endpoint.stop()
+            self.endpoint = None
+            messagebox.showerror("Error", f"No se pudo iniciar el intercomunicador:\n{e}")
+            return
+
+        self.mode_combo.config(state=tk.DISABLED)
+        self.key_entry.config(state=tk.DISABLED)
+        self.start_button.config(state=tk.DISABLED, style="Disabled.TButton")
+        self.stop_button.config(state=tk.NORMAL, style="Primary.TButton")
+        self.update_indicators()
+
+    def update_indicators(self):
+        """Refresca turno, ducking y contadores desde el estado del extremo."""
+        if not self.endpoint:
+            return
+        if not self.endpoint.running:
+            self.stop_session()
+            return
+
+        status = self.endpoint.status()
+        if status["floor"] == FLOOR_LOCAL:
+            text, color = "Hablando", COLORS["status_green"]
+        elif status["floor"] == FLOOR_REMOTE:
+            text, color = "Escuchando", COLORS["status_yellow"]
+        else:
+            text, color = "Conectado", COLORS["fg_white"]
+        if status["mode"] == "ptt" and self.endpoint.talking and status["floor"] == FLOOR_REMOTE:
+            text, color = "Turno ocupado", COLORS["status_red"]
+        self.status_label.config(text=text, fg=color)
+        self.detail_label.config(
+            text=f"Ducking {status['ducking_db']:5.1f} dB · ERLE {status['erle_db']:4.1f} dB · "
+                 f"enviados {status['sent']} · recibidos {status['received']}"
+        )
+        self.update_id = self.root.after(200, self.update_indicators)
+
+    def stop_session(self):
+        """Cierra el extremo local."""
+        if self.update_id:
+            self.root.after_cancel(self.update_id)
+            self.update_id = None
+        if self.endpoint:
+            self.endpoint.stop()
+            self.endpoint = None
+        self.mode_combo.config(state="readonly")
+        self.key_entry.config(state=tk.NORMAL)
+        self.start_button.config(state=tk.NORMAL, style="Primary.TButton")
+        self.stop_button.config(state=tk.DISABLED, style="Disabled.TButton")
+        self.status_label.config(text="Desconectado", fg=COLORS["fg_white"])
+        self.log_message("Intercomunicador detenido.")
+
+    def on_close(self):
+        """Maneja el cierre de la ventana."""
+        self.stop_session()
+        self.root.after(100, self.root.destroy)
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = IntercomApp(root)
+    root.mainloop()
@@ -4,70 +4,121 @@ interface_receptor.py - Interfaz de recepción de audio UDP
 Requiere:
 - pyaudio: reproducción de audio en altavoces
 - common.py: estilos compartidos y utilidades UI
+- pipeline.py: recepción, deriva, grabación circular y reproducción (compartido con daemon.py)
+- audio_engine.py: audio reutilizable entre sesiones
 """
 
-from tkinter import ttk
+from tkinter import ttk, filedialog, messagebox
 import tkinter as tk
-import numpy as np
 import threading
-import pyaudio
-import socket
 import sys
 
-from common import ( AUDIO_CONFIG, COLORS, setup_style, create_plot, configure_window )
+from common import (
+    RECORDER_CONFIG, SECURITY_CONFIG, SOURCE_FILTER_CONFIG, DEVICE_CONFIG, LATENCY_CONFIG, COLORS, STATUS_LEVEL_COLORS,
+    setup_style, create_plot, configure_window, AnalysisView, create_key_entry, create_device_selector, bind_control
+)
+from analysis import AudioAnalyzer, SingleSlot
+from secure import cipher_from_passphrase
+from audio_engine import AudioEngine
+from devices import DEFAULT_DEVICE
+from state import StatusQueue, UiPump
+from net_interfaces import shared_inventory
+from ring_recorder import RingRecorder
+from pipeline import ReceiverPipeline, receive_control, SCOPE_FRAMES
+
 
 
 class AudioReceiverApp:
-    def __init__(self, root):
+    def __init__(self, root, pyaudio_instance=None, echo_reference=None):
+        """
+        Args:
+            root: ventana tk.Tk o tk.Toplevel
+            pyaudio_instance: instancia PyAudio compartida (modo full-duplex); None = propia
+            echo_reference: callable(frames, rate) que recibe lo reproducido
+                (referencia del cancelador de eco en modo full-duplex)
+        """
         self.root = root
         
         # Configurar ventana base
         configure_window(self.root, "Receptor de Audio UDP", icon_name="receptor.ico")
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        # Configuración de audio
-        self.CHUNK = AUDIO_CONFIG["CHUNK"]
-        self.FORMAT = AUDIO_CONFIG["FORMAT"]
-        self.CHANNELS = AUDIO_CONFIG["CHANNELS"]
-        self.RATE = AUDIO_CONFIG["RATE"]
-
-        # Configuración de red
-        self.HOST = '0.0.0.0'
-        self.PORT = 5000
-
         # Variables de control
         self.AMPLIFICATION_FACTOR = tk.DoubleVar(value=1.0)
         self.VOLUME_FACTOR = tk.DoubleVar(value=1.0)
+        self.RECORDING_ENABLED = tk.BooleanVar(value=False)
+        self.SHARED_KEY = tk.StringVar(value=SECURITY_CONFIG["PASSPHRASE"])
+        self.ALLOWED_HOSTS = tk.StringVar(value=SOURCE_FILTER_CONFIG["ALLOWED_HOSTS"])
+        self.OUTPUT_DEVICE = tk.StringVar(value=DEVICE_CONFIG["OUTPUT"] or DEFAULT_DEVICE)
+        self.LOW_LATENCY = tk.BooleanVar(value=LATENCY_CONFIG["LOW_LATENCY"])
         
         # Estado
         self.receiving = False
-        self.p = None
-        self.stream = None
-        self.s = None
-        self.reception_thread = None
-        self.update_plot_id = None
-
-        # Buffer para gráfico
-        self.audio_buffer = np.zeros(self.CHUNK)
+        # Mensajes de los hilos hacia la interfaz (nunca tocan Tk directamente)
+        self.ui = StatusQueue()
+
+        # Último tramo de señal para el gráfico y análisis espectral (hilo propio)
+        self.scope = SingleSlot()
+        self.scope_version = 0
+        self.analyzer = AudioAnalyzer()
+
+        # Recepción y reproducción: el mismo código que usa el demonio sin interfaz (pipeline.py);
+        # PyAudio y el stream de salida se conservan entre sesiones
+        self.engine = AudioEngine(pyaudio_instance, log=self.log_message)
+        self.pipeline = ReceiverPipeline(
+            self.engine, control=receive_control(), log=self.log_message,
+            status=lambda message, level: self.ui.status(message, STATUS_LEVEL_COLORS[level]),
+            scope=self.scope, analyzer=self.analyzer, echo_reference=echo_reference,
+            on_stopped=lambda: self.ui.call(self.finalize_stop)
+        )
+        self.control = self.pipeline.control
 
         # Setup UI con estilos compartidos
         setup_style()
         self.setup_ui()
+        bind_control(self.AMPLIFICATION_FACTOR, self.control, "amplification")
+        bind_control(self.VOLUME_FACTOR, self.control, "volume")
+
+        # Un único temporizador aplica los mensajes de los hilos y refresca los gráficos
+        self.pump = UiPump(self.root, self.ui, self.update_status, log=self.log_message)
+        self.pump.add_tick(self.update_plot)
+        self.pump.start()
+
+        # Inicializar PortAudio y listar las salidas en segundo plano: la primera recepción arranca sin esperar
+        threading.Thread(target=self.prepare_audio, daemon=True).start()
+
+    def prepare_audio(self):
+        """Inicializa PortAudio y escanea los dispositivos de salida."""
+        self.engine.warm_up()
+        try:
+            names = self.pipeline.inventory.names(input=False)
+        except Exception as e:
+            self.log_message(f"No se pudieron listar las salidas de audio: {e}")
+            return
+        self.ui.call(self.update_device_list, names)
+
+    def update_device_list(self, names):
+        """Rellena el desplegable de salidas con el resultado del escaneo."""
+        self.device_combo.config(values=names)
+        if self.OUTPUT_DEVICE.get() not in names:
+            self.log_message(f"Salida '{self.OUTPUT_DEVICE.get()}' no encontrada, se usa la predeterminada")
+            self.OUTPUT_DEVICE.set(DEFAULT_DEVICE)
 
     def on_close(self):
         """Se ejecuta al cerrar la ventana."""
         self.stop_reception()
+        self.pipeline.join(timeout=1.0)
+        self.pump.stop()
+        self.engine.close()
         sys.exit(0)
 
     def get_local_ips(self):
         """
-        Obtiene las direcciones IP locales del dispositivo.
+        Obtiene las direcciones IP locales del dispositivo (inventario de interfaces, sin DNS).
         Retorna una lista con las IPs disponibles.
         """
         try:
-            hostname = socket.gethostname()
-            hostname_ex = socket.gethostbyname_ex(hostname)
-            ips = hostname_ex[2]
+            ips = [f"{address.address} ({interface.name})" for interface, address in shared_inventory().addresses()]
             return ips if ips else ["No disponible"]
         except Exception as e:
             return [f"Error: {str(e)}"]
@@ -139,6 +190,36 @@ class AudioReceiverApp:
             command=self.update_vol_label
         )
         self.volume_slider.pack(fill="x", padx=10, pady=(0, 10))
+
+        # Dispositivo de salida (la lista llega al terminar el escaneo en segundo plano)
+        device_frame = ttk.Frame(config_frame, style="TFrame")
+        device_frame.pack(fill="x", padx=5)
+        self.device_combo = create_device_selector(device_frame, self.OUTPUT_DEVICE, "Salida")
+        self.latency_check = ttk.Checkbutton(
+            device_frame,
+            text="Baja latencia (búfer corto)",
+            variable=self.LOW_LATENCY,
+            style="Dark.TCheckbutton"
+        )
+        self.latency_check.pack(anchor="w", padx=5, pady=(0, 5))
+        
+        # Grabación circular
+        record_frame = ttk.Frame(config_frame, style="TFrame")
+        record_frame.pack(fill="x", padx=10, pady=(0, 10))
+        
+        ttk.Checkbutton(
+            record_frame,
+            text=f"Grabar últimos {RECORDER_CONFIG['MINUTES']} min",
+            variable=self.RECORDING_ENABLED,
+            style="Dark.TCheckbutton"
+        ).pack(side="left")
+        
+        ttk.Button(
+            record_frame,
+            text="Guardar repetición",
+            command=self.save_replay,
+            style="Primary.TButton"
+        ).pack(side="right")
         
         # --- IPs LOCALES (Derecha) ---
         ips_frame = ttk.LabelFrame(row1_frame, text="IPs Locales Disponibles", style="Custom.TLabelframe")
@@ -175,6 +256,14 @@ class AudioReceiverApp:
         ip_text.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Clave compartida: solo se aceptan paquetes autenticados con ella
+        self.key_entry = create_key_entry(ips_frame, self.SHARED_KEY)
+        
+        # Emisores aceptados (el resto se descarta nada más recibirlo)
+        ttk.Label(ips_frame, text="Emisores permitidos (vacío = todos)", style="TLabel").pack(anchor="w", padx=5, pady=(0, 2))
+        self.allowed_entry = ttk.Entry(ips_frame, textvariable=self.ALLOWED_HOSTS, style="Dark.TEntry")
+        self.allowed_entry.pack(fill="x", padx=5, pady=(0, 5))
+        
         # ========== FILA 2: CONTROLES Y ESTADO ==========
         row2_frame = ttk.Frame(main_frame, style="TFrame")
         row2_frame.pack(fill="x", pady=(0, 10))
@@ -253,8 +342,9 @@ class AudioReceiverApp:
         graph_frame = ttk.LabelFrame(main_frame, text="Señal de Audio", style="Custom.TLabelframe")
         graph_frame.pack(fill="both", expand=True)
         
-        self.figure, self.ax, self.canvas, self.line, self.audio_buffer = create_plot(graph_frame, self.CHUNK)
+        self.figure, self.ax, self.canvas, self.line, _ = create_plot(graph_frame, SCOPE_FRAMES)
         self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+        self.analysis_view = AnalysisView(graph_frame, self.canvas)
         
         # Inicializar etiquetas
         self.update_amp_label(self.AMPLIFICATION_FACTOR.get())
@@ -277,14 +367,14 @@ class AudioReceiverApp:
         self.status_label.configure(bg=bg_color)
 
     def update_plot(self):
-        """Actualiza el gráfico con datos de audio."""
-        try:
-            self.line.set_ydata(self.audio_buffer)
+        """Refresca gráficos y medidores (temporizador de la interfaz); solo redibuja lo nuevo."""
+        if not self.receiving:
+            return
+        if self.analysis_view.shows_signal() and self.scope.version != self.scope_version:
+            self.scope_version = self.scope.version
+            self.line.set_ydata(self.scope.peek())
             self.canvas.draw()
-        except Exception:
-            pass
-        if self.receiving:
-            self.update_plot_id = self.root.after(50, self.update_plot)
+        self.analysis_view.refresh(self.analyzer.latest())
 
     def update_amp_label(self, value):
         """Actualiza la etiqueta del valor de amplificación."""
@@ -319,123 +409,77 @@ class AudioReceiverApp:
         if self.receiving:
             return
 
+        try:
+            cipher = cipher_from_passphrase(self.SHARED_KEY.get())
+        except RuntimeError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
         self.receiving = True
+        self.key_entry.config(state=tk.DISABLED)
+        self.allowed_entry.config(state=tk.DISABLED)
+        self.device_combo.config(state=tk.DISABLED)
+        self.latency_check.config(state=tk.DISABLED)
         self.start_button.config(state=tk.DISABLED, style="Disabled.TButton")
         self.stop_button.config(state=tk.NORMAL, style="Primary.TButton")
-        self.update_status("Escuchando...", COLORS["status_green"])
-
-        self.reception_thread = threading.Thread(target=self.run_reception, daemon=True)
-        self.reception_thread.start()
 
-        self.update_plot()
+        self.analyzer.start()
+        self.pipeline.start(cipher=cipher, allowed_hosts=self.ALLOWED_HOSTS.get(),
+                            device_name=self.OUTPUT_DEVICE.get(), low_latency=self.LOW_LATENCY.get(),
+                            record=self.RECORDING_ENABLED.get())
 
     def update_status(self, message, color="white"):
-        """Actualiza etiqueta de estado de forma segura."""
+        """Actualiza la etiqueta de estado (hilo de la interfaz; los hilos usan self.ui.status)."""
         self.status_label.config(text=message, foreground=color)
         self.update_status_background(color)
 
-    def run_reception(self):
-        """Ejecuta el bucle principal de recepción."""
+    def save_replay(self):
+        """
+        Exporta a WAV los últimos segundos de la grabación circular.
+
+        Se lee de un mapeo propio de solo lectura: el grabador de la recepción
+        sigue escribiendo en el suyo sin que este hilo lo toque.
+        """
         try:
-            self.p = pyaudio.PyAudio()
-            self.stream = self.p.open(
-                format=self.FORMAT,
-                channels=self.CHANNELS,
-                rate=self.RATE,
-                output=True,
-                frames_per_buffer=self.CHUNK
+            recorder = RingRecorder.open_existing(RECORDER_CONFIG["PATH"], readonly=True)
+        except (OSError, ValueError):
+            recorder = None
+        if recorder is None or len(recorder) == 0:
+            messagebox.showinfo("Repetición", "No hay audio grabado todavía.")
+            if recorder:
+                recorder.close()
+            return
+
+        try:
+            path = filedialog.asksaveasfilename(
+                title="Guardar repetición",
+                defaultextension=".wav",
+                filetypes=[("Audio WAV", "*.wav")]
             )
-            self.s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.s.settimeout(1.0)  # Timeout para poder verificar self.receiving
-            self.s.bind((self.HOST, self.PORT))
-
-            while self.receiving:
-                try:
-                    data, _ = self.s.recvfrom(self.CHUNK * 2 + 100)
-                    audio_data = np.frombuffer(data, dtype=np.int16)
-                    
-                    # Aplicar procesamiento de audio
-                    processed_audio = np.clip(
-                        audio_data * self.AMPLIFICATION_FACTOR.get() * self.VOLUME_FACTOR.get(),
-                        -32768, 32767
-                    ).astype(np.int16)
-                    
-                    # Reproducir audio
-                    self.stream.write(processed_audio.tobytes())
-                    
-                    # Actualizar buffer para gráfico
-                    try:
-                        if len(audio_data) >= self.CHUNK:
-                            self.audio_buffer = audio_data[:self.CHUNK].copy()
-                        else:
-                            self.audio_buffer = np.pad(audio_data, (0, self.CHUNK - len(audio_data)))
-                    except Exception:
-                        pass
-                        
-                except socket.timeout:
-                    # Timeout normal, continuar si aún estamos recibiendo
-                    continue
-                except socket.error:
-                    # Error de socket, salir del bucle
-                    break
-                    
-        except Exception as e:
-            self.log_message(f"Error en recepción: {e}")
+            if path:
+                start = recorder.seek_seconds_ago(RECORDER_CONFIG["EXPORT_SECONDS"])
+                blocks = recorder.export_wav(path, start)
+                self.log_message(f"Repetición guardada en {path} ({blocks} bloques)")
         finally:
-            self.cleanup_resources()
-
-    def cleanup_resources(self):
-        """Limpia los recursos de audio y red de forma segura."""
-        # Cerrar stream de audio
-        if self.stream:
-            try:
-                if self.stream.is_active():
-                    self.stream.stop_stream()
-                self.stream.close()
-                self.stream = None
-            except Exception as e:
-                self.log_message(f"Error cerrando stream: {e}")
-
-        # Terminar PyAudio
-        if self.p:
-            try:
-                self.p.terminate()
-                self.p = None
-            except Exception as e:
-                self.log_message(f"Error terminando PyAudio: {e}")
-
-        # Cerrar socket
-        if self.s:
-            try:
-                self.s.close()
-                self.s = None
-            except Exception as e:
-                self.log_message(f"Error cerrando socket: {e}")
-
-        # Actualizar estado en la interfaz
-        self.root.after(0, self.finalize_stop)
+            recorder.close()
 
     def finalize_stop(self):
-        """Finaliza el estado de detención en la interfaz."""
+        """Finaliza el estado de detención en la interfaz (el hilo ya liberó salida y socket)."""
         self.receiving = False
+        self.analyzer.stop()
+        self.key_entry.config(state=tk.NORMAL)
+        self.allowed_entry.config(state=tk.NORMAL)
+        self.device_combo.config(state="readonly")
+        self.latency_check.config(state=tk.NORMAL)
         self.start_button.config(state=tk.NORMAL, style="Primary.TButton")
         self.stop_button.config(state=tk.DISABLED, style="Disabled.TButton")
-        self.update_status("Detenido", COLORS["status_red"])
-        
-        # Cancelar actualización del gráfico
-        if self.update_plot_id:
-            self.root.after_cancel(self.update_plot_id)
-            self.update_plot_id = None
-            
-        self.log_message("Recepción detenida.")
 
     def stop_reception(self):
-        """Detiene la recepción inmediatamente."""
+        """Detiene la recepción (el hilo libera los recursos en su siguiente vuelta)."""
         if not self.receiving:
             return
+        self.pipeline.stop()
 
-        self.receiving = False
-        self.cleanup_resources()
 
     def log_message(self, message):
         """Registra mensajes en consola."""
@@ -0,0 +1,350 @@
+"""
+net_addr.py - Direcciones IPv4/IPv6, sockets de doble pila y multicast
+
+Todo el transporte pasa por aquí en lugar de fijar socket.AF_INET:
+- open_sender(): resuelve el destino con getaddrinfo (nombre, IPv4, IPv6,
+  "fe80::1%eth0") y crea el socket de esa familia; si el destino es un
+  grupo multicast, fija saltos e interfaz de salida.
+- bind_receiver(): socket de recepción de doble pila ("::" con
+  IPV6_V6ONLY = 0: IPv4 e IPv6 en un solo socket) o de la familia del
+  grupo multicast al que se une. Sin IPv6 en el sistema, IPv4 como antes.
+- host_of() / format_addr(): las direcciones IPv4 llegan a un socket de
+  doble pila como "::ffff:a.b.c.d" y en tuplas de 4 elementos; se
+  normalizan para filtros de origen, registros y medidas. Para contestar
+  se usa siempre la dirección original de recvfrom.
+- ipv6_neighbors(): el escáner no puede barrer un /64; en su lugar pide
+  respuesta a todos los nodos del enlace (ff02::1) y lee la tabla de
+  vecinos (neighbor discovery) del sistema.
+
+Uso (vecinos IPv6 del enlace):
+    python net_addr.py
+"""
+
+import ipaddress
+import platform
+import re
+import socket
+import struct
+import subprocess
+
+from config import NET_CONFIG
+
+MAPPED_PREFIX = "::ffff:"
+ADDR_FORMAT = struct.Struct("!16sHI")   # dirección IPv6 (IPv4 mapeada), puerto, scope
+
+_ipv6 = None
+
+
+def has_ipv6():
+    """True si el sistema puede crear sockets IPv6 (se comprueba una vez)."""
+    global _ipv6
+    if _ipv6 is None:
+        _ipv6 = False
+        if socket.has_ipv6:
+            try:
+                socket.socket(socket.AF_INET6, socket.SOCK_DGRAM).close()
+                _ipv6 = True
+            except OSError:
+                pass
+    return _ipv6
+
+
+def host_of(addr):
+    """IP de una dirección de socket, con las IPv4 mapeadas en su forma IPv4."""
+    host = addr[0]
+    if host.startswith(MAPPED_PREFIX) and "." in host:
+        return host[len(MAPPED_PREFIX):]
+    return host
+
+
+def format_addr(addr):
+    """"ip:puerto" o "[ipv6]:puerto" para registros y medidas."""
+    host = host_of(addr)
+    return f"[{host}]:{addr[1]}" if ":" in host else f"{host}:{addr[1]}"
+
+
+def normalize_host(text):
+    """Forma canónica de una IP escrita a mano (minúsculas, IPv6 comprimida); otro texto, tal cual."""
+    text = text.strip()
+    if text.startswith("[") and text.endswith("]"):
+        text = text[1:-1]
+    address, _, scope = text.partition("%")
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return text
+    address = str(getattr(ip, "ipv4_mapped", None) or ip)
+    return f"{address}%{scope}" if scope else address
+
+
+def is_multicast(host):
+    """True si `host` es una IP (v4 o v6) de grupo multicast."""
+    try:
+        return ipaddress.ip_address(host.partition("%")[0].strip("[]")).is_multicast
+    except ValueError:
+        return False
+
+
+def resolve(host, port, passive=False):
+    """
+    Primera dirección de `host` utilizable con UDP (orden de preferencia del sistema).
+
+    Retorna:
+        (familia, dirección de socket)
+    Lanza:
+        OSError (socket.gaierror): nombre sin resolver
+    """
+    host = host.strip()
+    if host.startswith("[") and host.endswith("]"):
+        host = host[1:-1]
+    family = socket.AF_UNSPEC if has_ipv6() else socket.AF_INET
+    flags = socket.AI_PASSIVE if passive else 0
+    infos = socket.getaddrinfo(host or None, port, family, socket.SOCK_DGRAM, 0, flags)
+    family, _, _, _, sockaddr = infos[0]
+    return family, sockaddr
+
+
+def _interface_index(interface):
+    if not interface:
+        return 0
+    try:
+        return int(interface)
+    except ValueError:
+        return socket.if_nametoindex(interface)
+
+
+def set_dual_stack(sock):
+    """Acepta también IPv4 (como ::ffff:a.b.c.d) en un socket IPv6, si el sistema lo permite."""
+    try:
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def configure_multicast_sender(sock, family, hops=None, interface=None):
+    """Saltos (TTL) e interfaz de salida para enviar a un grupo multicast."""
+    hops = NET_CONFIG["MULTICAST_HOPS"] if hops is None else hops
+    interface = NET_CONFIG["MULTICAST_INTERFACE"] if interface is None else interface
+    if family == socket.AF_INET6:
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_HOPS, int(hops))
+        if interface:
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, _interface_index(interface))
+    else:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, int(hops))
+        if interface:
+            # IPv4 elige la interfaz por una de sus direcciones
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+
+
+def open_sender(host, port):
+    """
+    Socket UDP de envío de la familia del destino.
+
+    Retorna:
+        (socket, dirección de destino para sendto)
+    Lanza:
+        OSError: destino sin resolver o familia no disponible
+    """
+    family, sockaddr = resolve(host, port)
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    if is_multicast(sockaddr[0]):
+        try:
+            configure_multicast_sender(sock, family)
+        except OSError:
+            sock.close()
+            raise
+    return sock, sockaddr
+
+
+def join_multicast(sock, group, interface=None):
+    """Une el socket ligado al grupo `group` (IPv4 o IPv6) en `interface` ("" = la del sistema)."""
+    interface = NET_CONFIG["MULTICAST_INTERFACE"] if interface is None else interface
+    address, _, scope = group.partition("%")
+    if ":" in address:
+        index = _interface_index(interface or scope)
+        mreq = socket.inet_pton(socket.AF_INET6, address) + struct.pack("@I", index)
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_JOIN_GROUP, mreq)
+    else:
+        local = socket.inet_aton(interface) if interface else struct.pack("!I", socket.INADDR_ANY)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, socket.inet_aton(address) + local)
+
+
+def bind_receiver(port, host="", group="", reuse_port=False):
+    """
+    Socket UDP ligado a `port` para recibir.
+
+    Args:
+        host: dirección local concreta ("" = todas, IPv4 e IPv6 si hay doble pila)
+        group: grupo multicast al que unirse ("" = solo unicast)
+        reuse_port: SO_REUSEPORT (varios procesos en el mismo puerto, Linux)
+    Lanza:
+        OSError: puerto ocupado, familia no disponible o grupo no válido
+    """
+    if group:
+        family, _ = resolve(group, port)
+        address = ("::" if family == socket.AF_INET6 else "0.0.0.0", port)
+    elif host:
+        family, address = resolve(host, port, passive=True)
+    elif has_ipv6():
+        family, address = socket.AF_INET6, ("::", port)
+    else:
+        family, address = socket.AF_INET, ("0.0.0.0", port)
+
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        if family == socket.AF_INET6 and address[0] == "::" and not group:
+            set_dual_stack(sock)
+        if group:
+            # Varios receptores del mismo grupo en este equipo
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(address)
+        if group:
+            join_multicast(sock, group)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def for_socket(sock, sockaddr):
+    """
+    `sockaddr` en la forma que acepta sendto en `sock`: una IPv4 hacia un
+    socket de doble pila va como IPv6 mapeada.
+
+    Lanza:
+        OSError: destino IPv6 desde un socket solo IPv4
+    """
+    if sock.family == socket.AF_INET6 and len(sockaddr) == 2 and ":" not in sockaddr[0]:
+        return MAPPED_PREFIX + sockaddr[0], sockaddr[1], 0, 0
+    if sock.family == socket.AF_INET and len(sockaddr) == 4:
+        raise OSError(f"Destino IPv6 {sockaddr[0]} desde un socket IPv4")
+    return sockaddr
+
+
+def reply_socket():
+    """Socket sin ligar que puede enviar a orígenes IPv4 e IPv6 (doble pila si la hay)."""
+    if has_ipv6():
+        sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        set_dual_stack(sock)
+        return sock
+    return socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+
+def pack_addr(addr):
+    """Dirección de origen en 22 bytes fijos (IPv4 como IPv6 mapeada) para reenviarla."""
+    host = host_of(addr)
+    if ":" in host:
+        ip = socket.inet_pton(socket.AF_INET6, host.partition("%")[0])
+    else:
+        ip = socket.inet_pton(socket.AF_INET6, MAPPED_PREFIX + host)
+    return ADDR_FORMAT.pack(ip, addr[1], addr[3] if len(addr) > 3 else 0)
+
+
+def unpack_addr(data, family):
+    """Inverso de pack_addr(): dirección para sendto en un socket de la familia `family`."""
+    ip, port, scope = ADDR_FORMAT.unpack_from(data)
+    host = socket.inet_ntop(socket.AF_INET6, ip)
+    if family == socket.AF_INET6:
+        return host, port, 0, scope
+    return host_of((host,)), port
+
+
+# ==================== VECINOS IPv6 ====================
+
+_NEIGHBOR_STATES_GONE = ("FAILED", "INCOMPLETE", "Unreachable", "Incomplete")
+
+
+def _run(command, timeout):
+    try:
+        return subprocess.run(command, capture_output=True, text=True, timeout=timeout).stdout
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def _link_interfaces():
+    try:
+        return [(index, name) for index, name in socket.if_nameindex()
+                if not name.startswith("lo") and name.lower() != "loopback"]
+    except (OSError, AttributeError):
+        return []
+
+
+def _solicit_all_nodes(system, interfaces, timeout):
+    """Ping a ff02::1 en cada interfaz: los nodos que contestan quedan en la tabla de vecinos."""
+    for index, name in interfaces:
+        if system == "windows":
+            command = ["ping", "-n", "2", "-w", str(int(timeout * 1000)), f"ff02::1%{index}"]
+        elif system == "darwin":
+            command = ["ping6", "-c", "2", "-i", "0.2", f"ff02::1%{name}"]
+        else:
+            command = ["ping", "-6", "-c", "2", "-i", "0.2", "-w", str(max(1, int(timeout))), f"ff02::1%{name}"]
+        _run(command, timeout + 1)
+
+
+def _parse_neighbors(system, output, interfaces):
+    names = {str(index): name for index, name in interfaces}
+    found = []
+    section = ""   # Windows: interfaz del bloque en curso
+    for line in output.splitlines():
+        parts = line.split()
+        if not parts or any(state in parts for state in _NEIGHBOR_STATES_GONE):
+            continue
+        if system == "windows":
+            # "  fe80::1    00-11-22-33-44-55  Reachable" bajo "Interface 12: Ethernet"
+            header = re.match(r"\s*Interface (\d+):", line)
+            if header:
+                section = header.group(1)
+                continue
+            address, iface = parts[0], section
+        elif system == "darwin":
+            # "fe80::1%en0  0:11:22:33:44:55  en0  23h59m58s S R"
+            address, _, iface = parts[0].partition("%")
+            iface = iface or (parts[2] if len(parts) > 2 else "")
+        else:
+            # "fe80::1 dev eth0 lladdr 00:11:22:33:44:55 router REACHABLE"
+            address = parts[0]
+            iface = parts[parts.index("dev") + 1] if "dev" in parts else ""
+        try:
+            ip = ipaddress.IPv6Address(address.partition("%")[0])
+        except ValueError:
+            continue
+        if ip.is_multicast or ip.is_loopback or ip.is_unspecified:
+            continue
+        if system != "windows":   # Windows indica el enlace por índice ("fe80::1%12")
+            iface = names.get(iface, iface)
+        found.append(f"{ip}%{iface}" if ip.is_link_local and iface else str(ip))
+    return found
+
+
+def ipv6_neighbors(timeout=2.0, solicit=True):
+    """
+    Nodos IPv6 presentes en los enlaces locales (neighbor discovery).
+
+    Args:
+        solicit: hacer ping a todos los nodos (ff02::1) antes de leer la tabla;
+            sin él solo aparecen los vecinos que el sistema ya conoce
+    Retorna:
+        list: direcciones, las de enlace local con su interfaz ("fe80::1%eth0").
+    """
+    if not has_ipv6():
+        return []
+    system = platform.system().lower()
+    interfaces = _link_interfaces()
+    if solicit:
+        _solicit_all_nodes(system, interfaces, timeout)
+    if system == "windows":
+        output = _run(["netsh", "interface", "ipv6", "show", "neighbors"], timeout)
+    elif system == "darwin":
+        output = _run(["ndp", "-an"], timeout)
+    else:
+        output = _run(["ip", "-6", "neigh", "show"], timeout)
+    return list(dict.fromkeys(_parse_neighbors(system, output, interfaces)))
+
+
+if __name__ == "__main__":
+    print(f"IPv6 disponible: {'sí' if has_ipv6() else 'no'}")
+    for neighbor in ipv6_neighbors():
+        print(f"  {neighbor}")
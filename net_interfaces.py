@@ -0,0 +1,479 @@
+"""
+net_interfaces.py - Inventario de interfaces de red leído del sistema, sin DNS
+
+Resolver el nombre del equipo (gethostbyname_ex) para saber sus IPs
+devuelve a menudo solo 127.0.1.1 en Linux y puede bloquear segundos en el
+arranque esperando al DNS. InterfaceInventory pregunta directamente al
+sistema operativo por interfaces, direcciones con su prefijo, MTU y estado
+del enlace:
+
+- Linux: netlink (RTM_GETLINK y RTM_GETADDR) sin procesos externos. Un
+  segundo socket netlink suscrito a los grupos de enlace y direcciones
+  avisa de cada cambio: el inventario se vuelve a leer solo entonces.
+- Windows: GetAdaptersAddresses (iphlpapi) por ctypes.
+- macOS/BSD: getifaddrs por ctypes (la MTU viene en los datos de enlace).
+En los dos últimos el resultado se guarda y se relee como mucho cada
+REFRESH_S. Si nada de eso está disponible, socket.if_nameindex() y la IP
+de salida por defecto (un connect UDP, que no envía nada).
+
+path_mtu() da la MTU hacia un destino para que el empaquetador no
+genere datagramas que la red tenga que fragmentar.
+
+Uso (interfaces de este equipo):
+    python net_interfaces.py
+"""
+
+import ctypes
+import ctypes.util
+import ipaddress
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+REFRESH_S = 5.0              # relectura máxima sin aviso de cambios (Windows, macOS)
+DEFAULT_MTU = 1500
+IP_HEADER = {socket.AF_INET: 20, socket.AF_INET6: 40}
+UDP_HEADER = 8
+IP_MTU = getattr(socket, "IP_MTU", 14 if sys.platform.startswith("linux") else None)
+IPV6_MTU = getattr(socket, "IPV6_MTU", 24 if sys.platform.startswith("linux") else None)
+
+InterfaceAddress = namedtuple("InterfaceAddress", ["address", "prefix", "family"])
+NetInterface = namedtuple("NetInterface", ["index", "name", "mtu", "up", "loopback", "addresses"])
+
+
+def network_of(address):
+    """ipaddress.ip_interface de un InterfaceAddress (red = .network)."""
+    return ipaddress.ip_interface(f"{address.address.partition('%')[0]}/{address.prefix}")
+
+
+def describe(interface):
+    """Texto de una línea con el estado, la MTU y las direcciones de una interfaz."""
+    state = "activa" if interface.up else "caída"
+    kind = ", bucle local" if interface.loopback else ""
+    addresses = ", ".join(f"{a.address}/{a.prefix}" for a in interface.addresses) or "sin direcciones"
+    return f"{interface.name} (#{interface.index}, {state}{kind}, MTU {interface.mtu}): {addresses}"
+
+
+def max_udp_payload(mtu, family):
+    """Bytes de datos UDP que caben en un paquete IP de `mtu` bytes sin fragmentar."""
+    return mtu - IP_HEADER.get(family, 20) - UDP_HEADER
+
+
+# ==================== LINUX: NETLINK ====================
+
+NETLINK_ROUTE = 0
+NLMSG_HEADER = struct.Struct("=IHHII")     # longitud, tipo, flags, secuencia, pid
+NLMSG_ERROR, NLMSG_DONE = 2, 3
+NLM_F_REQUEST, NLM_F_DUMP = 0x1, 0x300
+RTM_NEWLINK, RTM_GETLINK, RTM_NEWADDR, RTM_GETADDR = 16, 18, 20, 22
+IFINFOMSG = struct.Struct("=BxHiII")       # familia, tipo, índice, flags, cambio
+IFADDRMSG = struct.Struct("=BBBBI")        # familia, prefijo, flags, ámbito, índice
+RTATTR = struct.Struct("=HH")              # longitud, tipo
+IFLA_IFNAME, IFLA_MTU = 3, 4
+IFA_ADDRESS, IFA_LOCAL = 1, 2
+IFF_UP, IFF_LOOPBACK, IFF_RUNNING = 0x1, 0x8, 0x40
+RTMGRP_LINK, RTMGRP_IPV4_IFADDR, RTMGRP_IPV6_IFADDR = 0x1, 0x10, 0x100
+
+
+def _align(n):
+    return (n + 3) & ~3
+
+
+def _attributes(data, offset, end):
+    """{tipo: valor en bytes} de los rtattr entre `offset` y `end`."""
+    attrs = {}
+    while offset + RTATTR.size <= end:
+        length, kind = RTATTR.unpack_from(data, offset)
+        if length < RTATTR.size:
+            break
+        attrs[kind] = data[offset + RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def _netlink_dump(sock, msg_type, body, seq):
+    """Mensajes [(tipo, bytes del mensaje)] de una petición de volcado."""
+    header = NLMSG_HEADER.pack(NLMSG_HEADER.size + len(body), msg_type, NLM_F_REQUEST | NLM_F_DUMP, seq, 0)
+    sock.send(header + body)
+    messages = []
+    while True:
+        data = sock.recv(65536)
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(data):
+            length, kind, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+            if length < NLMSG_HEADER.size:
+                return messages
+            if kind == NLMSG_DONE:
+                return messages
+            if kind == NLMSG_ERROR:
+                raise OSError("netlink: error en el volcado")
+            messages.append((kind, data[offset:offset + length]))
+            offset += _align(length)
+
+
+def _read_netlink():
+    """Interfaces con netlink (Linux)."""
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE) as sock:
+        sock.bind((0, 0))
+        links = {}
+        for kind, msg in _netlink_dump(sock, RTM_GETLINK, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0), 1):
+            if kind != RTM_NEWLINK:
+                continue
+            _, _, index, flags, _ = IFINFOMSG.unpack_from(msg, NLMSG_HEADER.size)
+            attrs = _attributes(msg, NLMSG_HEADER.size + IFINFOMSG.size, len(msg))
+            name = attrs.get(IFLA_IFNAME, b"").split(b"\0")[0].decode(errors="replace")
+            mtu = struct.unpack("=I", attrs[IFLA_MTU])[0] if IFLA_MTU in attrs else DEFAULT_MTU
+            links[index] = [index, name, mtu, bool(flags & IFF_UP and flags & IFF_RUNNING),
+                            bool(flags & IFF_LOOPBACK), []]
+
+        for kind, msg in _netlink_dump(sock, RTM_GETADDR, IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0), 2):
+            if kind != RTM_NEWADDR:
+                continue
+            family, prefix, _, _, index = IFADDRMSG.unpack_from(msg, NLMSG_HEADER.size)
+            attrs = _attributes(msg, NLMSG_HEADER.size + IFADDRMSG.size, len(msg))
+            # IFA_LOCAL es la propia en enlaces punto a punto; IFA_ADDRESS, la del otro extremo
+            raw = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+            link = links.get(index)
+            if raw is None or link is None or family not in IP_HEADER:
+                continue
+            address = socket.inet_ntop(family, raw)
+            if family == socket.AF_INET6 and address.startswith("fe80"):
+                address = f"{address}%{link[1]}"
+            link[5].append(InterfaceAddress(address, prefix, family))
+    return [NetInterface(*link) for link in links.values()]
+
+
+class _NetlinkWatcher:
+    """Socket netlink suscrito a cambios de enlace y direcciones; changed() no bloquea."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self.sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+        self.sock.setblocking(False)
+
+    def changed(self):
+        changed = False
+        try:
+            while True:
+                self.sock.recv(65536)
+                changed = True
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            changed = True   # ENOBUFS: se perdieron avisos, releer por si acaso
+        return changed
+
+    def close(self):
+        self.sock.close()
+
+
+# ==================== WINDOWS: GetAdaptersAddresses ====================
+
+class _SocketAddress(ctypes.Structure):
+    _fields_ = [("lpSockaddr", ctypes.c_void_p), ("iSockaddrLength", ctypes.c_int)]
+
+
+class _UnicastAddress(ctypes.Structure):
+    pass
+
+
+_UnicastAddress._fields_ = [
+    ("Length", ctypes.c_ulong), ("Flags", ctypes.c_ulong), ("Next", ctypes.POINTER(_UnicastAddress)),
+    ("Address", _SocketAddress), ("PrefixOrigin", ctypes.c_int), ("SuffixOrigin", ctypes.c_int),
+    ("DadState", ctypes.c_int), ("ValidLifetime", ctypes.c_ulong), ("PreferredLifetime", ctypes.c_ulong),
+    ("LeaseLifetime", ctypes.c_ulong), ("OnLinkPrefixLength", ctypes.c_ubyte),
+]
+
+
+class _AdapterAddresses(ctypes.Structure):
+    pass
+
+
+_AdapterAddresses._fields_ = [
+    ("Length", ctypes.c_ulong), ("IfIndex", ctypes.c_ulong), ("Next", ctypes.POINTER(_AdapterAddresses)),
+    ("AdapterName", ctypes.c_char_p), ("FirstUnicastAddress", ctypes.POINTER(_UnicastAddress)),
+    ("FirstAnycastAddress", ctypes.c_void_p), ("FirstMulticastAddress", ctypes.c_void_p),
+    ("FirstDnsServerAddress", ctypes.c_void_p), ("DnsSuffix", ctypes.c_wchar_p),
+    ("Description", ctypes.c_wchar_p), ("FriendlyName", ctypes.c_wchar_p),
+    ("PhysicalAddress", ctypes.c_ubyte * 8), ("PhysicalAddressLength", ctypes.c_ulong),
+    ("Flags", ctypes.c_ulong), ("Mtu", ctypes.c_ulong), ("IfType", ctypes.c_ulong),
+    ("OperStatus", ctypes.c_int), ("Ipv6IfIndex", ctypes.c_ulong),
+]
+
+GAA_FLAGS = 0x2 | 0x4 | 0x8          # sin anycast, multicast ni servidores DNS
+ERROR_BUFFER_OVERFLOW = 111
+IF_TYPE_SOFTWARE_LOOPBACK = 24
+IF_OPER_STATUS_UP = 1
+
+
+def _parse_sockaddr(raw, bsd=False):
+    """(familia, IP texto, scope) de un sockaddr en bytes (BSD: sa_len + sa_family de 1 byte)."""
+    family = raw[1] if bsd else struct.unpack_from("=H", raw)[0]
+    if bsd:
+        family = {2: socket.AF_INET, 30: socket.AF_INET6, 28: socket.AF_INET6, 24: socket.AF_INET6}.get(family, -1)
+    elif family == 23:    # AF_INET6 en Windows
+        family = socket.AF_INET6
+    if family == socket.AF_INET and len(raw) >= 8:
+        return family, socket.inet_ntop(socket.AF_INET, raw[4:8]), 0
+    if family == socket.AF_INET6 and len(raw) >= 24:
+        scope = struct.unpack_from("=I", raw, 24)[0] if len(raw) >= 28 else 0
+        packed = raw[8:24]
+        if bsd and packed[:2] == b"\xfe\x80":
+            # KAME guarda el scope dentro de la dirección de enlace local (bytes 2-3)
+            packed = packed[:2] + b"\0\0" + packed[4:]
+        return family, socket.inet_ntop(socket.AF_INET6, packed), scope
+    return None, None, 0
+
+
+def _read_windows():
+    """Interfaces con GetAdaptersAddresses (Windows)."""
+    iphlpapi = ctypes.windll.iphlpapi
+    size = ctypes.c_ulong(16 * 1024)
+    for _ in range(4):
+        buffer = ctypes.create_string_buffer(size.value)
+        result = iphlpapi.GetAdaptersAddresses(socket.AF_UNSPEC, GAA_FLAGS, None, buffer, ctypes.byref(size))
+        if result != ERROR_BUFFER_OVERFLOW:
+            break
+    if result != 0:
+        raise OSError(result, "GetAdaptersAddresses falló")
+
+    interfaces = []
+    adapter = ctypes.cast(buffer, ctypes.POINTER(_AdapterAddresses))
+    while adapter:
+        a = adapter.contents
+        addresses = []
+        unicast = a.FirstUnicastAddress
+        while unicast:
+            u = unicast.contents
+            raw = ctypes.string_at(u.Address.lpSockaddr, u.Address.iSockaddrLength)
+            family, address, scope = _parse_sockaddr(raw)
+            if family is not None:
+                if family == socket.AF_INET6 and scope and address.startswith("fe80"):
+                    address = f"{address}%{scope}"
+                addresses.append(InterfaceAddress(address, u.OnLinkPrefixLength, family))
+            unicast = u.Next
+        interfaces.append(NetInterface(
+            a.IfIndex or a.Ipv6IfIndex, a.FriendlyName or a.AdapterName.decode(errors="replace"), a.Mtu,
+            a.OperStatus == IF_OPER_STATUS_UP, a.IfType == IF_TYPE_SOFTWARE_LOOPBACK, addresses
+        ))
+        adapter = a.Next
+    return interfaces
+
+
+# ==================== macOS/BSD: getifaddrs ====================
+
+class _IfAddrs(ctypes.Structure):
+    pass
+
+
+_IfAddrs._fields_ = [
+    ("ifa_next", ctypes.POINTER(_IfAddrs)), ("ifa_name", ctypes.c_char_p), ("ifa_flags", ctypes.c_uint),
+    ("ifa_addr", ctypes.c_void_p), ("ifa_netmask", ctypes.c_void_p), ("ifa_dstaddr", ctypes.c_void_p),
+    ("ifa_data", ctypes.c_void_p),
+]
+
+AF_LINK = 18
+IF_DATA_MTU_OFFSET = 8    # u_int32 ifi_mtu tras 8 bytes de campos u_char (macOS y FreeBSD)
+
+
+def _prefix_length(raw, family):
+    if not raw:
+        return 0
+    data = raw[4:8] if family == socket.AF_INET else raw[8:24]
+    return sum(bin(byte).count("1") for byte in data)
+
+
+def _read_getifaddrs():
+    """Interfaces con getifaddrs (macOS y otros BSD)."""
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    head = ctypes.POINTER(_IfAddrs)()
+    if libc.getifaddrs(ctypes.byref(head)) != 0:
+        raise OSError(ctypes.get_errno(), "getifaddrs falló")
+    links = {}
+    try:
+        node = head
+        while node:
+            entry = node.contents
+            node = entry.ifa_next
+            name = entry.ifa_name.decode(errors="replace")
+            link = links.get(name)
+            if link is None:
+                try:
+                    index = socket.if_nametoindex(name)
+                except OSError:
+                    index = 0
+                link = links[name] = [index, name, DEFAULT_MTU, bool(entry.ifa_flags & IFF_UP and
+                                                                      entry.ifa_flags & IFF_RUNNING),
+                                      bool(entry.ifa_flags & IFF_LOOPBACK), []]
+            if not entry.ifa_addr:
+                continue
+            sa_len = ctypes.string_at(entry.ifa_addr, 2)
+            if sa_len[1] == AF_LINK:
+                if entry.ifa_data:
+                    link[2] = struct.unpack("=I", ctypes.string_at(entry.ifa_data + IF_DATA_MTU_OFFSET, 4))[0]
+                continue
+            family, address, scope = _parse_sockaddr(ctypes.string_at(entry.ifa_addr, max(sa_len[0], 2)), bsd=True)
+            if family is None:
+                continue
+            netmask = ctypes.string_at(entry.ifa_netmask, 28) if entry.ifa_netmask else b""
+            if family == socket.AF_INET6 and address.startswith("fe80"):
+                address = f"{address}%{name}"
+            link[5].append(InterfaceAddress(address, _prefix_length(netmask, family), family))
+    finally:
+        libc.freeifaddrs(head)
+    return [NetInterface(*link) for link in links.values()]
+
+
+# ==================== ÚLTIMO RECURSO ====================
+
+def _default_route_address(family=socket.AF_INET):
+    """IP local de la ruta por defecto: connect UDP (no envía nada ni consulta el DNS)."""
+    target = ("192.0.2.1", 9) if family == socket.AF_INET else ("2001:db8::1", 9)
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.connect(target)
+            return sock.getsockname()[0]
+    except OSError:
+        return None
+
+
+def _read_fallback():
+    """Solo nombres e índices (if_nameindex) y la IP de la ruta por defecto."""
+    try:
+        names = socket.if_nameindex()
+    except (OSError, AttributeError):
+        names = []
+    interfaces = [NetInterface(index, name, DEFAULT_MTU, True, name.startswith("lo"), [])
+                  for index, name in names]
+    primary = _default_route_address()
+    if primary:
+        address = InterfaceAddress(primary, 24, socket.AF_INET)
+        if interfaces:
+            first = next((i for i in interfaces if not i.loopback), interfaces[0])
+            interfaces[interfaces.index(first)] = first._replace(addresses=[address])
+        else:
+            interfaces.append(NetInterface(0, "predeterminada", DEFAULT_MTU, True, False, [address]))
+    return interfaces
+
+
+def read_interfaces():
+    """Lee las interfaces del sistema con el mejor método disponible."""
+    readers = []
+    if sys.platform.startswith("linux") and hasattr(socket, "AF_NETLINK"):
+        readers.append(_read_netlink)
+    elif os.name == "nt":
+        readers.append(_read_windows)
+    elif ctypes.util.find_library("c"):
+        readers.append(_read_getifaddrs)
+    for reader in readers:
+        try:
+            return reader()
+        except (OSError, AttributeError, ValueError, struct.error):
+            continue
+    return _read_fallback()
+
+
+# ==================== INVENTARIO ====================
+
+class InterfaceInventory:
+    """Interfaces del sistema, leídas una vez y releídas al cambiar (o cada REFRESH_S)."""
+
+    def __init__(self, max_age=REFRESH_S):
+        self.max_age = max_age
+        self._interfaces = None
+        self._read_at = 0.0
+        self._lock = threading.Lock()
+        self._watcher = None
+        if sys.platform.startswith("linux") and hasattr(socket, "AF_NETLINK"):
+            try:
+                self._watcher = _NetlinkWatcher()
+            except OSError:
+                self._watcher = None
+
+    def interfaces(self, refresh=False):
+        """Lista de NetInterface (se relee si el sistema avisó de cambios o caducó)."""
+        with self._lock:
+            stale = self._interfaces is None or refresh
+            if self._watcher:
+                stale = self._watcher.changed() or stale
+            elif time.monotonic() - self._read_at > self.max_age:
+                stale = True
+            if stale:
+                self._interfaces = read_interfaces()
+                self._read_at = time.monotonic()
+            return list(self._interfaces)
+
+    def addresses(self, family=None, loopback=False, up_only=True):
+        """[(interfaz, InterfaceAddress), ...] filtradas por familia y estado."""
+        return [(interface, address) for interface in self.interfaces()
+                if (loopback or not interface.loopback) and (interface.up or not up_only)
+                for address in interface.addresses if family is None or address.family == family]
+
+    def own_ips(self):
+        """Todas las IPs propias (también las de bucle local), sin scope."""
+        return {address.address.partition("%")[0]
+                for interface in self.interfaces() for address in interface.addresses}
+
+    def find_by_address(self, ip):
+        """Interfaz que tiene la IP `ip`, o None."""
+        ip = ip.partition("%")[0]
+        for interface in self.interfaces():
+            if any(address.address.partition("%")[0] == ip for address in interface.addresses):
+                return interface
+        return None
+
+    def path_mtu(self, sockaddr):
+        """
+        MTU hacia `sockaddr` (dirección ya resuelta, IPv4 o IPv6).
+
+        El sistema elige la ruta con un connect UDP que no envía nada. Linux da
+        la MTU de la ruta (IP_MTU); en otros sistemas, la de la interfaz de salida.
+
+        Retorna:
+            (mtu, nombre de la interfaz o None)
+        """
+        family = socket.AF_INET6 if len(sockaddr) == 4 else socket.AF_INET
+        try:
+            with socket.socket(family, socket.SOCK_DGRAM) as sock:
+                sock.connect(sockaddr)
+                local = sock.getsockname()[0]
+                option = IPV6_MTU if family == socket.AF_INET6 else IP_MTU
+                level = socket.IPPROTO_IPV6 if family == socket.AF_INET6 else socket.IPPROTO_IP
+                route_mtu = None
+                if option is not None:
+                    try:
+                        route_mtu = sock.getsockopt(level, option)
+                    except OSError:
+                        pass
+        except OSError:
+            return DEFAULT_MTU, None
+        interface = self.find_by_address(local)
+        mtu = route_mtu or (interface.mtu if interface else DEFAULT_MTU)
+        return mtu, interface.name if interface else None
+
+    def close(self):
+        if self._watcher:
+            self._watcher.close()
+            self._watcher = None
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_inventory():
+    """Inventario común del proceso (el escáner, las interfaces y el empaquetador lo comparten)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = InterfaceInventory()
+        return _shared
+
+
+if __name__ == "__main__":
+    for interface in shared_inventory().interfaces():
+        print(describe(interface))
@@ -0,0 +1,147 @@
+"""
+net_tuning.py - Ajuste de sockets UDP y recepción por lotes
+
+Para hosts que reciben muchos streams con bloques pequeños:
+- tune_socket(): buffers de envío/recepción grandes (SO_SNDBUF/SO_RCVBUF),
+  marcado DSCP en IP_TOS o IPV6_TCLASS (EF = 46 para voz) y, en Linux, SO_BUSY_POLL
+  (sondeo activo del driver durante N µs antes de dormir: menos latencia
+  a cambio de CPU; puede requerir CAP_NET_ADMIN).
+- BatchReceiver: lectura por lotes al estilo recvmmsg con recvfrom_into
+  sobre buffers preasignados. Espera con select() y después vacía sin
+  bloquear lo ya encolado, hasta `batch` paquetes, sin crear un objeto
+  bytes por paquete.
+
+Los datos devueltos por BatchReceiver son memoryview sobre sus buffers y
+solo son válidos hasta la siguiente llamada a receive(): hay que
+decodificarlos o copiarlos antes.
+
+Uso (qué opciones acepta este sistema):
+    python net_tuning.py
+"""
+
+import select
+import socket
+import sys
+
+from protocol import MAX_DATAGRAM
+
+DSCP_EF = 46            # Expedited Forwarding (voz)
+SO_BUSY_POLL = getattr(socket, "SO_BUSY_POLL", 46 if sys.platform.startswith("linux") else None)
+
+
+def tune_socket(sock, rcvbuf=None, sndbuf=None, dscp=None, busy_poll_us=None):
+    """
+    Aplica las opciones indicadas (None = no tocar) y lee las resultantes.
+
+    Retorna:
+        dict: valores efectivos por opción, o el error si el sistema la rechazó.
+        Linux duplica los tamaños de buffer pedidos y los limita con
+        net.core.rmem_max / wmem_max.
+    """
+    applied = {}
+
+    def set_option(name, level, option, value, read_back=True):
+        try:
+            sock.setsockopt(level, option, value)
+            applied[name] = sock.getsockopt(level, option) if read_back else value
+        except (OSError, AttributeError) as e:
+            applied[name] = f"no disponible ({e})"
+
+    if rcvbuf:
+        set_option("rcvbuf", socket.SOL_SOCKET, socket.SO_RCVBUF, int(rcvbuf))
+    if sndbuf:
+        set_option("sndbuf", socket.SOL_SOCKET, socket.SO_SNDBUF, int(sndbuf))
+    if dscp is not None:
+        # DSCP ocupa los 6 bits altos del byte TOS (IPv4) o Traffic Class (IPv6);
+        # Windows suele ignorarlo sin error
+        tos = (int(dscp) & 0x3F) << 2
+        if sock.family == socket.AF_INET6:
+            set_option("dscp", socket.IPPROTO_IPV6, getattr(socket, "IPV6_TCLASS", 67), tos)
+            # Doble pila: el tráfico IPv4 del mismo socket sigue usando IP_TOS
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, getattr(socket, "IP_TOS", 3), tos)
+            except OSError:
+                pass
+        else:
+            set_option("dscp", socket.IPPROTO_IP, getattr(socket, "IP_TOS", 3), tos)
+        if isinstance(applied["dscp"], int):
+            applied["dscp"] >>= 2
+    if busy_poll_us:
+        if SO_BUSY_POLL is None:
+            applied["busy_poll_us"] = "no disponible (solo Linux)"
+        else:
+            set_option("busy_poll_us", socket.SOL_SOCKET, SO_BUSY_POLL, int(busy_poll_us))
+    return applied
+
+
+def wait_readable(sock, timeout):
+    """
+    True si hay algo que leer antes de `timeout` s: select() en sockets y la
+    espera propia en transportes sin descriptor (shm_transport.ShmSocket).
+    """
+    wait = getattr(sock, "wait_readable", None)
+    if wait:
+        return wait(timeout)
+    readable, _, _ = select.select((sock,), (), (), timeout)
+    return bool(readable)
+
+
+def describe(applied):
+    """Texto de una línea con el resultado de tune_socket()."""
+    return ", ".join(f"{name}={value}" for name, value in applied.items()) or "sin cambios"
+
+
+class BatchReceiver:
+    """Recepción por lotes sobre buffers preasignados (recvfrom_into)."""
+
+    def __init__(self, sock, batch=32, buffer_size=MAX_DATAGRAM, timeout=None):
+        """
+        Args:
+            sock: socket UDP ya ligado (o ShmSocket); pasa a modo no bloqueante
+            batch: datagramas máximos por lote
+            buffer_size: tamaño de cada buffer preasignado
+            timeout: espera máxima del primer datagrama (defecto: el del socket)
+        """
+        self.sock = sock
+        self.batch = batch
+        self.timeout = sock.gettimeout() if timeout is None else timeout
+        # La espera la hace select(): el socket queda no bloqueante y cada lote
+        # cuesta un select + un recvfrom_into por datagrama, sin cambiar de modo
+        sock.setblocking(False)
+        self._buffers = [bytearray(buffer_size) for _ in range(batch)]
+        self._views = [memoryview(buf) for buf in self._buffers]
+        self.stats = {"batches": 0, "packets": 0, "max_batch": 0}
+
+    def receive(self):
+        """
+        Espera datagramas hasta `timeout` y recoge los ya encolados sin bloquear.
+
+        Retorna:
+            list: [(memoryview, addr), ...] válidos hasta la siguiente llamada.
+        Lanza:
+            socket.timeout si no llega nada dentro del timeout.
+        """
+        if not wait_readable(self.sock, self.timeout):
+            raise socket.timeout("timed out")
+
+        packets = []
+        views = self._views
+        try:
+            for i in range(self.batch):
+                n, addr = self.sock.recvfrom_into(views[i])
+                packets.append((views[i][:n], addr))
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        self.stats["batches"] += 1
+        self.stats["packets"] += len(packets)
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(packets))
+        return packets
+
+
+if __name__ == "__main__":
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    result = tune_socket(probe, rcvbuf=4 * 1024 * 1024, sndbuf=1024 * 1024, dscp=DSCP_EF, busy_poll_us=50)
+    for name, value in result.items():
+        print(f"{name:14s} {value}")
+    probe.close()
@@ -0,0 +1,169 @@
+"""
+pacing.py - Envío de datagramas a ritmo constante con cola acotada
+
+El micrófono entrega los bloques a ráfagas (el driver suele despertar con
+varios bloques a la vez) y enviarlos según llegan reproduce esas ráfagas en
+la red y en el jitter buffer del receptor. PacedSender desacopla captura y
+envío:
+
+- La captura entrega cada paquete con su instante de medio (timestamp /
+  rate) y vuelve enseguida a leer.
+- Un hilo propio envía cada paquete en ancla + (instante de medio - medio
+  del ancla) sobre time.monotonic(): los silencios suprimidos por el VAD
+  conservan su hueco y los bloques salen equiespaciados.
+- El ancla se fija con un retardo de `delay_frames` bloques que absorbe
+  las ráfagas de captura.
+- Cola acotada a `max_queue` paquetes. Si la red no da abasto, se aplica
+  la política de descarte: "oldest" (se tira el más antiguo, prima la
+  latencia) o "newest" (se tira el que llega, prima la continuidad).
+- Si la captura se retrasa y un paquete llega después de su hora
+  (subdesbordamiento), o el instante de medio salta, se reancla.
+- El reloj del dispositivo y el monotónico derivan: mientras la cola
+  supera el retardo objetivo, el ancla se adelanta un poco en cada envío.
+
+Contadores en `stats`: sent, overflow (descartes por cola llena),
+underflow (paquetes llegados tarde), resync (saltos de reloj), max_depth.
+"""
+
+import collections
+import threading
+import time
+
+DROP_POLICIES = ("oldest", "newest")
+SPIN_S = 0.0005         # último tramo de espera activa (la precisión de sleep varía por SO)
+DRIFT_GAIN = 0.01       # fracción de bloque que se adelanta el ancla con la cola crecida
+
+
+class PacedSender:
+    """Hilo de envío que reparte los datagramas en el tiempo."""
+
+    def __init__(self, sock, address, interval, max_queue=8, policy="oldest", delay_frames=1):
+        """
+        Args:
+            sock: socket UDP de envío
+            address: (host, puerto) de destino
+            interval: duración nominal de un bloque (s), p. ej. CHUNK / RATE
+            max_queue: paquetes en espera como máximo
+            policy: "oldest" o "newest" (qué se descarta con la cola llena)
+            delay_frames: bloques de retardo para absorber ráfagas de captura
+        """
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Política de descarte desconocida: {policy}")
+        self.sock = sock
+        self.address = address
+        self.interval = float(interval)
+        self.max_queue = max(1, int(max_queue))
+        self.policy = policy
+        self.delay = delay_frames * self.interval
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._anchor = None     # (instante monotónico, instante de medio)
+        self.error = None
+        self.stats = {"sent": 0, "overflow": 0, "underflow": 0, "resync": 0, "max_depth": 0}
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, flush=False):
+        """
+        Detiene el hilo.
+
+        Con flush=True envía antes lo que quede en cola, cada paquete a su
+        hora (stop() espera como mucho ese tiempo más un segundo); sin él,
+        lo pendiente se descarta.
+        """
+        with self._cond:
+            if not flush:
+                self._queue.clear()
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=1.0 + (len(self._queue) * self.interval if flush else 0))
+            self._thread = None
+
+    def submit(self, packet, media_time):
+        """
+        Encola un datagrama para enviarlo en su instante de medio.
+
+        Args:
+            packet: datagrama completo (ya sellado si hay cifrado)
+            media_time: posición del primer frame en segundos (timestamp / rate)
+        Lanza:
+            OSError: el último error de envío del hilo, para que el bucle de
+            captura lo trate como si hubiera fallado su propio sendto.
+        """
+        if self.error:
+            raise self.error
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.stats["overflow"] += 1
+                if self.policy == "newest":
+                    return
+                self._queue.popleft()
+            self._queue.append((packet, media_time))
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self._queue))
+            self._cond.notify()
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def summary(self):
+        """Texto breve con los contadores."""
+        s = self.stats
+        return (f"enviados {s['sent']}, descartados por cola llena {s['overflow']}, "
+                f"tardíos {s['underflow']}, resincronizaciones {s['resync']}, cola máx. {s['max_depth']}")
+
+    def _due(self, media_time, now):
+        """Hora de envío del paquete; reancla si llega tarde o el medio salta."""
+        if self._anchor is None:
+            self._anchor = (now + self.delay, media_time)
+        due = self._anchor[0] + (media_time - self._anchor[1])
+        if due < now - self.interval:
+            # La captura no ha llegado a tiempo: se retoma el ritmo desde ahora
+            self.stats["underflow"] += 1
+            self._anchor = (now + self.delay, media_time)
+            due = now + self.delay
+        elif due > now + self.delay + self.max_queue * self.interval:
+            # Salto hacia delante del timestamp (reinicio del stream, reloj nuevo)
+            self.stats["resync"] += 1
+            self._anchor = (now + self.delay, media_time)
+            due = now + self.delay
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                now = time.monotonic()
+                due = self._due(self._queue[0][1], now)
+                if due - now > SPIN_S:
+                    # Espera interrumpible: stop() o un descarte "oldest" cambian la cabeza.
+                    # Al despertar se vuelve a mirar la cola: puede estar vacía (stop sin
+                    # flush) o tener otra cabeza; con flush se sigue esperando a su hora
+                    self._cond.wait(due - now - SPIN_S)
+                    continue
+                packet = self._queue.popleft()[0]
+                backlog = len(self._queue)
+
+            while time.monotonic() < due:
+                pass
+            try:
+                self.sock.sendto(packet, self.address)
+            except OSError as e:
+                self.error = e
+                self._running = False
+                return
+            self.stats["sent"] += 1
+
+            # Cola por encima del retardo objetivo: el dispositivo va algo más rápido
+            if backlog * self.interval > self.delay and self._anchor:
+                self._anchor = (self._anchor[0] - DRIFT_GAIN * self.interval, self._anchor[1])
@@ -0,0 +1,1080 @@
+"""
+pipeline.py - Canalizaciones de emisión y recepción sin interfaz gráfica
+
+El bucle de captura y envío (TransmitterPipeline) y el de recepción y
+reproducción (ReceiverPipeline), cada uno en su propio hilo. No importan
+Tk ni Matplotlib: las interfaces (interface_emisor.py,
+interface_receptor.py) y el demonio (daemon.py) usan exactamente este
+código y solo cambian cómo se presentan los resultados:
+
+- control: state.ControlState con los parámetros que se ajustan en caliente
+  (ganancia, volumen, VAD, filtros), leído una vez por bloque.
+- log(mensaje) y status(mensaje, nivel): avisos para el usuario; `nivel`
+  es STATUS_OK, STATUS_WAIT o STATUS_STOPPED (la interfaz lo traduce a
+  colores). Se llaman desde el hilo de la canalización.
+- scope (analysis.SingleSlot) y analyzer (analysis.AudioAnalyzer):
+  opcionales, solo para los gráficos; sin ellos no se hace ese trabajo.
+- on_stopped(): al terminar el hilo, tras liberar socket y dispositivo.
+
+stats() retorna un diccionario con el estado y las medidas del stream
+(lo sirve la API de control del demonio), incluido el coste por nodo del
+grafo de procesado (dsp_graph.py, orden en DSP_GRAPH_CONFIG) en `dsp_us`.
+"""
+
+import socket
+import threading
+import time
+
+import numpy as np
+import pyaudio
+
+from config import (
+    AUDIO_CONFIG, AUDIO_PRESETS, CAPTURE_DSP_CONFIG, VAD_CONFIG, RECORDER_CONFIG, SOURCE_FILTER_CONFIG,
+    NET_CONFIG, PACING_CONFIG, STARTUP_CONFIG, FEEDBACK_CONFIG, DEVICE_CONFIG, LATENCY_CONFIG, DSP_GRAPH_CONFIG,
+    SHM_CONFIG
+)
+from protocol import (
+    PT_AUDIO, PT_CN, PT_AUDIO_RED, PT_SESSION, PT_FEEDBACK, CN_PAYLOAD, MAX_DATAGRAM, SAMPLE_FORMAT_NAMES,
+    FLAG_ENCRYPTED, FLAG_ADAPTED, HEADER_SIZE, SAMPLE_WIDTHS, new_stream_id, parse_packet
+)
+from dsp import decode_frames, encode_frames, mixdown, roll_in
+from resampler import StreamResampler
+from drift import DriftCompensator
+from vad import ComfortNoise
+from dsp_graph import VadNode, build_graph
+from aec import EchoCanceller
+from ring_recorder import RingRecorder
+from source_filter import DropLog, SourceFilter, parse_host_list
+from net_tuning import BatchReceiver, tune_socket, describe
+from net_addr import open_sender, bind_receiver, host_of, format_addr
+from net_interfaces import shared_inventory, max_udp_payload
+from shm_transport import ShmSocket, parse_local_host
+from secure import TAG_SIZE, replay_state_path
+from pacing import PacedSender
+from feedback import (
+    AdaptiveController, AdaptivePacketizer, ReceptionStats, build_report, parse_report, split_red_payload
+)
+from session import EmitterSession, ReceiverSession, STATE_ACTIVE, read_pending
+from audio_engine import stream_latency_ms
+from devices import DeviceInventory, DeviceFailover
+from state import ControlState, STATUS_OK, STATUS_WAIT, STATUS_STOPPED
+
+SCOPE_FRAMES = AUDIO_CONFIG["CHUNK"]   # muestras de la ventana del gráfico de señal
+RECORD_FORMATS = {width: fmt for fmt, width in SAMPLE_WIDTHS.items()}   # ancho de muestra -> formato del archivo
+
+
+def latency_profile(low_latency):
+    """(trama de red, búfer del dispositivo) en frames para el perfil elegido."""
+    if low_latency:
+        return LATENCY_CONFIG["NETWORK_FRAMES"], LATENCY_CONFIG["DEVICE_FRAMES"]
+    return AUDIO_CONFIG["CHUNK"], AUDIO_CONFIG["CHUNK"]
+
+
+def transmit_control():
+    """ControlState con los parámetros en caliente del emisor y sus valores iniciales."""
+    return ControlState(amplification=1.0, vad=VAD_CONFIG["ENABLED"],
+                        highpass=CAPTURE_DSP_CONFIG["HIGHPASS"],
+                        noise_suppression=CAPTURE_DSP_CONFIG["NOISE_SUPPRESSION"])
+
+
+def receive_control():
+    """ControlState con los parámetros en caliente del receptor y sus valores iniciales."""
+    return ControlState(amplification=1.0, volume=1.0)
+
+
+class _Pipeline:
+    """Hilo de trabajo y avisos comunes a emisión y recepción."""
+
+    def __init__(self, engine, inventory, control, log, status, scope, analyzer, on_stopped):
+        self.engine = engine
+        self.inventory = inventory or DeviceInventory(engine, host_api=LATENCY_CONFIG["HOST_API"])
+        self.control = control
+        self.log = log
+        self._status = status
+        self.scope = scope
+        self.analyzer = analyzer
+        self.on_stopped = on_stopped
+        self.thread = None
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self, timeout=None):
+        """Espera a que termine el hilo (p. ej. antes de cerrar el AudioEngine)."""
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def status(self, message, level):
+        if self._status:
+            self._status(message, level)
+
+    def _launch(self, target):
+        if self.running:
+            raise RuntimeError("La canalización ya está en marcha")
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def _publish(self, window, frames, rate):
+        """Entrega el bloque a los gráficos si los hay; retorna la nueva ventana."""
+        if self.scope is not None:
+            window = roll_in(window, mixdown(frames))
+            self.scope.put(window)
+        if self.analyzer is not None:
+            self.analyzer.submit(frames, rate)
+        return window
+
+    def _finished(self):
+        if self.on_stopped:
+            try:
+                self.on_stopped()
+            except Exception as e:
+                self.log(f"Error al notificar la detención: {e}")
+
+
+class TransmitterPipeline(_Pipeline):
+    """Captura del micrófono, procesado y envío UDP a un receptor."""
+
+    def __init__(self, engine, inventory=None, control=None, log=print, status=None,
+                 scope=None, analyzer=None, echo_canceller=None, on_stopped=None):
+        """
+        Args:
+            engine: audio_engine.AudioEngine (PyAudio y streams reutilizables)
+            inventory: devices.DeviceInventory (None = uno nuevo sobre `engine`)
+            control: ControlState de transmit_control() (None = uno nuevo)
+            echo_canceller: aec.EchoCanceller aplicado a la captura (modo full-duplex)
+        """
+        super().__init__(engine, inventory, control or transmit_control(), log, status,
+                         scope, analyzer, on_stopped)
+        self.echo_canceller = echo_canceller
+
+        self.CHANNELS = AUDIO_CONFIG["CHANNELS"]
+        self.RATE = AUDIO_CONFIG["RATE"]
+        self.FORMAT = AUDIO_CONFIG["FORMAT"]
+        self.CHUNK, self.device_frames = latency_profile(LATENCY_CONFIG["LOW_LATENCY"])
+        self.PORT = 5000
+        self.host = None
+        self.device_name = ""
+
+        self.stop_event = threading.Event()
+        self.cipher = None
+        self.capture_graph = None
+        self.controller = None
+        self.packetizer = None
+        self.session = None
+        self.peer = None
+        self.pacer = None
+        self.stream = None
+        self.input_latency_ms = 0.0
+        self.s = None
+
+    def prepare(self, device_name="", low_latency=False):
+        """Inicializa PortAudio y deja el micrófono abierto en reserva (arranque en ms)."""
+        self.engine.warm_up()
+        _, device_frames = latency_profile(low_latency)
+        self.engine.prepare(self.FORMAT, self.CHANNELS, self.RATE, device_frames, input=True,
+                            device=self.inventory.resolve(device_name, input=True))
+
+    def start(self, host, port=5000, preset=None, cipher=None, device_name="", low_latency=False):
+        """
+        Arranca la transmisión en su hilo.
+
+        Args:
+            host: receptor (IPv4, IPv6, nombre o grupo multicast; "shm:<canal>"
+                si está en este mismo equipo)
+            preset: clave de AUDIO_PRESETS (None = el primero)
+            cipher: secure.PacketCipher o None
+            device_name: micrófono ("" = predeterminado)
+            low_latency: perfil de baja latencia (LATENCY_CONFIG)
+        """
+        if self.running:
+            raise RuntimeError("La transmisión ya está en marcha")
+        # El formato se fija al iniciar; el receptor lo negocia por la cabecera
+        self.CHANNELS, self.RATE, self.FORMAT = AUDIO_PRESETS[preset or next(iter(AUDIO_PRESETS))]
+        self.CHUNK, self.device_frames = latency_profile(low_latency)
+        self.host, self.PORT = host, port
+        self.cipher = cipher
+        self.device_name = device_name
+
+        # Modo full-duplex: el cancelador de eco debe trabajar al formato de captura
+        if self.echo_canceller:
+            if (self.echo_canceller.rate, self.echo_canceller.channels) != (self.RATE, self.CHANNELS):
+                self.echo_canceller = EchoCanceller(self.RATE, self.CHANNELS)
+            else:
+                self.echo_canceller.reset()
+
+        # Grafo de la captura: eco, limpieza, VAD y ganancia (nodos activados en caliente con `control`)
+        self.capture_graph = build_graph(
+            DSP_GRAPH_CONFIG["CAPTURE"], self.RATE, self.CHANNELS, self.CHUNK,
+            echo_canceller=self.echo_canceller, highpass_hz=CAPTURE_DSP_CONFIG["HIGHPASS_HZ"],
+            hangover_ms=VAD_CONFIG["HANGOVER_MS"], gain_factors=("amplification",)
+        )
+
+        self.stop_event.clear()
+        self.log(f"Preparando transmisión a {format_addr((host, port))}...")
+        self._launch(self._run)
+
+    def stop(self, timeout=None):
+        """Pide la detención; el hilo libera socket y micrófono al salir."""
+        self.stop_event.set()
+        if timeout is not None:
+            self.join(timeout)
+
+    def stats(self):
+        """Estado y medidas de la transmisión."""
+        # Referencias locales: el hilo de transmisión las sustituye al arrancar y al parar
+        session, packetizer, controller, pacer = self.session, self.packetizer, self.controller, self.pacer
+        return {
+            "tipo": "emisor",
+            "activo": self.running,
+            "destino": format_addr((self.host, self.PORT)) if self.host else None,
+            "formato": {"canales": self.CHANNELS, "rate": self.RATE,
+                        "muestra": SAMPLE_FORMAT_NAMES.get(self.FORMAT, self.FORMAT)},
+            "trama_frames": self.CHUNK,
+            "bufer_dispositivo_frames": self.device_frames,
+            "latencia_dispositivo_ms": round(self.input_latency_ms, 1),
+            "sesion": session.state if session else None,
+            "paquetes": packetizer.seq if packetizer else 0,
+            "perfil": controller.describe() if controller else None,
+            "ritmo": pacer.summary() if pacer else None,
+            "dsp_us": self.capture_graph.costs() if self.capture_graph else None,
+            "segundos": round(time.monotonic() - self.started_at, 1) if self.running else 0,
+            "parametros": self.control.snapshot()._asdict(),
+        }
+
+    def on_device_retry(self, attempt, error, wait):
+        """Informa de que el micrófono aún no está disponible."""
+        if attempt == 1:
+            self.log(f"Micrófono no disponible ({error}), reintentando...")
+        self.status(f"Esperando micrófono (intento {attempt})...", STATUS_WAIT)
+
+    def log_latency(self):
+        """Informa de la latencia de captura conseguida: trama de red + dispositivo."""
+        frame_ms = self.CHUNK / self.RATE * 1000.0
+        device_ms = self.input_latency_ms = stream_latency_ms(self.stream, input=True)
+        self.log(
+            f"Latencia de captura: {frame_ms + device_ms:.1f} ms "
+            f"(trama {self.CHUNK} frames = {frame_ms:.1f} ms, dispositivo {device_ms:.1f} ms "
+            f"con búfer de {self.device_frames} frames)"
+        )
+
+    def _run(self):
+        try:
+            # Cuenta atrás opcional (STARTUP_CONFIG["DELAY_S"]) antes de abrir el micrófono
+            for i in range(int(STARTUP_CONFIG["DELAY_S"]), 0, -1):
+                self.status(f"Iniciando en {i} segundos...", STATUS_WAIT)
+                if self.stop_event.wait(1):
+                    return
+            if not self.stop_event.is_set():
+                self._transmit()
+        except Exception as e:
+            if not self.stop_event.is_set():
+                self.log(f"Error al iniciar transmisión: {e}")
+        finally:
+            self._cleanup()
+            self._finished()
+
+    def _transmit(self):
+        host = self.host
+        # Micrófono elegido, con respaldo si se desconecta durante la transmisión
+        failover = DeviceFailover(self.inventory, self.device_name, DEVICE_CONFIG["BACKUP_INPUT"],
+                                  input=True, channels=self.CHANNELS,
+                                  retry_s=DEVICE_CONFIG["RETRY_PREFERRED_S"],
+                                  rescan_s=DEVICE_CONFIG["RESCAN_S"], log=self.log)
+
+        def open_input(index):
+            return self.engine.open(self.FORMAT, self.CHANNELS, self.RATE, self.device_frames,
+                                    input=True, device=index)
+
+        # Abrir el micrófono en cuanto esté libre (reintentos con espera exponencial);
+        # si ya estaba abierto en reserva, solo se reanuda
+        started = time.perf_counter()
+        opened = self.engine.open_when_ready(
+            self.FORMAT, self.CHANNELS, self.RATE, self.device_frames, input=True, device=failover.current,
+            timeout=STARTUP_CONFIG["READY_TIMEOUT_S"], cancel=self.stop_event,
+            on_retry=self.on_device_retry
+        )
+        if opened is None:
+            return
+        self.stream, device_rate = opened
+        self.log(f"Micrófono listo en {(time.perf_counter() - started) * 1000:.0f} ms")
+        self.log_latency()
+        self.status("¡Transmisión iniciada!", STATUS_OK)
+        # Receptor en esta máquina ("shm:<canal>"): memoria compartida en lugar de UDP
+        channel = parse_local_host(host, self.PORT)
+        max_payload = None
+        # Lo que admite el transporte (datagrama UDP o ranura local) menos cabecera y etiqueta
+        datagram_limit = MAX_DATAGRAM if channel is None else min(MAX_DATAGRAM, SHM_CONFIG["SLOT_BYTES"])
+        payload_limit = datagram_limit - HEADER_SIZE - (TAG_SIZE if self.cipher else 0)
+        if channel is not None:
+            self.s = ShmSocket.connect(channel)
+            self.peer = (host, self.PORT)
+            self.log(f"Transporte local por memoria compartida (canal '{channel}')")
+        else:
+            # IPv4 o IPv6 según el destino (nombre, IP o grupo multicast)
+            self.s, self.peer = open_sender(host, self.PORT)
+            applied = tune_socket(self.s, sndbuf=NET_CONFIG["SNDBUF"], dscp=NET_CONFIG["DSCP"] or None)
+            self.log(f"Socket de envío: {describe(applied)}")
+            # Payload máximo sin fragmentar: MTU de la ruta menos IP, UDP, cabecera y etiqueta AEAD
+            if NET_CONFIG["MTU_AWARE"]:
+                mtu, interface = shared_inventory().path_mtu(self.peer)
+                max_payload = min(max_udp_payload(mtu, self.s.family), datagram_limit) - HEADER_SIZE
+                if self.cipher:
+                    max_payload -= TAG_SIZE
+                self.log(f"MTU hacia {format_addr(self.peer)}: {mtu} ({interface or 'interfaz desconocida'}), "
+                         f"payload máximo {max_payload} bytes")
+
+        # Si el micrófono no soporta la frecuencia del stream, convertir
+        def make_resampler(device_rate):
+            if device_rate == self.RATE:
+                return None
+            self.log(f"Micrófono a {device_rate} Hz, resampleando a {self.RATE} Hz")
+            return StreamResampler(device_rate, self.RATE, self.CHANNELS, AUDIO_CONFIG["RESAMPLE_QUALITY"])
+
+        resampler = make_resampler(device_rate)
+
+        timestamp = 0
+
+        # Empaquetado según los informes del receptor: tasa de bits, FEC y tamaño de trama
+        controller = None
+        if FEEDBACK_CONFIG["ADAPTIVE"]:
+            controller = AdaptiveController(self.RATE, self.FORMAT, self.CHUNK, log=self.log)
+        packetizer = AdaptivePacketizer(new_stream_id(), self.CHANNELS, self.FORMAT, self.RATE, self.CHUNK,
+                                        controller, AUDIO_CONFIG["RESAMPLE_QUALITY"], max_payload, payload_limit)
+        self.controller, self.packetizer = controller, packetizer
+        # Solo se atienden respuestas del receptor; con destino multicast no se
+        # espera ninguna (uno a muchos: sin sesión ni informes de feedback)
+        peer_ip = host_of(self.peer) if channel is None else None
+
+        # Sesión: saludo al receptor, vivacidad y pausa/reanudación si desaparece
+        self.session = EmitterSession(packetizer.stream_id, log=self.log)
+
+        # Envío a ritmo de reloj: las ráfagas del micrófono no llegan a la red
+        if PACING_CONFIG["ENABLED"]:
+            self.pacer = PacedSender(
+                self.s, self.peer, self.CHUNK / self.RATE,
+                max_queue=PACING_CONFIG["MAX_QUEUE"], policy=PACING_CONFIG["DROP_POLICY"],
+                delay_frames=PACING_CONFIG["DELAY_FRAMES"]
+            )
+            self.pacer.start()
+        pacer = self.pacer
+
+        # Supresión de silencios: en silencio solo se envía ruido de confort periódico
+        graph = self.capture_graph
+        vad_node = graph.find(VadNode)
+        keepalive_s = VAD_CONFIG["KEEPALIVE_MS"] / 1000.0
+        last_keepalive = 0.0
+        scope_window = np.zeros(SCOPE_FRAMES)
+
+        while not self.stop_event.is_set():
+            try:
+                try:
+                    data = self.stream.read(self.CHUNK, exception_on_overflow=False)
+                except OSError as e:
+                    # Micrófono desconectado: otro dispositivo sin cortar la sesión ni la numeración
+                    if self.stop_event.is_set():
+                        break
+                    self.engine.discard(self.stream)
+                    self.stream = None
+                    opened = failover.fail_over(open_input, e)
+                    if opened is None:
+                        self.log("No queda ningún micrófono disponible")
+                        break
+                    self.stream, device_rate = opened
+                    resampler = make_resampler(device_rate)
+                    self.log_latency()
+                    continue
+
+                # De vuelta al micrófono preferido en cuanto reaparece
+                try:
+                    restored = failover.try_restore(open_input, stream=self.stream)
+                except OSError:
+                    self.stream = None
+                    self.log("No queda ningún micrófono disponible")
+                    break
+                if restored:
+                    self.engine.release(self.stream)
+                    self.stream, device_rate = restored
+                    resampler = make_resampler(device_rate)
+                    self.log_latency()
+
+                params = self.control.snapshot()
+                graph.update(params)
+
+                frames = decode_frames(data, self.FORMAT, self.CHANNELS)
+                if resampler:
+                    frames = resampler.process(frames)
+                # Grafo in situ (el eco se cancela antes de cualquier etapa no lineal)
+                graph.process(frames)
+                scope_window = self._publish(scope_window, frames, self.RATE)
+                active = vad_node.active if vad_node else True
+
+                if not self.session.sending:
+                    # Receptor perdido: no se envía audio a ciegas, solo saludos
+                    packetizer.discard()
+                    outgoing = []
+                elif active:
+                    outgoing = packetizer.add(frames, timestamp)
+                    last_keepalive = 0.0
+                else:
+                    # Entrar en silencio: sale lo acumulado y luego ruido de confort periódico
+                    outgoing = packetizer.flush()
+                    if time.monotonic() - last_keepalive >= keepalive_s:
+                        noise_rms = vad_node.vad.noise_rms * params.amplification
+                        packet = packetizer.build(CN_PAYLOAD.pack(noise_rms), timestamp, PT_CN)
+                        outgoing.append((packet, timestamp))
+                        last_keepalive = time.monotonic()
+                timestamp += len(frames)
+
+                outgoing.extend((packet, None) for packet in self.session.poll())
+
+                for packet, packet_timestamp in outgoing:
+                    if self.cipher:
+                        packet = self.cipher.seal(packet)
+                    # Verificar que el socket aún es válido antes de enviar
+                    if not self.s or self.stop_event.is_set():
+                        break
+                    if pacer and packet_timestamp is not None:
+                        pacer.submit(packet, packet_timestamp / self.RATE)
+                    else:
+                        self.s.sendto(packet, self.peer)
+
+                # Mensajes del receptor: sesión e informes (pérdida, jitter, buffer) -> perfil de envío
+                for header, payload in read_pending(self.s, self.cipher, peer_ip):
+                    if self.session.on_packet(header, payload) and controller:
+                        # Receptor nuevo o reiniciado: no conoce el formato nominal
+                        controller.restart()
+                    if controller and header.ptype == PT_FEEDBACK:
+                        report = parse_report(payload)
+                        if report and report.stream_id == packetizer.stream_id:
+                            controller.on_report(report)
+
+            except socket.error as e:
+                if not self.stop_event.is_set():
+                    self.log(f"Error de socket durante transmisión: {e}")
+                break
+            except Exception as e:
+                if not self.stop_event.is_set():
+                    self.log(f"Error durante transmisión: {e}")
+                break
+
+    def _cleanup(self):
+        """Libera pacer, micrófono y socket (hilo de la canalización)."""
+        # Detener el envío a ritmo antes de cerrar el socket
+        if self.pacer:
+            self.pacer.stop()
+            self.log(f"Envío a ritmo: {self.pacer.summary()}")
+            self.pacer = None
+
+        # Parar el stream de audio y guardarlo para la próxima transmisión
+        if self.stream:
+            self.engine.release(self.stream)
+            self.stream = None
+
+        # Despedirse del receptor y cerrar socket
+        if self.s:
+            try:
+                if self.session and self.session.state == STATE_ACTIVE:
+                    bye = self.session.bye()
+                    self.s.sendto(self.cipher.seal(bye) if self.cipher else bye, self.peer)
+            except OSError:
+                pass
+            try:
+                self.s.close()
+                self.s = None
+            except Exception as e:
+                self.log(f"Error cerrando socket: {e}")
+        self.status("Detenido", STATUS_STOPPED)
+        self.log("Transmisión detenida.")
+
+
+class ReceiverPipeline(_Pipeline):
+    """Recepción UDP, jitter/deriva, grabación circular y reproducción."""
+
+    def __init__(self, engine, inventory=None, control=None, log=print, status=None,
+                 scope=None, analyzer=None, echo_reference=None, on_stopped=None):
+        """
+        Args:
+            engine: audio_engine.AudioEngine (PyAudio y streams reutilizables)
+            inventory: devices.DeviceInventory (None = uno nuevo sobre `engine`)
+            control: ControlState de receive_control() (None = uno nuevo)
+            echo_reference: callable(frames, rate) que recibe lo reproducido
+                (referencia del cancelador de eco en modo full-duplex)
+        """
+        super().__init__(engine, inventory, control or receive_control(), log, status,
+                         scope, analyzer, on_stopped)
+        self.echo_reference = echo_reference
+
+        # Configuración de audio
+        self.CHUNK = AUDIO_CONFIG["CHUNK"]
+        self.FORMAT = AUDIO_CONFIG["FORMAT"]
+        self.CHANNELS = AUDIO_CONFIG["CHANNELS"]
+        self.RATE = AUDIO_CONFIG["RATE"]
+        self.device_frames = self.CHUNK   # búfer del dispositivo (independiente de los paquetes recibidos)
+        self.output_latency_ms = 0.0
+
+        # Configuración de red
+        self.HOST = NET_CONFIG["BIND_HOST"]
+        self.PORT = 5000
+        self.multicast_group = ""   # grupo IPv4/IPv6 al que unirse ("" = solo unicast)
+        self.local_channel = ""     # canal de shm_transport en lugar de UDP ("" = red)
+
+        self.receiving = False
+        self.device_name = ""
+        self.failover = None
+        # La sesión sobrevive a los reinicios: al volver se avisa al último emisor
+        self.session = ReceiverSession(log=self.log)
+        self.stream = None
+        self.s = None
+        self.recorder = None
+        self.record_resampler = None
+        self.cipher = None
+        self.source_filter = None
+        self.resampler = None
+        self.device_rate = self.RATE
+        self.drift = None
+        self.playback_graph = None
+        self.playback_queue = []
+        self.output_capacity = 0
+        self.frames_played = 0
+        self.comfort_noise = None
+        self.comfort_noise_until = 0.0
+        self.negotiated = False   # ya llegó audio con cabecera: se descarta el PCM heredado
+        self.output_stream = None  # stream cuyo formato nominal tiene la salida (paquete sin FLAG_ADAPTED)
+        self.drop_log = DropLog(self.log)
+        self.recv_timeout = 1.0
+        self.scope_window = np.zeros(SCOPE_FRAMES)
+
+        # Canal de retorno: medidas del stream recibido e informes periódicos al emisor
+        self.reception_stats = ReceptionStats()
+        self.feedback_addr = None
+        self.feedback_stream_id = new_stream_id()
+        self.feedback_seq = 0
+        self.next_feedback = 0.0
+        self.adapted_resampler = None
+
+    def start(self, port=5000, cipher=None, allowed_hosts="", device_name="", low_latency=False, record=False,
+              local_channel="", multicast_group=""):
+        """
+        Arranca la recepción en su hilo.
+
+        Args:
+            cipher: secure.PacketCipher o None
+            allowed_hosts: emisores aceptados, separados por comas ("" = todos)
+            device_name: salida ("" = predeterminada)
+            low_latency: búfer corto en el dispositivo (LATENCY_CONFIG["DEVICE_FRAMES"])
+            record: grabación circular "últimos N minutos" (RECORDER_CONFIG)
+            local_channel: recibir de un emisor de esta máquina por memoria
+                compartida (su host es "shm:<canal>"); "" = UDP en `port`
+            multicast_group: recibir además un grupo multicast IPv4 o IPv6
+                (p. ej. "ff12::5000"; el emisor envía a ese grupo)
+        """
+        if self.running:
+            raise RuntimeError("La recepción ya está en marcha")
+        self.PORT = port
+        self.local_channel = local_channel
+        self.multicast_group = multicast_group
+        self.cipher = cipher
+        if cipher:
+            # Anti-repetición que sobrevive a reinicios del receptor (un archivo por puerto o canal)
+            cipher.persist_replay(replay_state_path(f"shm_{local_channel}" if local_channel else port))
+        self.source_filter = SourceFilter(
+            parse_host_list(allowed_hosts),
+            rate_bytes=SOURCE_FILTER_CONFIG["RATE_BYTES"],
+            burst_bytes=SOURCE_FILTER_CONFIG["BURST_BYTES"],
+            packet_cost=SOURCE_FILTER_CONFIG["PACKET_COST"],
+        )
+        if record:
+            self.open_recorder()
+        self.negotiated = False
+        self.output_stream = None
+        self.drop_log = DropLog(self.log)
+        self.device_name = device_name
+        self.device_frames = LATENCY_CONFIG["DEVICE_FRAMES"] if low_latency else self.CHUNK
+        self.receiving = True
+        self._launch(self.run_reception)
+
+    def stop(self, timeout=None):
+        """Pide la detención; el hilo libera socket y salida en su siguiente vuelta."""
+        self.receiving = False
+        if timeout is not None:
+            self.join(timeout)
+
+    def stats(self):
+        """Estado y medidas de la recepción."""
+        report = self.reception_stats.current(self.drift.latency_ms if self.drift else 0.0)
+        return {
+            "tipo": "receptor",
+            "activo": self.running,
+            "puerto": self.PORT,
+            "canal_local": self.local_channel or None,
+            "grupo_multicast": self.multicast_group or None,
+            "formato": {"canales": self.CHANNELS, "rate": self.RATE,
+                        "muestra": SAMPLE_FORMAT_NAMES.get(self.FORMAT, self.FORMAT)},
+            "bufer_dispositivo_frames": self.device_frames,
+            "latencia_ms": round((self.drift.latency_ms if self.drift else 0.0) + self.output_latency_ms, 1),
+            "latencia_dispositivo_ms": round(self.output_latency_ms, 1),
+            "deriva_ppm": round(self.drift.drift_ppm, 1) if self.drift else None,
+            "dsp_us": self.playback_graph.costs() if self.playback_graph else None,
+            "perdida": round(report.loss, 4),
+            "jitter_ms": round(report.jitter_ms, 2),
+            "recuperados": report.recovered,
+            "descartados": self.drop_log.total,
+            "sesion": self.session.state,
+            "emisor": format_addr(self.session.emitter_addr) if self.session.emitter_addr else None,
+            "filtro_origen": self.source_filter.summary() if self.source_filter else None,
+            "grabando": self.recorder is not None,
+            "segundos": round(time.monotonic() - self.started_at, 1) if self.running else 0,
+            "parametros": self.control.snapshot()._asdict(),
+        }
+
+    def open_socket(self):
+        """
+        Crea y liga el socket de recepción (o el canal local de memoria compartida).
+
+        Retorna:
+            BatchReceiver | None: receptor por lotes en modo alto rendimiento.
+        """
+        if self.local_channel:
+            self.s = ShmSocket.listen(self.local_channel)
+        else:
+            # Doble pila (IPv4 e IPv6) salvo dirección local concreta o grupo multicast
+            self.s = bind_receiver(self.PORT, self.HOST, self.multicast_group)
+        # Timeout para poder verificar self.receiving y, en silencios del
+        # emisor, generar ruido de confort al ritmo de un bloque
+        self.recv_timeout = min(1.0, self.CHUNK / self.RATE / 2)
+        self.s.settimeout(self.recv_timeout)
+        if self.local_channel:
+            self.log(f"Transporte local por memoria compartida (canal '{self.local_channel}')")
+        else:
+            applied = tune_socket(self.s, rcvbuf=NET_CONFIG["RCVBUF"],
+                                  busy_poll_us=NET_CONFIG["BUSY_POLL_US"])
+            group = f", grupo {self.multicast_group}" if self.multicast_group else ""
+            self.log(f"Socket de recepción en {format_addr(self.s.getsockname())}{group}: {describe(applied)}")
+
+        # Reanudación rápida: avisar al último emisor sin esperar a su siguiente saludo
+        self.send_session(self.session.resume())
+
+        # Modo alto rendimiento: lotes sobre buffers preasignados (sin un bytes por paquete)
+        if NET_CONFIG["HIGH_THROUGHPUT"]:
+            return BatchReceiver(self.s, NET_CONFIG["BATCH"], timeout=self.recv_timeout)
+        return None
+
+    def run_reception(self):
+        """Ejecuta el bucle principal de recepción."""
+        try:
+            started = time.perf_counter()
+            # Salida elegida, con respaldo si se desconecta durante la recepción
+            self.failover = DeviceFailover(self.inventory, self.device_name, DEVICE_CONFIG["BACKUP_OUTPUT"],
+                                           input=False, channels=self.CHANNELS,
+                                           retry_s=DEVICE_CONFIG["RETRY_PREFERRED_S"],
+                                           rescan_s=DEVICE_CONFIG["RESCAN_S"], log=self.log)
+            self.open_output_stream()
+            batch_receiver = self.open_socket()
+            self.log(f"Recepción lista en {(time.perf_counter() - started) * 1000:.0f} ms")
+            self.status("Escuchando...", STATUS_OK)
+            retry_wait = 0.1
+
+            while self.receiving:
+                try:
+                    if batch_receiver:
+                        for data, addr in batch_receiver.receive():
+                            self.receive_packet(data, addr)
+                    else:
+                        data, addr = self.s.recvfrom(MAX_DATAGRAM)
+                        self.receive_packet(data, addr)
+
+                        # Recoger lo que ya esté pendiente y reproducirlo de una vez:
+                        # así el nivel medido incluye lo acumulado en el socket
+                        self.drain_socket()
+                    self.play_queued()
+                    self.send_control()
+                    retry_wait = 0.1
+
+                except socket.timeout:
+                    # Silencio anunciado por el emisor: mantener el dispositivo con ruido de confort
+                    if time.monotonic() < self.comfort_noise_until:
+                        self.playback_queue.append(self.comfort_noise.generate(self.CHUNK))
+                        self.play_queued()
+                    self.send_control()
+                    # Timeout normal, continuar si aún estamos recibiendo
+                    continue
+                except socket.error as e:
+                    if not self.receiving:
+                        break
+                    # Error de red (interfaz caída, socket invalidado): reabrir y seguir
+                    self.log(f"Error de socket: {e}; reintentando en {retry_wait:.1f} s")
+                    try:
+                        self.s.close()
+                    except OSError:
+                        pass
+                    time.sleep(retry_wait)
+                    retry_wait = min(2.0, retry_wait * 2)
+                    try:
+                        batch_receiver = self.open_socket()
+                    except OSError as e:
+                        self.log(f"No se pudo reabrir el socket: {e}")
+
+        except Exception as e:
+            self.log(f"Error en recepción: {e}")
+        finally:
+            self.receiving = False
+            # El grabador se cierra desde este hilo, que es el único que escribe en él
+            self.close_recorder()
+            self.cleanup_resources()
+            self._finished()
+
+    def receive_packet(self, data, addr):
+        """handle_packet de un datagrama: si falla, se descarta ese paquete y la recepción sigue."""
+        try:
+            self.handle_packet(data, addr)
+        except Exception as e:
+            # Contado por motivo; el log recibe como mucho un resumen cada pocos segundos
+            self.drop_log.add(e)
+
+    def handle_packet(self, data, addr):
+        """Decodifica un datagrama y encola sus frames para reproducción."""
+        # Origen no permitido o por encima de su tasa: descartar sin más trabajo
+        if not self.source_filter.allow(addr, data):
+            return
+        # Con clave: descartar lo no autenticado antes de cualquier procesado
+        if self.cipher:
+            data = self.cipher.open(data)
+            if data is None:
+                return
+        header, payload = parse_packet(data, self.RATE)
+        if header.ptype == PT_SESSION:
+            self.send_session((reply, addr) for reply in self.session.on_control(payload, addr))
+            return
+        if header.ptype not in (PT_AUDIO, PT_CN, PT_AUDIO_RED):
+            return
+        if header.flags & FLAG_ENCRYPTED and not self.cipher:
+            return  # cifrado y sin clave configurada
+        # PCM heredado sin cabecera: solo mientras no haya un stream negociado
+        if header.stream_id is None:
+            if self.negotiated:
+                return
+        else:
+            self.negotiated = True
+
+        # Renegociar la salida si el emisor cambió de formato (no si solo lo
+        # rebajó el control adaptativo: entonces se resamplea al rate actual)
+        adapted = header.flags & FLAG_ADAPTED
+        if not adapted:
+            self.ensure_output_format(header.channels, header.rate, header.sample_format)
+            self.output_stream = header.stream_id
+            self.adapted_resampler = None
+        elif header.stream_id != self.output_stream or header.channels != self.CHANNELS:
+            # Rebajado de un stream cuyo formato nominal aún no se conoce (receptor
+            # recién arrancado): se descarta hasta el primer paquete sin rebajar
+            return
+
+        # Pérdida y jitter para el informe al emisor (timestamps en frames del stream)
+        lost = 0
+        if header.seq is not None:
+            lost = self.reception_stats.on_packet(header.stream_id, header.seq, header.timestamp,
+                                                  self.RATE, time.monotonic())
+            self.feedback_addr = addr
+            self.session.on_media(addr, header.stream_id)
+
+        if header.ptype == PT_CN:
+            # El emisor está en silencio: generar ruido de confort hasta nuevo aviso
+            if len(payload) >= CN_PAYLOAD.size:
+                self.comfort_noise.level = CN_PAYLOAD.unpack_from(payload)[0]
+            self.comfort_noise_until = time.monotonic() + VAD_CONFIG["CN_TIMEOUT_MS"] / 1000.0
+            if self.recorder:
+                self.recorder.flush_pending()   # el último tramo de voz, con su hora real
+            return
+        self.comfort_noise_until = 0.0
+
+        # Redundancia: si se perdió justo el paquete anterior, su copia viene en este
+        if header.ptype == PT_AUDIO_RED:
+            payload, redundant = split_red_payload(payload)
+            if lost == 1 and len(redundant):
+                self.reception_stats.recovered += 1
+                self.enqueue_frames(redundant, header, adapted, position=None)
+
+        self.enqueue_frames(payload, header, adapted, header.timestamp)
+
+    def enqueue_frames(self, payload, header, adapted, position=None):
+        """
+        Decodifica un bloque y lo encola para reproducción al formato de la salida.
+
+        `position` (timestamp del paquete, en frames) permite al grabador
+        reunir los fragmentos de un bloque; None = continúa lo anterior.
+        """
+        frames = decode_frames(payload, header.sample_format, header.channels)
+        if adapted and header.rate != self.RATE:
+            if self.adapted_resampler is None or self.adapted_resampler.in_rate != header.rate:
+                self.adapted_resampler = StreamResampler(header.rate, self.RATE, self.CHANNELS,
+                                                         AUDIO_CONFIG["RESAMPLE_QUALITY"])
+            frames = self.adapted_resampler.process(frames)
+
+        # Guardar el bloque recibido en el buffer circular; los fragmentos de un
+        # mismo bloque se reúnen en una ranura completa
+        if self.recorder:
+            self.record_frames(frames, None if adapted else payload, position)
+
+        self.scope_window = self._publish(self.scope_window, frames, self.RATE)
+        self.playback_queue.append(frames)
+
+    def record_frames(self, frames, payload, position):
+        """
+        Escribe en el buffer circular al formato del archivo, que se conserva
+        aunque el emisor cambie de formato (así no se pierde la historia).
+
+        `payload`: PCM recibido tal cual (se escribe sin convertir si el formato
+        coincide) o None para codificar `frames`.
+        """
+        recorder = self.recorder
+        if payload is not None and (recorder.channels, recorder.rate, recorder.sample_width) == (
+                self.CHANNELS, self.RATE, SAMPLE_WIDTHS.get(self.FORMAT)):
+            recorder.append(payload, position)
+            return
+
+        if frames.shape[1] != recorder.channels:
+            frames = np.repeat(frames.mean(axis=1, keepdims=True), recorder.channels, axis=1)
+        if recorder.rate != self.RATE:
+            if self.record_resampler is None or self.record_resampler.in_rate != self.RATE:
+                self.record_resampler = StreamResampler(self.RATE, recorder.rate, recorder.channels,
+                                                        AUDIO_CONFIG["RESAMPLE_QUALITY"])
+            frames = self.record_resampler.process(frames)
+            if position is not None:
+                position = position * recorder.rate // self.RATE
+        sample_format = RECORD_FORMATS.get(recorder.sample_width, self.FORMAT)
+        recorder.append(encode_frames(frames, sample_format), position)
+
+    def send_control(self):
+        """Keepalives de sesión e informe periódico al emisor."""
+        self.send_session(self.session.poll())
+        self.send_feedback()
+
+    def send_session(self, messages):
+        """Envía mensajes de sesión [(datagrama, dirección), ...], sellados si hay clave."""
+        for packet, addr in messages:
+            try:
+                self.s.sendto(self.cipher.seal(packet) if self.cipher else packet, addr)
+            except OSError:
+                pass  # el emisor repite su saludo; el keepalive siguiente lo sustituye
+
+    def send_feedback(self):
+        """Envía al emisor el informe de pérdida, jitter y buffer cada FEEDBACK_CONFIG["INTERVAL_MS"]."""
+        now = time.monotonic()
+        if not FEEDBACK_CONFIG["ENABLED"] or self.feedback_addr is None or now < self.next_feedback:
+            return
+        self.next_feedback = now + FEEDBACK_CONFIG["INTERVAL_MS"] / 1000.0
+        packet = build_report(self.feedback_stream_id, self.feedback_seq,
+                              self.reception_stats.report(self.drift.latency_ms))
+        self.feedback_seq += 1
+        if self.cipher:
+            packet = self.cipher.seal(packet)
+        try:
+            self.s.sendto(packet, self.feedback_addr)
+        except OSError:
+            pass  # el informe es prescindible: el siguiente lo sustituye
+
+    def drain_socket(self, max_packets=64):
+        """Lee sin bloquear los datagramas ya recibidos por el sistema."""
+        self.s.settimeout(0.0)
+        try:
+            for _ in range(max_packets):
+                data, addr = self.s.recvfrom(MAX_DATAGRAM)
+                self.receive_packet(data, addr)
+        except BlockingIOError:
+            pass
+        finally:
+            self.s.settimeout(self.recv_timeout)
+
+    def output_fill_frames(self):
+        """Frames escritos en el dispositivo de salida y aún no reproducidos."""
+        available = self.stream.get_write_available()
+        self.output_capacity = max(self.output_capacity, available)
+        fill = self.output_capacity - available
+        # Expresado en frames del stream (antes del resampler de dispositivo)
+        return fill / self.resampler.ratio if self.resampler else fill
+
+    def play_queued(self):
+        """Reproduce la cola manteniendo la latencia fija frente a la deriva de reloj."""
+        if not self.playback_queue:
+            return
+        frames = np.concatenate(self.playback_queue) if len(self.playback_queue) > 1 else self.playback_queue[0]
+        self.playback_queue.clear()
+
+        # Nivel pendiente = lo que vamos a escribir + lo que queda en el dispositivo
+        try:
+            fill = self.output_fill_frames()
+        except OSError as e:
+            self.fail_over_output(e)
+            return
+        drop = self.drift.update(len(frames) + fill, len(frames))
+        if drop:
+            frames = frames[min(drop, len(frames)):]
+            self.log(f"Latencia excesiva: descartados {drop} frames")
+
+        # Grafo de reproducción in situ; deriva y resampleo cambian la longitud y van después
+        self.playback_graph.update(self.control.snapshot())
+        self.playback_graph.process(frames)
+        frames = self.drift.process(frames)
+        if self.resampler:
+            frames = self.resampler.process(frames)
+
+        # Reproducir audio; un error aquí es del dispositivo, no de la red
+        try:
+            self.stream.write(encode_frames(frames, self.FORMAT))
+        except OSError as e:
+            self.fail_over_output(e)
+            return
+        if self.echo_reference:
+            self.echo_reference(frames, self.device_rate)
+
+        self.frames_played += len(frames)
+        if self.frames_played >= self.RATE * 10:
+            self.frames_played = 0
+            self.log(
+                f"Latencia receptor: {self.drift.latency_ms + self.output_latency_ms:.0f} ms "
+                f"(cola {self.drift.latency_ms:.0f} ms + dispositivo {self.output_latency_ms:.0f} ms), "
+                f"deriva estimada: {self.drift.drift_ppm:+.0f} ppm"
+            )
+            if self.source_filter.dropped:
+                self.log(f"Filtro de origen: {self.source_filter.summary()}")
+
+        # De vuelta a la salida preferida en cuanto reaparece
+        try:
+            restored = self.failover.try_restore(self.open_output_device, stream=self.stream)
+        except OSError:
+            self.stream = None
+            raise RuntimeError("No queda ningún dispositivo de salida disponible")
+        if restored:
+            self.engine.release(self.stream)
+            self.configure_output(*restored)
+
+    def fail_over_output(self, error):
+        """Salida desconectada: continuar en otro dispositivo sin cortar la sesión."""
+        self.engine.discard(self.stream)
+        self.stream = None
+        opened = self.failover.fail_over(self.open_output_device, error)
+        if opened is None:
+            raise RuntimeError("No queda ningún dispositivo de salida disponible")
+        self.configure_output(*opened)
+
+    def open_output_device(self, index):
+        """Stream de salida al formato actual en el dispositivo `index` (None = predeterminado)."""
+        return self.engine.open(self.FORMAT, self.CHANNELS, self.RATE, self.device_frames,
+                                output=True, device=index)
+
+    def open_output_stream(self):
+        """Abre la salida al formato actual en el dispositivo elegido."""
+        self.configure_output(*self.open_output_device(self.failover.current))
+
+    def configure_output(self, stream, device_rate):
+        """Adopta un stream de salida, resampleando si el dispositivo usa otra frecuencia."""
+        self.stream = stream
+        self.device_rate = device_rate
+        self.resampler = None
+        if device_rate != self.RATE:
+            self.resampler = StreamResampler(self.RATE, device_rate, self.CHANNELS,
+                                             AUDIO_CONFIG["RESAMPLE_QUALITY"])
+            self.log(f"Salida a {device_rate} Hz, resampleando desde {self.RATE} Hz")
+        self.output_latency_ms = stream_latency_ms(stream, input=False)
+        self.log(f"Latencia del dispositivo de salida: {self.output_latency_ms:.1f} ms "
+                 f"(búfer de {self.device_frames} frames)")
+
+        # Nuevo dispositivo/formato: reiniciar la medida de latencia y deriva
+        self.playback_queue = []
+        self.output_capacity = 0
+        self.frames_played = 0
+        self.drift = DriftCompensator(self.RATE, self.CHANNELS)
+        self.playback_graph = build_graph(DSP_GRAPH_CONFIG["PLAYBACK"], self.RATE, self.CHANNELS,
+                                          DSP_GRAPH_CONFIG["PLAYBACK_BLOCK"],
+                                          gain_factors=("amplification", "volume"))
+        self.adapted_resampler = None
+        self.comfort_noise = ComfortNoise(self.CHANNELS)
+
+    def ensure_output_format(self, channels, rate, sample_format):
+        """Reabre el stream de salida si el formato recibido no coincide con el actual."""
+        if (channels, rate, sample_format) == (self.CHANNELS, self.RATE, self.FORMAT):
+            return
+
+        self.log(
+            f"Formato recibido: {channels} canal(es), {rate} Hz, "
+            f"{SAMPLE_FORMAT_NAMES.get(sample_format, sample_format)}"
+        )
+        if self.stream:
+            self.engine.release(self.stream)
+            self.stream = None
+
+        self.CHANNELS, self.RATE, self.FORMAT = channels, rate, sample_format
+        self.failover.channels = channels
+        self.open_output_stream()
+
+        # El archivo circular conserva su formato: record_frames convierte al suyo
+        self.record_resampler = None
+
+    def open_recorder(self):
+        """Abre (o reanuda) el archivo de grabación circular."""
+        if self.recorder:
+            return
+        try:
+            # Un archivo válido se reutiliza con su formato (no se trunca la historia)
+            # salvo que haya cambiado la duración configurada
+            try:
+                self.recorder = RingRecorder.open_existing(RECORDER_CONFIG["PATH"])
+                if self.recorder.capacity != self.recorder.capacity_for(RECORDER_CONFIG["MINUTES"]):
+                    self.recorder.close()
+                    self.recorder = None
+                    self.log(f"Duración de la grabación cambiada a {RECORDER_CONFIG['MINUTES']} min: "
+                             f"se recrea {RECORDER_CONFIG['PATH']}")
+            except (OSError, ValueError):
+                self.recorder = None
+            if self.recorder is None:
+                self.recorder = RingRecorder.for_duration(
+                    RECORDER_CONFIG["PATH"],
+                    RECORDER_CONFIG["MINUTES"],
+                    self.CHUNK,
+                    rate=self.RATE,
+                    channels=self.CHANNELS,
+                    sample_width=pyaudio.get_sample_size(self.FORMAT)
+                )
+            self.log(f"Grabación circular activa: {RECORDER_CONFIG['PATH']} ({len(self.recorder)} bloques previos)")
+        except Exception as e:
+            self.recorder = None
+            self.log(f"Error abriendo grabación circular: {e}")
+
+    def close_recorder(self):
+        """Sincroniza y cierra el archivo de grabación circular."""
+        if self.recorder:
+            try:
+                self.recorder.close()
+            except Exception as e:
+                self.log(f"Error cerrando grabación circular: {e}")
+            self.recorder = None
+
+    def cleanup_resources(self):
+        """Limpia los recursos de audio y red (hilo de la canalización)."""
+        # Parar el stream de audio y guardarlo para la próxima recepción
+        if self.stream:
+            stream, self.stream = self.stream, None
+            self.engine.release(stream)
+
+        # Despedirse del emisor y cerrar socket
+        if self.s:
+            self.send_session(self.session.bye())
+            try:
+                self.s.close()
+                self.s = None
+            except Exception as e:
+                self.log(f"Error cerrando socket: {e}")
+
+        if self.source_filter and self.source_filter.dropped:
+            self.log(f"Filtro de origen: {self.source_filter.summary()}")
+        if self.drop_log.total:
+            self.log(f"Paquetes descartados al procesar: {self.drop_log.summary()}")
+        if self.cipher and (self.cipher.stats["rejected"] or self.cipher.stats["replayed"]):
+            self.log(f"Paquetes descartados por autenticación: {self.cipher.stats['rejected']}, "
+                     f"repetidos: {self.cipher.stats['replayed']}")
+        if self.cipher:
+            self.cipher.close_replay()
+        self.status("Detenido", STATUS_STOPPED)
+        self.log("Recepción detenida.")
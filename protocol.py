@@ -0,0 +1,148 @@
+"""
+protocol.py - Formato de los paquetes UDP de audio
+
+Cada datagrama empieza con una cabecera fija que describe el audio que
+transporta, de modo que el receptor negocia el formato a partir del propio
+stream (canales, frecuencia y formato de muestra) sin configuración previa.
+
+Cabecera (28 bytes, orden de red):
+    magic        2s   b"MR"
+    version      B
+    tipo         B    PT_AUDIO, PT_CN, PT_AUDIO_RED, PT_FEEDBACK, PT_SESSION
+    flags        B
+    canales      B
+    formato      B    valor sampleFormat de PortAudio (paInt16=8, paInt24=4, paFloat32=1)
+    reservado    B
+    rate         I    frecuencia de muestreo (Hz)
+    stream_id    I    identificador aleatorio del emisor
+    seq          I    número de secuencia del paquete
+    timestamp    Q    frames capturados desde el inicio del stream
+
+En los tipos de control (PT_FEEDBACK, PT_SESSION) no viaja audio: canales,
+formato y rate van a 0 y el receptor no los interpreta.
+
+Los datagramas sin cabecera (emisores antiguos) se interpretan como PCM
+int16 mono crudo.
+"""
+
+import os
+import struct
+from collections import namedtuple
+
+MAGIC = b"MR"
+VERSION = 1
+
+HEADER = struct.Struct("!2sBBBBBxIIIQ")
+HEADER_SIZE = HEADER.size
+
+# Tipos de paquete
+PT_AUDIO = 0
+PT_CN = 1        # ruido de confort / keepalive durante silencios (payload: CN_PAYLOAD)
+PT_AUDIO_RED = 2    # audio + copia del bloque anterior (payload: RED_HEADER, primario, redundante)
+PT_FEEDBACK = 3     # informe del receptor al emisor (payload: FEEDBACK_PAYLOAD)
+PT_SESSION = 4      # saludo/keepalive/despedida de la sesión (payload: SESSION_PAYLOAD, ver session.py)
+
+# Tipos que transportan audio: canales, formato y rate de la cabecera describen el payload
+AUDIO_PTYPES = frozenset((PT_AUDIO, PT_CN, PT_AUDIO_RED))
+# Tipos de control: los campos de formato de la cabecera no se interpretan
+CONTROL_PTYPES = frozenset((PT_FEEDBACK, PT_SESSION))
+
+# Flags
+FLAG_ENCRYPTED = 0x01   # payload cifrado y cabecera autenticada (ver secure.py)
+FLAG_ADAPTED = 0x02     # formato/rate rebajados por el control adaptativo: no renegociar la salida
+FLAGS_OFFSET = 4        # posición del byte de flags dentro de la cabecera
+
+# Payload de PT_CN: nivel RMS del ruido de fondo (float, escala [-1, 1])
+CN_PAYLOAD = struct.Struct("!f")
+
+# Payload de PT_AUDIO_RED: longitud del bloque primario; el resto es el bloque seq - 1
+RED_HEADER = struct.Struct("!I")
+
+# Payload de PT_FEEDBACK: stream informado, seq más alto, pérdida (0-1),
+# jitter (ms), nivel del buffer de reproducción (ms), bloques recuperados
+FEEDBACK_PAYLOAD = struct.Struct("!IIfffI")
+
+# Payload de PT_SESSION: tipo de mensaje y stream_id de audio al que se refiere
+SESSION_PAYLOAD = struct.Struct("!BI")
+
+# Formatos de muestra (mismos valores que las constantes de PortAudio/PyAudio)
+FMT_FLOAT32 = 1
+FMT_INT24 = 4
+FMT_INT16 = 8
+
+SAMPLE_WIDTHS = {
+    FMT_INT16: 2,
+    FMT_INT24: 3,
+    FMT_FLOAT32: 4,
+}
+
+SAMPLE_FORMAT_NAMES = {
+    FMT_INT16: "16 bits",
+    FMT_INT24: "24 bits",
+    FMT_FLOAT32: "float32",
+}
+
+# Tamaño máximo de un datagrama UDP sobre IPv4
+MAX_DATAGRAM = 65507
+
+# Formatos que acepta el receptor (lo demás es un datagrama corrupto o malicioso)
+SUPPORTED_RATES = frozenset((8000, 11025, 16000, 22050, 24000, 32000, 44100, 48000, 88200, 96000, 176400, 192000))
+MAX_CHANNELS = 8
+
+PacketHeader = namedtuple(
+    "PacketHeader",
+    ["ptype", "flags", "channels", "sample_format", "rate", "stream_id", "seq", "timestamp"]
+)
+
+
+def new_stream_id():
+    """Genera un identificador de stream aleatorio de 32 bits."""
+    return struct.unpack("!I", os.urandom(4))[0]
+
+
+def frame_bytes(channels, sample_format):
+    """Bytes que ocupa un frame (una muestra por canal)."""
+    return channels * SAMPLE_WIDTHS[sample_format]
+
+
+def build_packet(payload, seq, timestamp, stream_id, channels, sample_format, rate,
+                 ptype=PT_AUDIO, flags=0):
+    """Antepone la cabecera al payload y retorna el datagrama completo."""
+    header = HEADER.pack(MAGIC, VERSION, ptype, flags, channels, sample_format,
+                         rate, stream_id, seq & 0xFFFFFFFF, timestamp)
+    return header + bytes(payload)
+
+
+def build_control_packet(payload, seq, stream_id, ptype, flags=0):
+    """Datagrama de control (PT_FEEDBACK, PT_SESSION): cabecera sin formato de audio."""
+    return build_packet(payload, seq, 0, stream_id, 0, 0, 0, ptype=ptype, flags=flags)
+
+
+def parse_packet(data, default_rate=44100):
+    """
+    Separa cabecera y payload de un datagrama.
+
+    Retorna:
+        tuple: (PacketHeader, memoryview del payload). Para datagramas sin
+        cabecera se devuelve una cabecera sintética int16 mono con
+        `stream_id`, `seq` y `timestamp` a None.
+
+    Lanza:
+        ValueError: cabecera "MR" de otra versión, de tipo desconocido o,
+            en los tipos de audio, con canales, rate o formato de muestra
+            no soportados.
+    """
+    view = memoryview(data)
+    if len(view) >= HEADER_SIZE and view[:2] == MAGIC:
+        magic, version, ptype, flags, channels, fmt, rate, stream_id, seq, timestamp = HEADER.unpack_from(view)
+        if version != VERSION:
+            raise ValueError(f"Versión de protocolo no soportada: {version}")
+        if ptype in AUDIO_PTYPES:
+            if fmt not in SAMPLE_WIDTHS or not 1 <= channels <= MAX_CHANNELS or rate not in SUPPORTED_RATES:
+                raise ValueError(f"Cabecera no válida: {channels} canal(es), {rate} Hz, formato {fmt}")
+        elif ptype not in CONTROL_PTYPES:
+            raise ValueError(f"Tipo de paquete desconocido: {ptype}")
+        header = PacketHeader(ptype, flags, channels, fmt, rate, stream_id, seq, timestamp)
+        return header, view[HEADER_SIZE:]
+    # Paquete heredado: PCM int16 mono sin cabecera
+    return PacketHeader(PT_AUDIO, 0, 1, FMT_INT16, default_rate, None, None, None), view
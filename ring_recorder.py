@@ -0,0 +1,320 @@
+"""
+ring_recorder.py - Grabador circular en memoria mapeada ("últimos N minutos")
+
+Guarda los bloques PCM recibidos en un archivo de tamaño fijo mapeado en
+memoria. El archivo contiene:
+- Cabecera: parámetros de audio y contador de escrituras (posición de cabeza)
+- Índice: por cada ranura, número de secuencia, marca de tiempo y longitud
+- Datos: ranuras de tamaño fijo con el PCM de cada bloque
+
+append() reúne en una ranura completa los fragmentos de un bloque que llegó
+repartido en varios paquetes (MTU) y parte en varias ranuras los bloques
+mayores que una ranura, de modo que cada ranura dura siempre lo mismo.
+
+Como el mapeo es compartido con el sistema operativo, lo escrito sobrevive a
+un cierre inesperado del proceso: al reabrir el archivo se recupera la cabeza
+y se puede reproducir lo grabado. open_existing(path, readonly=True) abre un
+segundo mapeo de solo lectura para exportar mientras el receptor sigue
+escribiendo en el suyo. La búsqueda de una posición es O(1) porque
+cada escritura ocupa siempre la ranura `n % capacidad`.
+
+Uso (reproducir los últimos 30 segundos de una grabación):
+    python ring_recorder.py grabacion_receptor.ring --desde 30
+"""
+
+import argparse
+import os
+import struct
+import time
+import wave
+
+import numpy as np
+
+MAGIC = b"MRRING01"
+VERSION = 1
+
+# magic, versión, ranuras, bytes por ranura, rate, canales, ancho de muestra, cabeza
+HEADER_FORMAT = "<8sIIIIHHQ"
+HEADER_SIZE = 64
+HEAD_OFFSET = struct.calcsize(HEADER_FORMAT) - 8
+
+INDEX_DTYPE = np.dtype([
+    ("seq", "<u8"),        # número de secuencia del paquete
+    ("timestamp", "<f8"),  # time.time() de llegada
+    ("length", "<u4"),     # bytes válidos en la ranura (0 = ranura vacía/incompleta)
+    ("_pad", "<u4"),
+])
+
+
+class RingRecorder:
+    """Buffer circular persistente de bloques PCM sobre un archivo mmap."""
+
+    def __init__(self, path, slot_bytes, capacity, rate=44100, channels=1, sample_width=2, readonly=False):
+        """
+        Abre (o crea) el archivo circular.
+
+        Args:
+            path: ruta del archivo
+            slot_bytes: tamaño máximo de un bloque (bytes)
+            capacity: número de ranuras del buffer
+            rate, channels, sample_width: formato del PCM almacenado
+            readonly: mapeo de solo lectura (el archivo debe existir con esa geometría)
+
+        Si el archivo existe con los mismos parámetros se reutiliza y se
+        conserva su contenido; si no coincide, se recrea.
+        """
+        self.path = path
+        self.slot_bytes = int(slot_bytes)
+        self.capacity = int(capacity)
+        self.rate = int(rate)
+        self.channels = int(channels)
+        self.sample_width = int(sample_width)
+        self.readonly = readonly
+
+        index_bytes = self.capacity * INDEX_DTYPE.itemsize
+        self._index_offset = HEADER_SIZE
+        self._data_offset = HEADER_SIZE + index_bytes
+        total_size = self._data_offset + self.capacity * self.slot_bytes
+
+        mode = "r+" if self._matches_existing(total_size) else "w+"
+        if readonly:
+            if mode == "w+":
+                raise ValueError(f"{path} no es un archivo de grabación circular válido")
+            mode = "r"
+        self._map = np.memmap(path, dtype=np.uint8, mode=mode, shape=(total_size,))
+
+        self.index = self._map[self._index_offset:self._data_offset].view(INDEX_DTYPE)
+        self.data = self._map[self._data_offset:].reshape(self.capacity, self.slot_bytes)
+        # Cabeza (número total de escrituras) como vista u64 sobre la cabecera
+        self._head = self._map[HEAD_OFFSET:HEAD_OFFSET + 8].view("<u8")
+
+        if mode == "w+":
+            self._write_header()
+
+        # PCM pendiente de completar una ranura (append) y posición que lo continúa
+        self._pending = np.zeros(self.slot_bytes, dtype=np.uint8)
+        self._pending_bytes = 0
+        self._next_position = None
+
+    @classmethod
+    def for_duration(cls, path, minutes, chunk, rate=44100, channels=1, sample_width=2):
+        """Crea un grabador dimensionado para `minutes` minutos de bloques de `chunk` frames."""
+        slot_bytes = chunk * channels * sample_width
+        capacity = max(1, int(minutes * 60 * rate / chunk))
+        return cls(path, slot_bytes, capacity, rate, channels, sample_width)
+
+    def capacity_for(self, minutes):
+        """Ranuras necesarias para `minutes` minutos con la duración de ranura de este archivo."""
+        return max(1, int(minutes * 60 * self.rate * self.channels * self.sample_width / self.slot_bytes))
+
+    @classmethod
+    def open_existing(cls, path, readonly=False):
+        """Abre un archivo circular existente con la geometría y el formato de su cabecera."""
+        with open(path, "rb") as f:
+            header = f.read(struct.calcsize(HEADER_FORMAT))
+        try:
+            magic, version, capacity, slot_bytes, rate, channels, width, _ = struct.unpack(HEADER_FORMAT, header)
+        except struct.error:
+            raise ValueError(f"{path} no es un archivo de grabación circular válido") from None
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} no es un archivo de grabación circular válido")
+        return cls(path, slot_bytes, capacity, rate, channels, width, readonly)
+
+    def _matches_existing(self, total_size):
+        """Comprueba si el archivo existente tiene la misma geometría."""
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) != total_size:
+            return False
+        with open(self.path, "rb") as f:
+            header = f.read(struct.calcsize(HEADER_FORMAT))
+        try:
+            magic, version, capacity, slot_bytes, rate, channels, width, _ = struct.unpack(HEADER_FORMAT, header)
+        except struct.error:
+            return False
+        return (magic == MAGIC and version == VERSION and capacity == self.capacity
+                and slot_bytes == self.slot_bytes and rate == self.rate
+                and channels == self.channels and width == self.sample_width)
+
+    def _write_header(self):
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, self.capacity, self.slot_bytes,
+                             self.rate, self.channels, self.sample_width, 0)
+        self._map[:len(header)] = np.frombuffer(header, dtype=np.uint8)
+        self._map.flush()
+
+    @property
+    def head(self):
+        """Número total de bloques escritos desde la creación del archivo."""
+        return int(self._head[0])
+
+    @property
+    def oldest(self):
+        """Número de escritura del bloque más antiguo aún disponible."""
+        return max(0, self.head - self.capacity)
+
+    def __len__(self):
+        return self.head - self.oldest
+
+    def write(self, payload, seq=None, timestamp=None):
+        """
+        Escribe un bloque en la siguiente ranura.
+
+        `payload` puede ser bytes, memoryview o un array NumPy: se copia una
+        única vez, directamente del buffer de recepción al mapa.
+        """
+        src = np.frombuffer(payload, dtype=np.uint8)
+        n = min(src.size, self.slot_bytes)
+        write_no = self.head
+        slot = write_no % self.capacity
+
+        index = self.index
+        index["length"][slot] = 0  # invalidar antes de escribir (consistencia ante caídas)
+        self.data[slot, :n] = src[:n]
+        index["seq"][slot] = write_no if seq is None else seq
+        index["timestamp"][slot] = time.time() if timestamp is None else timestamp
+        index["length"][slot] = n
+        self._head[0] = write_no + 1
+        return write_no
+
+    def append(self, payload, position=None, tolerance=32):
+        """
+        Añade PCM continuo; escribe una ranura cada `slot_bytes` completos.
+
+        Args:
+            payload: PCM al formato del archivo (bytes, memoryview o array)
+            position: posición en frames del primer frame de `payload`
+                (timestamp del paquete); None = continúa lo anterior
+            tolerance: frames de desfase aceptados como continuidad (resampleo)
+
+        Si `position` no continúa lo pendiente (pérdida, silencio, otro
+        stream), lo pendiente se escribe antes en una ranura parcial.
+        """
+        src = np.frombuffer(payload, dtype=np.uint8)
+        frame_bytes = self.channels * self.sample_width
+        if (position is not None and self._next_position is not None
+                and abs(position - self._next_position) > tolerance):
+            self.flush_pending()
+        if position is not None:
+            self._next_position = position
+        if self._next_position is not None:
+            self._next_position += src.size // frame_bytes
+
+        offset = 0
+        while offset < src.size:
+            n = min(self.slot_bytes - self._pending_bytes, src.size - offset)
+            self._pending[self._pending_bytes:self._pending_bytes + n] = src[offset:offset + n]
+            self._pending_bytes += n
+            offset += n
+            if self._pending_bytes == self.slot_bytes:
+                self.flush_pending()
+
+    def flush_pending(self):
+        """Escribe lo pendiente de append() aunque no complete una ranura."""
+        if self._pending_bytes:
+            self.write(self._pending[:self._pending_bytes])
+            self._pending_bytes = 0
+
+    def read(self, write_no):
+        """Devuelve (seq, timestamp, memoryview) del bloque `write_no`, o None si ya no está."""
+        if not self.oldest <= write_no < self.head:
+            return None
+        entry = self.index[write_no % self.capacity]
+        length = int(entry["length"])
+        if length == 0:
+            return None
+        return int(entry["seq"]), float(entry["timestamp"]), memoryview(self.data[write_no % self.capacity, :length])
+
+    def seek_seconds_ago(self, seconds):
+        """
+        Número de escritura correspondiente a `seconds` segundos antes de la cabeza.
+
+        Estimación O(1) a partir de la duración de ranura, corregida con las
+        marcas de tiempo vecinas.
+        """
+        if len(self) == 0:
+            return self.head
+        slot_seconds = self.slot_bytes / (self.rate * self.channels * self.sample_width)
+        target = self.head - int(round(seconds / slot_seconds))
+        target = min(max(target, self.oldest), self.head - 1)
+
+        # Ajuste acotado usando las marcas de tiempo reales (huecos sin audio)
+        newest = self.read(self.head - 1)
+        if newest is not None:
+            wanted = newest[1] - seconds
+            for _ in range(8):
+                current = self.read(target)
+                if current is None or current[1] <= wanted or target <= self.oldest:
+                    break
+                target = max(self.oldest, target - max(1, int((current[1] - wanted) / slot_seconds)))
+        return target
+
+    def iter_blocks(self, start=None):
+        """Itera (seq, timestamp, memoryview) desde `start` hasta la cabeza al empezar."""
+        write_no = self.oldest if start is None else max(start, self.oldest)
+        end = self.head   # con otro proceso o hilo escribiendo, no perseguir la cabeza
+        while write_no < end:
+            block = self.read(write_no)
+            if block is not None:
+                yield block
+            write_no += 1
+
+    def replay(self, stream, start=None):
+        """Reproduce en un stream PyAudio de salida desde `start` hasta la cabeza."""
+        for _, _, block in self.iter_blocks(start):
+            stream.write(bytes(block))
+
+    def export_wav(self, path, start=None):
+        """Exporta a WAV los bloques desde `start`. Retorna el número de bloques escritos."""
+        count = 0
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(self.channels)
+            wav.setsampwidth(self.sample_width)
+            wav.setframerate(self.rate)
+            for _, _, block in self.iter_blocks(start):
+                wav.writeframes(block)
+                count += 1
+        return count
+
+    def flush(self):
+        """Fuerza la escritura del mapa a disco."""
+        self._map.flush()
+
+    def close(self):
+        """Sincroniza y libera el mapa."""
+        if self._map is not None:
+            if not self.readonly:
+                self.flush_pending()
+                self._map.flush()
+            # Sin vistas ni memmap que lo referencien, NumPy libera el mapeo
+            # (los bloques aún en manos de quien leyó lo retienen hasta soltarlos)
+            del self.index, self.data, self._head
+            self._map = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduce o exporta una grabación circular.")
+    parser.add_argument("archivo", help="archivo .ring del receptor")
+    parser.add_argument("--desde", type=float, default=60.0, help="segundos antes del final (defecto: 60)")
+    parser.add_argument("--wav", help="exportar a WAV en lugar de reproducir")
+    args = parser.parse_args()
+
+    recorder = RingRecorder.open_existing(args.archivo, readonly=True)
+    start = recorder.seek_seconds_ago(args.desde)
+    try:
+        if args.wav:
+            blocks = recorder.export_wav(args.wav, start)
+            print(f"Exportados {blocks} bloques a {args.wav}")
+        else:
+            import pyaudio
+            p = pyaudio.PyAudio()
+            stream = p.open(format=p.get_format_from_width(recorder.sample_width),
+                            channels=recorder.channels, rate=recorder.rate, output=True)
+            try:
+                print(f"Reproduciendo {recorder.head - start} bloques...")
+                recorder.replay(stream, start)
+            except KeyboardInterrupt:
+                print("\nReproducción detenida.")
+            finally:
+                stream.stop_stream()
+                stream.close()
+                p.terminate()
+    finally:
+        recorder.close()
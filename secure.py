@@ -0,0 +1,286 @@
+"""
+secure.py - Cifrado autenticado (AEAD) opcional de los paquetes de audio
+
+Con una clave compartida, cada datagrama se cifra con ChaCha20-Poly1305:
+- La cabecera de protocol.py viaja en claro (el receptor la necesita para
+  negociar el formato) pero va autenticada como datos asociados, con el
+  flag FLAG_ENCRYPTED activo.
+- El payload se cifra y se le añade la etiqueta de 16 bytes.
+- El nonce es stream_id + seq, único por paquete mientras la clave y el
+  stream no se repitan (cada sesión del emisor genera un stream_id nuevo).
+- Una ventana deslizante por stream (como la de IPsec) descarta paquetes
+  repetidos o demasiado antiguos antes de descifrar, y solo avanza con
+  paquetes que pasan la autenticación.
+- Los receptores llaman a persist_replay(path): el seq más alto de cada
+  stream se guarda en un archivo mapeado en memoria (ReplayStore, una
+  escritura en memoria por paquete que sobrevive a un cierre inesperado
+  del proceso). Tras reiniciar, lo capturado antes del reinicio sigue
+  siendo una repetición. Se recuerdan los STATE_SLOTS streams más recientes.
+
+El receptor llama a PacketCipher.open() nada más leer el datagrama: lo que
+no se autentica se descarta antes de cualquier decodificación o DSP.
+
+La clave se deriva de una frase compartida con PBKDF2-HMAC-SHA256 (stdlib).
+El cifrado usa el paquete opcional `cryptography`; sin él la aplicación
+funciona igual, pero sin cifrado.
+
+Uso (coste por paquete):
+    python secure.py --bench
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+from protocol import HEADER, HEADER_SIZE, MAGIC, FLAG_ENCRYPTED, FLAGS_OFFSET
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+    from cryptography.exceptions import InvalidTag
+except ImportError:
+    ChaCha20Poly1305 = None
+    InvalidTag = Exception
+
+KEY_SALT = b"micro_remoto/aead/v1"
+KDF_ITERATIONS = 200_000
+TAG_SIZE = 16
+NONCE = struct.Struct("!4xII")   # 12 bytes: relleno + stream_id + seq
+MAX_STREAMS = 256                # ventanas de repetición guardadas a la vez
+
+STATE_MAGIC = b"MRREPLAY"
+STATE_HEADER = struct.Struct("<8sI4x")   # magic, siguiente ranura a reutilizar
+STATE_RECORD = struct.Struct("<III")     # stream_id, ocupada, seq más alto autenticado
+STATE_SLOTS = 4096
+REPLAY_STATE_PATH = "anti_repeticion_{}.bin"   # un archivo por puerto (o canal) de recepción
+
+
+def crypto_available():
+    """True si el paquete `cryptography` está instalado."""
+    return ChaCha20Poly1305 is not None
+
+
+def cipher_from_passphrase(passphrase):
+    """PacketCipher para la frase dada, o None si está vacía (sin cifrado)."""
+    passphrase = (passphrase or "").strip()
+    return PacketCipher(passphrase) if passphrase else None
+
+
+def replay_state_path(name):
+    """Archivo de estado anti-repetición del receptor `name` (puerto o canal local)."""
+    return REPLAY_STATE_PATH.format(name)
+
+
+def derive_key(passphrase):
+    """Deriva una clave de 32 bytes a partir de una frase compartida."""
+    return hashlib.pbkdf2_hmac("sha256", passphrase.encode("utf-8"), KEY_SALT, KDF_ITERATIONS, 32)
+
+
+class ReplayWindow:
+    """Ventana anti-repetición de `size` números de secuencia (mapa de bits)."""
+
+    def __init__(self, size=64, highest=None):
+        """`highest`: seq ya visto (estado guardado); él y todo lo anterior cuentan como recibidos."""
+        self.size = size
+        self.highest = highest
+        self.bitmap = 0 if highest is None else (1 << size) - 1
+
+    def check(self, seq):
+        """True si seq es nuevo y no está por detrás de la ventana."""
+        if self.highest is None or seq > self.highest:
+            return True
+        offset = self.highest - seq
+        return offset < self.size and not (self.bitmap >> offset) & 1
+
+    def update(self, seq):
+        """Marca seq como recibido (solo tras autenticar el paquete)."""
+        if self.highest is None:
+            self.highest, self.bitmap = seq, 1
+        elif seq > self.highest:
+            shift = seq - self.highest
+            self.bitmap = ((self.bitmap << shift) | 1) & ((1 << self.size) - 1) if shift < self.size else 1
+            self.highest = seq
+        else:
+            self.bitmap |= 1 << (self.highest - seq)
+
+
+class ReplayStore:
+    """Seq más alto autenticado por stream, en un archivo mapeado en memoria."""
+
+    def __init__(self, path, slots=STATE_SLOTS):
+        """Abre (o crea, si no existe o no es válido) el archivo de estado."""
+        self.path = path
+        self.slots = slots
+        size = STATE_HEADER.size + slots * STATE_RECORD.size
+        if not self._valid(path, size):
+            with open(path, "wb") as f:
+                f.write(STATE_HEADER.pack(STATE_MAGIC, 0))
+                f.write(bytes(size - STATE_HEADER.size))
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._next = STATE_HEADER.unpack_from(self._map)[1] % slots
+        self._index = {}   # stream_id -> ranura
+        for slot in range(slots):
+            stream_id, used, _ = STATE_RECORD.unpack_from(self._map, self._offset(slot))
+            if used:
+                self._index[stream_id] = slot
+
+    @staticmethod
+    def _valid(path, size):
+        if not os.path.isfile(path) or os.path.getsize(path) != size:
+            return False
+        with open(path, "rb") as f:
+            return f.read(len(STATE_MAGIC)) == STATE_MAGIC
+
+    @staticmethod
+    def _offset(slot):
+        return STATE_HEADER.size + slot * STATE_RECORD.size
+
+    def get(self, stream_id):
+        """Seq más alto guardado de `stream_id`, o None si no se conoce."""
+        slot = self._index.get(stream_id)
+        if slot is None:
+            return None
+        return STATE_RECORD.unpack_from(self._map, self._offset(slot))[2]
+
+    def put(self, stream_id, seq):
+        """Guarda el seq más alto de `stream_id`; un stream nuevo reutiliza la ranura más antigua."""
+        slot = self._index.get(stream_id)
+        if slot is None:
+            slot = self._next
+            old_id, used, _ = STATE_RECORD.unpack_from(self._map, self._offset(slot))
+            if used:
+                self._index.pop(old_id, None)
+            self._index[stream_id] = slot
+            self._next = (slot + 1) % self.slots
+            STATE_HEADER.pack_into(self._map, 0, STATE_MAGIC, self._next)
+        STATE_RECORD.pack_into(self._map, self._offset(slot), stream_id, 1, seq)
+
+    def close(self):
+        """Sincroniza y cierra el archivo."""
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+
+class PacketCipher:
+    """Sella y abre datagramas completos (cabecera + payload)."""
+
+    def __init__(self, key):
+        """
+        Args:
+            key: clave de 32 bytes o frase compartida (str)
+        """
+        if not crypto_available():
+            raise RuntimeError("Cifrado no disponible: instala el paquete 'cryptography'")
+        if isinstance(key, str):
+            key = derive_key(key)
+        self._aead = ChaCha20Poly1305(key)
+        self._windows = {}
+        self._store = None
+        self.stats = {"sealed": 0, "opened": 0, "rejected": 0, "replayed": 0}
+
+    def persist_replay(self, path):
+        """Conserva en `path` el seq más alto de cada stream para rechazar repeticiones tras un reinicio."""
+        self.close_replay()
+        self._store = ReplayStore(path)
+
+    def close_replay(self):
+        """Cierra el archivo de persist_replay() (el estado ya está escrito)."""
+        if self._store:
+            self._store.close()
+            self._store = None
+
+    def seal(self, packet):
+        """Cifra el payload de un datagrama de build_packet() y autentica su cabecera."""
+        header = bytearray(packet[:HEADER_SIZE])
+        header[FLAGS_OFFSET] |= FLAG_ENCRYPTED
+        fields = HEADER.unpack_from(header)
+        nonce = NONCE.pack(fields[7], fields[8])
+        self.stats["sealed"] += 1
+        return bytes(header) + self._aead.encrypt(nonce, bytes(packet[HEADER_SIZE:]), bytes(header))
+
+    def open(self, data):
+        """
+        Verifica y descifra un datagrama recibido.
+
+        Retorna:
+            bytes | None: datagrama en claro (cabecera + payload) o None si no
+            está cifrado, no se autentica o es una repetición.
+        """
+        if (len(data) < HEADER_SIZE + TAG_SIZE or data[:2] != MAGIC
+                or not data[FLAGS_OFFSET] & FLAG_ENCRYPTED):
+            self.stats["rejected"] += 1
+            return None
+
+        fields = HEADER.unpack_from(data)
+        stream_id, seq = fields[7], fields[8]
+        window = self._windows.get(stream_id)
+        if window is None and self._store:
+            # Stream visto antes de reiniciar: lo ya autenticado entonces es repetición
+            saved = self._store.get(stream_id)
+            if saved is not None:
+                window = ReplayWindow(highest=saved)
+        if window and not window.check(seq):
+            self.stats["replayed"] += 1
+            return None
+
+        header = bytes(data[:HEADER_SIZE])
+        try:
+            payload = self._aead.decrypt(NONCE.pack(stream_id, seq), bytes(data[HEADER_SIZE:]), header)
+        except InvalidTag:
+            self.stats["rejected"] += 1
+            return None
+
+        if stream_id not in self._windows:
+            if len(self._windows) >= MAX_STREAMS:
+                self._windows.pop(next(iter(self._windows)))
+            window = self._windows[stream_id] = window or ReplayWindow()
+        window.update(seq)
+        if self._store and window.highest == seq:
+            self._store.put(stream_id, seq)
+        self.stats["opened"] += 1
+        return header + payload
+
+
+def benchmark(payload_bytes=4096, packets=20000):
+    """Mide el coste de sellar + abrir un paquete (µs)."""
+    from protocol import build_packet, FMT_INT16
+
+    cipher = PacketCipher(bytes(32))
+    receiver = PacketCipher(bytes(32))
+    payload = bytes(payload_bytes)
+    sealed = [cipher.seal(build_packet(payload, seq, 0, 1, 1, FMT_INT16, 44100)) for seq in range(packets)]
+
+    start = time.perf_counter()
+    for seq in range(packets):
+        cipher.seal(build_packet(payload, seq, 0, 1, 1, FMT_INT16, 44100))
+    seal_us = (time.perf_counter() - start) / packets * 1e6
+
+    start = time.perf_counter()
+    for data in sealed:
+        receiver.open(data)
+    open_us = (time.perf_counter() - start) / packets * 1e6
+    return seal_us, open_us
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cifrado AEAD de paquetes de audio.")
+    parser.add_argument("--bench", action="store_true", help="ejecutar benchmark")
+    args = parser.parse_args()
+
+    if not args.bench:
+        parser.print_help()
+    elif not crypto_available():
+        print("Instala 'cryptography' para usar el cifrado.")
+    else:
+        # Tamaños típicos: 2048 frames mono int16 (46 ms) y 2048 frames estéreo float32
+        for payload_bytes, rate_pps in ((4096, 44100 / 2048), (16384, 48000 / 2048), (1920, 50)):
+            seal_us, open_us = benchmark(payload_bytes)
+            load = (seal_us + open_us) * rate_pps / 1e6 * 100
+            print(f"payload {payload_bytes:6d} B: sellar {seal_us:6.1f} µs, abrir {open_us:6.1f} µs "
+                  f"-> {load:.3f} % de un núcleo a {rate_pps:.1f} paquetes/s")
@@ -0,0 +1,262 @@
+"""
+session.py - Sesión emisor-receptor: saludo, keepalives, vivacidad y reanudación
+
+UDP no tiene conexión: sin esta capa el emisor no sabe si alguien escucha
+y, si el receptor se reinicia, nada restablece la sesión. Mensajes
+PT_SESSION (payload SESSION_PAYLOAD: tipo de mensaje + stream_id de audio
+al que se refieren), con identificador y numeración propios para no
+consumir números de secuencia del audio ni repetir nonces con cifrado:
+
+- HELLO (emisor -> receptor): se repite con espera exponencial
+  (HELLO_MIN_S .. HELLO_MAX_S) mientras no hay sesión activa.
+- ACCEPT (receptor -> emisor): respuesta al HELLO. Al reiniciar la
+  recepción, el receptor lo envía sin esperar al último emisor conocido:
+  la reanudación es inmediata.
+- KEEPALIVE (receptor -> emisor): cada KEEPALIVE_S; los informes de
+  feedback.py también cuentan como señal de vida.
+- BYE: cualquiera de los dos al detenerse.
+
+Emisor: conectando -> activa -> perdida. Mientras nunca ha contestado
+nadie sigue enviando audio (receptores antiguos sin sesión, p. ej.
+cmd_receptor.py); si un receptor que sí contestaba deja de hacerlo durante
+LIVENESS_S o se despide, el audio se pausa y solo salen HELLO hasta que
+vuelva. Receptor: detecta la pérdida del emisor por silencio de la red.
+"""
+
+import time
+
+from net_addr import host_of, format_addr
+from net_tuning import wait_readable
+from protocol import (
+    PT_SESSION, PT_FEEDBACK, SESSION_PAYLOAD, MAX_DATAGRAM, build_control_packet, new_stream_id, parse_packet
+)
+
+# Mensajes
+MSG_HELLO = 1
+MSG_ACCEPT = 2
+MSG_KEEPALIVE = 3
+MSG_BYE = 4
+
+# Estados
+STATE_CONNECTING = "conectando"
+STATE_ACTIVE = "activa"
+STATE_LOST = "perdida"
+
+HELLO_MIN_S = 0.1
+HELLO_MAX_S = 1.0       # tope de la espera: un receptor reiniciado se recupera en <= 1 s
+KEEPALIVE_S = 1.0
+LIVENESS_S = 3.0
+
+
+def read_pending(sock, cipher=None, peer_ip=None, max_packets=8):
+    """
+    Lee sin bloquear los datagramas de control pendientes en un socket de envío.
+
+    Retorna:
+        list: [(PacketHeader, payload), ...] autenticados si hay cifrado.
+    """
+    packets = []
+    try:
+        for _ in range(max_packets):
+            if not wait_readable(sock, 0):
+                break
+            data, addr = sock.recvfrom(MAX_DATAGRAM)
+            if peer_ip and host_of(addr) != peer_ip:
+                continue
+            if cipher:
+                data = cipher.open(data)
+                if data is None:
+                    continue
+            try:
+                packets.append(parse_packet(data))
+            except ValueError:
+                continue   # cabecera corrupta: se descarta solo ese datagrama
+    except OSError:
+        # Socket aún sin ligar o ICMP "puerto inalcanzable" (Windows): nada que leer
+        pass
+    return packets
+
+
+class _SessionEndpoint:
+    """Identificador y numeración propios de los mensajes de sesión."""
+
+    def __init__(self):
+        self.session_id = new_stream_id()
+        self._seq = 0
+
+    def message(self, msg, stream_id):
+        """Datagrama PT_SESSION (sin cifrar) con el mensaje `msg` sobre `stream_id`."""
+        packet = build_control_packet(SESSION_PAYLOAD.pack(msg, stream_id & 0xFFFFFFFF), self._seq,
+                                      self.session_id, PT_SESSION)
+        self._seq += 1
+        return packet
+
+    @staticmethod
+    def unpack(payload):
+        """(mensaje, stream_id) de un payload PT_SESSION, o None si está mal formado."""
+        if len(payload) < SESSION_PAYLOAD.size:
+            return None
+        return SESSION_PAYLOAD.unpack_from(payload)
+
+
+class EmitterSession(_SessionEndpoint):
+    """Estado de la sesión en el emisor."""
+
+    def __init__(self, stream_id, liveness_s=LIVENESS_S, log=print):
+        """
+        Args:
+            stream_id: stream de audio del emisor (el receptor lo devuelve en ACCEPT)
+            liveness_s: silencio del receptor tras el que se da por perdido
+        """
+        super().__init__()
+        self.stream_id = stream_id
+        self.liveness_s = liveness_s
+        self.log = log
+        self.state = STATE_CONNECTING
+        self.last_heard = None
+        self._hello_wait = HELLO_MIN_S
+        self._next_hello = 0.0
+
+    @property
+    def sending(self):
+        """False mientras un receptor con sesión se ha perdido: no enviar audio a ciegas."""
+        return self.state != STATE_LOST
+
+    def poll(self, now=None):
+        """
+        Comprueba la vivacidad y retorna los mensajes que toca enviar.
+
+        Retorna:
+            list: datagramas PT_SESSION (sin cifrar).
+        """
+        now = time.monotonic() if now is None else now
+        if self.state == STATE_ACTIVE and now - self.last_heard > self.liveness_s:
+            self._lose(f"Receptor sin respuesta desde hace {now - self.last_heard:.1f} s: audio en pausa")
+        if self.state == STATE_ACTIVE or now < self._next_hello:
+            return []
+        self._next_hello = now + self._hello_wait
+        self._hello_wait = min(HELLO_MAX_S, self._hello_wait * 2)
+        return [self.message(MSG_HELLO, self.stream_id)]
+
+    def on_packet(self, header, payload, now=None):
+        """
+        Procesa un datagrama de control del receptor.
+
+        Retorna:
+            bool: True si la sesión se acaba de (re)establecer.
+        """
+        now = time.monotonic() if now is None else now
+        if header.ptype == PT_FEEDBACK:
+            if self.state == STATE_ACTIVE:
+                self.last_heard = now
+            return False
+        if header.ptype != PT_SESSION:
+            return False
+        fields = self.unpack(payload)
+        if not fields or fields[1] != self.stream_id:
+            return False
+
+        msg = fields[0]
+        if msg == MSG_BYE:
+            if self.state == STATE_ACTIVE:
+                self._lose("El receptor se ha detenido: audio en pausa hasta que vuelva")
+            return False
+        if msg in (MSG_ACCEPT, MSG_KEEPALIVE):
+            self.last_heard = now
+            if msg == MSG_ACCEPT and self.state != STATE_ACTIVE:
+                resumed = self.state == STATE_LOST
+                self.state = STATE_ACTIVE
+                self._hello_wait = HELLO_MIN_S
+                self.log("Sesión reanudada con el receptor" if resumed else "Sesión establecida con el receptor")
+                return True
+        return False
+
+    def bye(self):
+        """Mensaje de despedida al detener la transmisión."""
+        return self.message(MSG_BYE, self.stream_id)
+
+    def _lose(self, reason):
+        self.state = STATE_LOST
+        self._hello_wait = HELLO_MIN_S
+        self._next_hello = 0.0
+        self.log(reason)
+
+
+class ReceiverSession(_SessionEndpoint):
+    """Estado de la sesión en el receptor; sobrevive a los reinicios de la recepción."""
+
+    def __init__(self, liveness_s=LIVENESS_S, log=print):
+        super().__init__()
+        self.liveness_s = liveness_s
+        self.log = log
+        self.emitter_addr = None
+        self.emitter_stream = None
+        self.state = STATE_CONNECTING
+        self.last_heard = None
+        self._next_keepalive = 0.0
+
+    def on_control(self, payload, addr, now=None):
+        """
+        Procesa un PT_SESSION del emisor.
+
+        Retorna:
+            list: respuestas (datagramas sin cifrar) para `addr`.
+        """
+        fields = self.unpack(payload)
+        if not fields:
+            return []
+        msg, stream_id = fields
+        if msg == MSG_HELLO:
+            self.on_media(addr, stream_id, now)
+            return [self.message(MSG_ACCEPT, stream_id)]
+        if msg == MSG_BYE and stream_id == self.emitter_stream:
+            self.state = STATE_LOST
+            self.log("El emisor ha terminado la sesión")
+        return []
+
+    def on_media(self, addr, stream_id, now=None):
+        """Registra tráfico del emisor (audio, ruido de confort o HELLO)."""
+        self.last_heard = time.monotonic() if now is None else now
+        if self.state != STATE_ACTIVE or (addr, stream_id) != (self.emitter_addr, self.emitter_stream):
+            self.log(f"Emisor activo: {format_addr(addr)}")
+            self._next_keepalive = 0.0
+        self.emitter_addr, self.emitter_stream = addr, stream_id
+        self.state = STATE_ACTIVE
+
+    def poll(self, now=None):
+        """
+        Comprueba la vivacidad del emisor y retorna los keepalives pendientes.
+
+        Retorna:
+            list: [(datagrama, dirección), ...] sin cifrar.
+        """
+        now = time.monotonic() if now is None else now
+        if self.state != STATE_ACTIVE:
+            return []
+        if now - self.last_heard > self.liveness_s:
+            self.state = STATE_LOST
+            self.log(f"Sin paquetes del emisor desde hace {now - self.last_heard:.1f} s")
+            return []
+        if now < self._next_keepalive:
+            return []
+        self._next_keepalive = now + KEEPALIVE_S
+        return [(self.message(MSG_KEEPALIVE, self.emitter_stream), self.emitter_addr)]
+
+    def resume(self):
+        """
+        ACCEPT espontáneo al último emisor conocido (al reiniciar la recepción),
+        para que reanude sin esperar a su siguiente HELLO.
+
+        Retorna:
+            list: [(datagrama, dirección)] o vacía si no hay emisor conocido.
+        """
+        if self.emitter_addr is None:
+            return []
+        return [(self.message(MSG_ACCEPT, self.emitter_stream), self.emitter_addr)]
+
+    def bye(self):
+        """Despedida al último emisor conocido al detener la recepción."""
+        if self.emitter_addr is None or self.state != STATE_ACTIVE:
+            return []
+        self.state = STATE_CONNECTING
+        return [(self.message(MSG_BYE, self.emitter_stream), self.emitter_addr)]
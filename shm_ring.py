@@ -0,0 +1,158 @@
+"""
+shm_ring.py - Buffer circular de bloques PCM en memoria compartida entre procesos
+
+Un productor y un consumidor en procesos distintos (p. ej. un proceso de
+decodificación y el mezclador de workers.py) intercambian bloques float32
+sin pickle, sin colas del sistema y sin bloqueos. La memoria
+(multiprocessing.shared_memory) contiene:
+- Cabecera: magic, número de ranuras, frames máximos y canales
+- Contadores: escrituras (y descartes), que solo toca el productor, y
+  lecturas, que solo toca el consumidor; cada uno en su propia línea de
+  caché para que los dos procesos no se la disputen
+- Ranuras: por cada una, clave (u32, p. ej. el stream_id), frames válidos
+  (u32) y el PCM (frames máximos x canales, float32)
+
+El productor copia el bloque en la ranura `escrituras % ranuras` y solo
+después avanza su contador; el consumidor lee hasta ese contador y después
+avanza el suyo. Los contadores son enteros de 8 bytes alineados y nunca
+retroceden. Con el buffer lleno write() descarta el bloque y lo cuenta: el
+productor (hilo de red) nunca espera al consumidor.
+"""
+
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MAGIC = b"MRSHMR01"
+
+# magic, ranuras, frames máximos por ranura, canales
+HEADER_FORMAT = "<8sIII"
+CACHE_LINE = 64
+WRITE_OFFSET = CACHE_LINE          # escrituras (u64) y descartes (u64): productor
+READ_OFFSET = 2 * CACHE_LINE       # lecturas (u64): consumidor
+SLOTS_OFFSET = 3 * CACHE_LINE
+SLOT_HEADER = 8                    # clave u32 + frames u32
+
+
+def _slot_bytes(max_frames, channels):
+    size = SLOT_HEADER + max_frames * channels * 4
+    return (size + CACHE_LINE - 1) // CACHE_LINE * CACHE_LINE
+
+
+class ShmRing:
+    """Buffer circular SPSC de bloques (clave, frames float32) en memoria compartida."""
+
+    def __init__(self, shm, owner):
+        """Usar ShmRing.create() en el proceso que lo crea y ShmRing.attach() en el otro."""
+        self._shm = shm
+        self.owner = owner
+        magic, slots, max_frames, channels = struct.unpack_from(HEADER_FORMAT, shm.buf)
+        if magic != MAGIC:
+            raise ValueError(f"'{shm.name}' no es un buffer circular compartido")
+        self.slots = slots
+        self.max_frames = max_frames
+        self.channels = channels
+
+        buf = shm.buf
+        slot_bytes = _slot_bytes(max_frames, channels)
+        self._counters = np.ndarray((2,), dtype="<u8", buffer=buf, offset=WRITE_OFFSET)
+        self._read = np.ndarray((1,), dtype="<u8", buffer=buf, offset=READ_OFFSET)
+        self._meta = np.ndarray((slots, 2), dtype="<u4", buffer=buf, offset=SLOTS_OFFSET,
+                                strides=(slot_bytes, 4))
+        self._data = np.ndarray((slots, max_frames, channels), dtype="<f4", buffer=buf,
+                                offset=SLOTS_OFFSET + SLOT_HEADER, strides=(slot_bytes, channels * 4, 4))
+
+    @classmethod
+    def create(cls, slots, max_frames, channels, name=None):
+        """Reserva la memoria compartida; el creador es quien la libera con unlink()."""
+        size = SLOTS_OFFSET + slots * _slot_bytes(max_frames, channels)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:SLOTS_OFFSET] = bytes(SLOTS_OFFSET)
+        struct.pack_into(HEADER_FORMAT, shm.buf, 0, MAGIC, slots, max_frames, channels)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Abre un buffer creado por otro proceso (la geometría se lee de la cabecera)."""
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def written(self):
+        return int(self._counters[0])
+
+    @property
+    def dropped(self):
+        """Bloques descartados por buffer lleno."""
+        return int(self._counters[1])
+
+    def __len__(self):
+        """Bloques escritos y aún no leídos."""
+        return int(self._counters[0] - self._read[0])
+
+    def write(self, key, frames):
+        """
+        Copia un bloque (frames, canales) en la siguiente ranura (solo el productor).
+
+        Retorna:
+            bool: False si el buffer estaba lleno y el bloque se descartó.
+        Lanza:
+            ValueError: más frames que max_frames o canales distintos
+        """
+        n = len(frames)
+        if n > self.max_frames or frames.shape[1] != self.channels:
+            raise ValueError(f"Bloque de {frames.shape} no cabe en ranuras de "
+                             f"({self.max_frames}, {self.channels})")
+        written = int(self._counters[0])
+        if written - int(self._read[0]) >= self.slots:
+            self._counters[1] += 1
+            return False
+        slot = written % self.slots
+        self._data[slot, :n] = frames
+        self._meta[slot] = (key & 0xFFFFFFFF, n)
+        # Publicar: el consumidor no mira la ranura hasta ver el nuevo contador
+        self._counters[0] = written + 1
+        return True
+
+    def write_split(self, key, frames):
+        """write() en trozos de max_frames; retorna cuántos trozos no cupieron."""
+        lost = 0
+        for start in range(0, len(frames), self.max_frames):
+            if not self.write(key, frames[start:start + self.max_frames]):
+                lost += 1
+        return lost
+
+    def read(self):
+        """Siguiente bloque como (clave, copia de los frames), o None si está vacío (solo el consumidor)."""
+        read = int(self._read[0])
+        if read >= int(self._counters[0]):
+            return None
+        slot = read % self.slots
+        key, n = (int(v) for v in self._meta[slot])
+        frames = self._data[slot, :n].copy()
+        self._read[0] = read + 1
+        return key, frames
+
+    def drain(self, max_blocks=None):
+        """Todos los bloques pendientes (o hasta `max_blocks`): [(clave, frames), ...]."""
+        blocks = []
+        while max_blocks is None or len(blocks) < max_blocks:
+            block = self.read()
+            if block is None:
+                break
+            blocks.append(block)
+        return blocks
+
+    def close(self):
+        # Las vistas NumPy retienen el buffer: soltarlas antes de cerrar el mapeo
+        self._counters = self._read = self._meta = self._data = None
+        self._shm.close()
+
+    def unlink(self):
+        """Libera la memoria compartida (solo el creador, tras close() de todos)."""
+        if self.owner:
+            self._shm.unlink()
@@ -0,0 +1,529 @@
+"""
+shm_transport.py - Transporte local por memoria compartida entre emisor y receptor
+
+Con emisor y receptor en la misma máquina (pruebas, enrutado entre
+aplicaciones) el UDP por loopback cuesta dos llamadas al sistema y dos
+copias por bloque. ShmSocket ofrece la parte de la interfaz de un socket
+UDP que usan las canalizaciones (sendto, recvfrom, recvfrom_into,
+timeouts) sobre un segmento de multiprocessing.shared_memory: los
+datagramas son los mismos (protocol.py, cifrado, sesión, feedback) y el
+resto del código no distingue el transporte.
+
+El receptor crea el segmento del canal con listen() y el emisor se une
+con connect() (host "shm:<canal>", o "shm" para usar el puerto como
+canal). El segmento contiene dos buffers circulares de datagramas, uno
+por sentido, cada uno con un único productor:
+- Contador de escrituras (u64) en su propia línea de caché.
+- Ranuras con secuencia (u64, estilo seqlock), longitud (u32) y datos.
+
+El productor marca la ranura como "escribiendo" (secuencia impar), copia
+el datagrama, la marca como completa (secuencia par) y solo después avanza
+el contador. Nunca espera al consumidor: con el buffer lleno sobrescribe
+lo más antiguo, igual que un socket UDP que pierde datagramas. El
+consumidor lleva su propio cursor, copia el datagrama directamente en el
+buffer del llamante y comprueba que la secuencia no cambió durante la
+copia; lo sobrescrito se cuenta como perdido (`stats["lost"]`).
+
+La espera es activa durante SHM_CONFIG["SPIN_US"] (entrega en µs) y
+después duerme en pasos crecientes hasta SHM_CONFIG["MAX_SLEEP_US"].
+
+Uso (comparativa con UDP por loopback):
+    python shm_transport.py --bench
+"""
+
+import argparse
+import errno
+import multiprocessing
+import os
+import re
+import socket
+import statistics
+import struct
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+from config import SHM_CONFIG
+
+MAGIC = b"MRSHMT01"
+SHM_PREFIX = "mremoto_"
+HOST_PREFIX = "shm"
+CHANNEL_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,20}$")   # macOS limita el nombre a 31 caracteres
+
+# magic, ranuras, bytes por ranura, pid del receptor, cerrado
+HEADER_FORMAT = "<8sIIII"
+CACHE_LINE = 64
+SLOT_HEADER = 16                   # secuencia u64 + longitud u32 + relleno
+TO_RECEIVER, TO_EMITTER = 0, 1     # sentidos
+RECONNECT_S = 0.5                  # el emisor reintenta unirse como mucho cada medio segundo
+_yield = getattr(os, "sched_yield", lambda: time.sleep(0))
+
+# El otro extremo siempre está en esta máquina: se presenta como loopback
+# para que las listas de origen y los registros funcionen igual que con UDP
+PEER_ADDR = ("127.0.0.1", 0)
+
+
+def parse_local_host(host, port):
+    """
+    Canal de un host "shm:<canal>" (o "shm": el puerto es el canal).
+
+    Retorna:
+        str | None: nombre del canal, o None si `host` es una dirección de red.
+    """
+    host = (host or "").strip()
+    if host == HOST_PREFIX:
+        return str(port)
+    if host.startswith(HOST_PREFIX + ":"):
+        return host[len(HOST_PREFIX) + 1:]
+    return None
+
+
+def _segment_name(channel):
+    channel = str(channel)
+    if not CHANNEL_PATTERN.match(channel):
+        raise ValueError(f"Canal local no válido: '{channel}' (letras, dígitos, '_' o '-', hasta 20)")
+    return SHM_PREFIX + channel
+
+
+def _round_up(size):
+    return (size + CACHE_LINE - 1) // CACHE_LINE * CACHE_LINE
+
+
+def _attach(name):
+    """Abre un segmento existente sin que este proceso lo libere al salir."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)   # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Antes de 3.13 el resource_tracker libera al salir todo segmento
+        # abierto, también los ajenos: solo el receptor debe hacerlo
+        if os.name == "posix":
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _unlink(shm):
+    """Libera el segmento aunque otro extremo del mismo árbol de procesos lo haya desregistrado."""
+    if os.name == "posix":
+        # Los procesos hijos comparten resource_tracker: un emisor hijo que se
+        # unió con _attach() retiró el registro y unlink() lo daría por ausente
+        resource_tracker.register(shm._name, "shared_memory")
+    shm.unlink()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True   # existe, pero es de otro usuario
+    return True
+
+
+class _Ring:
+    """Un sentido del canal: datagramas con secuencia por ranura sobre el segmento."""
+
+    def __init__(self, buf, offset, slots, slot_bytes):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.stride = _round_up(SLOT_HEADER + slot_bytes)
+        self._write = buf[offset:offset + 8].cast("Q")
+        self._slots_offset = offset + CACHE_LINE
+        self._seq = [buf[o:o + 8].cast("Q") for o in self._offsets()]
+        self._length = [buf[o + 8:o + 12].cast("I") for o in self._offsets()]
+        self._data = [buf[o + SLOT_HEADER:o + SLOT_HEADER + slot_bytes] for o in self._offsets()]
+
+    def _offsets(self):
+        return range(self._slots_offset, self._slots_offset + self.slots * self.stride, self.stride)
+
+    @staticmethod
+    def size(slots, slot_bytes):
+        return CACHE_LINE + slots * _round_up(SLOT_HEADER + slot_bytes)
+
+    @property
+    def written(self):
+        return self._write[0]
+
+    def put(self, data):
+        """Copia un datagrama en la siguiente ranura (solo el productor de este sentido)."""
+        n = self._write[0]
+        slot = n % self.slots
+        seq = self._seq[slot]
+        seq[0] = 2 * n + 1                     # escribiendo: el lector descartará la ranura
+        self._data[slot][:len(data)] = data
+        self._length[slot][0] = len(data)
+        seq[0] = 2 * n + 2                     # completa
+        self._write[0] = n + 1                 # publicar
+
+    def get_into(self, cursor, buffer):
+        """
+        Copia en `buffer` el datagrama `cursor` o el siguiente aún intacto.
+
+        Retorna:
+            (bytes copiados | None si no hay nada, nuevo cursor, datagramas perdidos)
+        """
+        lost = 0
+        while True:
+            written = self._write[0]
+            if cursor >= written:
+                return None, cursor, lost
+            if written - cursor > self.slots:
+                # Sobrescrito antes de leerlo: saltar a lo más antiguo que queda
+                lost += written - cursor - self.slots
+                cursor = written - self.slots
+            slot = cursor % self.slots
+            seq = self._seq[slot]
+            expected = 2 * cursor + 2
+            if seq[0] == expected:
+                n = self._length[slot][0]
+                if n <= len(buffer):
+                    buffer[:n] = self._data[slot][:n]
+                    if seq[0] == expected:
+                        return n, cursor + 1, lost
+            # Ranura reescrita durante la copia (o datagrama mayor que el buffer)
+            lost += 1
+            cursor += 1
+
+    def release(self):
+        """Suelta las vistas sobre el segmento (necesario antes de cerrarlo)."""
+        for view in [self._write, *self._seq, *self._length, *self._data]:
+            view.release()
+        self._seq = self._length = self._data = []
+
+
+class ShmSocket:
+    """Extremo de un canal local con la interfaz de socket UDP que usan las canalizaciones."""
+
+    def __init__(self, channel, listening):
+        """Usar ShmSocket.listen() en el receptor y ShmSocket.connect() en el emisor."""
+        self.channel = str(channel)
+        self.name = _segment_name(channel)
+        self.listening = listening
+        self._shm = None
+        self._header = None
+        self._tx = self._rx = None
+        self._cursor = 0
+        self._timeout = None
+        self._next_attach = 0.0
+        self.stats = {"sent": 0, "received": 0, "lost": 0}
+
+    @classmethod
+    def listen(cls, channel, slots=None, slot_bytes=None):
+        """
+        Crea el segmento del canal (lado receptor). Un segmento abandonado por
+        un receptor que terminó sin cerrarlo se sustituye.
+
+        Lanza:
+            OSError (EADDRINUSE): otro receptor vivo usa el canal
+        """
+        sock = cls(channel, listening=True)
+        slots = slots or SHM_CONFIG["SLOTS"]
+        slot_bytes = slot_bytes or SHM_CONFIG["SLOT_BYTES"]
+        size = CACHE_LINE + 2 * _Ring.size(slots, slot_bytes)
+        try:
+            shm = shared_memory.SharedMemory(name=sock.name, create=True, size=size)
+        except FileExistsError:
+            stale = _attach(sock.name)
+            try:
+                magic, _, _, pid, closed = struct.unpack_from(HEADER_FORMAT, stale.buf)
+            except struct.error:
+                magic, pid, closed = None, 0, 1
+            if magic == MAGIC and not closed and pid != os.getpid() and _pid_alive(pid):
+                stale.close()
+                raise OSError(errno.EADDRINUSE, f"El canal local '{channel}' ya tiene receptor")
+            stale.close()
+            _unlink(stale)
+            shm = shared_memory.SharedMemory(name=sock.name, create=True, size=size)
+        shm.buf[:CACHE_LINE] = bytes(CACHE_LINE)
+        for direction in (TO_RECEIVER, TO_EMITTER):
+            offset = CACHE_LINE + direction * _Ring.size(slots, slot_bytes)
+            shm.buf[offset:offset + CACHE_LINE] = bytes(CACHE_LINE)
+        struct.pack_into(HEADER_FORMAT, shm.buf, 0, MAGIC, slots, slot_bytes, os.getpid(), 0)
+        sock._map(shm)
+        return sock
+
+    @classmethod
+    def connect(cls, channel):
+        """
+        Extremo del emisor. Como con UDP, enviar sin receptor no es un error:
+        el segmento se abre cuando aparece y se reabre si el receptor se reinicia.
+        """
+        sock = cls(channel, listening=False)
+        sock._try_attach()
+        return sock
+
+    def _map(self, shm):
+        magic, slots, slot_bytes, _, _ = struct.unpack_from(HEADER_FORMAT, shm.buf)
+        if magic != MAGIC:
+            shm.close()
+            raise ValueError(f"'{self.name}' no es un canal local")
+        self._shm = shm
+        self._header = shm.buf[16:24].cast("I")   # pid, cerrado
+        rings = [_Ring(shm.buf, CACHE_LINE + d * _Ring.size(slots, slot_bytes), slots, slot_bytes)
+                 for d in (TO_RECEIVER, TO_EMITTER)]
+        if self.listening:
+            self._rx, self._tx = rings
+            self._cursor = 0
+        else:
+            self._tx, self._rx = rings
+            self._cursor = self._rx.written   # las respuestas anteriores eran para otro emisor
+
+    def _unmap(self):
+        if self._shm is None:
+            return
+        self._tx.release()
+        self._rx.release()
+        self._header.release()
+        self._tx = self._rx = self._header = None
+        self._shm.close()
+        self._shm = None
+
+    def _try_attach(self):
+        now = time.monotonic()
+        if now < self._next_attach:
+            return False
+        self._next_attach = now + RECONNECT_S
+        try:
+            self._map(_attach(self.name))
+        except (FileNotFoundError, ValueError):
+            return False
+        if self._header[1]:
+            self._unmap()   # cerrado por su receptor, aún sin liberar
+            return False
+        return True
+
+    def _connected(self):
+        """Lado emisor: segmento abierto y su receptor sigue ahí (si no, reintentar)."""
+        if self.listening:
+            return self._shm is not None
+        if self._shm is not None and self._header[1]:
+            self._unmap()
+        return self._shm is not None or self._try_attach()
+
+    # ---- interfaz de socket ----
+
+    def settimeout(self, timeout):
+        self._timeout = timeout
+
+    def gettimeout(self):
+        return self._timeout
+
+    def setblocking(self, flag):
+        self._timeout = None if flag else 0.0
+
+    def fileno(self):
+        return -1
+
+    def setsockopt(self, *args):
+        raise OSError(errno.ENOPROTOOPT, "opción de socket no aplicable a un canal local")
+
+    def sendto(self, data, address=None):
+        """Publica un datagrama para el otro extremo (`address` se ignora: el canal es punto a punto)."""
+        n = len(data)
+        if not self._connected():
+            if self.listening:
+                raise OSError(errno.EBADF, "Canal local cerrado")
+            return n   # sin receptor todavía: se pierde, como con UDP
+        if n > self._tx.slot_bytes:
+            raise OSError(errno.EMSGSIZE, f"Datagrama de {n} bytes mayor que la ranura ({self._tx.slot_bytes})")
+        self._tx.put(data)
+        self.stats["sent"] += 1
+        return n
+
+    def wait_readable(self, timeout):
+        """
+        Espera un datagrama: activa durante SPIN_US y después durmiendo.
+
+        Args:
+            timeout: segundos (None = sin límite, 0 = solo comprobar)
+        Retorna:
+            bool: True si hay algo que leer.
+        """
+        if self._connected() and self._rx.written > self._cursor:
+            return True
+        if timeout is not None and timeout <= 0:
+            return False
+        start = time.perf_counter()
+        spin_until = start + SHM_CONFIG["SPIN_US"] / 1e6
+        deadline = None if timeout is None else start + timeout
+        sleep = 20e-6
+        max_sleep = SHM_CONFIG["MAX_SLEEP_US"] / 1e6
+        while True:
+            if self._connected() and self._rx.written > self._cursor:
+                return True
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                return False
+            if now < spin_until:
+                _yield()   # con pocos núcleos, ceder la CPU al productor
+            else:
+                time.sleep(min(sleep, deadline - now) if deadline is not None else sleep)
+                sleep = min(max_sleep, sleep * 2)
+
+    def recvfrom_into(self, buffer, nbytes=0):
+        """
+        Copia el siguiente datagrama en `buffer` (sin objetos intermedios).
+
+        Lanza:
+            socket.timeout: nada dentro del timeout
+            BlockingIOError: en modo no bloqueante, nada pendiente
+        """
+        view = memoryview(buffer).cast("B")
+        if nbytes:
+            view = view[:nbytes]
+        while True:
+            if not self.wait_readable(self._timeout):
+                if self._timeout == 0.0:
+                    raise BlockingIOError(errno.EAGAIN, "Nada pendiente en el canal local")
+                raise socket.timeout("timed out")
+            n, self._cursor, lost = self._rx.get_into(self._cursor, view)
+            self.stats["lost"] += lost
+            if n is not None:
+                self.stats["received"] += 1
+                return n, PEER_ADDR
+
+    def recvfrom(self, bufsize):
+        buffer = bytearray(min(bufsize, self._rx.slot_bytes) if self._rx else bufsize)
+        n, addr = self.recvfrom_into(buffer)
+        return bytes(buffer[:n]), addr
+
+    def close(self):
+        """Cierra el extremo; el receptor además marca el canal como cerrado y lo libera."""
+        if self._shm is None:
+            return
+        if self.listening:
+            self._header[1] = 1
+            shm = self._shm
+            self._unmap()
+            try:
+                _unlink(shm)
+            except FileNotFoundError:
+                pass
+        else:
+            self._unmap()
+
+
+# ==================== BENCHMARK ====================
+
+def _echo(kind, channel, port, count_only, stop):
+    """Proceso receptor del benchmark: devuelve cada datagrama o solo los cuenta."""
+    if kind == "shm":
+        sock = ShmSocket.listen(channel)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        sock.bind(("127.0.0.1", port))
+    sock.settimeout(0.1)
+    buffer = bytearray(65536)
+    received = 0
+    try:
+        while not stop.is_set():
+            try:
+                n, addr = sock.recvfrom_into(buffer)
+            except socket.timeout:
+                continue
+            received += 1
+            if not count_only:
+                sock.sendto(buffer[:n], addr)
+            elif n == 1:
+                sock.sendto(struct.pack("<Q", received), addr)   # fin de la ráfaga: informar
+                received = 0
+    finally:
+        sock.close()
+
+
+def _bench_backend(kind, payload_bytes, seconds, pings):
+    context = multiprocessing.get_context("spawn")
+    channel = f"bench{os.getpid()}"
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    payload = os.urandom(payload_bytes)
+    results = {}
+
+    for count_only in (False, True):
+        stop = context.Event()
+        peer = context.Process(target=_echo, args=(kind, channel, port, count_only, stop), daemon=True)
+        peer.start()
+        if kind == "shm":
+            sock = ShmSocket.connect(channel)
+            target = None
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            target = ("127.0.0.1", port)
+        sock.settimeout(1.0)
+        try:
+            # Esperar a que el otro proceso escuche: responde a un datagrama de 1 byte en los dos modos
+            sock.settimeout(0.05)
+            deadline = time.monotonic() + 10.0
+            while True:
+                sock.sendto(b"\x00", target)
+                try:
+                    sock.recvfrom(65536)
+                    break
+                except socket.timeout:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"El proceso de eco ({kind}) no responde")
+            sock.settimeout(1.0)
+
+            if not count_only:
+                # Latencia de ida y vuelta, un datagrama cada vez
+                rtts = []
+                for _ in range(pings):
+                    start = time.perf_counter()
+                    sock.sendto(payload, target)
+                    sock.recvfrom(65536)
+                    rtts.append((time.perf_counter() - start) * 1e6)
+                rtts.sort()
+                results["rtt_median_us"] = statistics.median(rtts)
+                results["rtt_p99_us"] = rtts[int(len(rtts) * 0.99) - 1]
+            else:
+                # Caudal: envío sin esperar respuesta; el otro lado cuenta lo recibido
+                sent = 0
+                start = time.perf_counter()
+                end = start + seconds
+                while time.perf_counter() < end:
+                    for _ in range(64):
+                        sock.sendto(payload, target)
+                    sent += 64
+                    _yield()   # con un solo núcleo, dejar que el otro proceso lea
+                elapsed = time.perf_counter() - start
+                time.sleep(0.2)
+                sock.sendto(b"\x00", target)
+                data, _ = sock.recvfrom(65536)
+                received = struct.unpack("<Q", data)[0] - 1
+                results["sent_pps"] = sent / elapsed
+                results["received_pps"] = received / elapsed
+        finally:
+            stop.set()
+            sock.close()
+            peer.join(2.0)
+            if peer.is_alive():
+                peer.terminate()
+    return results
+
+
+def benchmark(payload_bytes=2060, seconds=2.0, pings=2000):
+    """Latencia de ida y vuelta y caudal de UDP por loopback frente al canal local."""
+    return {kind: _bench_backend(kind, payload_bytes, seconds, pings) for kind in ("udp", "shm")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transporte local por memoria compartida.")
+    parser.add_argument("--bench", action="store_true", help="comparar con UDP por loopback")
+    parser.add_argument("--bytes", type=int, default=2060,
+                        help="tamaño del datagrama (defecto: 1024 frames mono de 16 bits con cabecera)")
+    parser.add_argument("--segundos", type=float, default=2.0, help="duración de la medida de caudal")
+    parser.add_argument("--pings", type=int, default=2000, help="idas y vueltas para medir la latencia")
+    args = parser.parse_args()
+
+    if not args.bench:
+        parser.print_help()
+    else:
+        print(f"Datagramas de {args.bytes} bytes, {args.pings} idas y vueltas, "
+              f"{args.segundos:.1f} s de caudal")
+        for kind, result in benchmark(args.bytes, args.segundos, args.pings).items():
+            print(f"  {kind:4s} ida y vuelta mediana {result['rtt_median_us']:7.1f} µs  "
+                  f"p99 {result['rtt_p99_us']:7.1f} µs  "
+                  f"enviados {result['sent_pps']:9.0f}/s  recibidos {result['received_pps']:9.0f}/s")
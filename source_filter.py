@@ -0,0 +1,143 @@
+"""
+source_filter.py - Filtro de origen y limitación de tasa en la recepción
+
+Se aplica a cada datagrama justo después de recvfrom, antes de descifrar,
+decodificar o tocar NumPy, para que un emisor mal configurado o un bucle
+de paquetes no sature la CPU ni la cola de audio del receptor:
+
+1. Lista de permitidos por dirección IP (set, O(1)); vacía = cualquiera.
+   IPv4 e IPv6; las IPv4 que llegan a un socket de doble pila como
+   "::ffff:a.b.c.d" se comparan en su forma IPv4.
+2. Lista de permitidos por stream_id, leído directamente de la cabecera
+   sin analizarla entera (vacía = cualquiera).
+3. Cubo de fichas (token bucket) por origen (ip, puerto) medido en bytes:
+   como mucho `rate_bytes` por segundo con ráfagas de hasta `burst_bytes`.
+   Cada datagrama cuesta su tamaño más `packet_cost`, así que una avalancha
+   de paquetes pequeños también se frena. Medir en bytes y no en paquetes
+   hace el límite independiente de cuántos paquetes genere cada bloque
+   (formato, tamaño de trama, reparto por MTU).
+
+Los descartes se cuentan por motivo en `stats`.
+
+DropLog cuenta, también por motivo, los datagramas que pasan el filtro pero
+no se pueden procesar (cabecera no válida, payload corrupto) y los resume
+en el log como mucho cada `interval_s` segundos: una avalancha de paquetes
+malos no inunda el log ni la cola de estado de la interfaz.
+"""
+
+import struct
+import time
+
+from net_addr import host_of, normalize_host
+from protocol import MAGIC, HEADER_SIZE
+
+STREAM_ID = struct.Struct("!I")
+STREAM_ID_OFFSET = 12   # magic(2) version ptype flags canales formato reservado(6) rate(4)
+
+
+def parse_host_list(text):
+    """Convierte "192.168.1.20, fd00::20" en un set de IPs en forma canónica (vacío = todas)."""
+    return {normalize_host(part) for part in (text or "").replace(";", ",").split(",") if part.strip()}
+
+
+class SourceFilter:
+    """Lista de permitidos + cubo de fichas por origen, en O(1) por paquete."""
+
+    def __init__(self, allowed_hosts=None, allowed_streams=None, rate_bytes=3_000_000,
+                 burst_bytes=1024 * 1024, packet_cost=512, max_sources=256):
+        """
+        Args:
+            allowed_hosts: IPs aceptadas (iterable); None o vacío = todas
+            allowed_streams: stream_id aceptados; None o vacío = todos
+            rate_bytes: bytes por segundo sostenidos por origen
+            burst_bytes: bytes admitidos de golpe (tras una ráfaga de la red)
+            packet_cost: bytes que se suman al tamaño de cada datagrama
+            max_sources: orígenes con cubo propio (se olvidan los más antiguos)
+        """
+        self.allowed_hosts = {normalize_host(host) for host in allowed_hosts or ()}
+        self.allowed_streams = set(allowed_streams or ())
+        self.rate_bytes = float(rate_bytes)
+        self.burst_bytes = float(burst_bytes)
+        self.packet_cost = packet_cost
+        self.max_sources = max_sources
+        self._buckets = {}   # (ip, puerto) -> [fichas, último instante]
+        self.stats = {"accepted": 0, "dropped_host": 0, "dropped_stream": 0, "dropped_rate": 0}
+
+    def allow(self, addr, data):
+        """True si el datagrama `data` recibido de `addr` debe procesarse."""
+        if self.allowed_hosts and host_of(addr) not in self.allowed_hosts:
+            self.stats["dropped_host"] += 1
+            return False
+
+        if self.allowed_streams:
+            if len(data) < HEADER_SIZE or data[:2] != MAGIC:
+                self.stats["dropped_stream"] += 1
+                return False
+            if STREAM_ID.unpack_from(data, STREAM_ID_OFFSET)[0] not in self.allowed_streams:
+                self.stats["dropped_stream"] += 1
+                return False
+
+        now = time.monotonic()
+        bucket = self._buckets.get(addr)
+        if bucket is None:
+            if len(self._buckets) >= self.max_sources:
+                self._buckets.pop(next(iter(self._buckets)))
+            bucket = self._buckets[addr] = [self.burst_bytes, now]
+        else:
+            bucket[0] = min(self.burst_bytes, bucket[0] + (now - bucket[1]) * self.rate_bytes)
+            bucket[1] = now
+        cost = len(data) + self.packet_cost
+        if bucket[0] < cost:
+            self.stats["dropped_rate"] += 1
+            return False
+        bucket[0] -= cost
+
+        self.stats["accepted"] += 1
+        return True
+
+    @property
+    def dropped(self):
+        return self.stats["dropped_host"] + self.stats["dropped_stream"] + self.stats["dropped_rate"]
+
+    def summary(self):
+        """Texto breve con aceptados y descartes por motivo."""
+        s = self.stats
+        return (f"aceptados {s['accepted']}, descartados: origen {s['dropped_host']}, "
+                f"stream {s['dropped_stream']}, tasa {s['dropped_rate']}")
+
+
+class DropLog:
+    """Descartes por motivo con un resumen en el log como mucho cada `interval_s` segundos."""
+
+    def __init__(self, log=print, interval_s=5.0):
+        self.log = log
+        self.interval_s = interval_s
+        self.counts = {}      # motivo -> descartes totales
+        self._pending = {}    # motivo -> descartes aún no resumidos
+        self._next_log = 0.0  # el primer descarte se avisa enseguida
+        self.total = 0
+
+    def add(self, error):
+        """Cuenta un datagrama descartado por `error` (excepción o texto)."""
+        reason = str(error).split(":")[0] or type(error).__name__
+        self.counts[reason] = self.counts.get(reason, 0) + 1
+        self._pending[reason] = self._pending.get(reason, 0) + 1
+        self.total += 1
+        now = time.monotonic()
+        if now >= self._next_log:
+            self.flush(now)
+
+    def flush(self, now=None):
+        """Escribe en el log los descartes pendientes de resumir."""
+        if self._pending:
+            self.log(f"Paquetes descartados: {self._describe(self._pending)}")
+            self._pending = {}
+        self._next_log = (time.monotonic() if now is None else now) + self.interval_s
+
+    def summary(self):
+        """Texto breve con los descartes totales por motivo."""
+        return self._describe(self.counts) if self.counts else "ninguno"
+
+    @staticmethod
+    def _describe(counts):
+        return ", ".join(f"{reason} {count}" for reason, count in sorted(counts.items(), key=lambda item: -item[1]))
@@ -0,0 +1,144 @@
+"""
+state.py - Estado compartido entre la interfaz y los hilos de audio/red
+
+Tk no es seguro entre hilos y cada variable.get() es una llamada al
+intérprete Tcl: el hilo de audio no debe tocarlo nunca. Aquí el reparto es:
+
+- ControlState: parámetros de control (ganancia, volumen, casillas) como
+  una instantánea inmutable. La interfaz publica una nueva al cambiar un
+  valor; el hilo de audio toma la vigente una vez por bloque, sin bloqueo
+  (asignar una referencia es atómico en CPython) y sin mezclar valores de
+  dos actualizaciones.
+- StatusQueue: mensajes de los hilos hacia la interfaz (estado, llamadas a
+  ejecutar en el hilo de Tk). Se vacía desde un único temporizador.
+- UiPump: ese temporizador (root.after). En cada vuelta vacía la cola,
+  aplica solo el último estado de la tanda y ejecuta los refrescos
+  periódicos (gráficos), de modo que el coste de la interfaz no crece con
+  el ritmo de paquetes.
+
+Este módulo no importa tkinter: sin interfaz, StatusQueue se puede vaciar
+desde cualquier bucle y ControlState se actualiza directamente.
+"""
+
+import queue
+import threading
+from collections import namedtuple
+
+PUMP_INTERVAL_MS = 50
+
+MSG_STATUS = "status"
+MSG_CALL = "call"
+
+# Niveles de estado de las canalizaciones (pipeline.py); la interfaz los traduce a colores
+STATUS_OK = "ok"
+STATUS_WAIT = "wait"
+STATUS_STOPPED = "stopped"
+
+
+class ControlState:
+    """Parámetros de control con instantáneas atómicas."""
+
+    def __init__(self, **params):
+        """
+        Args:
+            **params: nombre -> valor inicial (los nombres quedan fijos)
+        """
+        self._type = namedtuple("ControlSnapshot", params)
+        self._snapshot = self._type(**params)
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Instantánea vigente (namedtuple inmutable, leer sin bloqueo)."""
+        return self._snapshot
+
+    def update(self, **changes):
+        """Publica una nueva instantánea con los valores cambiados."""
+        with self._lock:
+            self._snapshot = self._snapshot._replace(**changes)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._snapshot, name)
+
+
+class StatusQueue:
+    """Mensajes de los hilos de trabajo hacia la interfaz."""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def status(self, message, color="white"):
+        """Texto de estado (si llegan varios en una tanda, solo se pinta el último)."""
+        self._queue.put((MSG_STATUS, (message, color)))
+
+    def call(self, function, *args):
+        """Ejecuta `function(*args)` en el hilo de la interfaz."""
+        self._queue.put((MSG_CALL, (function, args)))
+
+    def drain(self, max_items=256):
+        """Retira hasta `max_items` mensajes pendientes: [(tipo, datos), ...]."""
+        items = []
+        try:
+            while len(items) < max_items:
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+
+
+class UiPump:
+    """Único temporizador de la interfaz: vacía la StatusQueue y refresca."""
+
+    def __init__(self, root, messages, on_status, interval_ms=PUMP_INTERVAL_MS, log=print):
+        """
+        Args:
+            root: ventana Tk (solo se usa para root.after)
+            messages: StatusQueue
+            on_status: callable(mensaje, color) que pinta el estado
+        """
+        self.root = root
+        self.messages = messages
+        self.on_status = on_status
+        self.interval_ms = interval_ms
+        self.log = log
+        self._ticks = []
+        self._after_id = None
+
+    def add_tick(self, function):
+        """Refresco periódico (p. ej. gráficos) ejecutado en cada vuelta."""
+        self._ticks.append(function)
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._run)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _run(self):
+        pending_status = None
+        for kind, data in self.messages.drain():
+            if kind == MSG_STATUS:
+                pending_status = data
+            elif kind == MSG_CALL:
+                # El orden respecto a las llamadas se respeta (p. ej. "Detenido" tras el último estado)
+                if pending_status:
+                    self._safely(self.on_status, *pending_status)
+                    pending_status = None
+                function, args = data
+                self._safely(function, *args)
+        if pending_status:
+            self._safely(self.on_status, *pending_status)
+        for function in self._ticks:
+            self._safely(function)
+        self._after_id = self.root.after(self.interval_ms, self._run)
+
+    def _safely(self, function, *args):
+        # Un error en un refresco no debe parar el temporizador de la interfaz
+        try:
+            function(*args)
+        except Exception as e:
+            self.log(f"Error actualizando la interfaz: {e}")
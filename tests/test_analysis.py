@@ -0,0 +1,19 @@
+"""Analizador de espectro con bloques vacíos o más cortos que el diezmado."""
+
+import numpy as np
+
+from analysis import AudioAnalyzer
+
+
+def test_empty_blocks_keep_history():
+    analyzer = AudioAnalyzer(target_rate=11025, fft_size=256)
+    tone = np.sin(2 * np.pi * 1000 * np.arange(2048) / 44100).astype(np.float32)[:, None]
+    first = analyzer._analyze(tone, 44100)
+    ring = analyzer._ring.copy()
+
+    assert analyzer._analyze(np.zeros((0, 1), dtype=np.float32), 44100) is None
+    assert analyzer._analyze(tone[:2], 44100) is None   # menos frames que el diezmado (4)
+    np.testing.assert_array_equal(analyzer._ring, ring)
+
+    again = analyzer._analyze(tone, 44100)
+    np.testing.assert_allclose(again["spectrum_db"], first["spectrum_db"], atol=1e-3)
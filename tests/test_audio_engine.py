@@ -0,0 +1,38 @@
+"""Motor de audio: una sola instancia PyAudio aunque la pidan varios hilos."""
+
+import threading
+import time
+
+import audio_engine
+from audio_engine import AudioEngine
+
+
+class SlowPyAudio:
+    """Inicializar PortAudio tarda: ventana amplia para una carrera."""
+
+    created = []
+
+    def __init__(self):
+        time.sleep(0.05)
+        SlowPyAudio.created.append(self)
+
+    def terminate(self):
+        pass
+
+
+def test_concurrent_first_use_creates_one_instance(monkeypatch):
+    monkeypatch.setattr(audio_engine.pyaudio, "PyAudio", SlowPyAudio)
+    SlowPyAudio.created.clear()
+    engine = AudioEngine(log=lambda message: None)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(engine.p)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(SlowPyAudio.created) == 1
+    assert all(p is SlowPyAudio.created[0] for p in seen)
+
+    assert engine.reset()
+    assert engine.p is not seen[0] and len(SlowPyAudio.created) == 2
+    engine.close()
@@ -0,0 +1,113 @@
+"""Conmutación de dispositivos: vuelta a un preferido conectado tras el arranque."""
+
+import time
+
+import pytest
+
+import audio_engine
+from audio_engine import AudioEngine
+from devices import DeviceFailover, DeviceInventory
+
+HARDWARE = []   # nombres conectados ahora; cada instancia los enumera al crearse
+
+
+def _info(index, name):
+    return {"index": index, "name": name, "hostApi": 0, "maxInputChannels": 1, "maxOutputChannels": 0,
+            "defaultSampleRate": 48000.0, "defaultLowInputLatency": 0.01, "defaultHighInputLatency": 0.1,
+            "defaultLowOutputLatency": 0.01, "defaultHighOutputLatency": 0.1}
+
+
+class FakeStream:
+    def __init__(self, device):
+        self.device = device
+        self.closed = False
+
+    def is_stopped(self):
+        return False
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakePyAudio:
+    """Como PortAudio: la lista de dispositivos se fija al inicializar."""
+
+    def __init__(self):
+        self.names = list(HARDWARE)
+
+    def get_device_count(self):
+        return len(self.names)
+
+    def get_device_info_by_index(self, index):
+        return _info(index, self.names[index])
+
+    def get_host_api_info_by_index(self, index):
+        return {"name": "ALSA"}
+
+    def get_default_input_device_info(self):
+        return _info(len(self.names) - 1, self.names[-1])
+
+    def is_format_supported(self, rate, **kwargs):
+        return True
+
+    def open(self, input_device_index=None, **kwargs):
+        index = len(self.names) - 1 if input_device_index is None else input_device_index
+        if not 0 <= index < len(self.names) or self.names[index] not in HARDWARE:
+            raise OSError("dispositivo no disponible")
+        return FakeStream(self.names[index])
+
+    def terminate(self):
+        pass
+
+
+@pytest.fixture
+def failover(monkeypatch):
+    monkeypatch.setattr(audio_engine.pyaudio, "PyAudio", FakePyAudio)
+    HARDWARE[:] = ["Interno"]
+    engine = AudioEngine(log=lambda message: None)
+    inventory = DeviceInventory(engine)
+    yield DeviceFailover(inventory, preferred="USB", input=True, retry_s=1.0, rescan_s=10.0,
+                         log=lambda message: None)
+    engine.close()
+
+
+def _open(failover):
+    return lambda index: failover.inventory.engine.open(8, 1, 48000, 256, input=True, device=index)
+
+
+def test_preferred_plugged_after_startup_is_restored(failover):
+    stream, _ = _open(failover)(failover.current)
+    assert stream.device == "Interno" and failover.on_backup
+
+    # Conectado antes del Interno en la enumeración: su índice pasa a ser el 0
+    HARDWARE[:] = ["USB", "Interno"]
+    now = time.monotonic() + 60.0
+    restored, _ = failover.try_restore(_open(failover), now=now, stream=stream)
+    assert restored.device == "USB"
+    assert stream.closed
+    assert failover.current == failover.preferred_index == 0
+    assert not failover.on_backup
+
+
+def test_rescan_reopens_backup_while_preferred_is_missing(failover):
+    stream, _ = _open(failover)(failover.current)
+    now = time.monotonic() + 60.0
+    reopened, _ = failover.try_restore(_open(failover), now=now, stream=stream)
+    assert reopened.device == "Interno" and stream.closed
+
+    # Los reintentos siguientes esperan a rescan_s: sin más cortes del audio
+    assert failover.try_restore(_open(failover), now=now + 5.0, stream=reopened) is None
+    assert not reopened.closed
+
+
+def test_no_rescan_while_other_streams_are_open(failover):
+    engine = failover.inventory.engine
+    stream, _ = _open(failover)(failover.current)
+    other, _ = engine.open(8, 1, 48000, 256, input=True, device=0)
+    HARDWARE[:] = ["Interno", "USB"]
+    assert failover.try_restore(_open(failover), now=time.monotonic() + 60.0, stream=stream) is None
+    assert not stream.closed
+    engine.release(other)
@@ -0,0 +1,41 @@
+"""Informes del receptor hasta el control adaptativo del emisor."""
+
+import numpy as np
+
+from feedback import AdaptiveController, AdaptivePacketizer, FeedbackReport, build_report, parse_report
+from protocol import FLAG_ADAPTED, FMT_INT16, PT_FEEDBACK, parse_packet
+
+
+def _deliver(controller, report, now):
+    """Camino del emisor: datagrama PT_FEEDBACK -> parse_packet -> parse_report -> controlador."""
+    header, payload = parse_packet(build_report(1, 0, report))
+    assert header.ptype == PT_FEEDBACK
+    return controller.on_report(parse_report(payload), now=now)
+
+
+def test_reports_drive_adaptation_and_restart():
+    controller = AdaptiveController(48000, FMT_INT16, 960, log=lambda msg: None)
+    nominal = controller.profile
+    assert _deliver(controller, FeedbackReport(9, 100, 0.5, 1.0, 80.0, 0), now=10.0)
+    assert controller.profile.rate < nominal.rate
+
+    controller.restart()
+    assert controller.profile == nominal
+
+
+def test_parse_report_rejects_short_payload():
+    assert parse_report(b"\x00" * 4) is None
+
+
+def test_reduced_profile_is_flagged():
+    controller = AdaptiveController(48000, FMT_INT16, 960, log=lambda msg: None)
+    packetizer = AdaptivePacketizer(5, 1, FMT_INT16, 48000, 960, controller)
+    frames = np.zeros((960, 1), dtype=np.float32)
+
+    ((packet, _),) = packetizer.add(frames, 0)
+    assert not parse_packet(packet)[0].flags & FLAG_ADAPTED
+
+    controller.level = len(controller.ladder) - 1
+    ((packet, _),) = packetizer.add(frames, 960)
+    header, _ = parse_packet(packet)
+    assert header.flags & FLAG_ADAPTED and header.rate == 24000
@@ -0,0 +1,55 @@
+"""Parada de PacedSender con paquetes en cola."""
+
+import threading
+import time
+
+import pytest
+
+from pacing import PacedSender
+
+
+class RecordingSocket:
+    """Anota cada sendto con su instante monotónico."""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, packet, address):
+        self.sent.append((time.monotonic(), packet))
+
+
+@pytest.fixture
+def thread_errors(monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", lambda args: errors.append(args.exc_value))
+    return errors
+
+
+def test_stop_while_waiting_discards_queue(thread_errors):
+    sock = RecordingSocket()
+    pacer = PacedSender(sock, ("127.0.0.1", 9), interval=0.2, delay_frames=2)
+    pacer.start()
+    for i in range(3):
+        pacer.submit(b"x%d" % i, i * 0.2)
+    time.sleep(0.05)    # el hilo espera la hora del primer paquete
+    pacer.stop()
+
+    assert thread_errors == []
+    assert pacer.error is None
+    assert sock.sent == [] and pacer.depth == 0
+
+
+def test_stop_with_flush_sends_on_schedule(thread_errors):
+    sock = RecordingSocket()
+    pacer = PacedSender(sock, ("127.0.0.1", 9), interval=0.05, delay_frames=1)
+    pacer.start()
+    for i in range(4):
+        pacer.submit(b"x%d" % i, i * 0.05)
+    time.sleep(0.01)
+    pacer.stop(flush=True)
+
+    assert thread_errors == []
+    assert [packet for _, packet in sock.sent] == [b"x0", b"x1", b"x2", b"x3"]
+    times = [t for t, _ in sock.sent]
+    # A su hora, no en ráfaga al parar
+    assert all(b - a >= 0.04 for a, b in zip(times, times[1:]))
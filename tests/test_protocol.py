@@ -0,0 +1,60 @@
+"""Ida y vuelta de cabeceras con build_packet / parse_packet."""
+
+import pytest
+
+from feedback import FeedbackReport, build_report, parse_report
+from protocol import (
+    FMT_FLOAT32, FMT_INT16, PT_AUDIO, PT_CN, PT_FEEDBACK, PT_SESSION, SESSION_PAYLOAD,
+    build_packet, parse_packet,
+)
+from session import MSG_HELLO, EmitterSession
+
+
+def test_audio_round_trip():
+    data = build_packet(b"\x01\x02" * 8, 7, 4096, 1234, 2, FMT_INT16, 48000)
+    header, payload = parse_packet(data)
+    assert (header.ptype, header.channels, header.sample_format, header.rate) == (PT_AUDIO, 2, FMT_INT16, 48000)
+    assert (header.stream_id, header.seq, header.timestamp) == (1234, 7, 4096)
+    assert bytes(payload) == b"\x01\x02" * 8
+
+
+def test_session_message_round_trip():
+    payload = SESSION_PAYLOAD.pack(MSG_HELLO, 99)
+    header, parsed = parse_packet(build_packet(payload, 0, 0, 5, 1, FMT_INT16, 0, ptype=PT_SESSION))
+    assert header.ptype == PT_SESSION
+    assert SESSION_PAYLOAD.unpack_from(parsed) == (MSG_HELLO, 99)
+
+    session = EmitterSession(stream_id=99, log=lambda msg: None)
+    header, parsed = parse_packet(session.poll(now=0.0)[0])
+    assert header.ptype == PT_SESSION
+    assert session.unpack(parsed) == (MSG_HELLO, 99)
+
+
+def test_feedback_report_round_trip():
+    report = FeedbackReport(42, 1000, 0.25, 3.5, 80.0, 2)
+    header, payload = parse_packet(build_report(7, 3, report))
+    assert (header.ptype, header.stream_id, header.seq) == (PT_FEEDBACK, 7, 3)
+    assert parse_report(payload) == report
+
+
+@pytest.mark.parametrize("channels, fmt, rate", [
+    (1, FMT_INT16, 0),          # rate fuera de la lista
+    (255, FMT_INT16, 48000),    # demasiados canales
+    (0, FMT_INT16, 48000),
+    (1, 99, 48000),             # formato de muestra desconocido
+])
+def test_invalid_audio_header_rejected(channels, fmt, rate):
+    for ptype in (PT_AUDIO, PT_CN):
+        with pytest.raises(ValueError):
+            parse_packet(build_packet(b"", 0, 0, 1, channels, fmt, rate, ptype=ptype))
+
+
+def test_unknown_ptype_rejected():
+    with pytest.raises(ValueError):
+        parse_packet(build_packet(b"", 0, 0, 1, 1, FMT_FLOAT32, 48000, ptype=200))
+
+
+def test_legacy_datagram():
+    header, payload = parse_packet(b"\x00\x01" * 10, default_rate=16000)
+    assert header.stream_id is None and header.rate == 16000
+    assert len(payload) == 20
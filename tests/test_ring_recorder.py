@@ -0,0 +1,77 @@
+"""Grabador circular: persistencia, reapertura y duración."""
+
+import numpy as np
+
+from ring_recorder import RingRecorder
+
+
+def _pcm(value, frames=256):
+    return np.full(frames, value, dtype="<i2").tobytes()
+
+
+def test_reopen_keeps_history(tmp_path):
+    path = str(tmp_path / "grabacion.ring")
+    recorder = RingRecorder.for_duration(path, minutes=1, chunk=256, rate=8000)
+    for value in range(3):
+        recorder.write(_pcm(value))
+    recorder.close()
+    recorder.close()    # cerrar dos veces no falla
+
+    reopened = RingRecorder.open_existing(path)
+    assert reopened.head == 3
+    assert [bytes(block) for _, _, block in reopened.iter_blocks()] == [_pcm(v) for v in range(3)]
+    reopened.close()
+
+
+def test_readonly_reader_alongside_writer(tmp_path):
+    path = str(tmp_path / "grabacion.ring")
+    writer = RingRecorder.for_duration(path, minutes=1, chunk=256, rate=8000)
+    writer.write(_pcm(1))
+    reader = RingRecorder.open_existing(path, readonly=True)
+    writer.write(_pcm(2))
+    assert reader.head == 2
+    assert sum(1 for _ in reader.iter_blocks()) == 2
+    reader.close()
+    writer.write(_pcm(3))
+    writer.close()
+
+
+def test_capacity_for_matches_for_duration(tmp_path):
+    path = str(tmp_path / "grabacion.ring")
+    recorder = RingRecorder.for_duration(path, minutes=2, chunk=512, rate=16000, channels=2)
+    assert recorder.capacity == recorder.capacity_for(2)
+    assert recorder.capacity_for(4) == 2 * recorder.capacity
+    recorder.close()
+
+
+def test_append_reassembles_fragments_into_slots(tmp_path):
+    path = str(tmp_path / "grabacion.ring")
+    recorder = RingRecorder.for_duration(path, minutes=1, chunk=256, rate=8000)
+    # Un bloque de 256 frames repartido en cuatro paquetes por la MTU
+    for part in range(4):
+        recorder.append(_pcm(part, frames=64), position=part * 64)
+    assert recorder.head == 1
+    expected = b"".join(_pcm(part, frames=64) for part in range(4))
+    assert bytes(recorder.read(0)[2]) == expected
+
+    # Un bloque mayor que una ranura se parte; el resto queda pendiente
+    recorder.append(_pcm(7, frames=320), position=256)
+    assert recorder.head == 2
+    assert bytes(recorder.read(1)[2]) == _pcm(7)
+    recorder.flush_pending()
+    assert bytes(recorder.read(2)[2]) == _pcm(7, frames=64)
+    recorder.close()
+
+
+def test_append_flushes_partial_slot_on_gap(tmp_path):
+    path = str(tmp_path / "grabacion.ring")
+    recorder = RingRecorder.for_duration(path, minutes=1, chunk=256, rate=8000)
+    recorder.append(_pcm(1, frames=100), position=0)
+    recorder.append(_pcm(2, frames=100), position=110)   # desfase dentro de la tolerancia
+    assert recorder.head == 0
+    recorder.append(_pcm(3, frames=100), position=1000)  # pérdida: la ranura queda parcial
+    assert recorder.head == 1
+    assert bytes(recorder.read(0)[2]) == _pcm(1, frames=100) + _pcm(2, frames=100)
+    recorder.flush_pending()
+    assert bytes(recorder.read(1)[2]) == _pcm(3, frames=100)
+    recorder.close()
@@ -0,0 +1,62 @@
+"""Ventana anti-repetición y su persistencia entre reinicios del receptor."""
+
+import pytest
+
+from protocol import FMT_INT16, build_packet
+from secure import ReplayStore, ReplayWindow, crypto_available
+
+
+def test_replay_window_rejects_repeats_and_old():
+    window = ReplayWindow(size=8)
+    for seq in (10, 12, 11):
+        assert window.check(seq)
+        window.update(seq)
+    assert not window.check(12)
+    assert not window.check(11)
+    assert window.check(9)          # dentro de la ventana y sin ver
+    assert not window.check(2)      # por detrás de la ventana
+    assert window.check(13)
+
+
+def test_replay_window_from_saved_state():
+    window = ReplayWindow(highest=100)
+    assert not window.check(100)
+    assert not window.check(95)
+    assert window.check(101)
+
+
+def test_replay_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "estado.bin")
+    store = ReplayStore(path, slots=2)
+    store.put(1, 10)
+    store.put(2, 20)
+    store.put(1, 11)
+    store.close()
+
+    store = ReplayStore(path, slots=2)
+    assert (store.get(1), store.get(2), store.get(3)) == (11, 20, None)
+    store.put(3, 30)                # reutiliza la ranura más antigua (stream 1)
+    assert (store.get(1), store.get(3)) == (None, 30)
+    store.close()
+
+
+@pytest.mark.skipif(not crypto_available(), reason="requiere el paquete cryptography")
+def test_replay_rejected_after_receiver_restart(tmp_path):
+    from secure import PacketCipher
+
+    path = str(tmp_path / "estado.bin")
+    sender = PacketCipher("clave de prueba")
+    packets = [sender.seal(build_packet(b"audio", seq, seq * 960, 77, 1, FMT_INT16, 48000)) for seq in range(4)]
+
+    receiver = PacketCipher("clave de prueba")
+    receiver.persist_replay(path)
+    assert all(receiver.open(packet) is not None for packet in packets[:3])
+    assert receiver.open(packets[1]) is None
+    receiver.close_replay()
+
+    # Receptor reiniciado: lo ya recibido sigue siendo repetición; lo nuevo pasa
+    restarted = PacketCipher("clave de prueba")
+    restarted.persist_replay(path)
+    assert [restarted.open(packet) is not None for packet in packets] == [False, False, False, True]
+    assert restarted.stats["replayed"] == 3
+    restarted.close_replay()
@@ -0,0 +1,73 @@
+"""Saludo HELLO -> ACCEPT -> KEEPALIVE entre emisor y receptor por loopback."""
+
+import select
+import socket
+
+import pytest
+
+from protocol import PT_SESSION, parse_packet
+from session import (
+    MSG_ACCEPT, MSG_HELLO, MSG_KEEPALIVE, STATE_ACTIVE, STATE_CONNECTING, EmitterSession, ReceiverSession,
+    read_pending,
+)
+
+
+@pytest.fixture
+def socket_pair():
+    emitter = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    emitter.bind(("127.0.0.1", 0))
+    receiver.bind(("127.0.0.1", 0))
+    yield emitter, receiver
+    emitter.close()
+    receiver.close()
+
+
+def _receive(sock):
+    assert select.select((sock,), (), (), 1.0)[0], "no llegó el datagrama"
+    return sock.recvfrom(65535)
+
+
+def _read_control(sock):
+    select.select((sock,), (), (), 1.0)
+    return read_pending(sock)
+
+
+def test_control_packets_carry_no_audio_format():
+    header, _ = parse_packet(EmitterSession(7, log=lambda msg: None).poll(now=0.0)[0])
+    assert (header.ptype, header.channels, header.sample_format, header.rate) == (PT_SESSION, 0, 0, 0)
+
+
+def test_handshake_over_loopback(socket_pair):
+    emitter_sock, receiver_sock = socket_pair
+    emitter = EmitterSession(stream_id=1234, log=lambda msg: None)
+    receiver = ReceiverSession(log=lambda msg: None)
+    assert emitter.state == STATE_CONNECTING
+
+    # HELLO del emisor
+    (hello,) = emitter.poll(now=0.0)
+    emitter_sock.sendto(hello, receiver_sock.getsockname())
+    data, addr = _receive(receiver_sock)
+    header, payload = parse_packet(data)
+    assert header.ptype == PT_SESSION
+    assert receiver.unpack(payload) == (MSG_HELLO, 1234)
+
+    # ACCEPT del receptor
+    (accept,) = receiver.on_control(payload, addr, now=0.0)
+    assert receiver.state == STATE_ACTIVE and receiver.emitter_stream == 1234
+    receiver_sock.sendto(accept, addr)
+    packets = _read_control(emitter_sock)
+    assert [emitter.unpack(payload)[0] for _, payload in packets] == [MSG_ACCEPT]
+    assert emitter.on_packet(*packets[0], now=0.1)
+    assert emitter.state == STATE_ACTIVE
+    assert emitter.poll(now=0.2) == []   # con sesión activa no se repite el HELLO
+
+    # KEEPALIVE del receptor: mantiene viva la sesión del emisor
+    ((keepalive, keepalive_addr),) = receiver.poll(now=0.5)
+    assert keepalive_addr == addr
+    receiver_sock.sendto(keepalive, keepalive_addr)
+    packets = _read_control(emitter_sock)
+    assert [emitter.unpack(payload)[0] for _, payload in packets] == [MSG_KEEPALIVE]
+    assert not emitter.on_packet(*packets[0], now=2.5)
+    emitter.poll(now=5.0)
+    assert emitter.state == STATE_ACTIVE and emitter.last_heard == 2.5
@@ -0,0 +1,26 @@
+"""Filtro de origen y registro de descartes."""
+
+from source_filter import DropLog, SourceFilter
+
+
+def test_drop_log_is_rate_limited():
+    lines = []
+    drops = DropLog(lines.append, interval_s=60.0)
+    for _ in range(1000):
+        drops.add(ValueError("Cabecera no válida: 1 canal(es), 0 Hz, formato 8"))
+    drops.add(ValueError("Tipo de paquete desconocido: 200"))
+
+    assert len(lines) == 1   # el primero enseguida; el resto espera al siguiente resumen
+    assert drops.total == 1001
+    assert drops.counts == {"Cabecera no válida": 1000, "Tipo de paquete desconocido": 1}
+
+    drops.flush()
+    assert lines[-1] == "Paquetes descartados: Cabecera no válida 999, Tipo de paquete desconocido 1"
+
+
+def test_byte_bucket_limits_flood():
+    source_filter = SourceFilter(rate_bytes=10_000, burst_bytes=10_000, packet_cost=100)
+    addr = ("192.0.2.1", 5000)
+    accepted = sum(source_filter.allow(addr, b"\x00" * 900) for _ in range(100))
+    assert accepted == 10
+    assert source_filter.stats["dropped_rate"] == 90
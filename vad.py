@@ -0,0 +1,102 @@
+"""
+vad.py - Detección de actividad de voz (VAD) y ruido de confort
+
+Detector barato y vectorizado: divide cada bloque en subtramas de ~10 ms y
+calcula de una vez su energía y su tasa de cruces por cero. Una subtrama es
+voz si su energía supera claramente el suelo de ruido estimado, o si la
+supera algo menos pero tiene la tasa de cruces típica de las fricativas
+(s, f, z...). Tras la última subtrama con voz se mantiene la actividad
+durante un tiempo de gracia (hangover) para no cortar finales de palabra.
+
+ComfortNoise genera en el receptor un ruido suave al nivel anunciado por
+el emisor durante los silencios, para que no se perciba un "corte".
+"""
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """VAD por energía + cruces por cero con suelo de ruido adaptativo y hangover."""
+
+    def __init__(self, rate, frame_ms=10, hangover_ms=300, threshold_db=9.0,
+                 weak_threshold_db=4.0, zcr_min=0.25, min_energy=1e-7, noise_rise_db_s=3.0):
+        """
+        Args:
+            rate: frecuencia de muestreo (Hz)
+            frame_ms: duración de cada subtrama de análisis
+            hangover_ms: tiempo que se mantiene la actividad tras la voz
+            threshold_db: margen sobre el ruido para considerar voz
+            weak_threshold_db: margen menor aceptado si la tasa de cruces es alta
+            zcr_min: tasa de cruces por cero (por muestra) típica de fricativas
+            min_energy: energía absoluta mínima (evita falsos positivos en silencio digital)
+            noise_rise_db_s: velocidad máxima de subida del suelo de ruido (dB/s)
+        """
+        self.rate = rate
+        self.frame_len = max(1, int(rate * frame_ms / 1000))
+        self.hangover_frames = int(rate * hangover_ms / 1000)
+        self.threshold = 10 ** (threshold_db / 10)
+        self.weak_threshold = 10 ** (weak_threshold_db / 10)
+        self.zcr_min = zcr_min
+        self.min_energy = min_energy
+        self.noise_rise_db_s = noise_rise_db_s
+        self.noise_energy = None
+        self._hangover_left = 0
+        self.active = True
+
+    @property
+    def noise_rms(self):
+        """Nivel RMS estimado del ruido de fondo (lineal, escala [-1, 1])."""
+        return 0.0 if self.noise_energy is None else float(np.sqrt(self.noise_energy))
+
+    def process(self, frames):
+        """
+        Analiza un bloque float32 (frames, canales).
+
+        Retorna:
+            bool: True si el bloque contiene voz (o está dentro del hangover).
+        """
+        mono = frames.mean(axis=1) if frames.shape[1] > 1 else frames[:, 0]
+        n_sub = len(mono) // self.frame_len
+        if n_sub == 0:
+            return self.active
+        sub = mono[:n_sub * self.frame_len].reshape(n_sub, self.frame_len)
+
+        energy = np.einsum("ij,ij->i", sub, sub) / self.frame_len
+        signs = np.signbit(sub)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_len
+
+        # Suelo de ruido: baja de inmediato a los mínimos, sube despacio
+        floor = max(float(energy.min()), self.min_energy)
+        if self.noise_energy is None or floor < self.noise_energy:
+            self.noise_energy = floor
+        else:
+            rise = 10 ** (self.noise_rise_db_s * len(mono) / self.rate / 10)
+            self.noise_energy = min(self.noise_energy * rise, floor)
+
+        speech = ((energy > self.noise_energy * self.threshold)
+                  | ((energy > self.noise_energy * self.weak_threshold) & (zcr > self.zcr_min)))
+        speech &= energy > self.min_energy
+
+        if speech.any():
+            # Hangover contado desde la última subtrama con voz
+            last = int(np.flatnonzero(speech)[-1])
+            self._hangover_left = self.hangover_frames - (n_sub - 1 - last) * self.frame_len
+        else:
+            self._hangover_left -= n_sub * self.frame_len
+        self.active = bool(speech.any()) or self._hangover_left > 0
+        return self.active
+
+
+class ComfortNoise:
+    """Generador de ruido de confort al nivel RMS indicado."""
+
+    def __init__(self, channels=1, seed=None):
+        self.channels = channels
+        self.level = 0.0
+        self._rng = np.random.default_rng(seed)
+
+    def generate(self, n_frames):
+        """Retorna un bloque float32 (n_frames, canales) de ruido suave."""
+        noise = self._rng.standard_normal((n_frames, self.channels), dtype=np.float32)
+        noise *= np.float32(self.level)
+        return noise
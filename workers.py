@@ -0,0 +1,634 @@
+"""
+workers.py - Recepción de muchos streams repartida entre varios procesos
+
+Un solo proceso de Python, con el GIL, se queda corto cuando un host recibe
+decenas de streams (decodificación, resampleo, FEC). Aquí cada emisor se
+asigna a uno de N procesos de decodificación y un proceso mezclador reúne
+el resultado:
+
+    red ──> [reparto] ──> proceso 1..N: filtro de origen, autenticación,
+                                         sesión, FEC, decodificación,
+                                         resampleo al formato de la mezcla
+                                  │
+                          shm_ring.ShmRing (uno por proceso, sin pickle)
+                                  │
+                                  v
+                          mezclador: cola por stream, suma, salida de audio
+
+Reparto (WORKER_CONFIG["MODE"]):
+- "reuseport": todos los procesos ligan el mismo puerto con SO_REUSEPORT y
+  el kernel reparte por origen (Linux). Sin saltos intermedios.
+- "dispatcher": un hilo recibe y reenvía cada datagrama por localhost al
+  proceso que le toca, con la dirección original delante (FORWARD_HEADER).
+  Funciona en cualquier sistema.
+En los dos casos la clave es el emisor (IP y puerto de origen), no el
+stream_id de la cabecera: los mensajes de sesión llevan su propio
+identificador y, cifrados, no dejan ver a qué stream pertenecen. Un emisor
+transmite un único stream, así que todo lo de un stream (audio, sesión,
+FEC) llega siempre al mismo proceso. Cada proceso contesta sesión e
+informes de feedback a sus emisores (el emisor filtra por IP, no por
+puerto).
+
+Uso:
+    python workers.py --puerto 5000 --procesos 4
+    python workers.py --bench            # streams por host frente a núcleos
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from config import AUDIO_CONFIG, SECURITY_CONFIG, SOURCE_FILTER_CONFIG, NET_CONFIG, FEEDBACK_CONFIG, WORKER_CONFIG
+from protocol import (
+    PT_AUDIO, PT_CN, PT_AUDIO_RED, PT_SESSION, FLAG_ENCRYPTED, FMT_INT16, HEADER, MAGIC, VERSION,
+    build_packet, new_stream_id, parse_packet
+)
+from dsp import decode_frames, encode_frames, remix
+from resampler import StreamResampler
+from secure import cipher_from_passphrase, replay_state_path
+from source_filter import DropLog, SourceFilter, parse_host_list
+from net_tuning import BatchReceiver, tune_socket
+from net_addr import ADDR_FORMAT, bind_receiver, reply_socket, pack_addr, unpack_addr
+from feedback import ReceptionStats, build_report, split_red_payload
+from session import ReceiverSession
+from shm_ring import ShmRing
+
+MODE_REUSEPORT = "reuseport"
+MODE_DISPATCHER = "dispatcher"
+
+FORWARD_HEADER = ADDR_FORMAT            # dirección (IPv4 o IPv6), puerto y scope del emisor original
+POLL_S = 0.1                             # espera máxima de cada vuelta (parada y keepalives)
+EMITTER_TIMEOUT_S = 30.0                 # se olvida el estado de un emisor sin tráfico
+PREBUFFER_BLOCKS = 2                     # bloques de mezcla acumulados antes de sonar un stream
+STREAM_IDLE_S = 2.0                      # el mezclador olvida un stream vacío tras este tiempo
+
+# Contadores compartidos (multiprocessing.Array de u64)
+WORKER_FIELDS = ("paquetes", "bloques", "descartes_buffer", "rechazados", "emisores")
+MIXER_FIELDS = ("mezclas", "streams", "frames_descartados")
+
+
+def reuseport_available():
+    """SO_REUSEPORT reparte datagramas UDP entre sockets solo en Linux."""
+    return hasattr(socket, "SO_REUSEPORT") and sys.platform.startswith("linux")
+
+
+def resolve_mode(mode):
+    """"auto" -> reuseport si el sistema reparte por él; si no, dispatcher."""
+    if mode in (None, "", "auto"):
+        return MODE_REUSEPORT if reuseport_available() else MODE_DISPATCHER
+    if mode == MODE_REUSEPORT and not reuseport_available():
+        raise RuntimeError("SO_REUSEPORT no reparte UDP en este sistema; usar 'dispatcher'")
+    if mode not in (MODE_REUSEPORT, MODE_DISPATCHER):
+        raise ValueError(f"Modo de reparto desconocido: {mode}")
+    return mode
+
+
+def shard_of(addr, processes):
+    """Proceso que atiende al emisor `addr` (estable entre procesos, a diferencia de hash())."""
+    return zlib.crc32(f"{addr[0]}:{addr[1]}".encode()) % processes
+
+
+class _Emitter:
+    """Estado de un emisor dentro de su proceso de decodificación."""
+
+    def __init__(self, log):
+        self.session = ReceiverSession(log=log)
+        self.stats = ReceptionStats()
+        self.resampler = None
+        self.feedback_stream_id = new_stream_id()
+        self.feedback_seq = 0
+        self.next_feedback = 0.0
+        self.last_seen = time.monotonic()
+        self.negotiated = False   # ya envió audio con cabecera: se descarta su PCM heredado
+
+
+class ShardWorker:
+    """Decodificación de los emisores asignados a un proceso (ver worker_main)."""
+
+    def __init__(self, ring, reply_socket, settings, counters, log=print):
+        """
+        Args:
+            ring: ShmRing hacia el mezclador (este proceso es el productor)
+            reply_socket: socket para sesión y feedback hacia los emisores
+            settings: diccionario de WorkerPool.settings()
+            counters: vista de WORKER_FIELDS de este proceso
+        """
+        self.ring = ring
+        self.reply = reply_socket
+        self.counters = counters
+        self.log = log
+        self.mix_rate = settings["mix_rate"]
+        self.mix_channels = settings["mix_channels"]
+        self.quality = settings["quality"]
+        self.feedback = settings["feedback"]
+        self.feedback_interval = settings["feedback_interval_ms"] / 1000.0
+        self.cipher = cipher_from_passphrase(settings["passphrase"])
+        self.source_filter = SourceFilter(parse_host_list(settings["allowed_hosts"]),
+                                          rate_bytes=settings["rate_bytes"], burst_bytes=settings["burst_bytes"],
+                                          packet_cost=settings["packet_cost"])
+        self.emitters = {}
+
+    def handle_packet(self, data, addr):
+        """Mismo tratamiento que ReceiverPipeline.handle_packet, por emisor y hacia el mezclador."""
+        self.counters[0] += 1
+        if not self.source_filter.allow(addr, data):
+            return
+        if self.cipher:
+            data = self.cipher.open(data)
+            if data is None:
+                self.counters[3] += 1
+                return
+        header, payload = parse_packet(data, self.mix_rate)
+        emitter = self.emitters.get(addr)
+        if emitter is None:
+            emitter = self.emitters[addr] = _Emitter(self.log)
+            self.counters[4] = len(self.emitters)
+        emitter.last_seen = time.monotonic()
+
+        if header.ptype == PT_SESSION:
+            self.send((reply, addr) for reply in emitter.session.on_control(payload, addr))
+            return
+        if header.ptype not in (PT_AUDIO, PT_CN, PT_AUDIO_RED):
+            return
+        if header.flags & FLAG_ENCRYPTED and not self.cipher:
+            return
+        # PCM heredado sin cabecera: solo mientras ese emisor no haya negociado un stream
+        if header.stream_id is None:
+            if emitter.negotiated:
+                return
+        else:
+            emitter.negotiated = True
+
+        lost = 0
+        if header.seq is not None:
+            lost = emitter.stats.on_packet(header.stream_id, header.seq, header.timestamp,
+                                           header.rate, time.monotonic())
+            emitter.session.on_media(addr, header.stream_id)
+        if header.ptype == PT_CN:
+            return  # silencio del emisor: el mezclador rellena con ceros
+
+        if header.ptype == PT_AUDIO_RED:
+            payload, redundant = split_red_payload(payload)
+            if lost == 1 and len(redundant):
+                emitter.stats.recovered += 1
+                self.emit(emitter, header, redundant)
+        self.emit(emitter, header, payload)
+
+    def emit(self, emitter, header, payload):
+        """Decodifica, lleva al formato de la mezcla y entrega el bloque al mezclador."""
+        frames = decode_frames(payload, header.sample_format, header.channels)
+        if header.rate != self.mix_rate:
+            resampler = emitter.resampler
+            if resampler is None or (resampler.in_rate, resampler.channels) != (header.rate, header.channels):
+                resampler = emitter.resampler = StreamResampler(header.rate, self.mix_rate, header.channels,
+                                                                self.quality)
+            frames = resampler.process(frames)
+        frames = remix(frames, self.mix_channels)
+        lost = self.ring.write_split(header.stream_id or 0, frames)
+        self.counters[1] += 1
+        self.counters[2] += lost
+
+    def send(self, messages):
+        for packet, addr in messages:
+            try:
+                self.reply.sendto(self.cipher.seal(packet) if self.cipher else packet, addr)
+            except OSError:
+                pass  # el siguiente keepalive o informe lo sustituye
+
+    def send_control(self):
+        """Keepalives de sesión, informes de feedback y olvido de emisores inactivos."""
+        now = time.monotonic()
+        for addr, emitter in list(self.emitters.items()):
+            if now - emitter.last_seen > EMITTER_TIMEOUT_S:
+                del self.emitters[addr]
+                self.counters[4] = len(self.emitters)
+                continue
+            self.send(emitter.session.poll(now))
+            if self.feedback and emitter.stats.stream_id is not None and now >= emitter.next_feedback:
+                emitter.next_feedback = now + self.feedback_interval
+                # Sin nivel de buffer: la cola está en el mezclador, no en este proceso
+                packet = build_report(emitter.feedback_stream_id, emitter.feedback_seq, emitter.stats.report(0.0))
+                emitter.feedback_seq += 1
+                self.send([(packet, addr)])
+
+
+def worker_main(index, settings, ring_name, counters, ports, stop):
+    """Proceso de decodificación `index` (destino de multiprocessing.Process)."""
+    def log(message):
+        if settings["verbose"]:
+            print(f"[proceso {index}] {message}", flush=True)
+
+    ring = ShmRing.attach(ring_name)
+    if settings["mode"] == MODE_REUSEPORT:
+        sock = bind_receiver(settings["port"], settings["host"], reuse_port=True)
+        reply = sock
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        # Los emisores pueden ser IPv4 o IPv6: contestar desde un socket de doble pila
+        reply = reply_socket()
+    tune_socket(sock, rcvbuf=settings["rcvbuf"])
+    ports.put((index, sock.getsockname()[1]))
+
+    worker = ShardWorker(ring, reply, settings, _CounterView(counters, index * len(WORKER_FIELDS)), log=log)
+    if worker.cipher:
+        # Cada proceso descifra sus emisores: estado anti-repetición propio
+        worker.cipher.persist_replay(replay_state_path(f"{settings['port']}_{index}"))
+    receiver = BatchReceiver(sock, settings["batch"], timeout=POLL_S)
+    forwarded = settings["mode"] == MODE_DISPATCHER
+    drops = DropLog(log)
+    try:
+        while not stop.is_set():
+            try:
+                packets = receiver.receive()
+            except socket.timeout:
+                packets = ()
+            for data, addr in packets:
+                if forwarded:
+                    addr = unpack_addr(data, reply.family)
+                    data = data[FORWARD_HEADER.size:]
+                try:
+                    worker.handle_packet(data, addr)
+                except Exception as e:
+                    drops.add(e)
+            worker.send_control()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if drops.total:
+            log(f"Paquetes descartados al procesar: {drops.summary()}")
+        if worker.cipher:
+            worker.cipher.close_replay()
+        sock.close()
+        if reply is not sock:
+            reply.close()
+        ring.close()
+
+
+class _CounterView:
+    """Contadores de un proceso dentro del Array compartido (índices relativos)."""
+
+    def __init__(self, array, offset):
+        self.array = array
+        self.offset = offset
+
+    def __getitem__(self, i):
+        return self.array[self.offset + i]
+
+    def __setitem__(self, i, value):
+        self.array[self.offset + i] = value
+
+
+def mixer_main(settings, ring_names, counters, ready, stop):
+    """Proceso mezclador: colas por stream, suma a ritmo de bloque y salida de audio."""
+    log = lambda message: print(f"[mezclador] {message}", flush=True)
+    rings = [ShmRing.attach(name) for name in ring_names]
+    rate, channels, block = settings["mix_rate"], settings["mix_channels"], settings["mix_frames"]
+    max_pending = int(rate * settings["max_buffer_ms"] / 1000)
+    offset = len(ring_names) * len(WORKER_FIELDS)
+    mixes, active, dropped = offset, offset + 1, offset + 2
+
+    # Salida de audio opcional (sin ella, p. ej. en el benchmark, el ritmo lo marca el reloj)
+    engine = stream = resampler = None
+    if settings["output"]:
+        from audio_engine import AudioEngine
+        from devices import DeviceInventory
+        engine = AudioEngine(log=log)
+        device = DeviceInventory(engine).resolve(settings["device"], input=False)
+        stream, device_rate = engine.open(FMT_INT16, channels, rate, block, output=True, device=device)
+        if device_rate != rate:
+            resampler = StreamResampler(rate, device_rate, channels, settings["quality"])
+    ready.set()
+
+    pending = {}     # clave -> [frames pendientes, sonando, último bloque recibido]
+    next_tick = time.monotonic()
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            for ring in rings:
+                for key, frames in ring.drain():
+                    entry = pending.get(key)
+                    if entry is None:
+                        pending[key] = [frames, False, now]
+                    else:
+                        entry[0] = np.concatenate((entry[0], frames))
+                        entry[2] = now
+
+            mix = np.zeros((block, channels), dtype=np.float32)
+            playing = 0
+            for key, entry in list(pending.items()):
+                frames = entry[0]
+                if len(frames) > max_pending:
+                    # Latencia acotada: lo más antiguo sobra
+                    counters[dropped] += len(frames) - max_pending
+                    frames = frames[-max_pending:]
+                if not entry[1]:
+                    entry[1] = len(frames) >= PREBUFFER_BLOCKS * block
+                if entry[1]:
+                    n = min(block, len(frames))
+                    mix[:n] += frames[:n]
+                    frames = frames[n:]
+                    playing += 1
+                    if not len(frames):
+                        entry[1] = False   # se vació: volver a acumular antes de sonar
+                entry[0] = frames
+                if not len(frames) and now - entry[2] > STREAM_IDLE_S:
+                    del pending[key]
+            counters[active] = playing
+
+            if stream:
+                if resampler:
+                    mix = resampler.process(mix)
+                stream.write(encode_frames(mix, FMT_INT16))
+            else:
+                next_tick += block / rate
+                time.sleep(max(0.0, next_tick - time.monotonic()))
+            counters[mixes] += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if engine:
+            engine.close()
+        for ring in rings:
+            ring.close()
+
+
+class WorkerPool:
+    """Procesos de decodificación, mezclador y (en modo dispatcher) hilo de reparto."""
+
+    def __init__(self, port=5000, processes=None, mode=None, passphrase=None, allowed_hosts=None,
+                 rate_bytes=None, output=True, device_name="", verbose=True, log=print):
+        """
+        Args:
+            processes: procesos de decodificación (None = WORKER_CONFIG o uno por núcleo)
+            mode: "reuseport", "dispatcher" o "auto" (None = WORKER_CONFIG["MODE"])
+            passphrase, allowed_hosts, rate_bytes: None = los de SECURITY_CONFIG / SOURCE_FILTER_CONFIG
+            output: False = mezclar sin dispositivo de audio (benchmark, pruebas)
+            verbose: False = los procesos no informan de cada emisor
+        """
+        self.port = port
+        self.processes = processes or WORKER_CONFIG["PROCESSES"] or os.cpu_count() or 1
+        self.mode = resolve_mode(mode or WORKER_CONFIG["MODE"])
+        self.passphrase = SECURITY_CONFIG["PASSPHRASE"] if passphrase is None else passphrase
+        self.allowed_hosts = SOURCE_FILTER_CONFIG["ALLOWED_HOSTS"] if allowed_hosts is None else allowed_hosts
+        self.rate_bytes = SOURCE_FILTER_CONFIG["RATE_BYTES"] if rate_bytes is None else rate_bytes
+        self.output = output
+        self.device_name = device_name
+        self.verbose = verbose
+        self.log = log
+        # spawn en todos los sistemas: el proceso padre puede tener PortAudio e hilos en marcha
+        self.context = multiprocessing.get_context("spawn")
+        self.rings = []
+        self.procs = []
+        self.mixer = None
+        self.counters = None
+        self.stop_event = None
+        self.dispatcher = None
+        self.worker_addrs = []
+        self.started_at = None
+
+    def settings(self):
+        """Configuración que reciben los procesos (con spawn no heredan los cambios en memoria)."""
+        return {
+            "host": NET_CONFIG["BIND_HOST"], "port": self.port, "mode": self.mode,
+            "passphrase": self.passphrase, "allowed_hosts": self.allowed_hosts,
+            "rate_bytes": self.rate_bytes, "burst_bytes": SOURCE_FILTER_CONFIG["BURST_BYTES"],
+            "packet_cost": SOURCE_FILTER_CONFIG["PACKET_COST"],
+            "rcvbuf": NET_CONFIG["RCVBUF"], "batch": NET_CONFIG["BATCH"],
+            "feedback": FEEDBACK_CONFIG["ENABLED"], "feedback_interval_ms": FEEDBACK_CONFIG["INTERVAL_MS"],
+            "quality": AUDIO_CONFIG["RESAMPLE_QUALITY"],
+            "mix_rate": WORKER_CONFIG["MIX_RATE"], "mix_channels": WORKER_CONFIG["MIX_CHANNELS"],
+            "mix_frames": WORKER_CONFIG["MIX_FRAMES"], "max_buffer_ms": WORKER_CONFIG["MAX_BUFFER_MS"],
+            "output": self.output, "device": self.device_name, "verbose": self.verbose,
+        }
+
+    @property
+    def running(self):
+        return any(proc.is_alive() for proc in self.procs)
+
+    def start(self, timeout=15.0):
+        """
+        Lanza mezclador y procesos y espera a que todos escuchen.
+
+        Lanza:
+            RuntimeError: algún proceso no arrancó a tiempo
+        """
+        if self.running:
+            raise RuntimeError("El grupo de procesos ya está en marcha")
+        settings = self.settings()
+        n = self.processes
+        self.stop_event = self.context.Event()
+        self.counters = self.context.Array("Q", n * len(WORKER_FIELDS) + len(MIXER_FIELDS), lock=False)
+        # Bloques de hasta 100 ms a la frecuencia de la mezcla por ranura
+        max_frames = settings["mix_rate"] // 10
+        self.rings = [ShmRing.create(WORKER_CONFIG["RING_SLOTS"], max_frames, settings["mix_channels"])
+                      for _ in range(n)]
+        ring_names = [ring.name for ring in self.rings]
+
+        mixer_ready = self.context.Event()
+        self.mixer = self.context.Process(target=mixer_main, name="mezclador", daemon=True,
+                                          args=(settings, ring_names, self.counters, mixer_ready, self.stop_event))
+        self.mixer.start()
+
+        ports = self.context.Queue()
+        self.procs = [
+            self.context.Process(target=worker_main, name=f"decodificador-{i}", daemon=True,
+                                 args=(i, settings, ring_names[i], self.counters, ports, self.stop_event))
+            for i in range(n)
+        ]
+        for proc in self.procs:
+            proc.start()
+
+        deadline = time.monotonic() + timeout
+        bound = {}
+        try:
+            while len(bound) < n:
+                index, port = ports.get(timeout=max(0.1, deadline - time.monotonic()))
+                bound[index] = port
+            if not mixer_ready.wait(max(0.1, deadline - time.monotonic())):
+                raise RuntimeError("El mezclador no arrancó")
+        except Exception as e:
+            self.stop()
+            raise RuntimeError(f"No arrancaron todos los procesos: {e}") from e
+        self.worker_addrs = [("127.0.0.1", bound[i]) for i in range(n)]
+
+        if self.mode == MODE_DISPATCHER:
+            self.dispatcher = threading.Thread(target=self._dispatch, name="reparto", daemon=True)
+            self.dispatcher.start()
+        self.started_at = time.monotonic()
+        self.log(f"{n} proceso(s) de decodificación en el puerto {self.port} ({self.mode}), "
+                 f"mezcla a {settings['mix_rate']} Hz")
+
+    def _dispatch(self):
+        """Reparte por emisor cada datagrama recibido (modo dispatcher)."""
+        sock = bind_receiver(self.port, NET_CONFIG["BIND_HOST"])
+        tune_socket(sock, rcvbuf=NET_CONFIG["RCVBUF"])
+        out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver = BatchReceiver(sock, NET_CONFIG["BATCH"], timeout=POLL_S)
+        targets, n = self.worker_addrs, len(self.worker_addrs)
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    packets = receiver.receive()
+                except socket.timeout:
+                    continue
+                for data, addr in packets:
+                    prefix = pack_addr(addr)
+                    try:
+                        out.sendto(prefix + data, targets[shard_of(addr, n)])
+                    except OSError:
+                        pass  # proceso saturado o detenido: se pierde como en la red
+        finally:
+            sock.close()
+            out.close()
+
+    def stop(self, timeout=2.0):
+        """Detiene todos los procesos y libera la memoria compartida."""
+        if self.stop_event is not None:
+            self.stop_event.set()
+        if self.dispatcher:
+            self.dispatcher.join(timeout)
+            self.dispatcher = None
+        for proc in self.procs + ([self.mixer] if self.mixer else []):
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(timeout)
+        self.procs, self.mixer = [], None
+        for ring in self.rings:
+            ring.close()
+            ring.unlink()
+        self.rings = []
+
+    def totals(self):
+        """Suma de los contadores de todos los procesos de decodificación."""
+        width = len(WORKER_FIELDS)
+        values = self.counters[:]
+        return {field: sum(values[i * width + k] for i in range(self.processes))
+                for k, field in enumerate(WORKER_FIELDS)}
+
+    def stats(self):
+        """Contadores por proceso, totales y los del mezclador."""
+        if self.counters is None:
+            return {"activo": False}
+        width = len(WORKER_FIELDS)
+        values = self.counters[:]
+        mixer = values[self.processes * width:]
+        return {
+            "activo": self.running,
+            "modo": self.mode,
+            "puerto": self.port,
+            "procesos": [dict(zip(WORKER_FIELDS, values[i * width:(i + 1) * width])) for i in range(self.processes)],
+            "total": self.totals(),
+            "mezclador": dict(zip(MIXER_FIELDS, mixer)),
+            "segundos": round(time.monotonic() - self.started_at, 1) if self.started_at else 0,
+        }
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def generate_load(port, streams, chunk, rate, stop):
+    """Emisores sintéticos sin ritmo (un socket y stream_id por emisor) hasta `stop`."""
+    payload = (np.random.uniform(-0.5, 0.5, chunk) * 32767).astype("<i2").tobytes()
+    emitters = []
+    for _ in range(streams):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        tune_socket(sock, sndbuf=NET_CONFIG["SNDBUF"])
+        packet = bytearray(build_packet(payload, 0, 0, new_stream_id(), 1, FMT_INT16, rate))
+        emitters.append((sock, packet, HEADER.unpack_from(packet)[7]))
+    target = ("127.0.0.1", port)
+    seq = 0
+    while not stop.is_set():
+        for sock, packet, stream_id in emitters:
+            HEADER.pack_into(packet, 0, MAGIC, VERSION, PT_AUDIO, 0, 1, FMT_INT16, rate, stream_id,
+                             seq & 0xFFFFFFFF, seq * chunk)
+            try:
+                sock.sendto(packet, target)
+            except OSError:
+                pass  # buffer de envío lleno: la carga ya satura
+        seq += 1
+
+
+def benchmark(seconds=3.0, streams=64, mode=None, max_processes=None, chunk=1024, rate=44100):
+    """
+    Streams por host frente a número de procesos: paquetes decodificados por
+    segundo con carga saturante y su equivalente en streams en tiempo real.
+    """
+    cores = os.cpu_count() or 1
+    max_processes = max_processes or cores
+    counts = sorted({1, max_processes} | {2 ** k for k in range(1, 8) if 2 ** k < max_processes})
+    context = multiprocessing.get_context("spawn")
+    packets_per_stream = rate / chunk
+    results = []
+    for processes in counts:
+        port = _free_port()
+        # Sin límite de tasa por origen: cada emisor sintético envía sin ritmo
+        pool = WorkerPool(port=port, processes=processes, mode=mode, passphrase="", allowed_hosts="",
+                          rate_bytes=1e12, output=False, verbose=False, log=lambda message: None)
+        pool.start()
+        stop = context.Event()
+        generator = context.Process(target=generate_load, args=(port, streams, chunk, rate, stop), daemon=True)
+        generator.start()
+        try:
+            time.sleep(1.0)   # arranque de los emisores y resamplers
+            before = pool.totals()["bloques"]
+            start = time.perf_counter()
+            time.sleep(seconds)
+            decoded = pool.totals()["bloques"] - before
+            elapsed = time.perf_counter() - start
+        finally:
+            stop.set()
+            generator.join(2.0)
+            if generator.is_alive():
+                generator.terminate()
+            pool.stop()
+        pps = decoded / elapsed
+        results.append((processes, pps, pps / packets_per_stream))
+    return cores, pool.mode, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recepción de muchos streams repartida entre procesos.")
+    parser.add_argument("--puerto", type=int, default=5000)
+    parser.add_argument("--procesos", type=int, default=0, help="procesos de decodificación (0 = uno por núcleo)")
+    parser.add_argument("--modo", default=None, help="reuseport, dispatcher o auto")
+    parser.add_argument("--salida", default="", help="dispositivo de salida de la mezcla (vacío = predeterminado)")
+    parser.add_argument("--sin-salida", action="store_true", help="mezclar sin dispositivo de audio")
+    parser.add_argument("--bench", action="store_true", help="ejecutar benchmark de escalado")
+    parser.add_argument("--streams", type=int, default=64, help="emisores sintéticos del benchmark")
+    parser.add_argument("--segundos", type=float, default=3.0, help="duración de cada medida del benchmark")
+    args = parser.parse_args()
+
+    if args.bench:
+        cores, mode, results = benchmark(args.segundos, args.streams, args.modo, args.procesos or None)
+        print(f"Benchmark: {args.streams} emisores de 44100 Hz mono, 1024 frames/paquete "
+              f"({44100 / 1024:.0f} paquetes/s cada uno), resampleo a {WORKER_CONFIG['MIX_RATE']} Hz, "
+              f"modo {mode}, {cores} núcleo(s); el generador de carga ocupa parte de uno")
+        for processes, pps, realtime in results:
+            print(f"  procesos={processes:<3} {pps:9.0f} paquetes/s  {realtime:7.0f} streams en tiempo real")
+    else:
+        pool = WorkerPool(port=args.puerto, processes=args.procesos or None, mode=args.modo,
+                          output=not args.sin_salida, device_name=args.salida)
+        pool.start()
+        try:
+            while pool.running:
+                time.sleep(5.0)
+                total = pool.stats()
+                print(f"Emisores {total['total']['emisores']}, paquetes {total['total']['paquetes']}, "
+                      f"sonando {total['mezclador']['streams']}, "
+                      f"descartes buffer {total['total']['descartes_buffer']}", flush=True)
+        except KeyboardInterrupt:
+            print("\nDeteniendo...")
+        finally:
+            pool.stop()